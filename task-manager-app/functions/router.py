@@ -0,0 +1,80 @@
+#router.py
+import importlib
+import logging
+import os
+import sys
+
+import api
+
+# The tasks and users handlers are flat modules, as in their own packages
+HERE = os.path.dirname(os.path.abspath(__file__))
+for package in ('tasks', 'users'):
+    path = os.path.join(HERE, package)
+    if path not in sys.path:
+        sys.path.append(path)
+
+# Configure logging
+logger = logging.getLogger()
+
+# (method, resource) -> module whose lambda_handler serves it, the same pairs the
+# split layout declares as Api events. Keep the two in step when adding routes.
+ROUTES = {
+    ('POST', '/tasks'): 'assign_task',
+    ('GET', '/tasks'): 'get_user_tasks',
+    ('PUT', '/tasks'): 'edit_task',
+    ('DELETE', '/tasks'): 'delete_task',
+    ('GET', '/tasks/all'): 'get_all_tasks',
+    ('GET', '/tasks/stats'): 'get_task_stats',
+    ('GET', '/tasks/due'): 'get_due_tasks',
+    ('GET', '/tasks/search'): 'search_tasks',
+    ('GET', '/tasks/changes'): 'get_task_changes',
+    ('GET', '/tasks/archive'): 'get_archived_tasks',
+    ('GET', '/tasks/test'): 'testapi',
+    ('POST', '/tasks/bulk'): 'bulk_update_tasks',
+    ('GET', '/tasks/bulk/{id}'): 'get_bulk_update',
+    # After the literal /tasks/* routes, which API Gateway also prefers
+    ('GET', '/tasks/{id}'): 'get_task',
+    ('GET', '/tasks/{id}/history'): 'get_task_history',
+    ('POST', '/users'): 'add_user',
+    ('GET', '/users'): 'get_all_users'
+}
+
+_patterns = [(method, resource, resource.strip('/').split('/')) for method, resource in ROUTES]
+_handlers = {}
+
+
+def match(method, path):
+    """(module, resource, path parameters) of the route serving `path`, or None"""
+    segments = path.strip('/').split('/')
+    for route_method, resource, pattern in _patterns:
+        if route_method != method or len(pattern) != len(segments):
+            continue
+        parameters = {}
+        for expected, actual in zip(pattern, segments):
+            if expected.startswith('{') and expected.endswith('}'):
+                parameters[expected[1:-1]] = actual
+            elif expected != actual:
+                break
+        else:
+            return ROUTES[(route_method, resource)], resource, parameters or None
+    return None
+
+
+def handler_for(module_name):
+    """The route's lambda_handler, imported on first use so a container only loads the routes it serves"""
+    handler = _handlers.get(module_name)
+    if handler is None:
+        handler = _handlers[module_name] = importlib.import_module(module_name).lambda_handler
+    return handler
+
+
+def lambda_handler(event, context):
+    route = match(event.get('httpMethod', ''), event.get('path') or '/')
+    if route is None:
+        logger.warning("No route for %s %s", event.get('httpMethod'), event.get('path'))
+        return api.error_response(404, 'Not Found')
+
+    module_name, resource, parameters = route
+    # Hand the handler the event it would get from its own integration
+    event = dict(event, resource=resource, pathParameters=parameters)
+    return handler_for(module_name)(event, context)
@@ -0,0 +1,44 @@
+#archive_tasks.py
+import logging
+
+from boto3.dynamodb.types import TypeDeserializer
+
+# Imported first so the archive's S3 client is instrumented
+import instrumentation
+import structured_logging
+import task_archive
+import task_codec
+
+# Configure logging
+logger = logging.getLogger()
+
+deserializer = TypeDeserializer()
+
+
+@structured_logging.logged
+@instrumentation.instrumented
+def lambda_handler(event, context):
+    """
+    Consume the TasksTable stream records of tasks that TTL removed (the event
+    source mapping filters on them) and write their last image to the archive.
+    The batch is written or retried as a whole, so nothing a retry rewrites
+    was already counted elsewhere.
+    """
+    records = [record for record in event.get('Records', []) if task_archive.is_expiry(record)]
+    if not records:
+        return {'batchItemFailures': []}
+
+    entries = [
+        (record['dynamodb']['SequenceNumber'],
+         task_codec.decode({key: deserializer.deserialize(value)
+                            for key, value in record['dynamodb']['OldImage'].items()}))
+        for record in records
+    ]
+    try:
+        keys = task_archive.archive(entries)
+    except Exception as e:
+        logger.error("Could not archive %d expired tasks: %s", len(entries), e)
+        return {'batchItemFailures': [{'itemIdentifier': event['Records'][0]['dynamodb']['SequenceNumber']}]}
+
+    logger.info("Archived %d tasks into %d objects", len(entries), len(keys))
+    return {'batchItemFailures': []}
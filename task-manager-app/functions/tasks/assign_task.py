@@ -1,16 +1,24 @@
 #assign_task.py
 import json
 import boto3
+from boto3.dynamodb.conditions import Attr
 import uuid
 import logging
 import os
 from datetime import datetime, timedelta
 import pytz 
+import task_cache
+import task_codec
+import instrumentation
+import structured_logging
+import api
+import tracing
+import throttling
+import task_archive
 
 
 # Configure logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
 
 # Initialize AWS services
 try:
@@ -18,9 +26,9 @@ try:
     table_name = os.environ.get('TABLE_NAME', 'TasksTable')
     table = dynamodb.Table(table_name)
     sns_client = boto3.client('sns')
-    events_client = boto3.client('events')
+    events_client = throttling.client('events')
 except Exception as e:
-    logger.error(f"Error initializing AWS services: {e}")
+    logger.error("Error initializing AWS services: %s", e)
     raise
 
 # Get SNS topic ARNs from environment variables
@@ -58,7 +66,7 @@ def schedule_deadline_notification(task, context):
                 f"{notification_time.day} {notification_time.month} ? {notification_time.year})"
             )
             
-            logger.info(f"Creating EventBridge rule with expression: {cron_expression}")
+            logger.info("Creating EventBridge rule with expression: %s", cron_expression)
             
             # Create the rule
             events_client.put_rule(
@@ -67,18 +75,13 @@ def schedule_deadline_notification(task, context):
                 State='ENABLED'
             )
 
-            deadline_function_name = os.environ.get('TASKS_DEADLINE_FUNCTION_NAME')
-            if not deadline_function_name:
-                logger.error("TASKS_DEADLINE_FUNCTION_NAME environment variable not set")
-                raise ValueError("Missing required environment variable: TASKS_DEADLINE_FUNCTION_NAME")
-
             # Create the Lambda target
             target_lambda_arn = os.environ.get('TASKS_DEADLINE_FUNCTION_ARN')
             if not target_lambda_arn:
                 logger.error("TASKS_DEADLINE_FUNCTION_ARN environment variable not set")
                 raise ValueError("Missing required environment variable: TASKS_DEADLINE_FUNCTION_ARN")
             
-            logger.info(f"Setting target Lambda ARN: {target_lambda_arn}")
+            logger.info("Setting target Lambda ARN: %s", target_lambda_arn)
 
             # Add target to the rule
             events_client.put_targets(
@@ -86,35 +89,24 @@ def schedule_deadline_notification(task, context):
                 Targets=[{
                     'Id': f"task-deadline-notification-{task['TaskId']}",
                     'Arn': target_lambda_arn,
-                    'Input': json.dumps({
+                    'Input': json.dumps(tracing.inject({
                         'taskId': task['TaskId'],
                         'assignee_email': task['responsibility']
-                    })
+                    }, scheduled_for=notification_time.replace(second=0, microsecond=0)))
                 }]
             )
 
-            # Add permission for EventBridge to invoke the Lambda
-            lambda_client = boto3.client('lambda')
-            try:
-                lambda_client.add_permission(
-                    FunctionName=deadline_function_name,
-                    StatementId=f"EventBridge-{task['TaskId']}",
-                    Action='lambda:InvokeFunction',
-                    Principal='events.amazonaws.com',
-                    SourceArn=f"arn:aws:events:{os.environ['AWS_REGION']}:{os.environ['AWS_ACCOUNT_ID']}:rule/{rule_name}"
-                )
-            except lambda_client.exceptions.ResourceConflictException:
-                # Permission already exists, which is fine
-                pass
+            # EventBridge may invoke the deadline function from any task-deadline-* rule
+            # (TaskDeadlineNotificationPermission), so no per-task permission is added
 
-            logger.info(f"Successfully scheduled deadline notification for task {task['TaskId']} at {notification_time} UTC")
+            logger.info("Successfully scheduled deadline notification for task %s at %s UTC", task['TaskId'], notification_time)
 
         except ValueError as ve:
-            logger.error(f"Invalid deadline format or missing environment variable: {ve}")
+            logger.error("Invalid deadline format or missing environment variable: %s", ve)
             return
             
     except Exception as e:
-        logger.error(f"Error scheduling deadline notification: {e}")
+        logger.error("Error scheduling deadline notification: %s", e)
         raise
 
 def send_task_notification(task, admin_email):
@@ -148,7 +140,7 @@ Task Details:
 
 Please log in to the system to view more details and start working on your task.
 """
-        logger.info(f"Attempting to send notification to topic: {TASKS_ASSIGNMENT_TOPIC_ARN}")
+        logger.info("Attempting to send notification to topic: %s", TASKS_ASSIGNMENT_TOPIC_ARN)
         
         # Publish to SNS topic with message attributes for filtering
         response = sns_client.publish(
@@ -163,132 +155,76 @@ Please log in to the system to view more details and start working on your task.
             },
             MessageStructure='string'  # Explicitly set message structure
         )
-        logger.info(f"Notification sent successfully: {response['MessageId']}")
+        logger.info("Notification sent successfully: %s", response['MessageId'])
         
     except Exception as e:
-        logger.error(f"Error sending notification: {e}")
-        logger.error(f"Topic ARN: {TASKS_ASSIGNMENT_TOPIC_ARN}")
-        logger.error(f"Task: {json.dumps(task)}")
+        logger.error("Error sending notification for task %s to topic %s: %s", task.get('TaskId'), TASKS_ASSIGNMENT_TOPIC_ARN, e)
+        logger.debug("Task: %s", task)
         raise
-def lambda_handler(event, context):
-    try:
-        claims = event.get('requestContext', {}).get('authorizer', {}).get('claims', {})
-        user_email = claims.get('email')
-        
-        if not user_email:
-            logger.warning("Unauthorized access attempt: Missing email claim")
-            return {
-                'statusCode': 401,
-                "headers": {
-                        "Content-Type": "application/json",
-                        "Access-Control-Allow-Origin": "*",
-                        "Access-Control-Allow-Credentials": True
-                },
-                'body': json.dumps({'error': 'Unauthorized'})
-            }
-        
-        task = json.loads(event.get('body', '{}'))
-        if not task:
-            logger.warning("Invalid request: Missing task data")
-            return {
-                'statusCode': 400,
-                "headers": {
-                        "Content-Type": "application/json",
-                        "Access-Control-Allow-Origin": "*",
-                        "Access-Control-Allow-Credentials": True
-                },
-                'body': json.dumps({'error': 'Invalid request: Missing task data'})
-            }
-        
-        # Validate required fields
-        required_fields = ['name', 'responsibility']
-        missing_fields = [field for field in required_fields if field not in task]
-        if missing_fields:
-            return {
-                'statusCode': 400,
-                "headers": {
-                        "Content-Type": "application/json",
-                        "Access-Control-Allow-Origin": "*",
-                        "Access-Control-Allow-Credentials": True
-                },
-                'body': json.dumps({'error': f'Missing required fields: {", ".join(missing_fields)}'})
-            }
+TASK_SCHEMA = api.Schema(required=('name', 'responsibility'), types={'name': str, 'responsibility': str, 'deadline': str,
+                                                                      'team': str},
+                         empty_message='Invalid request: Missing task data')
+# Set by the service alone; a client's values for them are dropped (a past ArchiveAt would have TTL delete the task)
+SYSTEM_FIELDS = ('TaskId', 'status', 'completed_at', task_archive.TTL_ATTRIBUTE)
+
+
+@structured_logging.logged
+@tracing.traced
+@instrumentation.instrumented
+@api.endpoint(schema=TASK_SCHEMA, idempotent=True)
+def lambda_handler(request):
+    task = {name: value for name, value in request.body.items() if name not in SYSTEM_FIELDS}
+
+    # Validate deadline format if provided
+    if 'deadline' in task:
+        try:
+            due_date = datetime.fromisoformat(task['deadline'].replace('Z', '+00:00'))
+        except ValueError:
+            raise api.ApiError(400, 'Invalid deadline format. Use ISO format (e.g., 2025-01-11T18:00:00Z)')
 
-        # Validate deadline format if provided
-        if 'deadline' in task:
-            try:
-                due_date = datetime.fromisoformat(task['deadline'].replace('Z', '+00:00'))
+        # Ensure it's timezone-aware
+        if due_date.tzinfo is None:
+            due_date = pytz.UTC.localize(due_date)
 
-                # Ensure it's timezone-aware
-                if due_date.tzinfo is None:
-                    due_date = pytz.UTC.localize(due_date)
+        if due_date <= datetime.now(pytz.UTC):  # Compare with an aware datetime
+            raise api.ApiError(400, 'Deadline must be in the future')
 
-                if due_date <= datetime.now(pytz.UTC):  # Compare with an aware datetime
+    # Generate TaskId and set status. With an Idempotency-Key the ID follows from the key: a failure
+    # after the write releases the key, and the retry must land on the same task instead of a second one
+    task['TaskId'] = str(uuid.uuid5(uuid.NAMESPACE_URL, request.idempotency_key) if request.idempotency_key
+                         else uuid.uuid4())
+    task['status'] = 'open'
 
-                    return {
-                        'statusCode': 400,
-                        'body': json.dumps({'error': 'Deadline must be in the future'})
-                    }
-            except ValueError:
-                return {
-                    'statusCode': 400,
-                    "headers": {
-                        "Content-Type": "application/json",
-                        "Access-Control-Allow-Origin": "*",
-                        "Access-Control-Allow-Credentials": True
-                    },
-                    'body': json.dumps({'error': 'Invalid deadline format. Use ISO format (e.g., 2025-01-11T18:00:00Z)'})
-                }
+    # A team admin's tasks belong to the team; an admin without one may name it
+    team = request.team or task.pop('team', None)
+    if team:
+        task['team'] = team
 
-        # Generate TaskId and set status
-        task['TaskId'] = str(uuid.uuid4())
-        task['status'] = 'open'
-        
-        # Save task to DynamoDB
-        table.put_item(Item=task)
-        
-        # Send notification to assignee
-        send_task_notification(task, user_email)
-        
-        # Schedule deadline notification if deadline is set
-        if 'deadline' in task:
-            schedule_deadline_notification(task, context)
-        
-        logger.info(f"Task assigned successfully: {task['TaskId']}")
-        
-        return {
-            'statusCode': 200,
-            "headers": {
-                        "Content-Type": "application/json",
-                        "Access-Control-Allow-Origin": "*",
-                        "Access-Control-Allow-Credentials": True
-            },
-            'body': json.dumps({
-                'message': 'Task assigned successfully!',
-                'TaskId': task['TaskId']
-            })
-        }
-    
-    except json.JSONDecodeError:
-        logger.error("Error decoding JSON request body")
-        return {
-            'statusCode': 400,
-            "headers": {
-                        "Content-Type": "application/json",
-                        "Access-Control-Allow-Origin": "*",
-                        "Access-Control-Allow-Credentials": True
-            },
-            'body': json.dumps({'error': 'Invalid JSON format'})
-        }
-    
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
-        return {
-            'statusCode': 500,
-            "headers": {
-                        "Content-Type": "application/json",
-                        "Access-Control-Allow-Origin": "*",
-                        "Access-Control-Allow-Credentials": True
-            },
-            'body': json.dumps({'error': 'Internal Server Error'})
-        }
\ No newline at end of file
+    # Save task to DynamoDB in the compact encoding
+    if request.idempotency_key:
+        try:
+            table.put_item(Item=task_codec.encode(task), ConditionExpression=Attr('TaskId').not_exists())
+            task_cache.prime(task)
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            # An earlier attempt wrote the task and failed after; finish its notification and schedule
+            logger.info("Task %s was written by an earlier attempt, completing it", task['TaskId'])
+    else:
+        table.put_item(Item=task_codec.encode(task))
+        task_cache.prime(task)
+
+    # Send notification to assignee
+    send_task_notification(task, request.email)
+
+    # Schedule deadline notification if deadline is set
+    if 'deadline' in task:
+        try:
+            schedule_deadline_notification(task, request.context)
+        finally:
+            throttling.emit_metrics()
+
+    logger.info("Task assigned successfully: %s", task['TaskId'])
+
+    return {
+        'message': 'Task assigned successfully!',
+        'TaskId': task['TaskId']
+    }
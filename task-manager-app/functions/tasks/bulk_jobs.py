@@ -0,0 +1,103 @@
+#bulk_jobs.py
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+
+# Configure logging
+logger = logging.getLogger()
+
+# Initialize AWS services
+dynamodb = boto3.resource('dynamodb')
+TASK_JOBS_TABLE_NAME = os.environ.get('TASK_JOBS_TABLE_NAME', 'TaskJobsTable')
+jobs_table = dynamodb.Table(TASK_JOBS_TABLE_NAME)
+
+# A job's progress stays readable this long after it was started
+TASK_JOB_RETENTION_DAYS = float(os.environ.get('TASK_JOB_RETENTION_DAYS', '30'))
+
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+# Per-job totals, added to after every page of tasks
+COUNTERS = ('matched', 'updated', 'unchanged', 'conflicts')
+
+# Kept on the job for the worker, left out of what the API returns
+INTERNAL_FIELDS = ('cursor', 'ExpiresAt')
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def create(job_filter, changes, team, started_by):
+    """Record a new running job with zeroed counters; returns it"""
+    job = {
+        'JobId': uuid.uuid4().hex,
+        'status': RUNNING,
+        'filter': job_filter,
+        'set': changes,
+        'started_by': started_by,
+        'created_at': _now(),
+        'updated_at': _now(),
+        'invocations': 0,
+        **{counter: 0 for counter in COUNTERS}
+    }
+    if team is not None:
+        job['team'] = team
+    if TASK_JOB_RETENTION_DAYS:
+        job['ExpiresAt'] = int(time.time() + TASK_JOB_RETENTION_DAYS * 86400)
+    jobs_table.put_item(Item=job, ConditionExpression=Attr('JobId').not_exists())
+    return job
+
+
+def get(job_id):
+    return jobs_table.get_item(Key={'JobId': job_id}, ConsistentRead=True).get('Item')
+
+
+def visible(job, request):
+    """Admins see the jobs of their team (every job for an admin without a team)"""
+    return request.is_admin and (request.team is None or job.get('team') == request.team)
+
+
+def public(job):
+    return {name: value for name, value in job.items() if name not in INTERNAL_FIELDS}
+
+
+def started_invocation(job_id):
+    """Count an invocation of the worker on the job"""
+    jobs_table.update_item(Key={'JobId': job_id}, UpdateExpression='ADD invocations :one',
+                           ExpressionAttributeValues={':one': 1})
+
+
+def record_page(job_id, counts, cursor):
+    """
+    Add one page's counts to the job and move its cursor on; a None cursor
+    means the page was the last one and the job has succeeded
+    """
+    names = {'#status': 'status', **{f"#{counter}": counter for counter in COUNTERS}}
+    values = {':now': _now(), **{f":{counter}": counts.get(counter, 0) for counter in COUNTERS}}
+    expression = 'ADD ' + ', '.join(f"#{counter} :{counter}" for counter in COUNTERS) + ' SET updated_at = :now'
+    if cursor is None:
+        expression += ', #status = :succeeded, finished_at = :now REMOVE #cursor'
+        values[':succeeded'] = SUCCEEDED
+    else:
+        expression += ', #cursor = :cursor'
+        values[':cursor'] = cursor
+    names['#cursor'] = 'cursor'
+    jobs_table.update_item(Key={'JobId': job_id}, UpdateExpression=expression,
+                           ExpressionAttributeNames=names, ExpressionAttributeValues=values)
+
+
+def fail(job_id, error):
+    """Stop the job where its cursor is; the tasks already updated stay updated"""
+    jobs_table.update_item(
+        Key={'JobId': job_id},
+        UpdateExpression='SET #status = :failed, #error = :error, updated_at = :now, finished_at = :now',
+        ExpressionAttributeNames={'#status': 'status', '#error': 'error'},
+        ExpressionAttributeValues={':failed': FAILED, ':error': error, ':now': _now()}
+    )
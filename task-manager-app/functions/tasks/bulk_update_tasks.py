@@ -0,0 +1,74 @@
+#bulk_update_tasks.py
+import json
+import logging
+import os
+
+import boto3
+
+import api
+import bulk_jobs
+import instrumentation
+import responses
+import structured_logging
+import tracing
+
+# Configure logging
+logger = logging.getLogger()
+
+# Initialize AWS services
+try:
+    lambda_client = boto3.client('lambda')
+except Exception as e:
+    logger.error("Error initializing AWS services: %s", e)
+    raise
+
+# The function that works through a job's tasks
+BULK_UPDATE_FUNCTION_NAME = os.environ.get('BULK_UPDATE_FUNCTION_NAME')
+
+FILTER_FIELDS = ('responsibility', 'status', 'team')
+SET_FIELDS = ('responsibility', 'status')
+# A bulk update completes or reopens tasks, as PUT /tasks does
+SET_STATUSES = ('open', 'completed')
+
+BULK_SCHEMA = api.Schema(required=('filter', 'set'), types={'filter': dict, 'set': dict})
+
+
+def validated(fields, allowed, name):
+    """The non-empty string values of `fields`, which may only name `allowed` ones"""
+    unknown = sorted(set(fields) - set(allowed))
+    if unknown:
+        raise api.ApiError(400, f"{name} only takes {', '.join(allowed)}, not {', '.join(unknown)}")
+    if not all(isinstance(value, str) and value for value in fields.values()):
+        raise api.ApiError(400, f"{name} values must be non-empty strings")
+    return dict(fields)
+
+
+@structured_logging.logged
+@tracing.traced
+@instrumentation.instrumented
+@api.endpoint(schema=BULK_SCHEMA, admin=True, idempotent=True)
+def lambda_handler(request):
+    """
+    Reassign or change the status of every task matching a filter, e.g.
+    {"filter": {"responsibility": "leaver@x.io", "status": "open"},
+     "set": {"responsibility": "successor@x.io"}}. The work runs as a job in
+    the background; GET /tasks/bulk/{id} reports its progress.
+    """
+    job_filter = validated(request.body['filter'], FILTER_FIELDS, 'filter')
+    changes = validated(request.body['set'], SET_FIELDS, 'set')
+    if 'status' in changes and changes['status'] not in SET_STATUSES:
+        raise api.ApiError(400, f"set.status must be one of {', '.join(SET_STATUSES)}")
+
+    # A team admin's job only reaches their team's tasks
+    if request.team is not None:
+        job_filter['team'] = request.team
+    if not job_filter:
+        # Never every task by accident
+        raise api.ApiError(400, 'filter must name a responsibility, status or team')
+
+    job = bulk_jobs.create(job_filter, changes, job_filter.get('team'), request.email)
+    lambda_client.invoke(FunctionName=BULK_UPDATE_FUNCTION_NAME, InvocationType='Event',
+                         Payload=json.dumps(tracing.inject({'job_id': job['JobId']})))
+    logger.info("Started bulk update %s of %s: %s", job['JobId'], json.dumps(job_filter), json.dumps(changes))
+
+    return responses.json_response(202, bulk_jobs.public(job), request.event)
@@ -0,0 +1,125 @@
+#change_log.py
+import logging
+import os
+import time
+
+import boto3
+from boto3.dynamodb.conditions import Key
+
+# Configure logging
+logger = logging.getLogger()
+
+# Initialize AWS services
+dynamodb = boto3.resource('dynamodb')
+TASK_CHANGES_TABLE_NAME = os.environ.get('TASK_CHANGES_TABLE_NAME', 'TaskChangesTable')
+changes_table = dynamodb.Table(TASK_CHANGES_TABLE_NAME)
+
+ALL_TASKS_FEED = 'ALL'
+CHANGE_LOG_RETENTION_DAYS = int(os.environ.get('CHANGE_LOG_RETENTION_DAYS', '30'))
+# Entries younger than this are held back so that a slower concurrent writer
+# can never land behind a cursor a client has already read past
+CHANGE_FEED_SETTLE_SECONDS = float(os.environ.get('CHANGE_FEED_SETTLE_SECONDS', '2'))
+
+
+class CursorExpiredError(Exception):
+    """The requested cursor is older than the retained change log; the client must resync"""
+
+
+def user_feed(email):
+    return f"USER#{email}"
+
+
+def team_feed(team):
+    return f"TEAM#{team}"
+
+
+def make_cursor(epoch_ms, sequence_number=''):
+    return f"{epoch_ms:013d}-{sequence_number:0>40}"
+
+
+def cursor_time_ms(cursor):
+    return int(cursor.split('-', 1)[0])
+
+
+def _entries(old_task, new_task):
+    """(feed, op, task) triples describing a change from each feed's point of view"""
+    if new_task:
+        entries = [(ALL_TASKS_FEED, 'upsert', new_task)]
+    else:
+        entries = [(ALL_TASKS_FEED, 'delete', old_task)]
+
+    for field, feed_of in (('responsibility', user_feed), ('team', team_feed)):
+        old_owner = (old_task or {}).get(field)
+        new_owner = (new_task or {}).get(field)
+        if new_owner:
+            entries.append((feed_of(new_owner), 'upsert', new_task))
+        if old_owner and old_owner != new_owner:
+            # The task left this user's or team's list (deleted, reassigned or moved)
+            entries.append((feed_of(old_owner), 'delete', old_task))
+    return entries
+
+
+def apply_change(old_task, new_task, sequence_number):
+    """Append one change to every affected feed"""
+    now = time.time()
+    cursor = make_cursor(int(now * 1000), sequence_number)
+    expires_at = int(now) + CHANGE_LOG_RETENTION_DAYS * 86400
+
+    with changes_table.batch_writer() as batch:
+        for feed, op, task in _entries(old_task, new_task):
+            item = {
+                'Feed': feed,
+                'Cursor': cursor,
+                'TaskId': task['TaskId'],
+                'Op': op,
+                'ExpiresAt': expires_at
+            }
+            if op == 'upsert':
+                item['Task'] = task
+            batch.put_item(Item=item)
+
+
+def head_cursor():
+    """A cursor to start syncing from before downloading the full task list"""
+    return make_cursor(int((time.time() - CHANGE_FEED_SETTLE_SECONDS) * 1000))
+
+
+def read_changes(feed, since, limit=100):
+    """
+    Return (changes, next_cursor, has_more) for entries after `since`, oldest
+    first. Raises CursorExpiredError when `since` predates the retention window.
+    """
+    now_ms = int(time.time() * 1000)
+    if cursor_time_ms(since) < now_ms - CHANGE_LOG_RETENTION_DAYS * 86400 * 1000:
+        raise CursorExpiredError(since)
+    settled = make_cursor(now_ms - int(CHANGE_FEED_SETTLE_SECONDS * 1000))
+    if since >= settled:
+        return [], since, False
+
+    response = changes_table.query(
+        KeyConditionExpression=Key('Feed').eq(feed) & Key('Cursor').between(since, settled),
+        Limit=limit + 1
+    )
+    changes = [item for item in response.get('Items', []) if item['Cursor'] != since]
+    has_more = len(changes) > limit or ('LastEvaluatedKey' in response and len(changes) == limit)
+    changes = changes[:limit]
+
+    # Once caught up, jump to the settled point so idle clients never fall out of retention
+    next_cursor = changes[-1]['Cursor'] if has_more else settled
+    return [
+        {key: value for key, value in change.items() if key not in ('Feed', 'ExpiresAt')}
+        for change in changes
+    ], next_cursor, has_more
+
+
+def feed_version(feed):
+    """Cursor of the newest retained entry in `feed`, or None when the feed has none"""
+    response = changes_table.query(
+        KeyConditionExpression=Key('Feed').eq(feed),
+        ScanIndexForward=False,
+        Limit=1,
+        ProjectionExpression='#cursor',
+        ExpressionAttributeNames={'#cursor': 'Cursor'}
+    )
+    items = response.get('Items', [])
+    return items[0]['Cursor'] if items else None
@@ -4,48 +4,55 @@ import logging
 import os
 from datetime import datetime
 import pytz
+import task_codec
+import instrumentation
+import structured_logging
+import tracing
+import throttling
 
 # Configure logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
 
 # Initialize AWS clients
 dynamodb = boto3.resource('dynamodb')
 sqs = boto3.client('sqs')
 sns_client = boto3.client('sns')
-events_client = boto3.client('events')
+events_client = throttling.client('events')
 
 TABLE_NAME = os.environ.get('TABLE_NAME')
 EXPIRED_TASKS_QUEUE_URL = os.environ.get('EXPIRED_TASKS_QUEUE_URL')
 CLOSED_TASKS_TOPIC_ARN = os.environ.get('CLOSED_TASKS_TOPIC_ARN')
 
+@structured_logging.logged
+@tracing.traced
+@instrumentation.instrumented
 def lambda_handler(event, context):
     try:
         task_id = event['taskId']
-        assignee_email = event['assignee_email']
 
-        # Get task details from DynamoDB
         table = dynamodb.Table(TABLE_NAME)
-        response = table.get_item(Key={'TaskId': task_id})
+        # A consistent read, not the API's task cache: a task completed moments ago must not be notified
+        task = task_codec.decode(table.get_item(Key={'TaskId': task_id}, ConsistentRead=True).get('Item'))
         
-        if 'Item' not in response:
-            logger.warning(f"Task {task_id} not found")
+        if task is None:
+            logger.warning("Task %s not found", task_id)
             return
-            
-        task = response['Item']
         
         # Only process if task is still open
         if task['status'] != 'open':
-            logger.info(f"Task {task_id} is not open, skipping deadline check")
+            logger.info("Task %s is not open, skipping deadline check", task_id)
             return
 
+        # Whoever holds the task now; the rule's input names the assignee it was scheduled for
+        assignee_email = task.get('responsibility') or event['assignee_email']
+
         # Send task to SQS for processing
         sqs.send_message(
             QueueUrl=EXPIRED_TASKS_QUEUE_URL,
-            MessageBody=json.dumps({
+            MessageBody=json.dumps(tracing.inject({
                 'taskId': task_id,
                 'assignee_email': assignee_email
-            })
+            }))
         )
 
         # Send SNS notification to ClosedTasksNotificationTopic
@@ -85,8 +92,11 @@ Please follow up as necessary.
             Name=rule_name
         )
 
-        logger.info(f"Task {task_id} deadline reached, sent to processing queue and notified via SNS.")
+        logger.info("Task %s deadline reached, sent to processing queue and notified via SNS.", task_id)
 
     except Exception as e:
-        logger.error(f"Error in deadline check handler: {e}")
+        logger.error("Error in deadline check handler: %s", e)
         raise
+
+    finally:
+        throttling.emit_metrics()
@@ -2,10 +2,12 @@ import json
 import boto3
 import logging
 import os
+import task_codec
+import instrumentation
+import structured_logging
 
 # Configure logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
 
 # Initialize AWS clients
 dynamodb = boto3.resource('dynamodb')
@@ -15,26 +17,28 @@ events_client = boto3.client('events')
 TABLE_NAME = os.environ.get('TABLE_NAME')
 TASKS_DEADLINE_TOPIC_ARN = os.environ.get('TASKS_DEADLINE_TOPIC_ARN')
 
+@structured_logging.logged
+@instrumentation.instrumented
 def lambda_handler(event, context):
     try:
         task_id = event['taskId']
-        assignee_email = event['assignee_email']
 
-        # Get task details from DynamoDB
         table = dynamodb.Table(TABLE_NAME)
-        response = table.get_item(Key={'TaskId': task_id})
+        # A consistent read, not the API's task cache: a task completed moments ago must not be notified
+        task = task_codec.decode(table.get_item(Key={'TaskId': task_id}, ConsistentRead=True).get('Item'))
         
-        if 'Item' not in response:
-            logger.warning(f"Task {task_id} not found")
+        if task is None:
+            logger.warning("Task %s not found", task_id)
             return
-            
-        task = response['Item']
         
         # Only send notification if task is still open
         if task['status'] != 'open':
-            logger.info(f"Task {task_id} is not open, skipping notification")
+            logger.info("Task %s is not open, skipping notification", task_id)
             return
 
+        # Whoever holds the task now; the rule's input names the assignee it was scheduled for
+        assignee_email = task.get('responsibility') or event['assignee_email']
+
         # Create notification message
         message = f"""
 ⚠️ Upcoming Task Deadline Alert ⚠️
@@ -73,8 +77,8 @@ Please ensure you complete this task before the deadline.
             Name=rule_name
         )
 
-        logger.info(f"Deadline notification sent for task {task_id}")
+        logger.info("Deadline notification sent for task %s", task_id)
 
     except Exception as e:
-        logger.error(f"Error sending deadline notification: {e}")
+        logger.error("Error sending deadline notification: %s", e)
         raise
\ No newline at end of file
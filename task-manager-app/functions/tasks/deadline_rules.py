@@ -0,0 +1,54 @@
+#deadline_rules.py
+import logging
+import re
+from datetime import datetime, timezone
+
+# Configure logging
+logger = logging.getLogger()
+
+# Every task with a deadline owns up to two one-shot rules: the warning rule created on
+# assignment, then the final rule deadline_warning creates when the warning fires
+WARNING_RULE_PREFIX = 'task-deadline-'
+FINAL_RULE_PREFIX = 'task-final-deadline-'
+RULE_PREFIXES = (WARNING_RULE_PREFIX, FINAL_RULE_PREFIX)
+
+_CRON = re.compile(r'^cron\((\d+) (\d+) (\d+) (\d+) \? (\d+)\)$')
+
+
+def rules_for(task_id):
+    """[(rule name, target id)] of the task's rules"""
+    return [
+        (f"{WARNING_RULE_PREFIX}{task_id}", f"task-deadline-notification-{task_id}"),
+        (f"{FINAL_RULE_PREFIX}{task_id}", f"task-final-deadline-{task_id}")
+    ]
+
+
+def task_id_of(rule_name):
+    """The task a deadline rule belongs to, or None for any other rule"""
+    for prefix in RULE_PREFIXES:
+        if rule_name.startswith(prefix):
+            return rule_name[len(prefix):]
+    return None
+
+
+def scheduled_for(schedule_expression):
+    """The UTC time a one-shot cron(M H D M ? Y) rule fires at, or None for other expressions"""
+    match = _CRON.match(schedule_expression or '')
+    if not match:
+        return None
+    minute, hour, day, month, year = (int(value) for value in match.groups())
+    try:
+        return datetime(year, month, day, hour, minute, tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def delete_rules(events_client, task_id):
+    """Delete both of the task's rules; rules that were never created or are already gone are skipped"""
+    for rule_name, target_id in rules_for(task_id):
+        try:
+            events_client.remove_targets(Rule=rule_name, Ids=[target_id])
+            events_client.delete_rule(Name=rule_name)
+            logger.info("Deleted event rule %s for task %s", rule_name, task_id)
+        except events_client.exceptions.ResourceNotFoundException:
+            logger.info("Rule %s not found for task %s", rule_name, task_id)
@@ -5,41 +5,48 @@ import logging
 import os
 from datetime import datetime
 import pytz
+import task_codec
+import instrumentation
+import structured_logging
+import tracing
+import throttling
 
 # Configure logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
 
 # Initialize AWS clients
 dynamodb = boto3.resource('dynamodb')
 sns_client = boto3.client('sns')
-events_client = boto3.client('events')
+events_client = throttling.client('events')
 sqs = boto3.client('sqs')
 
 TABLE_NAME = os.environ.get('TABLE_NAME')
 TASKS_DEADLINE_TOPIC_ARN = os.environ.get('TASKS_DEADLINE_TOPIC_ARN')
 EXPIRED_TASKS_QUEUE_URL = os.environ.get('EXPIRED_TASKS_QUEUE_URL')
 
+@structured_logging.logged
+@tracing.traced
+@instrumentation.instrumented
 def lambda_handler(event, context):
     try:
         task_id = event['taskId']
-        assignee_email = event['assignee_email']
 
-        # Get task details from DynamoDB
         table = dynamodb.Table(TABLE_NAME)
-        response = table.get_item(Key={'TaskId': task_id})
+        # A consistent read, not the API's task cache: a task completed moments ago must not be notified
+        task = task_codec.decode(table.get_item(Key={'TaskId': task_id}, ConsistentRead=True).get('Item'))
         
-        if 'Item' not in response:
-            logger.warning(f"Task {task_id} not found")
+        if task is None:
+            logger.warning("Task %s not found", task_id)
             return
-            
-        task = response['Item']
         
         # Only send notification if task is still open
         if task['status'] != 'open':
-            logger.info(f"Task {task_id} is not open, skipping notification")
+            logger.info("Task %s is not open, skipping notification", task_id)
             return
 
+        # Whoever holds the task now; the rule's input names the assignee it was scheduled for
+        assignee_email = task.get('responsibility') or event['assignee_email']
+
         # Create notification message
         message = f"""
 ⚠️ Upcoming Task Deadline Alert ⚠️
@@ -92,26 +99,14 @@ Please ensure you complete this task before the deadline.
             Targets=[{
                 'Id': f"task-final-deadline-{task_id}",
                 'Arn': os.environ['DEADLINE_CHECK_FUNCTION_ARN'],
-                'Input': json.dumps({
+                'Input': json.dumps(tracing.inject({
                     'taskId': task_id,
                     'assignee_email': assignee_email
-                })
+                }, scheduled_for=deadline.replace(second=0, microsecond=0)))
             }]
         )
 
-    # Add permission for EventBridge to invoke the Lambda
-        lambda_client = boto3.client('lambda')
-        try:
-            lambda_client.add_permission(
-                FunctionName=os.environ['DEADLINE_CHECK_FUNCTION_NAME'],
-                StatementId=f"EventBridge-{task['TaskId']}",
-                Action='lambda:InvokeFunction',
-                Principal='events.amazonaws.com',
-                SourceArn=f"arn:aws:events:{os.environ['AWS_REGION']}:{os.environ['AWS_ACCOUNT_ID']}:rule/{deadline_rule_name}"
-            )
-        except lambda_client.exceptions.ResourceConflictException:
-            # Permission already exists, which is fine
-            pass
+        # DeadlineCheckPermission lets EventBridge invoke the check from any task-final-deadline-* rule
 
         # Clean up the warning notification rule
         warning_rule_name = f"task-deadline-{task_id}"
@@ -123,8 +118,11 @@ Please ensure you complete this task before the deadline.
             Name=warning_rule_name
         )
 
-        logger.info(f"Deadline warning sent and final deadline scheduled for task {task_id}")
+        logger.info("Deadline warning sent and final deadline scheduled for task %s", task_id)
 
     except Exception as e:
-        logger.error(f"Error in deadline warning handler: {e}")
+        logger.error("Error in deadline warning handler: %s", e)
         raise
+
+    finally:
+        throttling.emit_metrics()
@@ -1,81 +1,56 @@
-import json
 import boto3
 import logging
+import task_cache
+import instrumentation
+import structured_logging
+import api
+import throttling
+import deadline_rules
+import task_views
 
 # Configure logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
 
-# Initialize DynamoDB
+# Initialize AWS services
 try:
     dynamodb = boto3.resource('dynamodb')
     table = dynamodb.Table('TasksTable')
+    events_client = throttling.client('events')
 except Exception as e:
-    logger.error(f"Error initializing DynamoDB: {e}")
+    logger.error("Error initializing AWS services: %s", e)
     raise
 
-def lambda_handler(event, context):
-    try:
-        claims = event.get('requestContext', {}).get('authorizer', {}).get('claims', {})
-        user_groups = claims.get('cognito:groups', [])
-        is_admin = 'admin' in user_groups
-        
-        if not is_admin:
-            logger.warning("Unauthorized delete attempt")
-            return {'statusCode': 403,
-            "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Credentials": True
-            }, 'body': json.dumps({'error': 'Unauthorized'})}
-
-        # Parse the request body safely
-        body = json.loads(event['body'])  # Fix: Parse the JSON string into a dictionary
+DELETE_SCHEMA = api.Schema(required=('TaskId',), types={'TaskId': str},
+                           empty_message='Invalid request: Missing TaskId',
+                           missing_message='Invalid request: Missing TaskId')
 
-        task_id = body.get('TaskId')  # Use .get() to avoid KeyError
 
-        if not task_id:
-            logger.warning("Invalid request: Missing TaskId")
-            return {'statusCode': 400, 
-            "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Credentials": True
-            },
-            'body': json.dumps({'error': 'Invalid request: Missing TaskId'})}
-
-        response = table.get_item(Key={'TaskId': task_id})
+@structured_logging.logged
+@instrumentation.instrumented
+@api.endpoint(schema=DELETE_SCHEMA, admin=True)
+def lambda_handler(request):
+    try:
+        task_id = request.body['TaskId']
 
-        if 'Item' not in response:
-            logger.warning(f"Task not found: {task_id}")
-            return {'statusCode': 404, 'body': json.dumps({'error': 'Task not found'})}
+        # Another team's task looks like a missing one
+        task = task_cache.get_task(table, task_id)
+        if task is None or not task_views.visible(task, request):
+            logger.warning("Task not found: %s", task_id)
+            raise api.ApiError(404, 'Task not found')
 
         table.delete_item(Key={'TaskId': task_id})
-        logger.info(f"Task deleted successfully: {task_id}")
+        task_cache.invalidate(task_id)
+        logger.info("Task deleted successfully: %s", task_id)
 
-        return {'statusCode': 200,
-                "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Credentials": True
-            },
-            'body': json.dumps({'message': 'Task deleted successfully'})}
+        # Its deadline rules would otherwise fire for a task that no longer exists
+        try:
+            deadline_rules.delete_rules(events_client, task_id)
+        except Exception as e:
+            # The task is gone either way; the reconcile_rules job removes what is left
+            logger.error("Could not delete the event rules of task %s: %s", task_id, e)
 
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error: {e}")
-        return {'statusCode': 400,
-                "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Credentials": True
-            },
-            'body': json.dumps({'error': 'Invalid JSON format'})}
+        return {'message': 'Task deleted successfully'}
 
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
-        return {'statusCode': 500,"headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Credentials": True
-            },
-        'body': json.dumps({'error': 'Internal Server Error'})}
+    finally:
+        task_cache.emit_metrics()
+        throttling.emit_metrics()
@@ -0,0 +1,151 @@
+#due_index.py
+import logging
+import os
+from datetime import datetime, timedelta
+
+import boto3
+import pytz
+from boto3.dynamodb.conditions import Key
+
+import write_shards
+
+# Configure logging
+logger = logging.getLogger()
+
+# Initialize AWS services
+dynamodb = boto3.resource('dynamodb')
+DUE_TASKS_TABLE_NAME = os.environ.get('DUE_TASKS_TABLE_NAME', 'DueTasksTable')
+due_table = dynamodb.Table(DUE_TASKS_TABLE_NAME)
+
+ALL_TASKS_SCOPE = 'ALL'
+# Every open task due on a day is written to that day's all-tasks bucket, which
+# turns into a hot key when a sprint ends; the bucket is split over this many
+# keys. Readers visit every shard, so changing it needs the index rebuilt
+# (maintenance/rebuild_due_index.py). Per-user buckets are not sharded.
+DUE_INDEX_SHARDS = int(os.environ.get('DUE_INDEX_SHARDS', '8'))
+# Attributes copied onto index entries so listings never go back to TasksTable
+PROJECTED_FIELDS = ('name', 'responsibility', 'deadline', 'status')
+
+
+def user_scope(email):
+    return f"USER#{email}"
+
+
+def team_scope(team):
+    return f"TEAM#{team}"
+
+
+def deadline_epoch(deadline):
+    """Parse an ISO deadline string into epoch seconds (naive values are UTC)"""
+    due_date = datetime.fromisoformat(deadline.replace('Z', '+00:00'))
+    if due_date.tzinfo is None:
+        due_date = pytz.UTC.localize(due_date)
+    return int(due_date.timestamp())
+
+
+def _day(epoch):
+    return datetime.fromtimestamp(epoch, pytz.UTC).strftime('%Y-%m-%d')
+
+
+def _bucket(scope, epoch, task_id):
+    bucket = f"{scope}#{_day(epoch)}"
+    return write_shards.sharded(bucket, task_id, DUE_INDEX_SHARDS) if scope == ALL_TASKS_SCOPE else bucket
+
+
+def _buckets(scope, day):
+    """The partition keys holding one day of a scope"""
+    bucket = f"{scope}#{day.isoformat()}"
+    return write_shards.shard_keys(bucket, DUE_INDEX_SHARDS) if scope == ALL_TASKS_SCOPE else [bucket]
+
+
+def _sort_key(epoch, task_id):
+    return f"{epoch:010d}#{task_id}"
+
+
+def entries_for(task):
+    """Index entries for a task; only open tasks with a valid deadline are indexed"""
+    if not task or task.get('status') != 'open' or not task.get('deadline'):
+        return []
+    try:
+        epoch = deadline_epoch(task['deadline'])
+    except (TypeError, ValueError):
+        logger.warning("Task %s has an unparseable deadline, not indexing it", task.get('TaskId'))
+        return []
+
+    scopes = [ALL_TASKS_SCOPE]
+    if task.get('responsibility'):
+        scopes.append(user_scope(task['responsibility']))
+    if task.get('team'):
+        scopes.append(team_scope(task['team']))
+
+    projected = {field: task[field] for field in PROJECTED_FIELDS if field in task}
+    return [
+        {
+            'Bucket': _bucket(scope, epoch, task['TaskId']),
+            'DueKey': _sort_key(epoch, task['TaskId']),
+            'TaskId': task['TaskId'],
+            'DueAt': epoch,
+            **projected
+        }
+        for scope in scopes
+    ]
+
+
+def apply_change(old_task, new_task):
+    """Bring the index in line with one task change, writing only what differs"""
+    old_entries = {(e['Bucket'], e['DueKey']): e for e in entries_for(old_task)}
+    new_entries = {(e['Bucket'], e['DueKey']): e for e in entries_for(new_task)}
+
+    stale = [key for key in old_entries if key not in new_entries]
+    changed = [entry for key, entry in new_entries.items() if old_entries.get(key) != entry]
+    if not stale and not changed:
+        return
+
+    with due_table.batch_writer() as batch:
+        for bucket, due_key in stale:
+            batch.delete_item(Key={'Bucket': bucket, 'DueKey': due_key})
+        for entry in changed:
+            batch.put_item(Item=entry)
+
+
+def _query_bucket(bucket, lower, upper, limit):
+    """Entries of one bucket between the two sort keys, in deadline order, up to `limit`"""
+    entries = []
+    query_params = {'KeyConditionExpression': Key('Bucket').eq(bucket) & Key('DueKey').between(lower, upper)}
+    while True:
+        if limit:
+            query_params['Limit'] = limit - len(entries)
+        response = due_table.query(**query_params)
+        entries.extend(response.get('Items', []))
+        if (limit and len(entries) >= limit) or 'LastEvaluatedKey' not in response:
+            return entries
+        query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def query_due(start_epoch, end_epoch, email=None, limit=None, team=None):
+    """
+    Return index entries with start_epoch <= deadline <= end_epoch in deadline
+    order, for one user, one team or (neither given) everyone. Each day in the window
+    costs one Query per shard, so the read cost follows the number of results
+    rather than the table size. The shards of a day are queried in parallel
+    and merged. Windows in the past work too, which is what a deadline
+    sweeper needs to pick up overdue tasks.
+    """
+    scope = user_scope(email) if email else team_scope(team) if team else ALL_TASKS_SCOPE
+    lower = f"{start_epoch:010d}"
+    upper = f"{end_epoch:010d}#\uffff"
+
+    results = []
+    day = datetime.fromtimestamp(start_epoch, pytz.UTC).date()
+    last_day = datetime.fromtimestamp(end_epoch, pytz.UTC).date()
+    while day <= last_day:
+        remaining = limit - len(results) if limit else None
+        # Each shard may hold the whole remainder, so each is read up to it
+        pages = write_shards.scatter(lambda bucket: _query_bucket(bucket, lower, upper, remaining), _buckets(scope, day))
+        results.extend(write_shards.gather(pages, lambda entry: entry['DueKey'], remaining))
+
+        if limit and len(results) >= limit:
+            break
+        day += timedelta(days=1)
+
+    return results
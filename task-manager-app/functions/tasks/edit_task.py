@@ -5,51 +5,37 @@ import logging
 import os
 from datetime import datetime, timedelta
 import pytz
+import task_cache
+import task_codec
+import instrumentation
+import structured_logging
+import api
+import tracing
+import throttling
+import deadline_rules
+import task_archive
+import task_history
+import task_views
 
 # Configure logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
 
 # Initialize AWS services
 try:
     dynamodb = boto3.resource('dynamodb')
     table = dynamodb.Table('TasksTable')
     sns_client = boto3.client('sns')
-    events_client = boto3.client('events')
+    events_client = throttling.client('events')
 except Exception as e:
-    logger.error(f"Error initializing AWS services: {e}")
+    logger.error("Error initializing AWS services: %s", e)
     raise
 
 def delete_task_event_rules(task_id):
     """Delete all existing EventBridge rules for a task"""
     try:
-        # Define rule names
-        warning_rule_name = f"task-deadline-{task_id}"
-        final_rule_name = f"task-final-deadline-{task_id}"
-        
-        for rule_name in [warning_rule_name, final_rule_name]:
-            try:
-                # Remove targets from the rule
-                events_client.remove_targets(
-                    Rule=rule_name,
-                    Ids=[f"task-deadline-notification-{task_id}"]
-                )
-                
-                # Delete the rule
-                events_client.delete_rule(
-                    Name=rule_name
-                )
-                
-                logger.info(f"Successfully deleted event rule {rule_name} for task {task_id}")
-            except events_client.exceptions.ResourceNotFoundException:
-                # Rule doesn't exist, which is fine
-                logger.info(f"Rule {rule_name} not found for task {task_id}")
-            except Exception as e:
-                logger.error(f"Error deleting rule {rule_name}: {e}")
-                raise
-                
+        deadline_rules.delete_rules(events_client, task_id)
     except Exception as e:
-        logger.error(f"Error in delete_task_event_rules: {e}")
+        logger.error("Error in delete_task_event_rules: %s", e)
         raise
 
 def schedule_deadline_notification(task, context):
@@ -83,7 +69,7 @@ def schedule_deadline_notification(task, context):
                 f"{notification_time.day} {notification_time.month} ? {notification_time.year})"
             )
             
-            logger.info(f"Creating EventBridge rule with expression: {cron_expression}")
+            logger.info("Creating EventBridge rule with expression: %s", cron_expression)
             
             # Create the rule
             events_client.put_rule(
@@ -92,18 +78,13 @@ def schedule_deadline_notification(task, context):
                 State='ENABLED'
             )
 
-            deadline_function_name = os.environ.get('TASKS_DEADLINE_FUNCTION_NAME')
-            if not deadline_function_name:
-                logger.error("TASKS_DEADLINE_FUNCTION_NAME environment variable not set")
-                raise ValueError("Missing required environment variable: TASKS_DEADLINE_FUNCTION_NAME")
-
             # Create the Lambda target
             target_lambda_arn = os.environ.get('TASKS_DEADLINE_FUNCTION_ARN')
             if not target_lambda_arn:
                 logger.error("TASKS_DEADLINE_FUNCTION_ARN environment variable not set")
                 raise ValueError("Missing required environment variable: TASKS_DEADLINE_FUNCTION_ARN")
             
-            logger.info(f"Setting target Lambda ARN: {target_lambda_arn}")
+            logger.info("Setting target Lambda ARN: %s", target_lambda_arn)
 
             # Add target to the rule
             events_client.put_targets(
@@ -111,35 +92,24 @@ def schedule_deadline_notification(task, context):
                 Targets=[{
                     'Id': f"task-deadline-notification-{task['TaskId']}",
                     'Arn': target_lambda_arn,
-                    'Input': json.dumps({
+                    'Input': json.dumps(tracing.inject({
                         'taskId': task['TaskId'],
                         'assignee_email': task['responsibility']
-                    })
+                    }, scheduled_for=notification_time.replace(second=0, microsecond=0)))
                 }]
             )
 
-            # Add permission for EventBridge to invoke the Lambda
-            lambda_client = boto3.client('lambda')
-            try:
-                lambda_client.add_permission(
-                    FunctionName=deadline_function_name,
-                    StatementId=f"EventBridge-{task['TaskId']}",
-                    Action='lambda:InvokeFunction',
-                    Principal='events.amazonaws.com',
-                    SourceArn=f"arn:aws:events:{os.environ['AWS_REGION']}:{os.environ['AWS_ACCOUNT_ID']}:rule/{rule_name}"
-                )
-            except lambda_client.exceptions.ResourceConflictException:
-                # Permission already exists, which is fine
-                pass
+            # EventBridge may invoke the deadline function from any task-deadline-* rule
+            # (TaskDeadlineNotificationPermission), so no per-task permission is added
 
-            logger.info(f"Successfully scheduled deadline notification for task {task['TaskId']} at {notification_time} UTC")
+            logger.info("Successfully scheduled deadline notification for task %s at %s UTC", task['TaskId'], notification_time)
 
         except ValueError as ve:
-            logger.error(f"Invalid deadline format or missing environment variable: {ve}")
+            logger.error("Invalid deadline format or missing environment variable: %s", ve)
             return
             
     except Exception as e:
-        logger.error(f"Error scheduling deadline notification: {e}")
+        logger.error("Error scheduling deadline notification: %s", e)
         raise
 
 def send_task_reassignment_notification(task, admin_email):
@@ -186,7 +156,7 @@ Please log in to the system to view more details and start working on your task.
         )
         
     except Exception as e:
-        logger.error(f"Error sending reassignment notification: {e}")
+        logger.error("Error sending reassignment notification: %s", e)
         raise
 
 def send_task_reopened_notification(task, admin_email):
@@ -229,7 +199,7 @@ This task has been reopened and requires your attention.
         )
         
     except Exception as e:
-        logger.error(f"Error sending reopened notification: {e}")
+        logger.error("Error sending reopened notification: %s", e)
         raise
 
 def send_task_completed_notification(task, user_email):
@@ -267,168 +237,131 @@ This task has been marked as completed.
         )
         
     except Exception as e:
-        logger.error(f"Error sending completion notification: {e}")
+        logger.error("Error sending completion notification: %s", e)
         raise
 
-def lambda_handler(event, context):
+UPDATE_SCHEMA = api.Schema(required=('TaskId',), types={'TaskId': str, 'responsibility': str, 'deadline': str, 'status': str,
+                                                        'comment': str, 'team': str},
+                           empty_message='Invalid request: Missing TaskId',
+                           missing_message='Invalid request: Missing TaskId')
+# Set by the service alone as the status changes; a client's values for them are dropped
+SYSTEM_FIELDS = ('completed_at', task_archive.TTL_ATTRIBUTE)
+
+
+@structured_logging.logged
+@tracing.traced
+@instrumentation.instrumented
+@api.endpoint(schema=UPDATE_SCHEMA, idempotent=True)
+def lambda_handler(request):
     try:
-        # Get user claims from authorizer
-        claims = event.get('requestContext', {}).get('authorizer', {}).get('claims', {})
-        user_email = claims.get('email')
-        user_groups = claims.get('cognito:groups', [])
-        is_admin = 'admin' in user_groups
-        
-        if not user_email:
-            logger.warning("Unauthorized access attempt: Missing email claim")
-            return {
-                'statusCode': 401,
-                    "headers": {
-                        "Content-Type": "application/json",
-                        "Access-Control-Allow-Origin": "*",
-                        "Access-Control-Allow-Credentials": True
-                    },
-                    'body': json.dumps({'error': 'Unauthorized'})
-                }
-        
-        # Parse request body
-        task_update = json.loads(event.get('body', '{}'))
-        task_id = task_update.pop('TaskId', None)
-        
-        if not task_id:
-            logger.warning("Invalid request: Missing TaskId")
-            return {'statusCode': 400,
-                    "headers": {
-                        "Content-Type": "application/json",
-                        "Access-Control-Allow-Origin": "*",
-                        "Access-Control-Allow-Credentials": True
-                    },
-                    'body': json.dumps({'error': 'Invalid request: Missing TaskId'})}
-        
-        # Get existing task
-        response = table.get_item(Key={'TaskId': task_id})
-        task = response.get('Item')
-        
+        user_email = request.email
+        is_admin = request.is_admin
+        task_update = request.body
+        task_id = task_update.pop('TaskId')
+        # Comments are appended to the task's history rather than stored on the task
+        comment = task_update.pop('comment', None)
+
+        # Read the task consistently: a cached copy may predate another container's write,
+        # and the put below only guards the status and responsibility
+        task = task_codec.decode(table.get_item(Key={'TaskId': task_id}, ConsistentRead=True).get('Item'))
+
         if not task:
-            logger.warning(f"Task not found: {task_id}")
-            return {'statusCode': 404,
-            "headers": {
-                        "Content-Type": "application/json",
-                        "Access-Control-Allow-Origin": "*",
-                        "Access-Control-Allow-Credentials": True
-                    },
-            'body': json.dumps({'error': 'Task not found'})}
-        
-        # Check permissions
-        if not is_admin and task['responsibility'] != user_email:
-            logger.warning(f"Unauthorized update attempt by {user_email} on task {task_id}")
-            return {'statusCode': 403,
-            "headers": {
-                        "Content-Type": "application/json",
-                        "Access-Control-Allow-Origin": "*",
-                        "Access-Control-Allow-Credentials": True
-                    },
-            'body': json.dumps({'error': 'Unauthorized'})}
-        
+            logger.warning("Task not found: %s", task_id)
+            raise api.ApiError(404, 'Task not found')
+
+        original = dict(task)
+        original_status = task['status']
+        original_responsibility = task['responsibility']
+
+        # Check permissions: own tasks, or any of the admin's team
+        if not task_views.visible(task, request):
+            logger.warning("Unauthorized update attempt by %s on task %s", user_email, task_id)
+            raise api.ApiError(403, 'Unauthorized')
+
         # Handle deadline updates (admin only)
+        rescheduled = False
         if is_admin and 'deadline' in task_update:
             try:
                 due_date = datetime.fromisoformat(task_update['deadline'].replace('Z', '+00:00'))
-
-                # Ensure it's timezone-aware
-                if due_date.tzinfo is None:
-                    due_date = pytz.UTC.localize(due_date)
-
-                if due_date <= datetime.now(pytz.UTC) + timedelta(minutes=2):
-                    return {
-                        'statusCode': 400,
-                        "headers": {
-                            "Content-Type": "application/json",
-                            "Access-Control-Allow-Origin": "*",
-                            "Access-Control-Allow-Credentials": True
-                        },
-                        'body': json.dumps({'error': 'Deadline must be in the future'})
-                    }
             except ValueError:
-                return {
-                    'statusCode': 400,
-                    "headers": {
-                        "Content-Type": "application/json",
-                        "Access-Control-Allow-Origin": "*",
-                        "Access-Control-Allow-Credentials": True
-                    },
-                    'body': json.dumps({'error': 'Invalid deadline format. Use ISO format (e.g., 2025-01-11T18:00:00Z)'})
-                }
-            
-            # Delete existing event rules
-            delete_task_event_rules(task_id)
+                raise api.ApiError(400, 'Invalid deadline format. Use ISO format (e.g., 2025-01-11T18:00:00Z)')
+
+            # Ensure it's timezone-aware
+            if due_date.tzinfo is None:
+                due_date = pytz.UTC.localize(due_date)
+
+            if due_date <= datetime.now(pytz.UTC) + timedelta(minutes=2):
+                raise api.ApiError(400, 'Deadline must be in the future')
+
             task['deadline'] = task_update['deadline']
-            # Reschedule deadline notification
-            schedule_deadline_notification(task, context)
-        
+            rescheduled = True
+
         # Handle task reassignment (admin only)
-        if is_admin and 'responsibility' in task_update and task_update['responsibility'] != task['responsibility']:
-            # Delete existing event rules
-            delete_task_event_rules(task_id)
-            
-            # Update task assignment
+        reassigned = is_admin and 'responsibility' in task_update and task_update['responsibility'] != task['responsibility']
+        if reassigned:
             task['responsibility'] = task_update['responsibility']
-            
-            # Send reassignment notification
-            send_task_reassignment_notification(task, user_email)
-
-            schedule_deadline_notification(task, context)
+            rescheduled = True
 
-            
-        
         # Handle task reopening (admin only)
-        if is_admin and task_update.get('status') == 'open' and task['status'] in ['completed', 'expired']:
+        reopened = is_admin and task_update.get('status') == 'open' and task['status'] in ['completed', 'expired']
+        if reopened:
             task['status'] = 'open'
-            send_task_reopened_notification(task, user_email)
-            
-        
+
         # Handle task completion
-        if task_update.get('status') == 'completed' and task['status'] != 'completed':
+        completed = task_update.get('status') == 'completed' and task['status'] != 'completed'
+        if completed:
             task['status'] = 'completed'
             task['completed_at'] = str(datetime.now(pytz.UTC))
+            # The archive clock restarts when the task is completed
+            task[task_archive.TTL_ATTRIBUTE] = task_archive.archive_at()
+
+        # Update allowed fields based on role; only an admin without a team moves tasks between teams
+        allowed_fields = ['status'] if not is_admin else [k for k in task_update if k not in SYSTEM_FIELDS
+                                                          and (k != 'team' or request.team is None)]
+        task.update({k: v for k, v in task_update.items() if k in allowed_fields})
+
+        # TasksTable's TTL moves a closed task to the archive; an open one must not age out,
+        # whichever way its status got there
+        if task['status'] in task_archive.CLOSED_STATUSES:
+            task.setdefault(task_archive.TTL_ATTRIBUTE, task_archive.archive_at())
+        else:
+            task.pop(task_archive.TTL_ATTRIBUTE, None)
+
+        # Save updated task, guarding against a change since it was read. A comment
+        # on its own leaves the task as it was and costs no write to it.
+        if task != original:
+            try:
+                table.put_item(
+                    Item=task_codec.encode(task),
+                    ConditionExpression=(task_codec.condition('status', 'eq', original_status)
+                                         & task_codec.condition('responsibility', 'eq', original_responsibility))
+                )
+            except table.meta.client.exceptions.ConditionalCheckFailedException:
+                task_cache.invalidate(task_id)
+                logger.warning("Task %s changed since it was read, rejecting update", task_id)
+                raise api.ApiError(409, 'Task was modified by another request, please retry')
+            task_cache.prime(task)
+
+        # Notifications and deadline rules follow the write, so a rejected update leaves none behind
+        if reassigned:
+            send_task_reassignment_notification(task, user_email)
+        if reopened:
+            send_task_reopened_notification(task, user_email)
+        if completed:
             send_task_completed_notification(task, user_email)
-            
             # Delete both deadline event rules
             delete_task_event_rules(task_id)
-        
-        # Update allowed fields based on role
-        allowed_fields = ['status', 'comment'] if not is_admin else task_update.keys()
-        task.update({k: v for k, v in task_update.items() if k in allowed_fields})
-        
-        # Save updated task
-        table.put_item(Item=task)
-        logger.info(f"Task updated successfully: {task_id}")
-        
-        return {'statusCode': 200,
-       "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Credentials": True
-            }, 'body': json.dumps({'message': 'Task updated successfully'})}
-    
-    except json.JSONDecodeError:
-        logger.error("Error decoding JSON request body")
-        return {
-            'statusCode': 400,
-                "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Credentials": True
-            },
-            'body': json.dumps({'error': 'Invalid JSON format'})
-            }
-    
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
-        return {
-            'statusCode': 500,
-                "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Credentials": True
-            }, 'body': json.dumps({'error': 'Internal Server Error'})
-        }
\ No newline at end of file
+        elif rescheduled:
+            # Replace the rules for the new deadline or assignee
+            delete_task_event_rules(task_id)
+            schedule_deadline_notification(task, request.context)
+
+        if comment:
+            task_history.append_comment(task_id, user_email, comment)
+        logger.info("Task updated successfully: %s", task_id)
+
+        return {'message': 'Task updated successfully'}
+
+    finally:
+        task_cache.emit_metrics()
+        throttling.emit_metrics()
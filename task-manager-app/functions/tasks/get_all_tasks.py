@@ -1,7 +1,12 @@
 import boto3
 import json
-from boto3.dynamodb.conditions import Attr, Key
 from typing import Dict, Optional
+import instrumentation
+import structured_logging
+import responses
+import api
+import task_codec
+import task_views
 
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table('TasksTable')
@@ -14,7 +19,7 @@ def parse_filter_params(query_params: Dict) -> Optional[str]:
     for field in valid_fields:
         if field in query_params:
             value = query_params[field]
-            condition = Attr(field).contains(value) if field == 'name' else Attr(field).eq(value)
+            condition = task_codec.condition(field, 'contains' if field == 'name' else 'eq', value)
             filter_expr = condition if filter_expr is None else filter_expr & condition
     
     return filter_expr
@@ -31,42 +36,25 @@ def get_sort_key(sort_param: str) -> str:
     field = sort_param.split(':')[0] if ':' in sort_param else sort_param
     return field if field in valid_sort_fields else 'deadline'
 
-def lambda_handler(event, context):
-    try:
-        # Get user claims from authorizer
-        claims = event['requestContext']['authorizer']['claims']
-        user_groups = claims.get('cognito:groups', [])
-        user_email = claims.get('email')
-        is_admin = 'admin' in user_groups
-
-        if not user_email:
-            return {
-                'statusCode': 401,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Credentials': True
-                },
-                'body': json.dumps({'message': 'Missing user email'})
-            }
-
-    except KeyError:
-        return {
-            'statusCode': 401,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True
-            },
-            'body': json.dumps({'message': 'Missing authorization'})
-        }
+@structured_logging.logged
+@instrumentation.instrumented
+@api.endpoint(errors={ValueError: (400, 'limit must be a number and next_token a value returned by this API')})
+def lambda_handler(request):
+    user_email = request.email
+    is_admin = request.is_admin
+    event = request.event
 
     # Parse query parameters
-    query_params = event.get('queryStringParameters', {}) or {}
-    
+    query_params = request.query
+
     # If not admin, force filter by user's email
     if not is_admin:
         query_params['responsibility'] = user_email
+
+    # A team admin only lists the team's tasks
+    team = task_views.listing_scope(request)
+    if team is not None:
+        query_params['team'] = team
     
     # Pagination parameters
     limit = int(query_params.get('limit', 10))
@@ -77,9 +65,13 @@ def lambda_handler(event, context):
     sort_key = get_sort_key(sort_param)
     sort_desc = sort_param.endswith(':desc')
     
+    # Read only the attributes the caller asked for, plus the one the page is sorted by
+    fields = task_views.requested_fields(query_params)
+
     # Build scan parameters
     scan_params = {
-        'Limit': limit
+        'Limit': limit,
+        **task_views.read_params(fields, extra=(sort_key,))
     }
     
     # Add filters if present
@@ -91,11 +83,11 @@ def lambda_handler(event, context):
     if last_evaluated_key:
         scan_params['ExclusiveStartKey'] = last_evaluated_key
 
-    # Perform scan
-    response = table.scan(**scan_params)
+    # Query the team's index partition, or scan the table for an unscoped admin
+    response = task_views.read_tasks(table, team, **scan_params)
     
     # Sort results
-    items = response.get('Items', [])
+    items = [task_codec.decode(item) for item in response.get('Items', [])]
     items.sort(
         key=lambda x: x.get(sort_key, ''),
         reverse=sort_desc
@@ -103,18 +95,12 @@ def lambda_handler(event, context):
     
     # Prepare response
     result = {
-        'items': items,
+        'items': responses.project(items, fields),
         'count': len(items),
-        'next_token': json.dumps(response.get('LastEvaluatedKey'))
+        'next_token': responses.dumps(response.get('LastEvaluatedKey'))
             if 'LastEvaluatedKey' in response else None
     }
     
-    return {
-        'statusCode': 200,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Credentials': True
-        },
-        'body': json.dumps(result)
-    }
\ No newline at end of file
+    # The ETag digests the page itself: the change feed is written from the table stream,
+    # so its version can trail a write and vouch for a listing that already changed
+    return responses.json_response(200, result, event, etag=True)
\ No newline at end of file
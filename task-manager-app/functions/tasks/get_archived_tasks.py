@@ -0,0 +1,38 @@
+import logging
+import instrumentation
+import structured_logging
+import responses
+import api
+import task_archive
+import task_views
+
+# Configure logging
+logger = logging.getLogger()
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+@structured_logging.logged
+@instrumentation.instrumented
+@api.endpoint()
+def lambda_handler(request):
+    """
+    Closed tasks that have left TasksTable, oldest archive first. Pages hold
+    whole archive objects, so a page can carry a few more than `limit` tasks;
+    pass next_token back to continue.
+    """
+    query_params = request.query
+    try:
+        limit = min(int(query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+    except ValueError:
+        limit = 0
+    if limit <= 0:
+        raise api.ApiError(400, 'limit must be a positive number')
+
+    # Admins read their team's archive (everyone's without a team) unless they ask for one user; others only their own
+    email = task_views.requested_user(request)
+    team = task_views.listing_scope(request)
+
+    tasks, next_token = task_archive.read(email, query_params.get('next_token'), limit, team=team)
+    return responses.json_response(200, {'items': tasks, 'count': len(tasks), 'next_token': next_token},
+                                   request.event)
@@ -0,0 +1,30 @@
+#get_bulk_update.py
+import logging
+
+import api
+import bulk_jobs
+import instrumentation
+import responses
+import structured_logging
+
+# Configure logging
+logger = logging.getLogger()
+
+
+@structured_logging.logged
+@instrumentation.instrumented
+@api.endpoint(admin=True)
+def lambda_handler(request):
+    """
+    Progress of a bulk update: its status (running, succeeded or failed) and
+    how many tasks it has matched, updated, found unchanged and skipped as
+    conflicts so far
+    """
+    job_id = (request.event.get('pathParameters') or {}).get('id')
+    job = bulk_jobs.get(job_id) if job_id else None
+
+    # Another team's job looks like a missing one
+    if job is None or not bulk_jobs.visible(job, request):
+        raise api.ApiError(404, 'Bulk update not found')
+
+    return responses.json_response(200, bulk_jobs.public(job), request.event)
@@ -0,0 +1,40 @@
+import logging
+import time
+import instrumentation
+import structured_logging
+import responses
+import api
+import due_index
+import task_views
+
+# Configure logging
+logger = logging.getLogger()
+
+MAX_WINDOW_HOURS = 24 * 31
+
+# Index keys that only exist to serve the query
+INDEX_ATTRIBUTES = ('Bucket', 'DueKey')
+
+@structured_logging.logged
+@instrumentation.instrumented
+@api.endpoint()
+def lambda_handler(request):
+    query_params = request.query
+    try:
+        hours = float(query_params.get('hours', 24))
+        limit = int(query_params['limit']) if 'limit' in query_params else None
+    except ValueError:
+        raise api.ApiError(400, 'hours and limit must be numbers')
+
+    if hours <= 0 or hours > MAX_WINDOW_HOURS or (limit is not None and limit <= 0):
+        raise api.ApiError(400, f'hours must be between 0 and {MAX_WINDOW_HOURS} and limit must be positive')
+
+    # Admins see their team's tasks (everyone's without a team) unless they ask for one user; others only their own
+    email = task_views.requested_user(request)
+    team = task_views.listing_scope(request)
+
+    now = int(time.time())
+    entries = due_index.query_due(now, now + int(hours * 3600), email=email, limit=limit, team=team)
+    items = responses.project(entries, exclude=INDEX_ATTRIBUTES)
+
+    return responses.json_response(200, {'items': items, 'count': len(items)}, request.event)
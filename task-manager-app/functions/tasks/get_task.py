@@ -0,0 +1,35 @@
+import logging
+import boto3
+import instrumentation
+import structured_logging
+import responses
+import api
+import task_cache
+import task_views
+
+# Configure logging
+logger = logging.getLogger()
+
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table('TasksTable')
+
+@structured_logging.logged
+@instrumentation.instrumented
+@api.endpoint()
+def lambda_handler(request):
+    """
+    One task with every attribute, for the detail view behind a listing row.
+    Served from the task cache when it is hot.
+    """
+    try:
+        task_id = (request.event.get('pathParameters') or {}).get('id')
+        task = task_cache.get_task(table, task_id) if task_id else None
+
+        # Users only see their own tasks and admins their team's; any other looks like a missing one
+        if task is None or not task_views.visible(task, request):
+            raise api.ApiError(404, 'Task not found')
+
+        return responses.json_response(200, task, request.event, etag=True)
+
+    finally:
+        task_cache.emit_metrics()
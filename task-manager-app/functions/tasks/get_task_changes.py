@@ -0,0 +1,45 @@
+import logging
+import instrumentation
+import structured_logging
+import responses
+import api
+import change_log
+import task_views
+
+# Configure logging
+logger = logging.getLogger()
+
+MAX_LIMIT = 1000
+
+@structured_logging.logged
+@instrumentation.instrumented
+@api.endpoint(errors={change_log.CursorExpiredError: (410, 'Cursor is older than the change log retention, a full resync is required')})
+def lambda_handler(request):
+    """
+    Delta sync for task lists. Without `since` the response only carries a
+    starting cursor: fetch it, download the full list once, then poll with
+    since=<next_cursor> to receive upserts and deletes after that point.
+    """
+    query_params = request.query
+    since = query_params.get('since')
+    # Admins follow the feed of their team's tasks (every task without a team), everyone else their own list
+    if request.is_admin and query_params.get('scope') == 'all':
+        team = task_views.listing_scope(request)
+        feed = change_log.team_feed(team) if team else change_log.ALL_TASKS_FEED
+    else:
+        feed = change_log.user_feed(request.email)
+
+    if not since:
+        return {'changes': [], 'next_cursor': change_log.head_cursor(), 'has_more': False}
+
+    try:
+        limit = min(int(query_params.get('limit', 100)), MAX_LIMIT)
+        change_log.cursor_time_ms(since)
+    except ValueError:
+        limit = 0
+    if limit <= 0:
+        raise api.ApiError(400, 'Invalid since cursor or limit')
+
+    changes, next_cursor, has_more = change_log.read_changes(feed, since, limit)
+    return responses.json_response(200, {'changes': changes, 'next_cursor': next_cursor, 'has_more': has_more},
+                                   request.event)
@@ -0,0 +1,51 @@
+import logging
+import boto3
+import instrumentation
+import structured_logging
+import responses
+import api
+import task_cache
+import task_history
+import task_views
+
+# Configure logging
+logger = logging.getLogger()
+
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table('TasksTable')
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+@structured_logging.logged
+@instrumentation.instrumented
+@api.endpoint()
+def lambda_handler(request):
+    """
+    The comments and transitions of one task, oldest first (order=desc for
+    newest first), a Query page at a time; pass next_token back to continue.
+    Admins without a team can also read the history of deleted and archived tasks.
+    """
+    try:
+        query_params = request.query
+        try:
+            limit = min(int(query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            raise api.ApiError(400, 'limit must be a positive number')
+
+        task_id = (request.event.get('pathParameters') or {}).get('id')
+        task = task_cache.get_task(table, task_id) if task_id else None
+        # A task that is gone has no team to check, so only unscoped admins see its history
+        readable = task_views.visible(task, request) if task else request.is_admin and request.team is None
+        if not task_id or not readable:
+            raise api.ApiError(404, 'Task not found')
+
+        events, next_token = task_history.read(task_id, query_params.get('next_token'), limit,
+                                               newest_first=query_params.get('order') == 'desc')
+        return responses.json_response(200, {'items': events, 'count': len(events), 'next_token': next_token},
+                                       request.event)
+
+    finally:
+        task_cache.emit_metrics()
@@ -0,0 +1,31 @@
+import logging
+import instrumentation
+import structured_logging
+import api
+import task_counters
+import task_views
+
+# Configure logging
+logger = logging.getLogger()
+
+@structured_logging.logged
+@instrumentation.instrumented
+@api.endpoint()
+def lambda_handler(request):
+    # Regular users only ever see their own counters, team admins their team's
+    requested_user = task_views.requested_user(request)
+    team = task_views.listing_scope(request)
+
+    if requested_user:
+        scope = requested_user
+        counter_key = task_counters.user_key(requested_user)
+    elif team:
+        scope = f"team:{team}"
+        counter_key = task_counters.team_key(team)
+    else:
+        scope = 'all'
+        counter_key = task_counters.ALL_TASKS_KEY
+
+    counts = task_counters.get_counts(counter_key)
+
+    return {'scope': scope, 'counts': counts}
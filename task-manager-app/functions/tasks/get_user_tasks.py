@@ -1,20 +1,25 @@
-import json
 import boto3
+import instrumentation
+import structured_logging
+import responses
+import api
+import task_codec
+import task_views
 
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table('TasksTable')
 
-def lambda_handler(event, context):
-    claims = event['requestContext']['authorizer']['claims']
-    user_email = claims['email']
+@structured_logging.logged
+@instrumentation.instrumented
+@api.endpoint()
+def lambda_handler(request):
+    event = request.event
+    user_email = request.email
+    fields = task_views.requested_fields(request.query)
 
-    response = table.scan(FilterExpression=boto3.dynamodb.conditions.Attr('responsibility').eq(user_email))
-    return {
-        'statusCode': 200,
-        "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Credentials": True
-            },
-        'body': json.dumps(response['Items'])
-    }
+    response = table.scan(FilterExpression=task_codec.condition('responsibility', 'eq', user_email),
+                          **task_views.read_params(fields))
+    tasks = [task_codec.decode(item) for item in response['Items']]
+    # The ETag digests the listing itself: the change feed is written from the table stream,
+    # so its version can trail a write and vouch for a listing that already changed
+    return responses.json_response(200, tasks, event, etag=True)
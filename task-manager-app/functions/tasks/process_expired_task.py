@@ -2,17 +2,29 @@ import json
 import boto3
 import logging
 import os
+import instrumentation
+import structured_logging
+import tracing
+import task_archive
+import task_codec
 
 # Configure logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
 
 # Initialize AWS clients
+dynamodb = boto3.resource('dynamodb')
 stepfunctions = boto3.client('stepfunctions')
 sqs = boto3.client('sqs')
 
 STEP_FUNCTION_ARN = os.environ['STEP_FUNCTION_ARN']
+TABLE_NAME = os.environ.get('TABLE_NAME')
 
+# Task fields the state machine's notification quotes
+NOTIFIED_FIELDS = ('name', 'responsibility', 'deadline')
+
+@structured_logging.logged
+@tracing.traced
+@instrumentation.instrumented
 def lambda_handler(event, context):
     try:
         # Process SQS messages
@@ -20,19 +32,29 @@ def lambda_handler(event, context):
             # Parse the message
             message = json.loads(record['body'])
             task_id = message['taskId']
-            
-            # Start Step Function execution
-            execution_input = {
-                'taskId': task_id
-            }
+
+            item = dynamodb.Table(TABLE_NAME).get_item(Key={'TaskId': task_id}, ConsistentRead=True).get('Item')
+            if item is None:
+                logger.warning("Task %s not found, nothing to expire", task_id)
+                continue
+            # The state machine cannot read the item's encoding, so it gets the decoded fields it quotes
+            task = task_codec.decode(item)
+
+            # Start Step Function execution; the trace context travels with the input.
+            # The state machine stamps archiveAt on the task as it expires it.
+            execution_input = tracing.inject({
+                'taskId': task_id,
+                'archiveAt': str(task_archive.archive_at()),
+                'task': {field: str(task.get(field, '')) for field in NOTIFIED_FIELDS}
+            })
             
             response = stepfunctions.start_execution(
                 stateMachineArn=STEP_FUNCTION_ARN,
                 input=json.dumps(execution_input)
             )
             
-            logger.info(f"Started Step Function execution for task {task_id}: {response['executionArn']}")
+            logger.info("Started Step Function execution for task %s: %s", task_id, response['executionArn'])
             
     except Exception as e:
-        logger.error(f"Error processing expired task: {e}")
+        logger.error("Error processing expired task: %s", e)
         raise
\ No newline at end of file
@@ -0,0 +1,160 @@
+#reconcile_rules.py
+import json
+import logging
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import boto3
+
+import deadline_rules
+import instrumentation
+import structured_logging
+import task_codec
+import throttling
+
+# Configure logging
+logger = logging.getLogger()
+
+TABLE_NAME = os.environ.get('TABLE_NAME', 'TasksTable')
+# Rules deleted at once; the throttling client slows down if EventBridge pushes back
+RECONCILE_CONCURRENCY = int(os.environ.get('RECONCILE_CONCURRENCY', '8'))
+# A one-shot rule this long past its time has either fired or never will
+RECONCILE_GRACE_SECONDS = int(os.environ.get('RECONCILE_GRACE_SECONDS', '3600'))
+# Stop starting deletions when the invocation has less than this left; the next run continues
+RECONCILE_STOP_MARGIN_MS = 30_000
+
+# ListRules returns at most 100 rules per page, BatchGetItem reads at most 100 keys
+PAGE_SIZE = 100
+
+# Outcome of a deletion skipped for lack of time
+_DEFERRED = object()
+
+dynamodb = boto3.resource('dynamodb')
+events_client = throttling.client('events')
+
+
+def list_task_rules():
+    """Every task deadline rule, a page of ListRules at a time"""
+    for prefix in deadline_rules.RULE_PREFIXES:
+        kwargs = {'NamePrefix': prefix, 'Limit': PAGE_SIZE}
+        while True:
+            response = events_client.list_rules(**kwargs)
+            yield from response.get('Rules', [])
+            if not response.get('NextToken'):
+                break
+            kwargs['NextToken'] = response['NextToken']
+
+
+def load_tasks(task_ids):
+    """{task id: {'status', 'deadline'}} for the ids that still exist, read in batches of 100"""
+    task_ids = list(dict.fromkeys(task_ids))
+    projection, names = task_codec.projection(('TaskId', 'status', 'deadline'))
+    found = {}
+    for start in range(0, len(task_ids), PAGE_SIZE):
+        request = {TABLE_NAME: {
+            'Keys': [{'TaskId': task_id} for task_id in task_ids[start:start + PAGE_SIZE]],
+            'ProjectionExpression': projection,
+            'ExpressionAttributeNames': names,
+            # A task completed a moment ago must not look open
+            'ConsistentRead': True
+        }}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for task in response.get('Responses', {}).get(TABLE_NAME, []):
+                found[task['TaskId']] = task_codec.decode(task)
+            request = response.get('UnprocessedKeys') or None
+    return found
+
+
+def orphan_reason(rule, task, now):
+    """Why `rule` should go, or None while it still has a job to do"""
+    if task is None:
+        return 'task_missing'
+    if task.get('status') != 'open':
+        return 'task_closed'
+    fires_at = deadline_rules.scheduled_for(rule.get('ScheduleExpression'))
+    if fires_at is not None and fires_at < now - timedelta(seconds=RECONCILE_GRACE_SECONDS):
+        return 'schedule_passed'
+    return None
+
+
+def delete_rule(rule_name):
+    try:
+        targets = events_client.list_targets_by_rule(Rule=rule_name).get('Targets', [])
+        if targets:
+            events_client.remove_targets(Rule=rule_name, Ids=[target['Id'] for target in targets])
+        events_client.delete_rule(Name=rule_name)
+    except events_client.exceptions.ResourceNotFoundException:
+        # Deleted by its task in the meantime
+        pass
+
+
+def reconcile(dry_run=False, now=None, time_left=None):
+    """
+    Find deadline rules whose task is gone or closed, or whose one-shot time
+    has passed, and delete them unless `dry_run`. `time_left` returns the
+    milliseconds the invocation has left. Returns the report.
+    """
+    now = now or datetime.now(timezone.utc)
+    rules = list(list_task_rules())
+    tasks = load_tasks(deadline_rules.task_id_of(rule['Name']) for rule in rules)
+
+    orphans = []
+    reasons = Counter()
+    for rule in rules:
+        reason = orphan_reason(rule, tasks.get(deadline_rules.task_id_of(rule['Name'])), now)
+        if reason:
+            orphans.append(rule['Name'])
+            reasons[reason] += 1
+
+    report = {'dry_run': dry_run, 'rules': len(rules), 'orphans': len(orphans), 'reasons': dict(reasons),
+              'deleted': 0, 'failed': {}, 'deferred': 0, 'sample': orphans[:20]}
+    if dry_run or not orphans:
+        return report
+
+    def delete(rule_name):
+        if time_left is not None and time_left() < RECONCILE_STOP_MARGIN_MS:
+            return rule_name, _DEFERRED
+        try:
+            delete_rule(rule_name)
+        except Exception as e:
+            logger.error("Could not delete orphaned rule %s: %s", rule_name, e)
+            return rule_name, str(e)
+        return rule_name, None
+
+    with ThreadPoolExecutor(max_workers=RECONCILE_CONCURRENCY) as pool:
+        for rule_name, error in pool.map(delete, orphans):
+            if error is None:
+                report['deleted'] += 1
+            elif error is _DEFERRED:
+                report['deferred'] += 1
+            else:
+                report['failed'][rule_name] = error
+    return report
+
+
+def emit_metrics(report):
+    """Log the run as a CloudWatch Embedded Metric Format line"""
+    instrumentation.emit_metrics({
+        'DeadlineRules': (report['rules'], 'Count'),
+        'OrphanedDeadlineRules': (report['orphans'], 'Count'),
+        'DeletedDeadlineRules': (report['deleted'], 'Count'),
+        'FailedDeadlineRuleDeletions': (len(report['failed']), 'Count')
+    }, DryRun=report['dry_run'])
+
+
+@structured_logging.logged
+@instrumentation.instrumented
+def lambda_handler(event, context):
+    """Scheduled daily; invoke with {"dry_run": true} for a report without deleting anything"""
+    dry_run = bool(isinstance(event, dict) and event.get('dry_run'))
+    time_left = getattr(context, 'get_remaining_time_in_millis', None)
+    try:
+        report = reconcile(dry_run=dry_run, time_left=time_left)
+        logger.info("Deadline rule reconciliation: %s", json.dumps(report))
+        emit_metrics(report)
+        return report
+    finally:
+        throttling.emit_metrics()
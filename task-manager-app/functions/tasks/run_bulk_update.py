@@ -0,0 +1,285 @@
+#run_bulk_update.py
+import json
+import logging
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import boto3
+import pytz
+from boto3.dynamodb.conditions import ConditionExpressionBuilder
+
+import bulk_jobs
+import deadline_rules
+import instrumentation
+import structured_logging
+import task_archive
+import task_cache
+import task_codec
+import task_views
+import throttling
+import tracing
+
+# Configure logging
+logger = logging.getLogger()
+
+TABLE_NAME = os.environ.get('TABLE_NAME', 'TasksTable')
+TASKS_ASSIGNMENT_TOPIC_ARN = os.environ.get('TASKS_ASSIGNMENT_TOPIC_ARN')
+REOPENED_TASKS_TOPIC_ARN = os.environ.get('REOPENED_TASKS_TOPIC_ARN')
+TASKS_COMPLETE_TOPIC_ARN = os.environ.get('TASKS_COMPLETE_TOPIC_ARN')
+# Tasks evaluated per read; each page is written, notified and recorded before the next one
+BULK_PAGE_SIZE = int(os.environ.get('BULK_PAGE_SIZE', '500'))
+# Tasks per TransactWriteItems call (at most 100); a conflicting task makes its batch retry without it
+BULK_WRITE_BATCH = int(os.environ.get('BULK_WRITE_BATCH', '25'))
+# Deadline rules of completed tasks deleted at once; the throttling client slows down if EventBridge pushes back
+BULK_RULE_CONCURRENCY = int(os.environ.get('BULK_RULE_CONCURRENCY', '8'))
+# Hand the rest of the job to a new invocation when this one has less than this left
+BULK_STOP_MARGIN_MS = 30_000
+# Tasks listed in one notification; an SNS message holds at most 256 KB
+NOTIFICATION_LIST_LIMIT = 50
+
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(TABLE_NAME)
+sns_client = boto3.client('sns')
+lambda_client = boto3.client('lambda')
+events_client = throttling.client('events')
+
+
+def task_filter(job_filter):
+    """FilterExpression of the job's responsibility and status filter, or None; the team is read through its index"""
+    conditions = [task_codec.condition(field, 'eq', job_filter[field])
+                  for field in ('responsibility', 'status') if field in job_filter]
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def apply_changes(task, changes):
+    """
+    The task with the job's changes made as PUT /tasks makes them, or None
+    when it already has them. Only completed and expired tasks are reopened.
+    """
+    updated = dict(task)
+    if 'responsibility' in changes:
+        updated['responsibility'] = changes['responsibility']
+    if changes.get('status') == 'open' and task.get('status') in ('completed', 'expired'):
+        updated['status'] = 'open'
+        # An open task must not age out of the table
+        updated.pop(task_archive.TTL_ATTRIBUTE, None)
+    elif changes.get('status') == 'completed' and task.get('status') != 'completed':
+        updated['status'] = 'completed'
+        updated['completed_at'] = str(datetime.now(pytz.UTC))
+        updated[task_archive.TTL_ATTRIBUTE] = task_archive.archive_at()
+    return updated if updated != task else None
+
+
+def _condition(original):
+    """The write goes through only if the task is as it was read, the guard edit_task puts on its write"""
+    return (task_codec.condition('status', 'eq', original['status'])
+            & task_codec.condition('responsibility', 'eq', original['responsibility']))
+
+
+def _put(original, task):
+    # The resource's client serializes the values; only a top-level condition is built for us
+    condition = ConditionExpressionBuilder().build_expression(_condition(original))
+    return {'Put': {
+        'TableName': TABLE_NAME,
+        'Item': task_codec.encode(task),
+        'ConditionExpression': condition.condition_expression,
+        'ExpressionAttributeNames': condition.attribute_name_placeholders,
+        'ExpressionAttributeValues': condition.attribute_value_placeholders
+    }}
+
+
+def _write_each(batch):
+    written, conflicted = [], []
+    for original, task in batch:
+        try:
+            table.put_item(Item=task_codec.encode(task), ConditionExpression=_condition(original))
+            written.append((original, task))
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            conflicted.append((original, task))
+    return written, conflicted
+
+
+def write(changed):
+    """
+    Write [(original, updated)] pairs BULK_WRITE_BATCH at a time, each batch
+    in one transaction; returns the (written, conflicted) pairs. Tasks that
+    changed since they were read are left as they are.
+    """
+    written, conflicted = [], []
+    for start in range(0, len(changed), BULK_WRITE_BATCH):
+        batch = changed[start:start + BULK_WRITE_BATCH]
+        while batch:
+            try:
+                dynamodb.meta.client.transact_write_items(TransactItems=[_put(*pair) for pair in batch])
+                written.extend(batch)
+                break
+            except dynamodb.meta.client.exceptions.TransactionCanceledException as e:
+                reasons = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+                failed = {index for index, code in enumerate(reasons) if code == 'ConditionalCheckFailed'}
+                if not failed:
+                    # Cancelled by a concurrent transaction rather than a condition: write them one by one
+                    pairs = _write_each(batch)
+                    written.extend(pairs[0])
+                    conflicted.extend(pairs[1])
+                    break
+                conflicted.extend(pair for index, pair in enumerate(batch) if index in failed)
+                batch = [pair for index, pair in enumerate(batch) if index not in failed]
+    for _, task in written:
+        task_cache.prime(task)
+    for _, task in conflicted:
+        task_cache.invalidate(task['TaskId'])
+    return written, conflicted
+
+
+def _task_lines(tasks):
+    lines = [f"- {task.get('name', 'No title')} (due {task.get('deadline', 'no deadline')}, Task ID: {task['TaskId']})"
+             for task in tasks[:NOTIFICATION_LIST_LIMIT]]
+    if len(tasks) > NOTIFICATION_LIST_LIMIT:
+        lines.append(f"- ...and {len(tasks) - NOTIFICATION_LIST_LIMIT} more")
+    return '\n'.join(lines)
+
+
+def _publish(topic_arn, subject, message, email=None):
+    if not topic_arn:
+        logger.error("Cannot send notification: SNS Topic ARN is not configured")
+        return
+    attributes = {'email': {'DataType': 'String', 'StringValue': email}} if email else {}
+    sns_client.publish(TopicArn=topic_arn, Message=message, Subject=subject, MessageAttributes=attributes)
+
+
+def notify(written, admin_email):
+    """
+    One message per new assignee for the page's reassigned tasks, one per
+    assignee for its reopened tasks and one for all of its completed tasks,
+    in place of a message per task
+    """
+    reassigned, reopened, completed = defaultdict(list), defaultdict(list), []
+    for original, task in written:
+        if task['responsibility'] != original['responsibility']:
+            reassigned[task['responsibility']].append(task)
+        if task['status'] != original['status']:
+            if task['status'] == 'open':
+                reopened[task['responsibility']].append(task)
+            else:
+                completed.append(task)
+
+    for assignee, tasks in reassigned.items():
+        _publish(TASKS_ASSIGNMENT_TOPIC_ARN, 'Task Reassignment', f"""
+Tasks Reassigned
+
+{len(tasks)} task(s) were reassigned to you by {admin_email}:
+
+{_task_lines(tasks)}
+
+Please log in to the system to view more details and start working on your tasks.
+""", assignee)
+    for assignee, tasks in reopened.items():
+        _publish(REOPENED_TASKS_TOPIC_ARN, 'Task Reopened', f"""
+Tasks Reopened
+
+{len(tasks)} task(s) were reopened by {admin_email}:
+
+{_task_lines(tasks)}
+
+These tasks have been reopened and require your attention.
+""", assignee)
+    if completed:
+        _publish(TASKS_COMPLETE_TOPIC_ARN, 'Task Completed', f"""
+Tasks Completed
+
+{len(completed)} task(s) were marked as completed by {admin_email}:
+
+{_task_lines(completed)}
+""")
+
+
+def _delete_rules(task_id):
+    try:
+        deadline_rules.delete_rules(events_client, task_id)
+    except Exception as e:
+        # reconcile_rules deletes the rules of closed tasks it finds left over
+        logger.warning("Could not delete the deadline rules of task %s: %s", task_id, e)
+
+
+def update_schedules(written):
+    """
+    Delete the deadline rules of the page's completed tasks, in parallel.
+    Reassigned tasks keep theirs: the deadline functions notify whoever is
+    responsible for the task when a rule fires.
+    """
+    task_ids = [task['TaskId'] for original, task in written
+                if task['status'] == 'completed' and original['status'] != 'completed' and 'deadline' in task]
+    if not task_ids:
+        return
+    with ThreadPoolExecutor(max_workers=BULK_RULE_CONCURRENCY) as executor:
+        list(executor.map(_delete_rules, task_ids))
+
+
+def run_page(job, cursor):
+    """Read, change and write one page of matching tasks; returns (counts, next cursor)"""
+    params = {'Limit': BULK_PAGE_SIZE}
+    expression = task_filter(job['filter'])
+    if expression is not None:
+        params['FilterExpression'] = expression
+    if cursor:
+        params['ExclusiveStartKey'] = cursor
+    response = task_views.read_tasks(table, job.get('team'), **params)
+
+    tasks = [task_codec.decode(item) for item in response.get('Items', [])]
+    changed = [(task, updated) for task, updated in ((task, apply_changes(task, job['set'])) for task in tasks)
+               if updated is not None]
+    written, conflicted = write(changed)
+    notify(written, job['started_by'])
+    update_schedules(written)
+    counts = {'matched': len(tasks), 'updated': len(written), 'unchanged': len(tasks) - len(changed),
+              'conflicts': len(conflicted)}
+    return counts, response.get('LastEvaluatedKey')
+
+
+def run(job, context):
+    """
+    Work through the job's tasks from its cursor, recording progress after
+    every page, until they are done or the invocation runs short of time;
+    then the rest is handed to a new invocation. Returns the job's status.
+    """
+    time_left = getattr(context, 'get_remaining_time_in_millis', None)
+    cursor = job.get('cursor')
+    while True:
+        counts, cursor = run_page(job, cursor)
+        bulk_jobs.record_page(job['JobId'], counts, cursor)
+        if cursor is None:
+            return bulk_jobs.SUCCEEDED
+        if time_left is not None and time_left() < BULK_STOP_MARGIN_MS:
+            lambda_client.invoke(FunctionName=context.function_name, InvocationType='Event',
+                                 Payload=json.dumps(tracing.inject({'job_id': job['JobId']})))
+            return bulk_jobs.RUNNING
+
+
+@structured_logging.logged
+@tracing.traced
+@instrumentation.instrumented
+def lambda_handler(event, context):
+    """Invoked asynchronously with {"job_id": ...} by POST /tasks/bulk, and by itself to continue a long job"""
+    job_id = event['job_id']
+    try:
+        job = bulk_jobs.get(job_id)
+        if job is None or job['status'] != bulk_jobs.RUNNING:
+            logger.warning("Bulk update %s is not running, nothing to do", job_id)
+            return None
+        bulk_jobs.started_invocation(job_id)
+        status = run(job, context)
+        logger.info("Bulk update %s: %s", job_id, status)
+        return status
+    except Exception as e:
+        # The job stops at its last recorded page; starting it again skips the tasks already changed
+        logger.exception("Bulk update %s failed", job_id)
+        bulk_jobs.fail(job_id, str(e))
+        return bulk_jobs.FAILED
+    finally:
+        task_cache.emit_metrics()
+        throttling.emit_metrics()
@@ -0,0 +1,163 @@
+#search_index.py
+import logging
+import os
+import re
+from collections import Counter, defaultdict
+
+import boto3
+from boto3.dynamodb.conditions import Key
+
+import task_codec
+
+# Configure logging
+logger = logging.getLogger()
+
+# Initialize AWS services
+dynamodb = boto3.resource('dynamodb')
+TASK_SEARCH_TABLE_NAME = os.environ.get('TASK_SEARCH_TABLE_NAME', 'TaskSearchTable')
+TASKS_TABLE_NAME = os.environ.get('TABLE_NAME', 'TasksTable')
+search_table = dynamodb.Table(TASK_SEARCH_TABLE_NAME)
+
+ALL_TASKS_SCOPE = 'ALL'
+# Matches in the title count for more than matches in the description
+FIELD_WEIGHTS = {'name': 3, 'description': 1}
+# Terms are partitioned by their first characters, so prefixes must be at least this long
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 40
+MAX_TERMS_PER_TASK = 100
+EXACT_MATCH_BOOST = 2
+STOPWORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'into', 'is', 'it',
+    'of', 'on', 'or', 'the', 'this', 'to', 'with'
+))
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Lower-case alphanumeric tokens, without stopwords or very short words"""
+    if not text:
+        return []
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in _TOKEN_PATTERN.findall(str(text).lower())
+        if len(token) >= MIN_TERM_LENGTH and token not in STOPWORDS
+    ]
+
+
+def user_scope(email):
+    return f"USER#{email}"
+
+
+def team_scope(team):
+    return f"TEAM#{team}"
+
+
+def _shard(scope, term):
+    return f"{scope}#{term[:MIN_TERM_LENGTH]}"
+
+
+def term_scores(task):
+    """Weighted term frequencies for the searchable fields of a task"""
+    scores = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(task.get(field)):
+            scores[token] += weight
+    return dict(scores.most_common(MAX_TERMS_PER_TASK))
+
+
+def entries_for(task):
+    """Inverted index postings for a task, keyed by (Shard, TermKey)"""
+    if not task:
+        return {}
+    scopes = [ALL_TASKS_SCOPE]
+    if task.get('responsibility'):
+        scopes.append(user_scope(task['responsibility']))
+    if task.get('team'):
+        scopes.append(team_scope(task['team']))
+
+    return {
+        (_shard(scope, term), f"{term}#{task['TaskId']}"): score
+        for term, score in term_scores(task).items()
+        for scope in scopes
+    }
+
+
+def apply_change(old_task, new_task):
+    """Write only the postings that were added, removed or re-scored"""
+    old_entries = entries_for(old_task)
+    new_entries = entries_for(new_task)
+
+    stale = [key for key in old_entries if key not in new_entries]
+    changed = [(key, score) for key, score in new_entries.items() if old_entries.get(key) != score]
+    if not stale and not changed:
+        return
+
+    task_id = (new_task or old_task)['TaskId']
+    with search_table.batch_writer() as batch:
+        for shard, term_key in stale:
+            batch.delete_item(Key={'Shard': shard, 'TermKey': term_key})
+        for (shard, term_key), score in changed:
+            batch.put_item(Item={'Shard': shard, 'TermKey': term_key, 'TaskId': task_id, 'Score': score})
+
+
+def _postings(scope, term):
+    """TaskId -> best score for every indexed term starting with `term`"""
+    matches = {}
+    query_params = {
+        'KeyConditionExpression': Key('Shard').eq(_shard(scope, term)) & Key('TermKey').begins_with(term)
+    }
+    while True:
+        response = search_table.query(**query_params)
+        for posting in response.get('Items', []):
+            indexed_term = posting['TermKey'].rsplit('#', 1)[0]
+            score = int(posting['Score']) * (EXACT_MATCH_BOOST if indexed_term == term else 1)
+            task_id = posting['TaskId']
+            matches[task_id] = max(score, matches.get(task_id, 0))
+        if 'LastEvaluatedKey' not in response:
+            return matches
+        query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def search(query, email=None, limit=20, team=None):
+    """
+    Rank tasks matching every term of `query` (each term also matches as a
+    prefix). Returns [(TaskId, score)] best first, scoped to one user's tasks
+    when email is given, else to one team's when team is.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+    scope = user_scope(email) if email else team_scope(team) if team else ALL_TASKS_SCOPE
+
+    totals = None
+    for term in terms:
+        matches = _postings(scope, term)
+        if totals is None:
+            totals = defaultdict(int, matches)
+        else:
+            totals = defaultdict(int, {
+                task_id: totals[task_id] + score for task_id, score in matches.items() if task_id in totals
+            })
+        if not totals:
+            return []
+
+    ranked = sorted(totals.items(), key=lambda hit: (-hit[1], hit[0]))
+    return ranked[:limit]
+
+
+def fetch_tasks(task_ids, **read_params):
+    """
+    Load tasks in the given order with BatchGetItem (at most 100 ids);
+    `read_params` may carry a ProjectionExpression and its attribute names
+    """
+    if not task_ids:
+        return []
+    request = {TASKS_TABLE_NAME: {'Keys': [{'TaskId': task_id} for task_id in task_ids], **read_params}}
+    found = {}
+    while request:
+        response = dynamodb.batch_get_item(RequestItems=request)
+        for task in response.get('Responses', {}).get(TASKS_TABLE_NAME, []):
+            found[task['TaskId']] = task_codec.decode(task)
+        request = response.get('UnprocessedKeys') or None
+    return [found[task_id] for task_id in task_ids if task_id in found]
@@ -0,0 +1,45 @@
+import logging
+import instrumentation
+import structured_logging
+import responses
+import api
+import search_index
+import task_views
+
+# Configure logging
+logger = logging.getLogger()
+
+MAX_LIMIT = 100
+
+@structured_logging.logged
+@instrumentation.instrumented
+@api.endpoint()
+def lambda_handler(request):
+    query_params = request.query
+    query = query_params.get('q', '')
+    try:
+        limit = min(int(query_params.get('limit', 20)), MAX_LIMIT)
+    except ValueError:
+        limit = 0
+
+    if not search_index.tokenize(query) or limit <= 0:
+        raise api.ApiError(400, 'Provide a search term q of at least 2 characters and a positive limit')
+
+    # Results come in the list shape of the other listings, or the fields= asked for
+    fields = task_views.requested_fields(query_params)
+
+    # Regular users only search their own tasks, team admins their team's
+    email = task_views.requested_user(request)
+    team = task_views.listing_scope(request)
+
+    hits = search_index.search(query, email=email, limit=limit, team=team)
+    scores = dict(hits)
+    # The assignee and team are read along with the fields, for the check below
+    tasks = search_index.fetch_tasks([task_id for task_id, _ in hits],
+                                     **task_views.read_params(fields, extra=('responsibility', 'team')))
+    # The index follows the table through the stream, so check the tasks as they are now
+    tasks = [task for task in tasks
+             if task_views.visible(task, request) and (team is None or task.get('team') == team)]
+    items = [dict(task, score=scores[task['TaskId']]) for task in responses.project(tasks, fields)]
+
+    return responses.json_response(200, {'items': items, 'count': len(items)}, request.event)
@@ -0,0 +1,226 @@
+#task_archive.py
+import gzip
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from urllib.parse import quote, urlparse
+
+import responses
+
+# Configure logging
+logger = logging.getLogger()
+
+# s3://bucket/prefix for S3, file:///path for a local directory, unset to disable reads and writes
+TASK_ARCHIVE_URL = os.environ.get('TASK_ARCHIVE_URL')
+# Closed tasks stay in TasksTable this long before the table's TTL hands them to the archive
+TASK_ARCHIVE_AFTER_DAYS = float(os.environ.get('TASK_ARCHIVE_AFTER_DAYS', '30'))
+TTL_ATTRIBUTE = 'ArchiveAt'
+CLOSED_STATUSES = ('completed', 'expired')
+
+OBJECT_SUFFIX = '.json.gz'
+GZIP_LEVEL = 9
+LIST_PAGE_SIZE = 1000
+# Objects read for one page of a listing, whatever they hold, so a page's cost stays bounded
+ARCHIVE_PAGE_OBJECTS = int(os.environ.get('ARCHIVE_PAGE_OBJECTS', '20'))
+
+
+class S3Store:
+    """Archive objects under a prefix of an S3 bucket"""
+
+    def __init__(self, bucket, prefix=''):
+        import boto3
+        self.bucket = bucket
+        self.prefix = f"{prefix.strip('/')}/" if prefix.strip('/') else ''
+        self.client = boto3.client('s3')
+
+    def put(self, key, data):
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data,
+                               ContentType='application/json', ContentEncoding='gzip')
+
+    def get(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)['Body'].read()
+
+    def keys(self, prefix='', start_after=None):
+        """Keys under `prefix` in ascending order, after `start_after`"""
+        kwargs = {'Bucket': self.bucket, 'Prefix': self.prefix + prefix, 'MaxKeys': LIST_PAGE_SIZE}
+        if start_after:
+            kwargs['StartAfter'] = self.prefix + start_after
+        while True:
+            response = self.client.list_objects_v2(**kwargs)
+            for entry in response.get('Contents', []):
+                yield entry['Key'][len(self.prefix):]
+            if not response.get('IsTruncated'):
+                return
+            kwargs.pop('StartAfter', None)
+            kwargs['ContinuationToken'] = response['NextContinuationToken']
+
+    def folders(self):
+        """Top-level prefixes, each ending in /"""
+        kwargs = {'Bucket': self.bucket, 'Prefix': self.prefix, 'Delimiter': '/', 'MaxKeys': LIST_PAGE_SIZE}
+        found = []
+        while True:
+            response = self.client.list_objects_v2(**kwargs)
+            found.extend(entry['Prefix'][len(self.prefix):] for entry in response.get('CommonPrefixes', []))
+            if not response.get('IsTruncated'):
+                return sorted(found)
+            kwargs['ContinuationToken'] = response['NextContinuationToken']
+
+
+class LocalStore:
+    """Local filesystem stand-in for the S3 archive, one file per object"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so a reader never sees half an object
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+
+    def get(self, key):
+        with open(self._path(key), 'rb') as f:
+            return f.read()
+
+    def keys(self, prefix='', start_after=None):
+        found = []
+        for directory, _, names in os.walk(self.root):
+            relative = os.path.relpath(directory, self.root).replace(os.sep, '/')
+            for name in names:
+                if name.endswith(OBJECT_SUFFIX):
+                    found.append(name if relative == '.' else f"{relative}/{name}")
+        yield from (key for key in sorted(found) if key.startswith(prefix) and (not start_after or key > start_after))
+
+    def folders(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(f"{name}/" for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
+
+
+def connect(url):
+    """Return the archive store for the given URL, or None when archiving is not configured"""
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme == 's3':
+        return S3Store(parsed.netloc, parsed.path)
+    if parsed.scheme == 'file':
+        return LocalStore(parsed.path)
+    raise ValueError(f"Unsupported TASK_ARCHIVE_URL scheme: {url}")
+
+
+_store = None
+
+
+def get_store():
+    """The configured store, connected on first use so handlers that only set ArchiveAt never create an S3 client"""
+    global _store
+    if _store is None:
+        _store = connect(TASK_ARCHIVE_URL)
+    return _store
+
+
+def archive_at(closed_at=None):
+    """Epoch seconds at which a task closed at `closed_at` (default now) leaves TasksTable"""
+    closed_at = time.time() if closed_at is None else closed_at
+    return int(closed_at + TASK_ARCHIVE_AFTER_DAYS * 86400)
+
+
+def is_expiry(record):
+    """Whether a stream record is DynamoDB's TTL deleting an item, rather than an application delete"""
+    identity = record.get('userIdentity') or {}
+    return (record.get('eventName') == 'REMOVE' and identity.get('type') == 'Service'
+            and identity.get('principalId') == 'dynamodb.amazonaws.com')
+
+
+def owner_prefix(email):
+    return f"{quote(email or '-', safe='@.+')}/"
+
+
+def team_prefix(team):
+    """Tasks without a team go under -/"""
+    return f"{quote(team or '-', safe='@.+')}/"
+
+
+def _group(task):
+    """<team>/<owner>/<month archived>/, the prefix a task's archive object goes under"""
+    archived = datetime.fromtimestamp(int(task.get(TTL_ATTRIBUTE) or time.time()), timezone.utc)
+    return f"{team_prefix(task.get('team'))}{owner_prefix(task.get('responsibility'))}{archived:%Y-%m}/"
+
+
+def object_key(task, sequence_number):
+    """Keys sort by team, owner, month and stream order, so an owner's listing comes out oldest first"""
+    return f"{_group(task)}{sequence_number:0>40}{OBJECT_SUFFIX}"
+
+
+def encode(tasks):
+    return gzip.compress(responses.dumps(tasks).encode(), GZIP_LEVEL)
+
+
+def decode(data):
+    return json.loads(gzip.decompress(data))
+
+
+def archive(entries):
+    """
+    Write (stream sequence number, task) pairs, grouped into one compressed
+    object per team, owner and month. Each object is named after the first record in
+    it, so a retried batch overwrites what it wrote before instead of adding
+    copies. Returns the keys written.
+    """
+    store = get_store()
+    if store is None:
+        raise RuntimeError('TASK_ARCHIVE_URL is not configured')
+
+    groups = defaultdict(list)
+    for sequence_number, task in sorted(entries, key=lambda entry: entry[0].zfill(40)):
+        groups[_group(task)].append((sequence_number, task))
+
+    written = []
+    for group in groups.values():
+        key = object_key(group[0][1], group[0][0])
+        store.put(key, encode([task for _, task in group]))
+        written.append(key)
+    return written
+
+
+def _prefixes(store, email, team):
+    """Key prefixes holding the archive of one owner and/or team, in key order"""
+    if team is not None:
+        return [team_prefix(team) + (owner_prefix(email) if email else '')]
+    if email:
+        # An owner's tasks may belong to any team; there are few teams to list
+        return [folder + owner_prefix(email) for folder in store.folders()]
+    return ['']
+
+
+def read(email=None, start_after=None, limit=50, team=None):
+    """
+    Archived tasks of one owner and/or team (everyone's when both are None),
+    whole objects at a time until at least `limit` tasks or
+    ARCHIVE_PAGE_OBJECTS objects are read. Returns (tasks, next token); pass
+    the token back as `start_after` for the next page.
+    """
+    store = get_store()
+    if store is None:
+        return [], None
+
+    tasks = []
+    last_key = None
+    read_objects = 0
+    for prefix in _prefixes(store, email, team):
+        for key in store.keys(prefix, start_after):
+            if len(tasks) >= limit or read_objects >= ARCHIVE_PAGE_OBJECTS:
+                return tasks, last_key
+            tasks.extend(decode(store.get(key)))
+            read_objects += 1
+            last_key = key
+    return tasks, None
@@ -0,0 +1,238 @@
+#task_cache.py
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+import instrumentation
+import task_codec
+
+# Configure logging
+logger = logging.getLogger()
+
+# Cache configuration from environment variables
+TASK_CACHE_TTL_SECONDS = float(os.environ.get('TASK_CACHE_TTL_SECONDS', '30'))
+TASK_CACHE_MAX_ENTRIES = int(os.environ.get('TASK_CACHE_MAX_ENTRIES', '512'))
+# 'local' for the in-process stand-in, a redis:// URL for ElastiCache, unset to disable
+TASK_CACHE_SHARED_URL = os.environ.get('TASK_CACHE_SHARED_URL')
+
+try:
+    import redis
+except ImportError:  # redis is only needed when a shared tier URL is configured
+    redis = None
+
+
+class LRUCache:
+    """Per-container LRU cache with a TTL on every entry"""
+
+    def __init__(self, max_entries=TASK_CACHE_MAX_ENTRIES, ttl_seconds=TASK_CACHE_TTL_SECONDS, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class LocalSharedTier:
+    """In-process stand-in for the shared (Redis) tier, exposing the same get/setex/delete calls"""
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._values[key]
+                return None
+            return value
+
+    def setex(self, key, ttl_seconds, value):
+        with self._lock:
+            self._values[key] = (self._clock() + ttl_seconds, value)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._values.pop(key, None)
+
+
+def connect_shared_tier(url):
+    """Return a shared cache client for the given URL, or None when no shared tier is configured"""
+    if not url:
+        return None
+    if url == 'local':
+        return LocalSharedTier()
+    if redis is None:
+        logger.warning("TASK_CACHE_SHARED_URL is set but the redis package is not installed; shared tier disabled")
+        return None
+    return redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.1)
+
+
+def _encode_value(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, set):
+        return sorted(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _serialize(task):
+    return json.dumps(task, default=_encode_value, separators=(',', ':'))
+
+
+def _deserialize(payload):
+    if isinstance(payload, bytes):
+        payload = payload.decode('utf-8')
+    # Numbers come back as Decimal, matching what the DynamoDB resource returns
+    return json.loads(payload, parse_float=Decimal, parse_int=Decimal)
+
+
+local_cache = LRUCache()
+shared_tier = connect_shared_tier(TASK_CACHE_SHARED_URL)
+
+_metrics_lock = threading.Lock()
+_metrics = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def _count(name):
+    with _metrics_lock:
+        _metrics[name] += 1
+
+
+def _shared_key(task_id):
+    return f"task:{task_id}"
+
+
+def _shared_get(task_id):
+    if shared_tier is None:
+        return None
+    try:
+        payload = shared_tier.get(_shared_key(task_id))
+        return _deserialize(payload) if payload is not None else None
+    except Exception as e:
+        # The shared tier is an optimisation only; fall through to DynamoDB
+        logger.warning("Shared task cache read failed for %s: %s", task_id, e)
+        return None
+
+
+def _shared_set(task):
+    if shared_tier is None:
+        return
+    try:
+        shared_tier.setex(_shared_key(task['TaskId']), int(max(TASK_CACHE_TTL_SECONDS, 1)), _serialize(task))
+    except Exception as e:
+        logger.warning("Shared task cache write failed for %s: %s", task['TaskId'], e)
+
+
+def _shared_delete(task_id):
+    if shared_tier is None:
+        return
+    try:
+        shared_tier.delete(_shared_key(task_id))
+    except Exception as e:
+        logger.warning("Shared task cache invalidation failed for %s: %s", task_id, e)
+
+
+def get_task(table, task_id):
+    """
+    Return the task for task_id, decoded from its item, reading through the local and shared tiers
+    before falling back to DynamoDB. Returns None when the task does not exist.
+    Callers receive their own copy and may mutate it freely.
+    """
+    task = local_cache.get(task_id)
+    if task is not None:
+        _count('hits')
+        return copy.deepcopy(task)
+
+    task = _shared_get(task_id)
+    if task is not None:
+        _count('shared_hits')
+        local_cache.set(task_id, task)
+        return copy.deepcopy(task)
+
+    _count('misses')
+    response = table.get_item(Key={'TaskId': task_id})
+    task = task_codec.decode(response.get('Item'))
+    if task is not None:
+        local_cache.set(task_id, copy.deepcopy(task))
+        _shared_set(task)
+    return task
+
+
+def prime(task):
+    """Store a freshly written task so the next read skips DynamoDB"""
+    local_cache.set(task['TaskId'], copy.deepcopy(task))
+    _shared_set(task)
+
+
+def invalidate(task_id):
+    """Drop a task from both tiers; call after every write to the task item"""
+    _count('invalidations')
+    local_cache.delete(task_id)
+    _shared_delete(task_id)
+
+
+def cache_stats():
+    """Return the hit/miss counters accumulated since the last emit_metrics call"""
+    with _metrics_lock:
+        stats = dict(_metrics)
+    lookups = stats['hits'] + stats['shared_hits'] + stats['misses']
+    stats['hit_ratio'] = (stats['hits'] + stats['shared_hits']) / lookups if lookups else 0.0
+    stats['size'] = len(local_cache)
+    return stats
+
+
+def emit_metrics():
+    """Log the cache counters as a CloudWatch Embedded Metric Format line and reset them"""
+    stats = cache_stats()
+    with _metrics_lock:
+        for name in _metrics:
+            _metrics[name] = 0
+
+    instrumentation.emit_metrics({
+        'TaskCacheHits': (stats['hits'], 'Count'),
+        'TaskCacheSharedHits': (stats['shared_hits'], 'Count'),
+        'TaskCacheMisses': (stats['misses'], 'Count'),
+        'TaskCacheInvalidations': (stats['invalidations'], 'Count')
+    })
+    return stats
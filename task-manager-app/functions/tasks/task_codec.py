@@ -0,0 +1,153 @@
+#task_codec.py
+import os
+import zlib
+
+from boto3.dynamodb.conditions import Attr
+from boto3.dynamodb.types import Binary
+
+# Stored name of every task attribute. TaskId is the table key and ArchiveAt
+# the table's TTL attribute, so those two keep their names.
+SHORT_NAMES = {
+    'name': 'n',
+    'description': 'd',
+    'responsibility': 'r',
+    'status': 's',
+    'deadline': 'dl',
+    'completed_at': 'ca',
+    'comment': 'c',
+    'team': 'tm'
+}
+LONG_NAMES = {short: name for name, short in SHORT_NAMES.items()}
+KEPT_NAMES = ('TaskId', 'ArchiveAt')
+# Map holding the attributes a client added beyond the schema, under their own names
+EXTRA_NAME = 'x'
+
+# Free-text attributes stored as zlib-compressed binary once they are this many bytes long
+COMPRESSED_FIELDS = ('description', 'comment')
+TASK_CODEC_COMPRESS_BYTES = int(os.environ.get('TASK_CODEC_COMPRESS_BYTES', '256'))
+ZLIB_LEVEL = 9
+
+
+def stored_name(field):
+    return SHORT_NAMES.get(field, field)
+
+
+def encode_value(field, value):
+    """The stored form of one attribute value"""
+    if field in COMPRESSED_FIELDS and isinstance(value, str):
+        raw = value.encode('utf-8')
+        if len(raw) >= TASK_CODEC_COMPRESS_BYTES:
+            packed = zlib.compress(raw, ZLIB_LEVEL)
+            # Text that does not compress stays readable
+            if len(packed) < len(raw):
+                return Binary(packed)
+    return value
+
+
+def decode_value(value):
+    if isinstance(value, Binary):
+        value = value.value
+    if isinstance(value, (bytes, bytearray)):
+        return zlib.decompress(value).decode('utf-8')
+    return value
+
+
+def encode(task):
+    """
+    The TasksTable item for a task: short attribute names, long text
+    compressed, and any attributes outside the schema gathered into one map.
+    """
+    item = {}
+    extra = {}
+    for name, value in task.items():
+        if name in SHORT_NAMES:
+            item[SHORT_NAMES[name]] = encode_value(name, value)
+        elif name in KEPT_NAMES:
+            item[name] = value
+        else:
+            extra[name] = value
+    if extra:
+        item[EXTRA_NAME] = extra
+    return item
+
+
+def decode(item):
+    """
+    The task an item stores, with the attribute names the API uses. Items
+    written before the compact encoding (long names) decode as well; where an
+    item carries both names, the short one was written later and wins.
+    """
+    if item is None:
+        return None
+    task = {}
+    for name, value in item.items():
+        if name in LONG_NAMES:
+            task[LONG_NAMES[name]] = decode_value(value)
+        elif name == EXTRA_NAME and isinstance(value, dict):
+            for extra_name, extra_value in value.items():
+                task.setdefault(extra_name, extra_value)
+        else:
+            task.setdefault(name, value)
+    return task
+
+
+def is_compact(item):
+    """Whether an item is stored exactly as encode() would store it"""
+    return encode(decode(item)) == item
+
+
+def condition(field, operator, value):
+    """
+    Condition or filter on a task field, true for compact items and for items
+    still in the legacy encoding. The short name wins where an item has both,
+    as in decode(): a legacy item expired by the state machine carries s=expired
+    next to its old status=open. Compressed values compare equal because zlib
+    output is deterministic for the same input and level.
+    """
+    compact = getattr(Attr(stored_name(field)), operator)(encode_value(field, value))
+    if field not in SHORT_NAMES:
+        return compact
+    return compact | (Attr(stored_name(field)).not_exists() & getattr(Attr(field), operator)(value))
+
+
+def projection(fields):
+    """
+    (ProjectionExpression, ExpressionAttributeNames) reading `fields` in both
+    encodings. Fields outside the schema are read from the extras map.
+    """
+    placeholders = {}
+
+    def placeholder(name):
+        return placeholders.setdefault(name, f"#a{len(placeholders)}")
+
+    paths = []
+    for field in dict.fromkeys(fields):
+        if field in KEPT_NAMES:
+            paths.append(placeholder(field))
+            continue
+        compact = (placeholder(SHORT_NAMES[field]) if field in SHORT_NAMES
+                   else f"{placeholder(EXTRA_NAME)}.{placeholder(field)}")
+        paths += [compact, placeholder(field)]
+    return ', '.join(dict.fromkeys(paths)), {alias: name for name, alias in placeholders.items()}
+
+
+def item_size(item):
+    """Approximate DynamoDB size of an item in bytes, the figure read and write units are billed on"""
+    return sum(len(name.encode('utf-8')) + _value_size(value) for name, value in item.items())
+
+
+def _value_size(value):
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, Binary):
+        return len(value.value)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, bool) or value is None:
+        return 1
+    if isinstance(value, (list, set)):
+        return 3 + sum(_value_size(element) + 1 for element in value)
+    if isinstance(value, dict):
+        return 3 + item_size(value)
+    # Numbers: about one byte per two significant digits, plus one
+    return 1 + (len(str(value).lstrip('-').replace('.', '')) + 1) // 2
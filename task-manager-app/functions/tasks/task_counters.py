@@ -0,0 +1,183 @@
+#task_counters.py
+import logging
+import os
+import time
+from collections import defaultdict
+
+import boto3
+
+import task_codec
+import write_shards
+
+# Configure logging
+logger = logging.getLogger()
+
+# Initialize AWS services
+dynamodb = boto3.resource('dynamodb')
+TASK_STATS_TABLE_NAME = os.environ.get('TASK_STATS_TABLE_NAME', 'TaskStatsTable')
+stats_table = dynamodb.Table(TASK_STATS_TABLE_NAME)
+
+ALL_TASKS_KEY = 'ALL'
+TRACKED_STATUSES = ('open', 'completed', 'expired')
+# Every task change adds to the all-tasks counters, so that item is split over
+# this many keys, each task always counting in the same one. Reads add them up
+# along with the unsharded item written before, so the count may be raised
+# at any time but lowering it needs rebuild_counters.
+TASK_COUNTER_SHARDS = int(os.environ.get('TASK_COUNTER_SHARDS', '8'))
+# Each applied stream record leaves a marker so a replay of it counts nothing.
+# Stream records are kept for 24 hours, the markers a little longer.
+APPLIED_PREFIX = 'APPLIED#'
+APPLIED_MARKER_SECONDS = 2 * 86400
+
+
+def user_key(email):
+    return f"USER#{email}"
+
+
+def team_key(team):
+    return f"TEAM#{team}"
+
+
+def _scopes(task):
+    """Counter items a task contributes to"""
+    scopes = [write_shards.sharded(ALL_TASKS_KEY, task.get('TaskId'), TASK_COUNTER_SHARDS)]
+    if task.get('responsibility'):
+        scopes.append(user_key(task['responsibility']))
+    if task.get('team'):
+        scopes.append(team_key(task['team']))
+    return scopes
+
+
+def counter_deltas(old_task, new_task):
+    """
+    Work out the counter changes for a task going from old_task to new_task.
+    Either side may be None for creations and deletions. Returns
+    {counter_key: {status: delta}} with zero deltas dropped.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for task, sign in ((old_task, -1), (new_task, 1)):
+        if not task or not task.get('status'):
+            continue
+        for scope in _scopes(task):
+            deltas[scope][task['status']] += sign
+            deltas[scope]['total'] += sign
+
+    return {
+        scope: {status: delta for status, delta in counts.items() if delta}
+        for scope, counts in deltas.items()
+        if any(counts.values())
+    }
+
+
+def _add(counter_key, counts):
+    names = {}
+    values = {}
+    clauses = []
+    for i, (status, delta) in enumerate(sorted(counts.items())):
+        names[f"#s{i}"] = status
+        values[f":d{i}"] = delta
+        clauses.append(f"#s{i} :d{i}")
+    return {'Update': {
+        'TableName': TASK_STATS_TABLE_NAME,
+        'Key': {'CounterKey': counter_key},
+        'UpdateExpression': 'ADD ' + ', '.join(clauses),
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values
+    }}
+
+
+def apply_change(old_task, new_task, sequence_number):
+    """
+    Apply the counter deltas of one task change, the stream record with
+    `sequence_number`, in a single transaction with ADD updates. The
+    transaction also writes the record's marker on condition that it does
+    not exist, so a replayed record counts nothing. Returns whether it counted.
+    """
+    deltas = counter_deltas(old_task, new_task)
+    if not deltas:
+        return False
+    marker = {'Put': {
+        'TableName': TASK_STATS_TABLE_NAME,
+        'Item': {'CounterKey': f"{APPLIED_PREFIX}{sequence_number}",
+                 'ExpiresAt': int(time.time()) + APPLIED_MARKER_SECONDS},
+        'ConditionExpression': 'attribute_not_exists(CounterKey)'
+    }}
+    try:
+        dynamodb.meta.client.transact_write_items(
+            TransactItems=[_add(counter_key, counts) for counter_key, counts in deltas.items()] + [marker]
+        )
+    except dynamodb.meta.client.exceptions.TransactionCanceledException as e:
+        reasons = e.response.get('CancellationReasons', [])
+        if reasons and reasons[-1].get('Code') == 'ConditionalCheckFailed':
+            logger.info("Stream record %s was already counted", sequence_number)
+            return False
+        raise
+    return True
+
+
+def _to_counts(item):
+    counts = {status: 0 for status in TRACKED_STATUSES}
+    counts['total'] = 0
+    for name, value in (item or {}).items():
+        if name != 'CounterKey':
+            counts[name] = int(value)
+    return counts
+
+
+def _counter_keys(counter_key):
+    """The items a counter is kept in: the all-tasks counters in their shards and the pre-sharding item"""
+    if counter_key != ALL_TASKS_KEY or TASK_COUNTER_SHARDS <= 1:
+        return [counter_key]
+    return [ALL_TASKS_KEY, *write_shards.shard_keys(ALL_TASKS_KEY, TASK_COUNTER_SHARDS)]
+
+
+def get_counts(counter_key):
+    """
+    Return the counters stored under one key: a single GetItem, or for the
+    sharded all-tasks counters one BatchGetItem whose items are added up
+    """
+    keys = _counter_keys(counter_key)
+    if len(keys) == 1:
+        response = stats_table.get_item(Key={'CounterKey': counter_key})
+        return _to_counts(response.get('Item'))
+
+    counts = _to_counts(None)
+    request = {TASK_STATS_TABLE_NAME: {'Keys': [{'CounterKey': key} for key in keys]}}
+    while request:
+        response = dynamodb.batch_get_item(RequestItems=request)
+        for item in response.get('Responses', {}).get(TASK_STATS_TABLE_NAME, []):
+            for status, count in _to_counts(item).items():
+                counts[status] = counts.get(status, 0) + count
+        request = response.get('UnprocessedKeys') or None
+    return counts
+
+
+def rebuild_counters(tasks_table):
+    """Recompute every counter from a full scan of the tasks table (one-off backfill)"""
+    totals = defaultdict(lambda: defaultdict(int))
+    scan_params = {}
+    while True:
+        response = tasks_table.scan(**scan_params)
+        for task in response.get('Items', []):
+            for counter_key, counts in counter_deltas(None, task_codec.decode(task)).items():
+                for status, delta in counts.items():
+                    totals[counter_key][status] += delta
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    # Shards (and the pre-sharding item) no task counts in any more are emptied
+    for counter_key in _counter_keys(ALL_TASKS_KEY):
+        totals.setdefault(counter_key, {})
+
+    with stats_table.batch_writer() as batch:
+        for counter_key, counts in totals.items():
+            batch.put_item(Item={'CounterKey': counter_key, **counts})
+
+    logger.info("Rebuilt %s task counters", len(totals))
+    return len(totals)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    rebuild_counters(dynamodb.Table(os.environ.get('TABLE_NAME', 'TasksTable')))
@@ -0,0 +1,100 @@
+#task_history.py
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+import boto3
+from boto3.dynamodb.conditions import Attr, Key
+
+# Configure logging
+logger = logging.getLogger()
+
+# Initialize AWS services
+dynamodb = boto3.resource('dynamodb')
+TASK_EVENTS_TABLE_NAME = os.environ.get('TASK_EVENTS_TABLE_NAME', 'TaskEventsTable')
+events_table = dynamodb.Table(TASK_EVENTS_TABLE_NAME)
+
+# Events outlive their task by this long (deleted and archived tasks included); 0 keeps them forever
+TASK_HISTORY_RETENTION_DAYS = float(os.environ.get('TASK_HISTORY_RETENTION_DAYS', '365'))
+
+# Task fields whose changes are recorded as transitions, with the event type they produce
+TRACKED_FIELDS = {'status': 'status', 'responsibility': 'assigned', 'deadline': 'deadline'}
+
+
+def event_key(epoch_ms, suffix):
+    """Sort key of an event: its time in milliseconds, then something unique to the writer"""
+    return f"{epoch_ms:013d}#{suffix}"
+
+
+def _event(task_id, event_type, epoch_ms, suffix, **fields):
+    item = {
+        'TaskId': task_id,
+        'EventAt': event_key(epoch_ms, suffix),
+        'type': event_type,
+        'at': datetime.fromtimestamp(epoch_ms / 1000, timezone.utc).isoformat(timespec='milliseconds')
+    }
+    item.update({name: value for name, value in fields.items() if value is not None})
+    if TASK_HISTORY_RETENTION_DAYS:
+        item['ExpiresAt'] = int(epoch_ms / 1000 + TASK_HISTORY_RETENTION_DAYS * 86400)
+    return item
+
+
+def append_comment(task_id, author, text, now=None):
+    """Add a comment to the task's history with one PutItem; returns the event"""
+    epoch_ms = int((time.time() if now is None else now) * 1000)
+    item = _event(task_id, 'comment', epoch_ms, uuid.uuid4().hex[:12], by=author, text=text)
+    events_table.put_item(Item=item, ConditionExpression=Attr('EventAt').not_exists())
+    return item
+
+
+def events_for(old_task, new_task, sequence_number, epoch_ms, archived=False):
+    """
+    History events for one stream record. Keys derive from the record's
+    sequence number, so a replayed record rewrites the same events.
+    """
+    task_id = (new_task or old_task)['TaskId']
+
+    def event(index, event_type, **fields):
+        return _event(task_id, event_type, epoch_ms, f"{sequence_number:0>40}#{index}", **fields)
+
+    if old_task is None:
+        return [event(0, 'created', to=new_task.get('status'), assignee=new_task.get('responsibility'))]
+    if new_task is None:
+        return [event(0, 'archived' if archived else 'deleted', status=old_task.get('status'))]
+    return [
+        event(index, event_type, **{'from': old_task.get(field), 'to': new_task.get(field)})
+        for index, (field, event_type) in enumerate(TRACKED_FIELDS.items())
+        if old_task.get(field) != new_task.get(field)
+    ]
+
+
+def apply_change(old_task, new_task, sequence_number, created_at=None, archived=False):
+    """Record the transitions of one TasksTable change"""
+    epoch_ms = int((created_at or time.time()) * 1000)
+    events = events_for(old_task, new_task, sequence_number, epoch_ms, archived)
+    if not events:
+        return
+    with events_table.batch_writer() as batch:
+        for item in events:
+            batch.put_item(Item=item)
+
+
+def read(task_id, start_after=None, limit=50, newest_first=False):
+    """
+    One page of a task's history in time order. Returns (events, next token);
+    pass the token back as `start_after` for the next page.
+    """
+    kwargs = {
+        'KeyConditionExpression': Key('TaskId').eq(task_id),
+        'ScanIndexForward': not newest_first,
+        'Limit': limit
+    }
+    if start_after:
+        kwargs['ExclusiveStartKey'] = {'TaskId': task_id, 'EventAt': start_after}
+    response = events_table.query(**kwargs)
+    events = [{key: value for key, value in item.items() if key not in ('TaskId', 'ExpiresAt')}
+              for item in response.get('Items', [])]
+    last_key = response.get('LastEvaluatedKey')
+    return events, last_key['EventAt'] if last_key else None
@@ -0,0 +1,65 @@
+#task_stream.py
+import logging
+
+from boto3.dynamodb.types import TypeDeserializer
+
+# Imported first so the clients created by the modules below are instrumented
+import instrumentation
+import structured_logging
+import change_log
+import due_index
+import search_index
+import task_archive
+import task_cache
+import task_codec
+import task_counters
+import task_history
+
+# Configure logging
+logger = logging.getLogger()
+
+deserializer = TypeDeserializer()
+
+
+def _image(record, name):
+    image = record['dynamodb'].get(name)
+    if not image:
+        return None
+    return task_codec.decode({key: deserializer.deserialize(value) for key, value in image.items()})
+
+
+def process_record(record):
+    """Keep every derived view in step with one TasksTable change"""
+    old_task = _image(record, 'OldImage')
+    new_task = _image(record, 'NewImage')
+    task_id = (new_task or old_task)['TaskId']
+
+    # Writes made outside the API (e.g. the expiry state machine) must evict cached copies too
+    task_cache.invalidate(task_id)
+    due_index.apply_change(old_task, new_task)
+    search_index.apply_change(old_task, new_task)
+    change_log.apply_change(old_task, new_task, record['dynamodb']['SequenceNumber'])
+    expired = task_archive.is_expiry(record)
+    task_history.apply_change(old_task, new_task, record['dynamodb']['SequenceNumber'],
+                              record['dynamodb'].get('ApproximateCreationDateTime'), archived=expired)
+    # Archiving moves a closed task out of the table, it does not delete it, so
+    # it keeps counting. A replayed record is not counted twice.
+    if not expired:
+        task_counters.apply_change(old_task, new_task, record['dynamodb']['SequenceNumber'])
+
+
+@structured_logging.logged
+@instrumentation.instrumented
+def lambda_handler(event, context):
+    """
+    Consume the TasksTable stream. Failures are reported per record so that a
+    retried batch only replays the records that were not yet applied.
+    """
+    for record in event.get('Records', []):
+        try:
+            process_record(record)
+        except Exception as e:
+            logger.error("Error processing stream record %s: %s", record.get('eventID'), e)
+            return {'batchItemFailures': [{'itemIdentifier': record['dynamodb']['SequenceNumber']}]}
+
+    return {'batchItemFailures': []}
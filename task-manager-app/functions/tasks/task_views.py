@@ -0,0 +1,106 @@
+#task_views.py
+import os
+import re
+
+import boto3
+from boto3.dynamodb.conditions import Key
+
+import api
+import task_codec
+
+# What a row of a task list shows. Listings return these unless fields= asks
+# for others; GET /tasks/{id} returns the whole task.
+LIST_FIELDS = ('TaskId', 'name', 'status', 'deadline', 'responsibility')
+ALL_FIELDS = 'all'
+# TasksTable index partitioned by team, so a team's listings read only its own tasks
+TEAM_INDEX = 'TeamIndex'
+MAX_FIELDS = 20
+FIELD_NAME = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Created on first use: only a team admin asking for one user needs it
+cognito_client = None
+
+
+def requested_fields(query_params):
+    """
+    The fields a listing returns: LIST_FIELDS by default, the comma separated
+    names of fields= (TaskId always included), or None for fields=all.
+    """
+    value = query_params.get('fields')
+    if value is None:
+        return LIST_FIELDS
+    if value.strip() == ALL_FIELDS:
+        return None
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    if not fields or len(fields) > MAX_FIELDS or not all(FIELD_NAME.match(field) for field in fields):
+        raise api.ApiError(400, f"fields must be '{ALL_FIELDS}' or up to {MAX_FIELDS} comma separated attribute names")
+    return ('TaskId', *dict.fromkeys(field for field in fields if field != 'TaskId'))
+
+
+def read_params(fields, extra=()):
+    """Scan parameters that read only `fields` and `extra` (e.g. the sort key); none when `fields` is None"""
+    if fields is None:
+        return {}
+    expression, names = task_codec.projection((*fields, *extra))
+    return {'ProjectionExpression': expression, 'ExpressionAttributeNames': names}
+
+
+def visible(task, request):
+    """
+    Whether the caller may see `task`: their own tasks, and as an admin the
+    tasks of their team (any task for an admin without a team).
+    """
+    if task.get('responsibility') == request.email:
+        return True
+    return request.is_admin and (request.team is None or task.get('team') == request.team)
+
+
+def listing_scope(request):
+    """
+    The team an admin listing is limited to: the admin's own, or for an admin
+    without a team the one asked for with team=. None lists every team.
+    """
+    if not request.is_admin:
+        return None
+    return request.team if request.team is not None else request.query.get('team')
+
+
+def user_team(email):
+    """The custom:team of the user with this email, or None (no team, or no such user)"""
+    global cognito_client
+    if cognito_client is None:
+        cognito_client = boto3.client('cognito-idp')
+    # The value is a quoted string in the filter; quotes and backslashes in it are escaped
+    quoted = email.replace('\\', '\\\\').replace('"', '\\"')
+    response = cognito_client.list_users(UserPoolId=os.environ['COGNITO_USER_POOL_ID'],
+                                         Filter=f'email = "{quoted}"', Limit=1)
+    for user in response['Users']:
+        attributes = {attr['Name']: attr['Value'] for attr in user['Attributes']}
+        if attributes.get('email') == email:
+            return attributes.get('custom:team')
+    return None
+
+
+def requested_user(request):
+    """
+    The user a per-user view is for: the caller, or for an admin the one asked
+    for with user= (None for everyone). A team admin may only ask for the
+    members of their team.
+    """
+    if not request.is_admin:
+        return request.email
+    email = request.query.get('user')
+    if email and request.team is not None and user_team(email) != request.team:
+        raise api.ApiError(404, 'User not found')
+    return email
+
+
+def read_tasks(table, team, **params):
+    """
+    One page of tasks: a Query of the team's TeamIndex partition when `team`
+    is set, so its cost follows the team's size, else a Scan of the table.
+    """
+    if team is None:
+        return table.scan(**params)
+    return table.query(IndexName=TEAM_INDEX,
+                       KeyConditionExpression=Key(task_codec.stored_name('team')).eq(team), **params)
@@ -1,13 +1,14 @@
-import json
 import boto3
+import instrumentation
+import structured_logging
+import api
 
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table('TasksTable')
 
-def lambda_handler(event, context):
-
-    return {
-        'statusCode': 200,
-        'body': json.dumps(event),
-        'context': json.dumps(context)
-    }
+@structured_logging.logged
+@instrumentation.instrumented
+@api.endpoint()
+def lambda_handler(request):
+    # Echo what API Gateway delivered; the context object is not JSON serializable
+    return {'event': request.event}
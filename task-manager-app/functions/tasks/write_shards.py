@@ -0,0 +1,48 @@
+#write_shards.py
+import heapq
+import itertools
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+# Shards read at once by a scatter-gather reader; threads start on first use
+SHARD_READ_CONCURRENCY = int(os.environ.get('SHARD_READ_CONCURRENCY', '8'))
+_executor = ThreadPoolExecutor(max_workers=SHARD_READ_CONCURRENCY)
+
+
+def shard_of(item_id, shards):
+    """
+    The shard an item's entry goes to. A checksum rather than hash(), so every
+    container puts an item in the same shard and a later update or delete
+    finds the entry its creation wrote.
+    """
+    return zlib.crc32(str(item_id).encode('utf-8')) % shards
+
+
+def shard_key(key, shard):
+    return f"{key}#{shard}"
+
+
+def sharded(key, item_id, shards):
+    """
+    The partition key an item's entry under the hot `key` is written to:
+    one of `shards` suffixed keys, or `key` itself when it is not sharded
+    """
+    return key if shards <= 1 else shard_key(key, shard_of(item_id, shards))
+
+
+def shard_keys(key, shards):
+    """Every partition key `key` is spread over, which a reader has to visit"""
+    return [key] if shards <= 1 else [shard_key(key, shard) for shard in range(shards)]
+
+
+def scatter(read, keys):
+    """read(key) for every key, in parallel; the results come back in the order of `keys`"""
+    if len(keys) == 1:
+        return [read(keys[0])]
+    return list(_executor.map(read, keys))
+
+
+def gather(pages, sort_key, limit=None):
+    """Merge lists that are each ordered by `sort_key` into one ordered list of at most `limit` items"""
+    return list(itertools.islice(heapq.merge(*pages, key=sort_key), limit))
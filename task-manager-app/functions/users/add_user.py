@@ -2,10 +2,12 @@ import json
 import boto3
 import os
 import logging
+import instrumentation
+import structured_logging
+import api
 
 # Configure logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
 
 # Initialize AWS clients
 cognito_client = boto3.client('cognito-idp')
@@ -35,10 +37,10 @@ def subscribe_to_topic(email, topic_arn, topic_name, apply_filter):
             Endpoint=email,
             Attributes=attributes
         )
-        logger.info(f"Successfully subscribed {email} to {topic_name} {'with filter policy' if apply_filter else ''}")
+        logger.info("Successfully subscribed %s to %s %s", email, topic_name, 'with filter policy' if apply_filter else '')
         return response['SubscriptionArn']
     except Exception as e:
-        logger.error(f"Error subscribing {email} to {topic_name}: {str(e)}")
+        logger.error("Error subscribing %s to %s: %s", email, topic_name, e)
         raise
 
 def subscribe_to_all_topics(email, role):
@@ -69,25 +71,30 @@ def subscribe_to_all_topics(email, role):
                     'status': 'failed',
                     'error': str(e)
                 })
-                logger.error(f"Failed to subscribe to {topic_name}: {str(e)}")
+                logger.error("Failed to subscribe to %s: %s", topic_name, e)
                 # Continue with other subscriptions even if one fails
                 continue
     
     return subscription_results
 
-def create_cognito_user(username, email, role, temporary_password):
+def create_cognito_user(username, email, role, temporary_password, team=None):
     """
     Create a user in Cognito and assign them to appropriate group
     """
     try:
+        attributes = [
+            {'Name': 'email', 'Value': email},
+            {'Name': 'email_verified', 'Value': 'true'}
+        ]
+        # Reaches the user's tokens as the custom:team claim
+        if team:
+            attributes.append({'Name': 'custom:team', 'Value': team})
+
         # Create the user in Cognito
         response = cognito_client.admin_create_user(
             UserPoolId=USER_POOL_ID,
             Username=username,
-            UserAttributes=[
-                {'Name': 'email', 'Value': email},
-                {'Name': 'email_verified', 'Value': 'true'}
-            ],
+            UserAttributes=attributes,
             TemporaryPassword=temporary_password,
         )
         
@@ -101,65 +108,38 @@ def create_cognito_user(username, email, role, temporary_password):
         
         return response
     except Exception as e:
-        logger.error(f"Error creating Cognito user: {str(e)}")
+        logger.error("Error creating Cognito user: %s", e)
         raise
 
-def lambda_handler(event, context):
-    try:
-        # Parse and validate input
-        body = json.loads(event['body'])
-        username = body.get('username')
-        email = body.get('email')
-        role = body.get('role', 'user')
-        temporary_password = body.get('password', "DefaultTemp123!")
-        
-        # Input validation
-        if not username or not email:
-            return {
-                'statusCode': 400,
-                "headers": {
-                    "Content-Type": "application/json",
-                    "Access-Control-Allow-Origin": "*",
-                    "Access-Control-Allow-Credentials": True
-                },
-                'body': json.dumps({
-                    'error': 'Missing required fields: username and email are required'
-                })
-            }
-        
-        # Create user in Cognito
-        cognito_response = create_cognito_user(username, email, role, temporary_password)
-        
-        # Subscribe to notification topics
-        subscription_results = subscribe_to_all_topics(email, role)
-        
-        # Prepare success response
-        return {
-            'statusCode': 200,
-            "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Credentials": True
-            },
-            'body': json.dumps({
-                'message': 'User created successfully',
-                'username': username,
-                'cognito_status': cognito_response['User']['UserStatus'],
-                'subscriptions': subscription_results
-            })
-        }
+USER_SCHEMA = api.Schema(required=('username', 'email'),
+                         types={'username': str, 'email': str, 'role': str, 'password': str, 'team': str},
+                         missing_message='Missing required fields: username and email are required')
 
-    except Exception as e:
-        logger.error(f"Error in lambda_handler: {str(e)}")
-        return {
-            'statusCode': 500,
-            "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Credentials": True
-            },
-            'body': json.dumps({
-                'error': 'Internal server error',
-                'details': str(e)
-            })
-        }
+
+@structured_logging.logged
+@instrumentation.instrumented
+@api.endpoint(schema=USER_SCHEMA)
+def lambda_handler(request):
+    body = request.body
+    username = body['username']
+    email = body['email']
+    role = body.get('role', 'user')
+    temporary_password = body.get('password', "DefaultTemp123!")
+    # Only an admin without a team picks one; a team admin adds users to their own team
+    if 'team' in body and not request.is_admin:
+        raise api.ApiError(403, 'Only admins can set a team')
+    team = (request.team or body.get('team')) if request.is_admin else None
+
+    # Create user in Cognito
+    cognito_response = create_cognito_user(username, email, role, temporary_password, team)
+
+    # Subscribe to notification topics
+    subscription_results = subscribe_to_all_topics(email, role)
+
+    return {
+        'message': 'User created successfully',
+        'username': username,
+        'team': team,
+        'cognito_status': cognito_response['User']['UserStatus'],
+        'subscriptions': subscription_results
+    }
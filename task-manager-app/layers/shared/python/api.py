@@ -0,0 +1,145 @@
+#api.py
+import functools
+import logging
+import time
+
+import responses
+
+logger = logging.getLogger()
+
+_TYPE_NAMES = {str: 'string', int: 'number', bool: 'boolean', dict: 'object', list: 'list'}
+
+
+class ApiError(Exception):
+    """Raised by endpoint code to answer with `status_code` and {key: message}"""
+
+    def __init__(self, status_code, message, key='error'):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.key = key
+
+
+class Schema:
+    """
+    Request body rules, compiled once at import: fields that must be present
+    and non-empty, and the type each known field must have. Other fields are
+    passed through untouched.
+    """
+
+    def __init__(self, required=(), types=None, empty_message='Invalid request: Missing request body',
+                 missing_message='Missing required fields: {fields}'):
+        self.required = tuple(required)
+        self.types = tuple((name, expected, f"{name} must be a {_TYPE_NAMES.get(expected, expected.__name__)}")
+                           for name, expected in (types or {}).items())
+        self.empty_message = empty_message
+        self.missing_message = missing_message
+
+    def validate(self, body):
+        if not body or not isinstance(body, dict):
+            raise ApiError(400, self.empty_message)
+        missing = [name for name in self.required if body.get(name) in (None, '')]
+        if missing:
+            raise ApiError(400, self.missing_message.format(fields=', '.join(missing)))
+        for name, expected, message in self.types:
+            value = body.get(name)
+            # bool is an int subclass, so numbers reject it explicitly
+            if value is not None and (not isinstance(value, expected) or (expected is int and isinstance(value, bool))):
+                raise ApiError(400, message)
+        return body
+
+
+class Request:
+    """What an endpoint needs from the API Gateway event, read once"""
+
+    __slots__ = ('event', 'context', 'claims', 'email', 'is_admin', 'team', 'query', 'body', 'idempotency_key')
+
+    def __init__(self, event, context):
+        self.event = event
+        self.context = context
+        authorizer = (event.get('requestContext') or {}).get('authorizer') or {}
+        self.claims = authorizer.get('claims')
+        claims = self.claims or {}
+        self.email = claims.get('email')
+        self.is_admin = 'admin' in claims.get('cognito:groups', [])
+        # Users and admins of a team only reach that team's tasks; None is unscoped
+        self.team = claims.get('custom:team') or None
+        self.query = event.get('queryStringParameters') or {}
+        self.body = None
+        # The caller-scoped Idempotency-Key the request claimed, on idempotent endpoints
+        self.idempotency_key = None
+
+
+@functools.lru_cache(maxsize=256)
+def _error_body(key, message):
+    return responses.dumps({key: message})
+
+
+def error_response(status_code, message, key='error'):
+    return {'statusCode': status_code, 'headers': dict(responses.HEADERS), 'body': _error_body(key, message)}
+
+
+def endpoint(schema=None, admin=False, errors=None, idempotent=False):
+    """
+    Turn `handler(request)` into an API Gateway Lambda handler. Authorization
+    claims are checked, the body is parsed and validated against `schema`, the
+    returned value is serialized (a dict with a statusCode is passed through),
+    and exceptions become error responses: ApiError as raised, classes listed
+    in `errors` as their (status, message), and anything else as a 500.
+    With `idempotent`, a retry carrying the same Idempotency-Key header gets
+    the first response replayed instead of running the handler again.
+    """
+    error_map = tuple((errors or {}).items())
+    if idempotent:
+        # Only endpoints that accept the header load the idempotency table client
+        import idempotency
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            started = time.perf_counter()
+            claimed = None
+            try:
+                request = Request(event, context)
+                if request.claims is None:
+                    raise ApiError(401, 'Missing authorization', key='message')
+                if not request.email:
+                    raise ApiError(401, 'Missing user email', key='message')
+                if admin and not request.is_admin:
+                    logger.warning("Admin-only request by %s", request.email)
+                    raise ApiError(403, 'Unauthorized - Admin access required')
+                if schema is not None:
+                    try:
+                        body = responses.json_body(event)
+                    except ValueError:
+                        raise ApiError(400, 'Invalid JSON format')
+                    request.body = schema.validate(body)
+                if idempotent:
+                    claimed = idempotency.claim(handler.__module__, request, responses.header(event, idempotency.HEADER))
+                    request.idempotency_key = claimed.key if claimed is not None else None
+
+                if claimed is not None and claimed.response is not None:
+                    response, claimed = claimed.response, None
+                else:
+                    result = handler(request)
+                    response = result if isinstance(result, dict) and 'statusCode' in result else \
+                        responses.json_response(200, result, event)
+            except ApiError as e:
+                response = error_response(e.status_code, e.message, e.key)
+            except Exception as e:
+                mapped = next(((status, message) for error_type, (status, message) in error_map
+                               if isinstance(e, error_type)), None)
+                if mapped:
+                    response = error_response(*mapped)
+                else:
+                    logger.exception("Unexpected error in %s: %s", handler.__module__, e)
+                    response = error_response(500, 'Internal Server Error')
+
+            if claimed is not None:
+                idempotency.finish(claimed, response)
+            response['headers']['Server-Timing'] = f"app;dur={(time.perf_counter() - started) * 1000:.1f}"
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,105 @@
+#idempotency.py
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+
+import boto3
+
+import api
+
+# Configure logging
+logger = logging.getLogger()
+
+IDEMPOTENCY_TABLE_NAME = os.environ.get('IDEMPOTENCY_TABLE_NAME', 'IdempotencyTable')
+# How long a key replays its first response; DynamoDB TTL deletes the record some time after
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+# After this long an attempt that never finished (timeout, crash) no longer blocks retries
+IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', '60'))
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# Larger responses are not stored; a retry then runs the request again
+MAX_RESPONSE_BYTES = 300_000
+# Outcomes a retry may well change, so they are not replayed
+RETRYABLE_STATUSES = (409, 429)
+
+IN_PROGRESS = 'IN_PROGRESS'
+COMPLETED = 'COMPLETED'
+
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(IDEMPOTENCY_TABLE_NAME)
+
+# A claimed key; `response` is set when the request already ran and must be replayed
+Claim = namedtuple('Claim', ['key', 'response'])
+
+
+def fingerprint(body):
+    """Digest of the request body, so a key reused for a different request is caught"""
+    return hashlib.blake2b(json.dumps(body, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+
+def claim(scope, request, key):
+    """
+    Reserve `key` for this request, or return the stored response of the
+    request that used it first. Keys are scoped to the endpoint and caller.
+    Returns None when the request carries no key.
+    """
+    if not key:
+        return None
+    if len(key) > MAX_KEY_LENGTH:
+        raise api.ApiError(400, f'{HEADER} must be at most {MAX_KEY_LENGTH} characters')
+
+    record_key = f"{scope}#{request.email}#{key}"
+    digest = fingerprint(request.body)
+    now = int(time.time())
+    try:
+        table.put_item(
+            Item={
+                'IdempotencyKey': record_key,
+                'Status': IN_PROGRESS,
+                'Fingerprint': digest,
+                'LockedUntil': now + IDEMPOTENCY_LOCK_SECONDS,
+                'ExpiresAt': now + IDEMPOTENCY_TTL_SECONDS
+            },
+            # A new key, one past its TTL that DynamoDB has not deleted yet, or an abandoned attempt
+            ConditionExpression='attribute_not_exists(IdempotencyKey) OR ExpiresAt < :now OR '
+                                '(#status = :in_progress AND LockedUntil < :now)',
+            ExpressionAttributeNames={'#status': 'Status'},
+            ExpressionAttributeValues={':now': now, ':in_progress': IN_PROGRESS}
+        )
+        return Claim(record_key, None)
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        pass
+
+    record = table.get_item(Key={'IdempotencyKey': record_key}, ConsistentRead=True).get('Item')
+    if record and record['Fingerprint'] != digest:
+        raise api.ApiError(422, f'{HEADER} was already used for a different request')
+    if not record or record['Status'] != COMPLETED:
+        raise api.ApiError(409, f'A request with this {HEADER} is still being processed')
+
+    logger.info("Replaying the stored response for idempotency key %s", record_key)
+    response = json.loads(record['Response'])
+    response['headers']['Idempotent-Replayed'] = 'true'
+    return Claim(record_key, response)
+
+
+def finish(claimed, response):
+    """Store the response for retries to replay, or release the key when a retry should run again"""
+    stored = json.dumps(response)
+    try:
+        if response['statusCode'] >= 500 or response['statusCode'] in RETRYABLE_STATUSES or \
+                len(stored) > MAX_RESPONSE_BYTES:
+            table.delete_item(Key={'IdempotencyKey': claimed.key})
+            return
+        table.update_item(
+            Key={'IdempotencyKey': claimed.key},
+            UpdateExpression='SET #status = :completed, #response = :response REMOVE LockedUntil',
+            ExpressionAttributeNames={'#status': 'Status', '#response': 'Response'},
+            ExpressionAttributeValues={':completed': COMPLETED, ':response': stored}
+        )
+    except Exception as e:
+        # The request itself succeeded; a retry is blocked until the lock expires, then runs again
+        logger.error("Could not record the outcome for idempotency key %s: %s", claimed.key, e)
@@ -0,0 +1,222 @@
+#instrumentation.py
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+import boto3
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'TaskManager')
+INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', 'true').lower() != 'false'
+
+_state = threading.local()
+_install_lock = threading.Lock()
+
+
+def _calls():
+    calls = getattr(_state, 'calls', None)
+    if calls is None:
+        calls = _state.calls = []
+    return calls
+
+
+def _body_size(body):
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, bytearray, str)):
+        return len(body)
+    if isinstance(body, dict):
+        # Query-protocol services (SNS, SQS) are form encoded later
+        return sum(len(str(key)) + len(str(value)) + 2 for key, value in body.items())
+    return 0
+
+
+def _response_size(http_response, parsed):
+    try:
+        length = http_response.headers.get('content-length')
+        if length:
+            return int(length)
+        if http_response.raw is not None:
+            return len(http_response.content)
+    except Exception:
+        pass
+    # Responses without a raw body (stubs, stand-ins): approximate from the parsed shape
+    return len(json.dumps({k: v for k, v in (parsed or {}).items() if k != 'ResponseMetadata'}, default=str))
+
+
+def _on_parameter_build(context, **kwargs):
+    context['instrumentation_started'] = time.perf_counter()
+
+
+def _on_before_call(params, context, **kwargs):
+    context['instrumentation_request_bytes'] = _body_size(params.get('body'))
+
+
+def _record(model, context, status, retries, response_bytes, error=None):
+    started = context.get('instrumentation_started')
+    if started is None:
+        return
+    _calls().append({
+        'service': model.service_model.service_name,
+        'operation': model.name,
+        'latency_ms': (time.perf_counter() - started) * 1000,
+        'status': status,
+        'retries': retries,
+        'request_bytes': context.get('instrumentation_request_bytes', 0),
+        'response_bytes': response_bytes,
+        'error': error
+    })
+
+
+def _on_after_call(http_response, parsed, model, context, **kwargs):
+    metadata = (parsed or {}).get('ResponseMetadata', {})
+    error = (parsed or {}).get('Error', {}).get('Code')
+    _record(model, context, getattr(http_response, 'status_code', 0), metadata.get('RetryAttempts', 0),
+            _response_size(http_response, parsed), error)
+
+
+def _on_after_call_error(model, context, exception, **kwargs):
+    _record(model, context, 0, 0, 0, type(exception).__name__)
+
+
+def install(session=None):
+    """
+    Hook botocore events on the session so every client created from it
+    afterwards records its calls. Import this module before creating clients.
+    """
+    if not INSTRUMENTATION_ENABLED:
+        return
+    session = session or boto3._get_default_session()
+    with _install_lock:
+        if getattr(session, '_instrumentation_installed', False):
+            return
+        session._instrumentation_installed = True
+        events = session._session.get_component('event_emitter')
+        # First in line, so stubs that answer in before-call are timed too
+        events.register_first('before-parameter-build.*.*', _on_parameter_build, unique_id='instrumentation-start')
+        events.register_first('before-call.*.*', _on_before_call, unique_id='instrumentation-request')
+        events.register_last('after-call.*.*', _on_after_call, unique_id='instrumentation-response')
+        events.register_last('after-call-error.*.*', _on_after_call_error, unique_id='instrumentation-error')
+
+
+def summarize(calls, duration_ms=None):
+    """Per-operation totals for one invocation, dominant operation first"""
+    operations = defaultdict(lambda: {'calls': 0, 'latency_ms': 0.0, 'max_ms': 0.0, 'retries': 0,
+                                      'errors': 0, 'request_bytes': 0, 'response_bytes': 0})
+    for call in calls:
+        totals = operations[f"{call['service']}.{call['operation']}"]
+        totals['calls'] += 1
+        totals['latency_ms'] += call['latency_ms']
+        totals['max_ms'] = max(totals['max_ms'], call['latency_ms'])
+        totals['retries'] += call['retries']
+        totals['errors'] += int(call['error'] is not None)
+        totals['request_bytes'] += call['request_bytes']
+        totals['response_bytes'] += call['response_bytes']
+
+    ordered = dict(sorted(operations.items(), key=lambda item: item[1]['latency_ms'], reverse=True))
+    for totals in ordered.values():
+        totals['latency_ms'] = round(totals['latency_ms'], 3)
+        totals['max_ms'] = round(totals['max_ms'], 3)
+    aws_ms = sum(totals['latency_ms'] for totals in ordered.values())
+    summary = {
+        'AwsCalls': len(calls),
+        'AwsTimeMs': round(aws_ms, 3),
+        'DominantOperation': next(iter(ordered), None),
+        'Operations': ordered
+    }
+    if duration_ms is not None:
+        summary['DurationMs'] = round(duration_ms, 3)
+        summary['AwsTimeShare'] = round(aws_ms / duration_ms, 3) if duration_ms else 0.0
+    return summary
+
+
+def _emf(metrics, dimensions, values):
+    return json.dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [list(dimensions)],
+                'Metrics': [{'Name': name, 'Unit': unit} for name, unit in metrics]
+            }]
+        },
+        **dimensions,
+        **values
+    }, default=str)
+
+
+def emit_metrics(metrics, dimensions=None, **properties):
+    """
+    Print one EMF line of `metrics`, {name: (value, unit)}, under the
+    function's name plus `dimensions`; `properties` are logged alongside
+    """
+    dimensions = {'FunctionName': os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local'), **(dimensions or {})}
+    print(_emf([(name, unit) for name, (_, unit) in metrics.items()], dimensions,
+               {**{name: value for name, (value, _) in metrics.items()}, **properties}))
+
+
+def emit(calls, function_name, request_id, duration_ms):
+    """Print one EMF line per downstream operation plus the per-request summary"""
+    summary = summarize(calls, duration_ms)
+    for operation, totals in summary['Operations'].items():
+        service, name = operation.split('.', 1)
+        print(_emf(
+            [('AwsCallLatency', 'Milliseconds'), ('AwsCallCount', 'Count'), ('AwsCallRetries', 'Count'),
+             ('AwsCallErrors', 'Count'), ('AwsRequestBytes', 'Bytes'), ('AwsResponseBytes', 'Bytes')],
+            {'FunctionName': function_name, 'Service': service, 'Operation': name},
+            {
+                'AwsCallLatency': [round(call['latency_ms'], 3) for call in calls
+                                   if call['service'] == service and call['operation'] == name],
+                'AwsCallCount': totals['calls'],
+                'AwsCallRetries': totals['retries'],
+                'AwsCallErrors': totals['errors'],
+                'AwsRequestBytes': totals['request_bytes'],
+                'AwsResponseBytes': totals['response_bytes'],
+                'RequestId': request_id
+            }
+        ))
+    print(_emf(
+        [('Duration', 'Milliseconds'), ('AwsTime', 'Milliseconds'), ('AwsCalls', 'Count')],
+        {'FunctionName': function_name},
+        {
+            'Duration': summary['DurationMs'],
+            'AwsTime': summary['AwsTimeMs'],
+            'AwsCalls': summary['AwsCalls'],
+            'RequestId': request_id,
+            'DominantOperation': summary['DominantOperation'],
+            'Operations': summary['Operations']
+        }
+    ))
+    return summary
+
+
+def _request_id(event, context):
+    if isinstance(event, dict) and isinstance(event.get('requestContext'), dict):
+        request_id = event['requestContext'].get('requestId')
+        if request_id:
+            return request_id
+    return getattr(context, 'aws_request_id', None)
+
+
+def instrumented(handler):
+    """Record the AWS calls made during each invocation of a Lambda handler and emit them"""
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        if not INSTRUMENTATION_ENABLED:
+            return handler(event, context)
+        _state.calls = []
+        started = time.perf_counter()
+        try:
+            return handler(event, context)
+        finally:
+            function_name = os.environ.get('AWS_LAMBDA_FUNCTION_NAME') or getattr(context, 'function_name', 'local')
+            emit(_state.calls, function_name, _request_id(event, context), (time.perf_counter() - started) * 1000)
+            _state.calls = []
+
+    return wrapper
+
+
+install()
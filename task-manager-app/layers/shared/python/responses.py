@@ -0,0 +1,170 @@
+#responses.py
+import base64
+import gzip
+import hashlib
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+from boto3.dynamodb.types import Binary
+
+try:
+    import orjson
+except ImportError:
+    # Not in the layer by default; the stdlib encoder produces the same JSON, only slower
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies of at least this many bytes are compressed for clients that accept it; 0 disables.
+# API Gateway only passes the bytes through when the API lists the media type in BinaryMediaTypes.
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', '0'))
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Credentials': True
+}
+
+
+def plain(value):
+    """JSON form of the types DynamoDB items contain: Decimal numbers, sets and binary"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        try:
+            return sorted(value)
+        except TypeError:
+            return list(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Binary):
+        value = value.value
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value, default=plain, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(value, default=plain, separators=(',', ':'))
+
+
+def project(items, fields=None, exclude=()):
+    """Copies of `items` with only `fields` (all when None), minus `exclude`"""
+    if fields is None and not exclude:
+        return items
+    if fields is None:
+        return [{key: value for key, value in item.items() if key not in exclude} for item in items]
+    keep = [field for field in fields if field not in exclude]
+    return [{field: item[field] for field in keep if field in item} for item in items]
+
+
+def header(event, name):
+    headers = (event or {}).get('headers') or {}
+    name = name.lower()
+    return next((value for key, value in headers.items() if key.lower() == name), None)
+
+
+def accepted_encodings(event):
+    """Content codings the client accepts, from Accept-Encoding (q=0 excluded)"""
+    accepted = set()
+    for part in (header(event, 'Accept-Encoding') or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def negotiate_encoding(event):
+    """'br' or 'gzip' when the client accepts it (brotli only if the module is available), else None"""
+    accepted = accepted_encodings(event)
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, GZIP_LEVEL)
+
+
+def json_body(event, default=None):
+    """Decoded JSON request body; binary media types make API Gateway base64-encode it"""
+    body = (event or {}).get('body')
+    if not body:
+        return default
+    if event.get('isBase64Encoded'):
+        body = base64.b64decode(body)
+    return json.loads(body)
+
+
+def etag_for(*parts):
+    """Weak validator from a version or content digest; weak because the encoding may vary"""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def matches(event, etag):
+    """Whether If-None-Match names `etag` (weak comparison, as RFC 9110 requires for If-None-Match)"""
+    condition = header(event, 'If-None-Match')
+    if not condition or etag is None:
+        return False
+    if condition.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    return any((tag.strip()[2:] if tag.strip().startswith('W/') else tag.strip()) == opaque
+               for tag in condition.split(','))
+
+
+def not_modified(event, etag, headers=None):
+    """A 304 response when the client's copy is current, else None. Call before building the body."""
+    if not matches(event, etag):
+        return None
+    headers = dict(HEADERS, **(headers or {}))
+    headers.update({'ETag': etag, 'Cache-Control': 'private, no-cache'})
+    return {'statusCode': 304, 'headers': headers, 'body': ''}
+
+
+def json_response(status_code, body, event=None, headers=None, etag=None):
+    """
+    API Gateway proxy response for `body`, compressed when it is large and the
+    client accepts br or gzip. With an `etag` (or etag=True to digest the
+    content) the response is conditional: a matching If-None-Match gets a 304.
+    """
+    text = dumps(body)
+    headers = dict(HEADERS, **(headers or {}))
+    if etag is not None:
+        if etag is True:
+            etag = etag_for(hashlib.blake2b(text.encode(), digest_size=16).hexdigest())
+        unchanged = not_modified(event, etag, headers)
+        if unchanged:
+            return unchanged
+        headers.update({'ETag': etag, 'Cache-Control': 'private, no-cache'})
+    response = {'statusCode': status_code, 'headers': headers, 'body': text}
+
+    if RESPONSE_COMPRESSION_MIN_BYTES and event is not None and len(text) >= RESPONSE_COMPRESSION_MIN_BYTES:
+        encoding = negotiate_encoding(event)
+        if encoding:
+            response['body'] = base64.b64encode(compress(text.encode(), encoding)).decode()
+            response['isBase64Encoded'] = True
+            headers.update({'Content-Encoding': encoding, 'Vary': 'Accept-Encoding'})
+    return response
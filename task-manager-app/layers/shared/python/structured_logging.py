@@ -0,0 +1,188 @@
+#structured_logging.py
+import functools
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import weakref
+from datetime import datetime, timezone
+
+# Level written for every invocation
+LOG_LEVEL = logging.getLevelName(os.environ.get('LOG_LEVEL', 'INFO').upper())
+# Share of invocations that write DEBUG records as they happen (head sampling)
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', '0.01'))
+# DEBUG records held per invocation and written only if it fails (tail sampling); 0 disables
+LOG_DEBUG_BUFFER_SIZE = int(os.environ.get('LOG_DEBUG_BUFFER_SIZE', '0'))
+# Libraries whose DEBUG output is never wanted, even in sampled invocations
+QUIET_LOGGERS = ('boto3', 'botocore', 's3transfer', 'urllib3')
+
+_state = threading.local()
+_handlers = weakref.WeakSet()
+# The root logger's level between invocations, set by setup()
+_root_level = LOG_LEVEL
+
+
+def _invocation():
+    return getattr(_state, 'invocation', None)
+
+
+def current_correlation_id():
+    invocation = _invocation()
+    return invocation['correlation_id'] if invocation else None
+
+
+def _header(event, name):
+    headers = event.get('headers') or {}
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def correlation_id_for(event, context):
+    """
+    The ID that joins log lines across hops: an X-Correlation-Id header, the
+    API Gateway requestId, a correlation_id carried in an async payload, or
+    finally the Lambda request ID.
+    """
+    if isinstance(event, dict):
+        correlation_id = (_header(event, 'x-correlation-id')
+                          or (event.get('requestContext') or {}).get('requestId')
+                          or event.get('correlation_id'))
+        if correlation_id:
+            return correlation_id
+    return getattr(context, 'aws_request_id', None)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; arguments are only interpolated here, for records that are written"""
+
+    RESERVED = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'logger': record.name,
+            'location': f"{record.module}:{record.lineno}"
+        }
+        invocation = _invocation()
+        if invocation:
+            entry['correlation_id'] = invocation['correlation_id']
+            entry['request_id'] = invocation['request_id']
+            entry['function'] = invocation['function']
+        # Fields passed with extra={...}
+        entry.update({key: value for key, value in vars(record).items() if key not in self.RESERVED})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SampledHandler(logging.Handler):
+    """
+    Writes records at `level` and above. Records below it are written only in
+    head-sampled invocations; otherwise up to `buffer_size` of them are kept
+    and written if the invocation logs an error or fails.
+    """
+
+    def __init__(self, level=LOG_LEVEL, buffer_size=LOG_DEBUG_BUFFER_SIZE, stream=None):
+        super().__init__(logging.DEBUG)
+        self.threshold = level
+        self.buffer_size = buffer_size
+        self._stream = stream
+        self.setFormatter(JsonFormatter())
+        _handlers.add(self)
+
+    def handle(self, record):
+        if record.levelno < self.threshold:
+            invocation = _invocation()
+            if invocation is None:
+                return False
+            if invocation['sampled']:
+                return super().handle(record)
+            buffer = invocation['buffers'].setdefault(self, [])
+            if len(buffer) < self.buffer_size:
+                buffer.append(record)
+            return False
+        if record.levelno >= logging.ERROR:
+            self.flush_buffer()
+        return super().handle(record)
+
+    def flush_buffer(self):
+        invocation = _invocation()
+        if not invocation:
+            return
+        for record in invocation['buffers'].pop(self, []):
+            super().handle(record)
+
+    def emit(self, record):
+        try:
+            # Resolved per write so redirected or captured stdout is honoured
+            stream = self._stream or sys.stdout
+            stream.write(self.format(record) + '\n')
+        except Exception:
+            self.handleError(record)
+
+
+def setup(level=LOG_LEVEL, buffer_size=LOG_DEBUG_BUFFER_SIZE):
+    """Replace the root logger's handlers (including the Lambda runtime's) with the JSON handler"""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if not isinstance(handler, SampledHandler):
+            root.removeHandler(handler)
+    if not any(isinstance(handler, SampledHandler) for handler in root.handlers):
+        root.addHandler(SampledHandler(level, buffer_size))
+    # The root logger stays at `level` so below-threshold calls return before any
+    # argument is touched; only the buffer needs DEBUG records from every invocation,
+    # and begin() lowers it for the invocations that are sampled
+    global _root_level
+    _root_level = logging.DEBUG if buffer_size else level
+    root.setLevel(_root_level)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(max(level, logging.INFO))
+
+
+def begin(event, context, sample_rate=LOG_DEBUG_SAMPLE_RATE):
+    _state.invocation = {
+        'correlation_id': correlation_id_for(event, context),
+        'request_id': getattr(context, 'aws_request_id', None),
+        'function': os.environ.get('AWS_LAMBDA_FUNCTION_NAME') or getattr(context, 'function_name', None),
+        'sampled': random.random() < sample_rate,
+        'buffers': {}
+    }
+    root = logging.getLogger()
+    if _state.invocation['sampled'] and root.level > logging.DEBUG:
+        root.setLevel(logging.DEBUG)
+
+
+def end(failed=False):
+    if failed:
+        for handler in list(_handlers):
+            handler.flush_buffer()
+    invocation = _invocation()
+    if invocation and invocation['sampled']:
+        logging.getLogger().setLevel(_root_level)
+    _state.invocation = None
+
+
+def logged(handler):
+    """Set the correlation ID and sampling decision for each invocation of a Lambda handler"""
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        begin(event, context)
+        failed = True
+        try:
+            result = handler(event, context)
+            failed = isinstance(result, dict) and int(result.get('statusCode', 200)) >= 500
+            return result
+        finally:
+            end(failed)
+
+    return wrapper
+
+
+setup()
@@ -0,0 +1,240 @@
+#throttling.py
+import functools
+import logging
+import os
+import random
+import threading
+import time
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionError, HTTPClientError
+
+import instrumentation
+
+# Configure logging
+logger = logging.getLogger()
+
+# Control-plane calls (EventBridge rules, Lambda permissions) per second and service a container may send
+# once the service has throttled it
+CONTROL_PLANE_RATE = float(os.environ.get('CONTROL_PLANE_RATE', '10'))
+CONTROL_PLANE_BURST = float(os.environ.get('CONTROL_PLANE_BURST') or CONTROL_PLANE_RATE)
+# Attempts per call, the first included, before a throttle is passed on to the caller
+CONTROL_PLANE_MAX_ATTEMPTS = int(os.environ.get('CONTROL_PLANE_MAX_ATTEMPTS', '6'))
+
+# Error codes AWS services answer with when a caller exceeds its request rate.
+# LimitExceededException is a quota (too many rules), not a rate, so retrying cannot help.
+THROTTLE_CODES = frozenset({'ThrottlingException', 'Throttling', 'TooManyRequestsException',
+                            'RequestLimitExceeded', 'ThrottledException'})
+
+# Server-side failures botocore's standard mode retries; retried here too, without slowing down
+TRANSIENT_CODES = frozenset({'InternalFailure', 'InternalError', 'InternalServerError', 'InternalServiceError',
+                             'ServiceUnavailable', 'ServiceUnavailableException', 'RequestTimeout',
+                             'RequestTimeoutException', 'PriorRequestNotComplete'})
+RETRIED_ERRORS = (ClientError, ConnectionError, HTTPClientError)
+
+BACKOFF_BASE_SECONDS = 0.05
+BACKOFF_CAP_SECONDS = 2.0
+
+
+def is_throttle(error):
+    return isinstance(error, ClientError) and error.response.get('Error', {}).get('Code') in THROTTLE_CODES
+
+
+def is_transient(error):
+    """A 5xx, a transient error code or a connection failure: worth another attempt, but not a throttle"""
+    if isinstance(error, (ConnectionError, HTTPClientError)):
+        return True
+    if not isinstance(error, ClientError):
+        return False
+    return (error.response.get('Error', {}).get('Code') in TRANSIENT_CODES
+            or error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0) >= 500)
+
+
+class TokenBucket:
+    """Tokens refill at `rate` per second up to `burst`; acquire() waits for one"""
+
+    def __init__(self, rate, burst, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until one is available; returns the seconds waited"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve the token now so concurrent callers queue behind each other
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            self._sleep(wait)
+        return wait
+
+    def drain(self):
+        with self._lock:
+            self._tokens = 0.0
+            self._updated = self._clock()
+
+
+class AdaptiveLimiter:
+    """
+    Token bucket whose rate follows AIMD: every throttle from the service
+    halves it (down to `min_rate`), every success adds `increase` back (up to
+    `max_rate`). Throttled calls are retried after a jittered exponential
+    backoff, so a burst is slowed down instead of failed. Like botocore's
+    adaptive retry mode, calls are not paced until the first throttle, and
+    pacing stops again once the rate has climbed back to `max_rate`.
+    Transient failures are retried with the same backoff but leave the rate
+    alone.
+    """
+
+    def __init__(self, name, max_rate=CONTROL_PLANE_RATE, burst=CONTROL_PLANE_BURST,
+                 max_attempts=CONTROL_PLANE_MAX_ATTEMPTS, min_rate=None, increase=None,
+                 clock=time.monotonic, sleep=time.sleep, rng=random):
+        self.name = name
+        self.max_rate = max_rate
+        self.min_rate = min_rate if min_rate is not None else max_rate / 32
+        self.increase = increase if increase is not None else max_rate / 20
+        self.max_attempts = max_attempts
+        self.bucket = TokenBucket(max_rate, burst, clock, sleep)
+        self.engaged = False
+        self._sleep = sleep
+        self._rng = rng
+        self._lock = threading.Lock()
+        self._metrics = {'calls': 0, 'throttles': 0, 'retries': 0, 'failures': 0, 'wait_seconds': 0.0}
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._metrics[name] += amount
+
+    def on_success(self):
+        with self._lock:
+            self.bucket.rate = min(self.max_rate, self.bucket.rate + self.increase)
+            if self.bucket.rate >= self.max_rate:
+                # Recovered: calls go unpaced again until the next throttle
+                self.engaged = False
+
+    def on_throttle(self):
+        with self._lock:
+            self._metrics['throttles'] += 1
+            self.bucket.rate = max(self.min_rate, self.bucket.rate / 2)
+            if not self.engaged:
+                # Start pacing from an empty bucket rather than repeat the burst that was throttled
+                self.engaged = True
+                self.bucket.drain()
+
+    def backoff(self, attempt):
+        """Full jitter: anywhere up to base * 2^attempt, capped"""
+        return self._rng.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+    def call(self, operation, *args, **kwargs):
+        self._count('calls')
+        for attempt in range(1, self.max_attempts + 1):
+            if self.engaged:
+                self._count('wait_seconds', self.bucket.acquire())
+            try:
+                result = operation(*args, **kwargs)
+            except RETRIED_ERRORS as e:
+                throttled = is_throttle(e)
+                if not throttled and not is_transient(e):
+                    raise
+                if throttled:
+                    self.on_throttle()
+                if attempt == self.max_attempts:
+                    self._count('failures')
+                    logger.error("%s still failing after %s attempts at %.2f calls/s: %s",
+                                 self.name, attempt, self.rate, e)
+                    raise
+                self._count('retries')
+                delay = self.backoff(attempt)
+                logger.warning("%s %s, retrying in %.3fs at %.2f calls/s", self.name,
+                               'throttled' if throttled else f"failed ({e})", delay, self.rate)
+                self._count('wait_seconds', delay)
+                self._sleep(delay)
+            else:
+                self.on_success()
+                return result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._metrics)
+        stats['rate'] = round(self.rate, 3)
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self._metrics:
+                self._metrics[name] = 0 if name != 'wait_seconds' else 0.0
+
+
+class LimitedClient:
+    """A boto3 client whose API calls go through a limiter; everything else (exceptions, meta) is the client's"""
+
+    def __init__(self, client, limiter):
+        self._client = client
+        self._limiter = limiter
+        self._operations = set(client.meta.method_to_api_mapping)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if name not in self._operations:
+            return attribute
+        limited = functools.wraps(attribute)(functools.partial(self._limiter.call, attribute))
+        # Cache on the instance so __getattr__ only runs once per operation
+        setattr(self, name, limited)
+        return limited
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(service_name):
+    """The container-wide limiter of a service; every client of that service shares its rate"""
+    with _limiters_lock:
+        limiter = _limiters.get(service_name)
+        if limiter is None:
+            limiter = _limiters[service_name] = AdaptiveLimiter(service_name)
+        return limiter
+
+
+def client(service_name):
+    """
+    A boto3 client for control-plane calls. botocore's own retries are turned
+    off so that every throttle reaches the limiter and slows the container down;
+    the limiter retries the 5xx and connection errors botocore would have.
+    """
+    config = Config(retries={'total_max_attempts': 1, 'mode': 'standard'})
+    return LimitedClient(boto3.client(service_name, config=config), limiter_for(service_name))
+
+
+def emit_metrics():
+    """Log each limiter's counters as CloudWatch Embedded Metric Format lines and reset them"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    emitted = {}
+    for limiter in limiters:
+        stats = limiter.stats()
+        limiter.reset_stats()
+        if not stats['calls']:
+            continue
+        emitted[limiter.name] = stats
+        instrumentation.emit_metrics({
+            'ControlPlaneCalls': (stats['calls'], 'Count'),
+            'ControlPlaneThrottles': (stats['throttles'], 'Count'),
+            'ControlPlaneRetries': (stats['retries'], 'Count'),
+            'ControlPlaneFailures': (stats['failures'], 'Count'),
+            'ControlPlaneWait': (round(stats['wait_seconds'] * 1000, 3), 'Milliseconds'),
+            'ControlPlaneRate': (stats['rate'], 'Count/Second')
+        }, {'Service': limiter.name})
+    return emitted
@@ -0,0 +1,259 @@
+#tracing.py
+import functools
+import json
+import logging
+import os
+import random
+import secrets
+import threading
+import time
+import urllib.request
+from collections import namedtuple
+from contextlib import contextmanager
+
+import structured_logging
+
+# Where finished spans go: 'stdout' (one JSON line per invocation), 'otlp' (POST to TRACE_COLLECTOR_URL) or 'none'
+TRACE_EXPORTER = os.environ.get('TRACE_EXPORTER', 'stdout').lower()
+TRACE_COLLECTOR_URL = os.environ.get('TRACE_COLLECTOR_URL', '')
+# Share of new traces that are recorded; continued traces keep their caller's decision
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '1'))
+
+logger = logging.getLogger()
+
+# W3C trace context of a span in another process
+SpanContext = namedtuple('SpanContext', ['trace_id', 'span_id', 'sampled'])
+# Trace context read from an incoming event plus the hop timing its sender recorded
+Carrier = namedtuple('Carrier', ['context', 'sent_at', 'scheduled_for'])
+
+_state = threading.local()
+_exporter = None
+
+
+def _stack():
+    stack = getattr(_state, 'stack', None)
+    if stack is None:
+        stack = _state.stack = []
+    return stack
+
+
+def _finished():
+    finished = getattr(_state, 'finished', None)
+    if finished is None:
+        finished = _state.finished = []
+    return finished
+
+
+class Span:
+    def __init__(self, name, trace_id, parent_id=None, sampled=True, kind='internal', attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self.end = None
+        self.error = None
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self, error=None):
+        self.end = time.time()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        if self.sampled:
+            _finished().append(self)
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'start': self.start,
+            'end': self.end,
+            'duration_ms': round((self.end - self.start) * 1000, 3),
+            'attributes': self.attributes,
+            'error': self.error
+        }
+
+
+def parse_traceparent(value):
+    try:
+        version, trace_id, span_id, flags = value.split('-')
+        int(trace_id, 16), int(span_id, 16)
+    except (AttributeError, ValueError):
+        return None
+    if len(trace_id) != 32 or len(span_id) != 16:
+        return None
+    return SpanContext(trace_id, span_id, int(flags, 16) & 1 == 1)
+
+
+def current_span():
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+def start_span(name, remote=None, kind='internal', **attributes):
+    """
+    Start a span under the current one, or under `remote` (a Carrier from
+    extract) when continuing a trace from another hop, or as a new trace.
+    """
+    parent = current_span()
+    if remote is not None and remote.context is not None:
+        trace_id, parent_id, sampled = remote.context
+    elif parent is not None:
+        trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+    else:
+        trace_id, parent_id, sampled = secrets.token_hex(16), None, random.random() < TRACE_SAMPLE_RATE
+    span = Span(name, trace_id, parent_id, sampled, kind, attributes)
+    if remote is not None:
+        now = time.time()
+        if remote.sent_at is not None:
+            span.set(**{'hop.wait_ms': round((now - remote.sent_at) * 1000, 3)})
+        if remote.scheduled_for is not None:
+            span.set(**{'schedule.lag_ms': round((now - remote.scheduled_for) * 1000, 3)})
+    _stack().append(span)
+    return span
+
+
+def end_span(span, error=None):
+    stack = _stack()
+    if span in stack:
+        stack.remove(span)
+    span.finish(error)
+
+
+@contextmanager
+def span(name, remote=None, kind='internal', **attributes):
+    current = start_span(name, remote, kind, **attributes)
+    try:
+        yield current
+    except Exception as e:
+        end_span(current, e)
+        raise
+    end_span(current)
+
+
+def inject(payload, scheduled_for=None):
+    """
+    Add the current trace context to a message payload (EventBridge target
+    Input, SQS body, Step Functions input) so the next hop continues the trace.
+    `scheduled_for` (a datetime) marks payloads delivered by a schedule, so the
+    receiver measures scheduler lag instead of the intended wait.
+    """
+    current = current_span()
+    payload['traceparent'] = current.traceparent if current else \
+        f"00-{secrets.token_hex(16)}-{secrets.token_hex(8)}-00"
+    payload['trace_sent_at'] = round(time.time(), 6)
+    if scheduled_for is not None:
+        payload['trace_scheduled_for'] = scheduled_for.timestamp()
+    correlation_id = structured_logging.current_correlation_id()
+    if correlation_id:
+        payload['correlation_id'] = correlation_id
+    return payload
+
+
+def extract(event):
+    """Carrier for an API Gateway event (traceparent header), a single-record SQS event or a direct payload"""
+    if not isinstance(event, dict):
+        return Carrier(None, None, None)
+    records = event.get('Records')
+    if isinstance(records, list):
+        if len(records) != 1 or 'body' not in records[0]:
+            return Carrier(None, None, None)
+        try:
+            carrier = extract(json.loads(records[0]['body']))
+        except (TypeError, ValueError):
+            return Carrier(None, None, None)
+        sent_timestamp = (records[0].get('attributes') or {}).get('SentTimestamp')
+        if sent_timestamp:
+            carrier = carrier._replace(sent_at=int(sent_timestamp) / 1000)
+        return carrier
+    headers = event.get('headers') or {}
+    traceparent = next((value for key, value in headers.items() if key.lower() == 'traceparent'), None)
+    if traceparent:
+        return Carrier(parse_traceparent(traceparent), None, None)
+    return Carrier(parse_traceparent(event.get('traceparent')), event.get('trace_sent_at'),
+                   event.get('trace_scheduled_for'))
+
+
+def set_exporter(exporter):
+    """Send finished spans to exporter(list_of_span_dicts) instead of TRACE_EXPORTER"""
+    global _exporter
+    _exporter = exporter
+
+
+_OTLP_KINDS = {'internal': 1, 'server': 2, 'consumer': 5}
+
+
+def _otlp_span(span):
+    attributes = dict(span['attributes'], **({'error': span['error']} if span['error'] else {}))
+    return {
+        'traceId': span['trace_id'],
+        'spanId': span['span_id'],
+        'parentSpanId': span['parent_id'] or '',
+        'name': span['name'],
+        'kind': _OTLP_KINDS[span['kind']],
+        'startTimeUnixNano': str(int(span['start'] * 1e9)),
+        'endTimeUnixNano': str(int(span['end'] * 1e9)),
+        'attributes': [{'key': key, 'value': {'stringValue': str(value)}} for key, value in attributes.items()],
+        'status': {'code': 2 if span['error'] else 1}
+    }
+
+
+def _export_otlp(spans):
+    body = {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': 'task-manager'}}]},
+        'scopeSpans': [{'scope': {'name': 'tracing'}, 'spans': [_otlp_span(span) for span in spans]}]
+    }]}
+    request = urllib.request.Request(TRACE_COLLECTOR_URL, data=json.dumps(body).encode(),
+                                     headers={'Content-Type': 'application/json'}, method='POST')
+    urllib.request.urlopen(request, timeout=2).close()
+
+
+def flush():
+    """Export the spans finished on this thread since the last flush"""
+    finished = _finished()
+    if not finished:
+        return
+    spans = [span.to_dict() for span in finished]
+    finished.clear()
+    try:
+        if _exporter is not None:
+            _exporter(spans)
+        elif TRACE_EXPORTER == 'otlp' and TRACE_COLLECTOR_URL:
+            _export_otlp(spans)
+        elif TRACE_EXPORTER == 'stdout':
+            print(json.dumps({'trace_spans': spans}, default=str))
+    except Exception as e:
+        # Losing spans must never fail the invocation
+        logger.warning("Could not export %d spans: %s", len(spans), e)
+
+
+def traced(handler):
+    """Run each invocation of a Lambda handler in a span that continues the caller's trace"""
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        name = os.environ.get('AWS_LAMBDA_FUNCTION_NAME') or getattr(context, 'function_name', None) or handler.__module__
+        api = isinstance(event, dict) and 'requestContext' in event
+        try:
+            with span(name, remote=extract(event), kind='server' if api else 'consumer',
+                      **{'faas.module': handler.__module__}) as current:
+                result = handler(event, context)
+                if isinstance(result, dict) and 'statusCode' in result:
+                    current.set(**{'http.status_code': result['statusCode']})
+                return result
+        finally:
+            flush()
+
+    return wrapper
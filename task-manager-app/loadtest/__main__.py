@@ -0,0 +1,78 @@
+"""
+Command line entry point:
+
+    python -m loadtest --requests 2000 --concurrency 16 --service-latency dynamodb=0.004,sns=0.02
+    python -m loadtest --parameter ApiMode=router
+    python -m loadtest --throttle events=20:5,lambda=15
+"""
+import argparse
+import json
+import sys
+
+from . import harness
+
+
+def _latency(value):
+    latency = {}
+    for pair in filter(None, value.split(',')):
+        service, seconds = pair.split('=')
+        latency[service.strip()] = float(seconds)
+    return latency
+
+
+def _parameter(value):
+    name, _, parameter_value = value.partition('=')
+    return name.strip(), parameter_value.strip()
+
+
+def _throttles(value):
+    throttles = {}
+    for pair in filter(None, value.split(',')):
+        service, limit = pair.split('=')
+        rate, _, burst = limit.partition(':')
+        throttles[service.strip()] = (float(rate), float(burst) if burst else None)
+    return throttles
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay API traffic against in-process AWS stand-ins')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--initial-tasks', type=int, default=100)
+    parser.add_argument('--schedule-rounds', type=int, default=2,
+                        help='times to fast-forward the EventBridge deadline rules after the load phase')
+    parser.add_argument('--service-latency', type=_latency, default={},
+                        help='simulated round trip per service in seconds, e.g. dynamodb=0.004,sns=0.02')
+    parser.add_argument('--parameter', type=_parameter, action='append', default=[], metavar='NAME=VALUE',
+                        help='template parameter override, e.g. ApiMode=router (repeatable)')
+    parser.add_argument('--throttle', type=_throttles, default={}, metavar='SERVICE=RATE[:BURST],...',
+                        help='requests per second each service stand-in admits before throttling, e.g. events=20:5')
+    parser.add_argument('--json', metavar='PATH', help='also write the report as JSON')
+    parser.add_argument('--baseline', metavar='PATH', help='fail when the run regresses against this JSON report')
+    parser.add_argument('--latency-tolerance', type=float, default=0.5)
+    parser.add_argument('--verbose', action='store_true', help='show handler logs')
+    args = parser.parse_args(argv)
+
+    report = harness.run(requests=args.requests, concurrency=args.concurrency, seed=args.seed, users=args.users,
+                         initial_tasks=args.initial_tasks, schedule_rounds=args.schedule_rounds,
+                         latency=args.service_latency, verbose=args.verbose, parameters=dict(args.parameter),
+                         throttles=args.throttle)
+    print(harness.format_report(report))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = harness.compare(report, json.load(f), latency_tolerance=args.latency_tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
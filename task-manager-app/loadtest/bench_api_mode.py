@@ -0,0 +1,229 @@
+"""
+Cold start benchmark: one function per API route (ApiMode=split) against the
+single routing function (ApiMode=router).
+
+Three measurements feed the comparison:
+
+- init cost: every route module is imported in a fresh interpreter, alone for
+  the split layout and after the router for the router layout, which only
+  imports a route the first time a container serves it;
+- warm latency: a load run through the harness in each layout, which also
+  shows what the extra routing hop costs;
+- container reuse: a day of Poisson traffic over the default request mix is
+  replayed against per-function container pools (split) or one shared pool
+  (router). A container is reclaimed after `keep_alive` idle seconds, and a
+  request that finds no idle container pays a cold start.
+
+Interpreter start-up, the Lambda sandbox and boto3 itself (the stand-ins load
+it before timing starts) are not included in the init cost, so the absolute
+numbers are a lower bound; the difference between the layouts is the point.
+
+    python -m loadtest.bench_api_mode --rates 2,20,200 --json api_mode.json
+"""
+import argparse
+import heapq
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+
+from . import harness as harness_module
+from .harness import DEFAULT_MIX, Harness, load_template, percentile
+
+LAYOUTS = ('split', 'router')
+DEFAULT_RATES = (2, 20, 200)
+# Idle time after which Lambda reclaims a container; not documented, commonly observed at 5 to 15 minutes
+DEFAULT_KEEP_ALIVE_SECONDS = 600
+DEFAULT_DURATION_SECONDS = 24 * 3600
+
+
+# Init cost
+
+def _probe(modules):
+    """Child process: import `modules` in order against the stand-ins, print the seconds each took"""
+    import time
+    from .standins import REGION, AwsStandIns
+
+    template = load_template()
+    for layout in LAYOUTS:
+        stack = harness_module.Stack(template, {'ApiMode': layout})
+        os.environ.update(stack.environment())
+        for function in stack.functions().values():
+            for path in [function['code_uri']] + function['layer_paths']:
+                if path not in sys.path:
+                    sys.path.insert(0, path)
+    AwsStandIns().install(REGION)
+    timings = []
+    for name in modules:
+        started = time.perf_counter()
+        __import__(name)
+        timings.append(time.perf_counter() - started)
+    print(json.dumps(timings))
+
+
+def _timed_imports(modules, repeat):
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-m', 'loadtest.bench_api_mode', '--probe', ','.join(modules)],
+                                cwd=harness_module.ROOT, check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return [statistics.median(run[index] for run in runs) for index in range(len(modules))]
+
+
+def measure_init(routes, repeat=3):
+    """
+    {'split': {module: ms}, 'router': {'router': ms, module: ms}}: what a cold
+    container spends importing before it can serve the route
+    """
+    split, router, router_base = {}, {}, []
+    for module in routes:
+        split[module] = round(_timed_imports([module], repeat)[0] * 1000, 2)
+        base, lazy = _timed_imports(['router', module], repeat)
+        router_base.append(base)
+        router[module] = round(lazy * 1000, 2)
+    router['router'] = round(statistics.median(router_base) * 1000, 2)
+    return {'split': split, 'router': router}
+
+
+# Warm latency
+
+def measure_warm(requests, seed):
+    """p50 handler latency per route module in each layout, from a harness load run"""
+    warm = {}
+    for layout in LAYOUTS:
+        report = harness_module.run(requests=requests, concurrency=1, seed=seed, users=10, initial_tasks=20,
+                                    schedule_rounds=0, harness=Harness(parameters={'ApiMode': layout}).start())
+        warm[layout] = {label: stats['p50_ms'] for label, stats in report['handlers'].items() if label in DEFAULT_MIX}
+    return warm
+
+
+# Container reuse
+
+def _arrivals(rate_per_minute, mix, duration, rng):
+    total = sum(mix.values())
+    streams = []
+    for route, weight in mix.items():
+        rate = rate_per_minute * weight / total / 60
+        at, times = 0.0, []
+        while True:
+            at += rng.expovariate(rate)
+            if at >= duration:
+                break
+            times.append((at, route))
+        streams.append(times)
+    return list(heapq.merge(*streams))
+
+
+def simulate(layout, arrivals, init_ms, warm_ms, keep_alive=DEFAULT_KEEP_ALIVE_SECONDS):
+    """Replay `arrivals` [(seconds, route)] against container pools; returns cold start and latency totals"""
+    pools = {}
+    latencies = []
+    cold_starts, lazy_imports, init_total, peak = 0, 0, 0.0, 0
+    cold_by_route = {}
+    for at, route in arrivals:
+        pool = pools.setdefault(route if layout == 'split' else 'router', [])
+        # Reclaim containers idle for longer than the keep-alive
+        pool[:] = [container for container in pool if container['free_at'] > at - keep_alive]
+        idle = [container for container in pool if container['free_at'] <= at]
+        if idle:
+            container = max(idle, key=lambda container: container['free_at'])
+            init = 0.0
+            if route not in container['loaded']:
+                # Router containers import a route the first time they serve it
+                init = init_ms[route]
+                lazy_imports += 1
+        else:
+            container = {'loaded': set()}
+            pool.append(container)
+            init = init_ms[route] + init_ms.get('router', 0.0)
+            cold_starts += 1
+            cold_by_route[route] = cold_by_route.get(route, 0) + 1
+        container['loaded'].add(route)
+        duration = init + warm_ms[route]
+        container['free_at'] = at + duration / 1000
+        init_total += init
+        latencies.append(duration)
+        peak = max(peak, sum(len(containers) for containers in pools.values()))
+
+    latencies.sort()
+    return {
+        'requests': len(arrivals),
+        'cold_starts': cold_starts,
+        'cold_start_rate': round(cold_starts / len(arrivals), 4) if arrivals else 0.0,
+        'lazy_imports': lazy_imports,
+        'init_seconds': round(init_total / 1000, 3),
+        'peak_containers': peak,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'p999_ms': round(percentile(latencies, 99.9), 2),
+        'cold_starts_by_route': dict(sorted(cold_by_route.items()))
+    }
+
+
+def run(rates=DEFAULT_RATES, seed=1, keep_alive=DEFAULT_KEEP_ALIVE_SECONDS, duration=DEFAULT_DURATION_SECONDS,
+        repeat=3, warm_requests=300):
+    mix = dict(DEFAULT_MIX)
+    init = measure_init(mix, repeat)
+    warm = measure_warm(warm_requests, seed)
+    results = []
+    for rate in rates:
+        arrivals = _arrivals(rate, mix, duration, random.Random(f"{seed}:{rate}"))
+        results.append({
+            'rate_per_minute': rate,
+            'layouts': {layout: simulate(layout, arrivals, init[layout], warm[layout], keep_alive) for layout in LAYOUTS}
+        })
+    return {'seed': seed, 'keep_alive_seconds': keep_alive, 'duration_seconds': duration,
+            'init_ms': init, 'warm_p50_ms': warm, 'results': results}
+
+
+def format_report(report):
+    init, warm = report['init_ms'], report['warm_p50_ms']
+    lines = [f"{'route':<20}{'split init':>12}{'router lazy':>13}{'split p50':>11}{'router p50':>12}"]
+    for route in init['split']:
+        lines.append(f"{route:<20}{init['split'][route]:>12.1f}{init['router'][route]:>13.1f}"
+                     f"{warm['split'].get(route, 0.0):>11.2f}{warm['router'].get(route, 0.0):>12.2f}")
+    lines.append(f"router module init: {init['router']['router']:.1f} ms")
+    lines.append('')
+    lines.append(f"{report['duration_seconds'] // 3600}h of traffic, containers reclaimed after "
+                 f"{report['keep_alive_seconds']}s idle")
+    lines.append(f"{'req/min':>8}  {'layout':<8}{'requests':>10}{'cold':>8}{'cold %':>8}{'lazy':>7}"
+                 f"{'init s':>9}{'peak':>6}{'p50 ms':>9}{'p99 ms':>9}{'p99.9 ms':>10}")
+    for result in report['results']:
+        for layout, stats in result['layouts'].items():
+            lines.append(f"{result['rate_per_minute']:>8g}  {layout:<8}{stats['requests']:>10}{stats['cold_starts']:>8}"
+                         f"{stats['cold_start_rate'] * 100:>8.2f}{stats['lazy_imports']:>7}{stats['init_seconds']:>9.1f}"
+                         f"{stats['peak_containers']:>6}{stats['p50_ms']:>9.2f}{stats['p99_ms']:>9.1f}"
+                         f"{stats['p999_ms']:>10.1f}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare cold starts of the split and router API layouts')
+    parser.add_argument('--rates', default=','.join(str(rate) for rate in DEFAULT_RATES),
+                        help='comma separated total API requests per minute to simulate')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--keep-alive', type=float, default=DEFAULT_KEEP_ALIVE_SECONDS,
+                        help='seconds an idle container is kept before it is reclaimed')
+    parser.add_argument('--hours', type=float, default=DEFAULT_DURATION_SECONDS / 3600)
+    parser.add_argument('--repeat', type=int, default=3, help='fresh interpreters per init measurement')
+    parser.add_argument('--json', metavar='PATH', help='also write the report as JSON')
+    parser.add_argument('--probe', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        _probe(args.probe.split(','))
+        return 0
+
+    report = run([float(rate) for rate in args.rates.split(',')], seed=args.seed, keep_alive=args.keep_alive,
+                 duration=int(args.hours * 3600), repeat=args.repeat)
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
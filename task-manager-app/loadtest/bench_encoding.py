@@ -0,0 +1,115 @@
+"""
+Item size and scan cost of TasksTable before and after the compact encoding.
+
+The table is filled with generated tasks in the legacy encoding (the task
+dicts as posted), measured, migrated with maintenance.migrate_task_encoding
+and measured again, so the report shows what the migration saves on a table
+of that shape:
+
+    python -m loadtest.bench_encoding --size 20000 --long-descriptions 0.1
+"""
+import argparse
+import json
+import math
+import sys
+from collections import Counter
+
+import boto3
+
+from . import datagen
+from .harness import Harness, claims_for, percentile, quiet
+from .standins import item_size
+
+DEFAULT_SIZE = 20_000
+# Share of generated tasks with a long description
+DEFAULT_LONG_DESCRIPTIONS = 0.1
+
+
+def _measure(harness, table_name, busiest):
+    """Item sizes, write units to store every item once, read units of a full scan and the reach of one user's listing"""
+    table = harness.aws.dynamodb.table(table_name)
+    sizes = sorted(item_size(item) for item in table.items.values())
+
+    harness.reset_measurements()
+    scan_params = {}
+    resource = boto3.resource('dynamodb').Table(table_name)
+    while True:
+        response = resource.scan(**scan_params)
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    scan_units = table.stats()['read_units']
+
+    # get_user_tasks reads one Scan page, which holds 1 MB of items whatever their size
+    harness.reset_measurements()
+    status, listing = harness.request('GET', '/tasks', claims_for(busiest))
+    assert status == 200, listing
+    return {
+        'mean_item_bytes': round(sum(sizes) / len(sizes), 1),
+        'p95_item_bytes': percentile(sizes, 95),
+        'max_item_bytes': sizes[-1],
+        'table_bytes': sum(sizes),
+        'write_units': sum(max(1, math.ceil(size / 1024)) for size in sizes),
+        'scan_read_units': round(scan_units, 1),
+        'listing_items_scanned': table.stats()['items_scanned'],
+        'listing_tasks_returned': len(listing)
+    }
+
+
+def run(size=DEFAULT_SIZE, seed=1, long_descriptions=DEFAULT_LONG_DESCRIPTIONS, harness=None):
+    harness = harness or Harness().start()
+    from maintenance import migrate_task_encoding
+
+    generator = datagen.TaskGenerator(seed, user_count=max(50, size // 500), long_description_rate=long_descriptions)
+    tasks = list(generator.tasks(size))
+    busiest = Counter(task['responsibility'] for task in tasks).most_common(1)[0][0]
+    table_name = harness.stack.ref('TasksTable')
+    with quiet():
+        datagen.load_tasks(harness.aws, tasks, table_name, compact=False)
+        legacy = _measure(harness, table_name, busiest)
+        migration = migrate_task_encoding.migrate(boto3.resource('dynamodb').Table(table_name))
+        compact = _measure(harness, table_name, busiest)
+    return {
+        'size': size,
+        'long_descriptions': long_descriptions,
+        'legacy': legacy,
+        'compact': compact,
+        'migration': migration,
+        'savings': {metric: round(1 - compact[metric] / legacy[metric], 3)
+                    for metric in ('mean_item_bytes', 'table_bytes', 'write_units', 'scan_read_units')}
+    }
+
+
+def format_report(report):
+    lines = [f"== {report['size']} tasks, {report['long_descriptions']:.0%} with long descriptions",
+             f"   {'':<26}{'legacy':>12}{'compact':>12}{'change':>8}"]
+    for metric in ('mean_item_bytes', 'p95_item_bytes', 'max_item_bytes', 'table_bytes', 'write_units',
+                   'scan_read_units', 'listing_items_scanned', 'listing_tasks_returned'):
+        legacy, compact = report['legacy'][metric], report['compact'][metric]
+        change = f"{compact / legacy - 1:+.0%}" if legacy else '-'
+        lines.append(f"   {metric:<26}{legacy:>12,}{compact:>12,}{change:>8}")
+    migration = report['migration']
+    lines.append(f"   migrated {migration['migrated']} of {migration['scanned']} items "
+                 f"({migration['skipped']} skipped, {migration['bytes_saved']} bytes saved)")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare TasksTable item size and scan cost across task encodings')
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--long-descriptions', type=float, default=DEFAULT_LONG_DESCRIPTIONS,
+                        help='share of tasks with a long description')
+    parser.add_argument('--json', metavar='PATH', help='also write the report as JSON')
+    args = parser.parse_args(argv)
+
+    report = run(args.size, args.seed, args.long_descriptions)
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Write throughput of the due index and the task counters under a sprint-end
+storm, unsharded and with their hot keys write-sharded.
+
+Every generated task is open and due on the same day, so each one writes the
+day's all-tasks due bucket and the all-tasks counter item. DynamoDB caps the
+write rate of a single partition key; the stand-in tables are given such a
+cap (--partition-wcu, scaled down from DynamoDB's 1,000 so a run is short),
+and parallel writers apply the tasks the way concurrent stream consumers
+would. Throttled calls are retried with botocore's backoff. After the writes,
+the day is read back with the scatter-gather reader and checked:
+
+    python -m loadtest.bench_hot_keys --tasks 2000 --shards 1,8 --partition-wcu 200
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from botocore.exceptions import ClientError
+
+from .harness import Harness, quiet
+
+DEFAULT_TASKS = 2000
+DEFAULT_SHARDS = (1, 8)
+DEFAULT_PARTITION_WCU = 200
+DEFAULT_WRITERS = 8
+DEFAULT_USERS = 200
+# Simulated DynamoDB round trip, which the parallel shard reads overlap
+DEFAULT_LATENCY_MS = 2.0
+
+
+def storm(size, users, now=None):
+    """Open tasks due within one hour of the same day, spread evenly over `users` assignees"""
+    now = now or datetime.now(timezone.utc)
+    sprint_end = (now + timedelta(days=1)).replace(hour=17, minute=0, second=0, microsecond=0)
+    return [{
+        'TaskId': f"storm-{index:06d}",
+        'name': f"Sprint task {index}",
+        'status': 'open',
+        'responsibility': f"user{index % users}@example.com",
+        'deadline': (sprint_end + timedelta(seconds=index * 3600 // size)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    } for index in range(size)]
+
+
+def _run(tasks, shards, partition_wcu, writers, latency_ms):
+    harness = Harness(latency={'dynamodb': latency_ms / 1000} if latency_ms else None).start()
+    import due_index
+    import task_counters
+
+    due_index.DUE_INDEX_SHARDS = shards
+    task_counters.TASK_COUNTER_SHARDS = shards
+    tables = {name: harness.aws.dynamodb.table(name) for name in ('DueTasksTable', 'TaskStatsTable')}
+    for table in tables.values():
+        table.limit_partition_writes(partition_wcu)
+
+    failed = []
+    lock = threading.Lock()
+
+    def apply(task):
+        for project in (due_index.apply_change,
+                        lambda old, new: task_counters.apply_change(old, new, new['TaskId'])):
+            try:
+                project(None, task)
+            except ClientError as e:
+                # Out of retries; a stream consumer would fail the batch and replay it
+                with lock:
+                    failed.append((task['TaskId'], e.response['Error']['Code']))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        list(pool.map(apply, tasks))
+    elapsed = time.perf_counter() - started
+
+    deadlines = [due_index.deadline_epoch(task['deadline']) for task in tasks]
+    read_started = time.perf_counter()
+    entries = due_index.query_due(min(deadlines), max(deadlines))
+    read_ms = (time.perf_counter() - read_started) * 1000
+    keys = [entry['DueKey'] for entry in entries]
+    return {
+        'shards': shards,
+        'elapsed_s': round(elapsed, 2),
+        'tasks_per_second': round(len(tasks) / elapsed, 1),
+        'throttled_due_writes': tables['DueTasksTable'].stats()['throttled_writes'],
+        'throttled_counter_writes': tables['TaskStatsTable'].stats()['throttled_writes'],
+        'failed_writes': len(failed),
+        'due_read_ms': round(read_ms, 1),
+        'due_entries_read': len(entries),
+        'due_read_in_order': keys == sorted(keys),
+        'open_count': task_counters.get_counts(task_counters.ALL_TASKS_KEY)['open']
+    }
+
+
+def run(size=DEFAULT_TASKS, shard_counts=DEFAULT_SHARDS, partition_wcu=DEFAULT_PARTITION_WCU,
+        writers=DEFAULT_WRITERS, users=DEFAULT_USERS, latency_ms=DEFAULT_LATENCY_MS):
+    tasks = storm(size, users)
+    with quiet():
+        runs = [_run(tasks, shards, partition_wcu, writers, latency_ms) for shards in shard_counts]
+    return {'tasks': size, 'partition_wcu': partition_wcu, 'writers': writers, 'users': users,
+            'latency_ms': latency_ms, 'runs': runs}
+
+
+def format_report(report):
+    lines = [f"== {report['tasks']} tasks due the same day, {report['writers']} writers, "
+             f"{report['partition_wcu']} WCU/s per partition key",
+             f"   {'shards':>6}{'tasks/s':>10}{'elapsed s':>11}{'throttled':>11}{'failed':>8}"
+             f"{'read ms':>9}{'read':>7}{'in order':>10}{'open':>7}"]
+    for run in report['runs']:
+        throttled = run['throttled_due_writes'] + run['throttled_counter_writes']
+        lines.append(f"   {run['shards']:>6}{run['tasks_per_second']:>10,}{run['elapsed_s']:>11}{throttled:>11,}"
+                     f"{run['failed_writes']:>8}{run['due_read_ms']:>9}{run['due_entries_read']:>7}"
+                     f"{str(run['due_read_in_order']):>10}{run['open_count']:>7}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare hot-key write throughput with and without write sharding')
+    parser.add_argument('--tasks', type=int, default=DEFAULT_TASKS)
+    parser.add_argument('--shards', default=','.join(map(str, DEFAULT_SHARDS)),
+                        help='comma separated shard counts to run, 1 being unsharded')
+    parser.add_argument('--partition-wcu', type=float, default=DEFAULT_PARTITION_WCU,
+                        help='write units per second one partition key accepts')
+    parser.add_argument('--writers', type=int, default=DEFAULT_WRITERS, help='concurrent stream consumers')
+    parser.add_argument('--users', type=int, default=DEFAULT_USERS)
+    parser.add_argument('--latency-ms', type=float, default=DEFAULT_LATENCY_MS,
+                        help='simulated DynamoDB round trip')
+    parser.add_argument('--json', metavar='PATH', help='also write the report as JSON')
+    args = parser.parse_args(argv)
+
+    report = run(args.tasks, [int(shards) for shards in args.shards.split(',')], args.partition_wcu,
+                 args.writers, args.users, args.latency_ms)
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
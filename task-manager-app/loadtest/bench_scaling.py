@@ -0,0 +1,203 @@
+"""
+Scaling benchmark for the task table.
+
+For each table size the stack is started fresh, filled with generated tasks
+and every read path is exercised a few times. The report shows read units
+consumed, items scanned versus returned and latency per endpoint, so the
+point where a handler stops scaling is visible and comparable across changes:
+
+    python -m loadtest.bench_scaling --sizes 10000,100000,1000000 --json scaling.json
+"""
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+
+from . import datagen
+from .harness import ADMIN_EMAIL, Harness, claims_for, percentile, quiet
+
+DEFAULT_SIZES = (10_000, 100_000)
+# Default EventBridge quota of rules per event bus; every open task with a deadline holds one
+EVENTBRIDGE_RULES_QUOTA = 300
+
+
+def _scenarios(harness, tasks, generator):
+    """(name, request builder) for every measured path"""
+    per_user = Counter(task['responsibility'] for task in tasks)
+    busiest = per_user.most_common(1)[0][0]
+    typical = sorted(per_user, key=per_user.get)[len(per_user) // 2]
+    admin = claims_for(ADMIN_EMAIL, admin=True)
+    pending = [task for task in tasks if task['status'] == 'open' and 'deadline' in task]
+
+    def api(method, path, claims, query=None, expected=None):
+        return lambda index: (('api', method, path, claims, None, query), expected)
+
+    def deadline_flow(module, rule_prefix, target_prefix):
+        def build(index):
+            task = pending[index % len(pending)]
+            # The rule that triggers this step exists in production, so create it up front
+            rule_name = f"{rule_prefix}-{task['TaskId']}"
+            harness.aws.events.put_rule(Name=rule_name, ScheduleExpression='rate(1 day)')
+            harness.aws.events.put_targets(Rule=rule_name, Targets=[{
+                'Id': f"{target_prefix}-{task['TaskId']}",
+                'Arn': harness.stack.get_att(harness.function_for(module), 'Arn')
+            }])
+            return ('lambda', module, {'taskId': task['TaskId'], 'assignee_email': task['responsibility']}), None
+        return build
+
+    scenarios = [
+        ('get_user_tasks (busiest user)', api('GET', '/tasks', claims_for(busiest), expected=per_user[busiest])),
+        ('get_user_tasks (typical user)', api('GET', '/tasks', claims_for(typical), expected=per_user[typical])),
+        ('get_all_tasks (first page)', api('GET', '/tasks/all', admin)),
+        ('get_all_tasks (status=open)', api('GET', '/tasks/all', admin, {'status': 'open', 'limit': '50'})),
+        ('get_task_stats', api('GET', '/tasks/stats', claims_for(busiest))),
+        ('get_due_tasks (7 days)', api('GET', '/tasks/due', claims_for(busiest), {'hours': '168'})),
+        ('search_tasks', api('GET', '/tasks/search', claims_for(busiest), {'q': generator.rng.choice(datagen.WORDS)}))
+    ]
+    if pending:
+        scenarios += [
+            ('deadline_warning', deadline_flow('deadline_warning', 'task-deadline', 'task-deadline-notification')),
+            ('deadline_check', deadline_flow('deadline_check', 'task-final-deadline', 'task-final-deadline'))
+        ]
+    return scenarios
+
+
+def _result_count(payload):
+    if isinstance(payload, list):
+        return len(payload)
+    if isinstance(payload, dict):
+        for key in ('items', 'tasks', 'results'):
+            if isinstance(payload.get(key), list):
+                return len(payload[key])
+    return None
+
+
+def _measure(harness, build, repeat):
+    harness.reset_measurements()
+    latencies, results, expected, statuses = [], [], None, Counter()
+    for index in range(repeat):
+        call, expected = build(index)
+        started = time.perf_counter()
+        if call[0] == 'api':
+            status, payload = harness.request(*call[1:])
+            statuses[status] += 1
+            results.append(_result_count(payload))
+        else:
+            try:
+                harness.invoke(harness.function_for(call[1]), call[2])
+                statuses['ok'] += 1
+            except Exception:
+                statuses['error'] += 1
+        latencies.append(time.perf_counter() - started)
+
+    tables = [table.stats() for table in harness.aws.dynamodb.tables.values()]
+    latencies.sort()
+    counted = [count for count in results if count is not None]
+    return {
+        'read_units': round(sum(table['read_units'] for table in tables) / repeat, 2),
+        'write_units': round(sum(table['write_units'] for table in tables) / repeat, 2),
+        'items_scanned': round(sum(table['items_scanned'] for table in tables) / repeat, 1),
+        'items_returned': round(sum(table['items_returned'] for table in tables) / repeat, 1),
+        'result_items': round(sum(counted) / len(counted), 1) if counted else None,
+        'expected_items': expected,
+        'aws_calls': round(sum(harness.aws.calls.values()) / repeat, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'statuses': {str(status): count for status, count in statuses.items()}
+    }
+
+
+def run_size(size, seed=1, repeat=5, user_count=None, harness=None):
+    """Benchmark every scenario against a freshly generated table of `size` tasks"""
+    harness = harness or Harness().start()
+    generator = datagen.TaskGenerator(seed, user_count=user_count or max(50, size // 500))
+    tasks = list(generator.tasks(size))
+    with quiet():
+        load_started = time.perf_counter()
+        datagen.load_tasks(harness.aws, tasks, harness.stack.ref('TasksTable'))
+        datagen.build_projections(harness.aws, tasks)
+        load_seconds = time.perf_counter() - load_started
+
+        endpoints = {name: _measure(harness, build, repeat) for name, build in _scenarios(harness, tasks, generator)}
+
+    statuses = Counter(task['status'] for task in tasks)
+    now = generator.now.strftime('%Y-%m-%dT%H:%M:%SZ')
+    return {
+        'size': size,
+        'users': len(generator.users),
+        'statuses': dict(statuses),
+        'deadline_rules': sum(1 for task in tasks if task['status'] == 'open' and task.get('deadline', '') > now),
+        'eventbridge_rules_quota': EVENTBRIDGE_RULES_QUOTA,
+        'load_seconds': round(load_seconds, 2),
+        'endpoints': endpoints
+    }
+
+
+def run(sizes=DEFAULT_SIZES, seed=1, repeat=5):
+    return {'seed': seed, 'repeat': repeat, 'results': [run_size(size, seed, repeat) for size in sizes]}
+
+
+def compare(report, baseline, tolerance=0.1):
+    """Flag endpoints whose read units or scanned items per request grew beyond the tolerance"""
+    previous = {result['size']: result['endpoints'] for result in baseline.get('results', [])}
+    regressions = []
+    for result in report['results']:
+        for name, current in result['endpoints'].items():
+            before = previous.get(result['size'], {}).get(name)
+            if not before:
+                continue
+            for metric in ('read_units', 'items_scanned'):
+                if current[metric] > before[metric] * (1 + tolerance) + 1e-9:
+                    regressions.append(f"{result['size']} tasks, {name}: {metric} {before[metric]} -> {current[metric]}")
+    return regressions
+
+
+def format_report(report):
+    lines = []
+    for result in report['results']:
+        lines.append(f"== {result['size']} tasks, {result['users']} users, {result['statuses']} "
+                     f"(loaded in {result['load_seconds']}s)")
+        rules = result['deadline_rules']
+        lines.append(f"   pending deadline rules: {rules} "
+                     f"({'over' if rules > result['eventbridge_rules_quota'] else 'within'} the default "
+                     f"{result['eventbridge_rules_quota']} rules per event bus)")
+        lines.append(f"   {'endpoint':<32}{'RCU':>10}{'scanned':>10}{'returned':>10}{'result':>9}{'expected':>10}"
+                     f"{'p50 ms':>10}{'p95 ms':>10}")
+        for name, stats in result['endpoints'].items():
+            result_items = '-' if stats['result_items'] is None else f"{stats['result_items']:g}"
+            expected_items = '-' if stats['expected_items'] is None else str(stats['expected_items'])
+            lines.append(f"   {name:<32}{stats['read_units']:>10.1f}{stats['items_scanned']:>10g}"
+                         f"{stats['items_returned']:>10g}{result_items:>9}{expected_items:>10}"
+                         f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}")
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sweep TasksTable size and report per-endpoint read cost')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='comma separated table sizes, e.g. 10000,100000,1000000')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5, help='requests per endpoint and size')
+    parser.add_argument('--json', metavar='PATH', help='also write the report as JSON')
+    parser.add_argument('--baseline', metavar='PATH', help='fail when read cost regresses against this JSON report')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    report = run([int(size) for size in args.sizes.split(',')], seed=args.seed, repeat=args.repeat)
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), tolerance=args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
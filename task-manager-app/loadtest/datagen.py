@@ -0,0 +1,147 @@
+"""
+Seeded generator of realistic TasksTable contents.
+
+Assignees follow a Zipf distribution (a few people own most tasks),
+statuses are mixed, and deadlines cluster around weekly sprint ends the
+way real planning does. The same seed always produces the same tasks.
+"""
+import itertools
+import random
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from .harness import WORDS
+from .standins import deserialize_item, serialize_item
+
+STATUS_MIX = {'open': 0.55, 'completed': 0.35, 'expired': 0.10}
+ZIPF_EXPONENT = 1.1
+# Share of tasks created without a deadline
+NO_DEADLINE_RATE = 0.1
+# Share of open tasks whose deadline passed but which the expiry flow has not reached yet
+OVERDUE_OPEN_RATE = 0.05
+# Deadlines cluster on sprint ends (Friday 17:00 UTC) with this spread
+CLUSTER_SPREAD_HOURS = 18
+# Word count of the long descriptions (pasted specs, meeting notes) a share of tasks carry
+LONG_DESCRIPTION_WORDS = (80, 400)
+
+
+class TaskGenerator:
+    def __init__(self, seed=1, user_count=200, zipf_exponent=ZIPF_EXPONENT, status_mix=STATUS_MIX,
+                 horizon_days=60, now=None, long_description_rate=0.0):
+        self.rng = random.Random(seed)
+        self.long_description_rate = long_description_rate
+        self.users = [f"user{number:05d}@example.com" for number in range(user_count)]
+        weights = (1 / rank ** zipf_exponent for rank in range(1, user_count + 1))
+        self._user_weights = list(itertools.accumulate(weights))
+        self.statuses = list(status_mix)
+        self._status_weights = list(itertools.accumulate(status_mix.values()))
+        self.now = (now or datetime.now(timezone.utc)).replace(second=0, microsecond=0)
+
+        start = self.now - timedelta(days=horizon_days)
+        friday = (start + timedelta(days=(4 - start.weekday()) % 7)).replace(hour=17, minute=0)
+        sprint_ends = [friday + timedelta(weeks=week) for week in range(horizon_days * 2 // 7 + 1)]
+        self.past_clusters = [end for end in sprint_ends if end < self.now] or [self.now - timedelta(days=1)]
+        self.future_clusters = [end for end in sprint_ends if end > self.now] or [self.now + timedelta(days=1)]
+
+    def user(self):
+        return self.rng.choices(self.users, cum_weights=self._user_weights)[0]
+
+    def deadline(self, past):
+        center = self.rng.choice(self.past_clusters if past else self.future_clusters)
+        deadline = center + timedelta(minutes=int(self.rng.gauss(0, CLUSTER_SPREAD_HOURS * 60)))
+        # Keep the spread from pushing a deadline across "now"
+        if past and deadline >= self.now:
+            deadline = self.now - timedelta(minutes=self.rng.randint(5, 600))
+        elif not past and deadline <= self.now:
+            deadline = self.now + timedelta(minutes=self.rng.randint(5, 600))
+        return deadline
+
+    def task(self):
+        rng = self.rng
+        status = rng.choices(self.statuses, cum_weights=self._status_weights)[0]
+        task = {
+            'TaskId': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'name': ' '.join(rng.sample(WORDS, rng.randint(2, 3))).title(),
+            'description': ' '.join(rng.choices(WORDS, k=rng.randint(6, 20))),
+            'responsibility': self.user(),
+            'status': status
+        }
+        # Checked first so that a zero rate draws nothing and older seeds keep their tasks
+        if self.long_description_rate and rng.random() < self.long_description_rate:
+            task['description'] = ' '.join(rng.choices(WORDS, k=rng.randint(*LONG_DESCRIPTION_WORDS)))
+        if rng.random() < 0.3:
+            task['comment'] = ' '.join(rng.choices(WORDS, k=rng.randint(2, 8)))
+
+        if rng.random() >= NO_DEADLINE_RATE or status == 'expired':
+            if status == 'expired':
+                past = True
+            elif status == 'open':
+                past = rng.random() < OVERDUE_OPEN_RATE
+            else:
+                past = rng.random() < 0.5
+            deadline = self.deadline(past)
+            task['deadline'] = deadline.strftime('%Y-%m-%dT%H:%M:%SZ')
+            if status == 'completed':
+                completed_at = min(deadline - timedelta(minutes=rng.randint(0, 3 * 24 * 60)), self.now)
+                task['completed_at'] = str(completed_at)
+        elif status == 'completed':
+            task['completed_at'] = str(self.now - timedelta(minutes=rng.randint(0, 30 * 24 * 60)))
+        return task
+
+    def tasks(self, count):
+        for _ in range(count):
+            yield self.task()
+
+
+def generate_tasks(count, seed=1, **options):
+    return list(TaskGenerator(seed, **options).tasks(count))
+
+
+def load_tasks(stand_ins, tasks, table_name='TasksTable', compact=True):
+    """
+    Store tasks straight into a stand-in table, without going through the API
+    or producing stream records. Items are stored the way the handlers write
+    them, or as the plain task dicts (the encoding before task_codec) when
+    `compact` is false. The handler modules must already be importable.
+    Returns the number of tasks stored.
+    """
+    import task_codec
+
+    table = stand_ins.dynamodb.table(table_name)
+    stored = 0
+    with table.lock:
+        for task in tasks:
+            table.store(task_codec.encode(task) if compact else dict(task))
+            stored += 1
+    return stored
+
+
+def build_projections(stand_ins, tasks):
+    """
+    Fill the derived tables (due index, search index, counters) that the
+    stream consumer would have built for `tasks`, using the same projection
+    functions offline. The handler modules must already be importable, e.g.
+    after Harness.start().
+    """
+    import due_index
+    import search_index
+    import task_counters
+
+    due_table = stand_ins.dynamodb.table(due_index.DUE_TASKS_TABLE_NAME)
+    search_table = stand_ins.dynamodb.table(search_index.TASK_SEARCH_TABLE_NAME)
+    stats_table = stand_ins.dynamodb.table(task_counters.TASK_STATS_TABLE_NAME)
+    counters = defaultdict(Counter)
+
+    for task in tasks:
+        for entry in due_index.entries_for(task):
+            # Round-trip through the DynamoDB types so numbers are stored as Decimal
+            due_table.store(deserialize_item(serialize_item(entry)))
+        for (shard, term_key), score in search_index.entries_for(task).items():
+            search_table.store({'Shard': shard, 'TermKey': term_key, 'TaskId': task['TaskId'], 'Score': Decimal(score)})
+        for counter_key, deltas in task_counters.counter_deltas(None, task).items():
+            counters[counter_key].update(deltas)
+
+    for counter_key, counts in counters.items():
+        stats_table.store({'CounterKey': counter_key, **{status: Decimal(count) for status, count in counts.items()}})
@@ -0,0 +1,432 @@
+"""
+Parser and evaluator for the DynamoDB expression language used by the
+stand-in tables: condition/filter/key-condition expressions, update
+expressions and projection expressions. Items are plain Python values as
+produced by boto3's TypeDeserializer.
+"""
+import re
+from decimal import Decimal
+from functools import lru_cache
+
+from boto3.dynamodb.types import Binary
+
+
+class ExpressionError(Exception):
+    """The expression is malformed or uses something the stand-in does not support"""
+
+
+MISSING = object()
+
+_TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<name>\#[A-Za-z0-9_]+)
+  | (?P<value>:[A-Za-z0-9_]+)
+  | (?P<number>\d+)
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op><>|<=|>=|=|<|>|\(|\)|,|\.|\[|\]|\+|-)
+""", re.VERBOSE)
+
+KEYWORDS = {'AND', 'OR', 'NOT', 'BETWEEN', 'IN', 'SET', 'REMOVE', 'ADD', 'DELETE'}
+COMPARATORS = {'=', '<>', '<', '<=', '>', '>='}
+
+
+def _tokenize(expression):
+    tokens = []
+    position = 0
+    while position < len(expression):
+        match = _TOKEN_PATTERN.match(expression, position)
+        if not match:
+            raise ExpressionError(f"Unexpected character at {position} in {expression!r}")
+        position = match.end()
+        kind = match.lastgroup
+        text = match.group()
+        if kind == 'space':
+            continue
+        if kind == 'ident' and text.upper() in KEYWORDS:
+            kind, text = 'keyword', text.upper()
+        tokens.append((kind, text))
+    tokens.append(('end', ''))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.position = 0
+
+    def peek(self, offset=0):
+        return self.tokens[self.position + offset]
+
+    def next(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def accept(self, kind, text=None):
+        token = self.peek()
+        if token[0] == kind and (text is None or token[1] == text):
+            self.position += 1
+            return token
+        return None
+
+    def expect(self, kind, text=None):
+        token = self.accept(kind, text)
+        if token is None:
+            raise ExpressionError(f"Expected {text or kind} but found {self.peek()[1]!r} in {self.expression!r}")
+        return token
+
+    def done(self):
+        if self.peek()[0] != 'end':
+            raise ExpressionError(f"Unexpected {self.peek()[1]!r} in {self.expression!r}")
+
+    # Paths and operands
+
+    def path(self):
+        token = self.next()
+        if token[0] not in ('name', 'ident'):
+            raise ExpressionError(f"Expected an attribute path but found {token[1]!r} in {self.expression!r}")
+        elements = [token]
+        while True:
+            if self.accept('op', '.'):
+                token = self.next()
+                if token[0] not in ('name', 'ident'):
+                    raise ExpressionError(f"Bad path in {self.expression!r}")
+                elements.append(token)
+            elif self.accept('op', '['):
+                elements.append(('index', int(self.expect('number')[1])))
+                self.expect('op', ']')
+            else:
+                return ('path', tuple(elements))
+
+    def operand(self):
+        token = self.peek()
+        if token[0] == 'value':
+            self.next()
+            return ('value', token[1])
+        if token[0] == 'ident' and self.peek(1) == ('op', '('):
+            function = self.next()[1]
+            self.expect('op', '(')
+            arguments = [self.operand()]
+            while self.accept('op', ','):
+                arguments.append(self.operand())
+            self.expect('op', ')')
+            return ('call', function, tuple(arguments))
+        return self.path()
+
+    # Conditions
+
+    def condition(self):
+        left = self.conjunction()
+        while self.accept('keyword', 'OR'):
+            left = ('or', left, self.conjunction())
+        return left
+
+    def conjunction(self):
+        left = self.negation()
+        while self.accept('keyword', 'AND'):
+            left = ('and', left, self.negation())
+        return left
+
+    def negation(self):
+        if self.accept('keyword', 'NOT'):
+            return ('not', self.negation())
+        return self.comparison()
+
+    def comparison(self):
+        if self.accept('op', '('):
+            inner = self.condition()
+            self.expect('op', ')')
+            return inner
+
+        left = self.operand()
+        token = self.peek()
+        if token[0] == 'op' and token[1] in COMPARATORS:
+            self.next()
+            return ('compare', token[1], left, self.operand())
+        if self.accept('keyword', 'BETWEEN'):
+            low = self.operand()
+            self.expect('keyword', 'AND')
+            return ('between', left, low, self.operand())
+        if self.accept('keyword', 'IN'):
+            self.expect('op', '(')
+            candidates = [self.operand()]
+            while self.accept('op', ','):
+                candidates.append(self.operand())
+            self.expect('op', ')')
+            return ('in', left, tuple(candidates))
+        if left[0] == 'call':
+            return ('function', left)
+        raise ExpressionError(f"Expected a comparison in {self.expression!r}")
+
+    # Update expressions
+
+    def update(self):
+        actions = []
+        while self.peek()[0] != 'end':
+            clause = self.expect('keyword')[1]
+            while True:
+                path = self.path()
+                if clause == 'SET':
+                    self.expect('op', '=')
+                    value = self.operand()
+                    if self.peek() in (('op', '+'), ('op', '-')):
+                        value = ('arith', self.next()[1], value, self.operand())
+                    actions.append(('SET', path, value))
+                elif clause == 'REMOVE':
+                    actions.append(('REMOVE', path, None))
+                elif clause in ('ADD', 'DELETE'):
+                    actions.append((clause, path, self.operand()))
+                else:
+                    raise ExpressionError(f"Unknown update clause {clause}")
+                if not self.accept('op', ','):
+                    break
+        return tuple(actions)
+
+    def projection(self):
+        paths = [self.path()]
+        while self.accept('op', ','):
+            paths.append(self.path())
+        self.done()
+        return tuple(paths)
+
+
+@lru_cache(maxsize=1024)
+def parse_condition(expression):
+    parser = _Parser(expression)
+    tree = parser.condition()
+    parser.done()
+    return tree
+
+
+@lru_cache(maxsize=1024)
+def parse_update(expression):
+    return _Parser(expression).update()
+
+
+@lru_cache(maxsize=1024)
+def parse_projection(expression):
+    return _Parser(expression).projection()
+
+
+class Context:
+    """Resolves #name and :value placeholders for one request"""
+
+    def __init__(self, names=None, values=None):
+        self.names = names or {}
+        self.values = values or {}
+
+    def name(self, token):
+        kind, text = token
+        if kind == 'name':
+            if text not in self.names:
+                raise ExpressionError(f"Missing ExpressionAttributeNames entry for {text}")
+            return self.names[text]
+        return text
+
+    def value(self, placeholder):
+        if placeholder not in self.values:
+            raise ExpressionError(f"Missing ExpressionAttributeValues entry for {placeholder}")
+        return self.values[placeholder]
+
+    def path_elements(self, path):
+        return [element[1] if element[0] == 'index' else self.name(element) for element in path[1]]
+
+
+def get_path(item, elements):
+    current = item
+    for element in elements:
+        if isinstance(element, int):
+            if not isinstance(current, list) or element >= len(current):
+                return MISSING
+        elif not isinstance(current, dict) or element not in current:
+            return MISSING
+        current = current[element]
+    return current
+
+
+def set_path(item, elements, value):
+    current = item
+    for element in elements[:-1]:
+        current = current[element]
+    last = elements[-1]
+    if isinstance(last, int) and last >= len(current):
+        current.append(value)
+    else:
+        current[last] = value
+
+
+def remove_path(item, elements):
+    parent = get_path(item, elements[:-1])
+    last = elements[-1]
+    if isinstance(parent, dict):
+        parent.pop(last, None)
+    elif isinstance(parent, list) and isinstance(last, int) and last < len(parent):
+        del parent[last]
+
+
+def type_code(value):
+    if isinstance(value, str):
+        return 'S'
+    if isinstance(value, bool):
+        return 'BOOL'
+    if isinstance(value, (int, float, Decimal)):
+        return 'N'
+    if isinstance(value, (bytes, bytearray, Binary)):
+        return 'B'
+    if value is None:
+        return 'NULL'
+    if isinstance(value, list):
+        return 'L'
+    if isinstance(value, dict):
+        return 'M'
+    if isinstance(value, set):
+        sample = next(iter(value))
+        return {'S': 'SS', 'N': 'NS', 'B': 'BS'}[type_code(sample)]
+    raise ExpressionError(f"Unsupported value type {type(value).__name__}")
+
+
+def _operand(node, item, context):
+    kind = node[0]
+    if kind == 'value':
+        return context.value(node[1])
+    if kind == 'path':
+        return get_path(item, context.path_elements(node))
+    if kind == 'call':
+        function, arguments = node[1], node[2]
+        if function == 'size':
+            value = _operand(arguments[0], item, context)
+            if value is MISSING or value is None or isinstance(value, (bool, Decimal, int)):
+                return MISSING
+            return Decimal(len(value.value if isinstance(value, Binary) else value))
+        if function == 'if_not_exists':
+            value = _operand(arguments[0], item, context)
+            return _operand(arguments[1], item, context) if value is MISSING else value
+        if function == 'list_append':
+            return list(_operand(arguments[0], item, context)) + list(_operand(arguments[1], item, context))
+    raise ExpressionError(f"Unsupported operand {node!r}")
+
+
+def _comparable(left, right):
+    if left is MISSING or right is MISSING:
+        return False
+    return type_code(left) == type_code(right) and type_code(left) in ('S', 'N', 'B')
+
+
+def _compare(operator, left, right):
+    if operator == '=':
+        return left is not MISSING and right is not MISSING and left == right
+    if operator == '<>':
+        return left is MISSING or right is MISSING or left != right
+    if not _comparable(left, right):
+        return False
+    if isinstance(left, Binary):
+        left, right = left.value, right.value
+    return {
+        '<': left < right, '<=': left <= right, '>': left > right, '>=': left >= right
+    }[operator]
+
+
+def evaluate_condition(tree, item, context):
+    kind = tree[0]
+    if kind == 'and':
+        return evaluate_condition(tree[1], item, context) and evaluate_condition(tree[2], item, context)
+    if kind == 'or':
+        return evaluate_condition(tree[1], item, context) or evaluate_condition(tree[2], item, context)
+    if kind == 'not':
+        return not evaluate_condition(tree[1], item, context)
+    if kind == 'compare':
+        return _compare(tree[1], _operand(tree[2], item, context), _operand(tree[3], item, context))
+    if kind == 'between':
+        value = _operand(tree[1], item, context)
+        return _compare('>=', value, _operand(tree[2], item, context)) and _compare('<=', value, _operand(tree[3], item, context))
+    if kind == 'in':
+        value = _operand(tree[1], item, context)
+        return any(_compare('=', value, _operand(candidate, item, context)) for candidate in tree[2])
+    if kind == 'function':
+        function, arguments = tree[1][1], tree[1][2]
+        if function == 'attribute_exists':
+            return _operand(arguments[0], item, context) is not MISSING
+        if function == 'attribute_not_exists':
+            return _operand(arguments[0], item, context) is MISSING
+        if function == 'attribute_type':
+            value = _operand(arguments[0], item, context)
+            return value is not MISSING and type_code(value) == _operand(arguments[1], item, context)
+        if function == 'begins_with':
+            value, prefix = _operand(arguments[0], item, context), _operand(arguments[1], item, context)
+            return _comparable(value, prefix) and not isinstance(value, Decimal) and value.startswith(prefix)
+        if function == 'contains':
+            value, needle = _operand(arguments[0], item, context), _operand(arguments[1], item, context)
+            if isinstance(value, str):
+                return isinstance(needle, str) and needle in value
+            if isinstance(value, (set, list)):
+                return needle in value
+            return False
+    raise ExpressionError(f"Unsupported condition {tree!r}")
+
+
+def matches(expression, item, names=None, values=None):
+    """True when `item` satisfies the condition expression (an absent expression always matches)"""
+    if not expression:
+        return True
+    return evaluate_condition(parse_condition(expression), item or {}, Context(names, values))
+
+
+def apply_update(expression, item, names=None, values=None):
+    """Apply an update expression to `item` in place"""
+    context = Context(names, values)
+    for action, path, operand in parse_update(expression):
+        elements = context.path_elements(path)
+        if action == 'SET':
+            if operand[0] == 'arith':
+                left, right = _operand(operand[2], item, context), _operand(operand[3], item, context)
+                if left is MISSING or right is MISSING:
+                    raise ExpressionError('An operand in the update expression has an incorrect data type')
+                value = left + right if operand[1] == '+' else left - right
+            else:
+                value = _operand(operand, item, context)
+            if value is MISSING:
+                raise ExpressionError('The provided expression refers to an attribute that does not exist in the item')
+            set_path(item, elements, value)
+        elif action == 'REMOVE':
+            remove_path(item, elements)
+        elif action == 'ADD':
+            value = _operand(operand, item, context)
+            current = get_path(item, elements)
+            if current is MISSING:
+                set_path(item, elements, value)
+            elif isinstance(current, set):
+                current |= value
+            else:
+                set_path(item, elements, current + value)
+        elif action == 'DELETE':
+            current = get_path(item, elements)
+            if isinstance(current, set):
+                current -= _operand(operand, item, context)
+                if not current:
+                    remove_path(item, elements)
+    return item
+
+
+def project(expression, item, names=None):
+    """Return a copy of `item` holding only the attributes named in a projection expression"""
+    if not expression:
+        return item
+    context = Context(names)
+    result = {}
+    for path in parse_projection(expression):
+        elements = context.path_elements(path)
+        value = get_path(item, elements)
+        if value is MISSING:
+            continue
+        # Only top-level and nested map paths are projected; list indexes keep the whole list
+        target = result
+        for element in elements[:-1]:
+            if isinstance(element, int):
+                break
+            target = target.setdefault(element, {})
+        else:
+            target[elements[-1]] = value
+            continue
+        result[elements[0]] = item[elements[0]]
+    return result
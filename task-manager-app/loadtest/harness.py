@@ -0,0 +1,889 @@
+"""
+Runs the real Lambda handlers in-process against the AWS stand-ins.
+
+The stack is read from template.yaml: DynamoDB tables, environment variables,
+API routes, stream and queue event sources and the state machine are all
+wired up from the template, so new functions take part without harness
+changes. API traffic is replayed as API Gateway proxy events built from
+events/event.json.
+"""
+import base64
+import contextlib
+import copy
+import fnmatch
+import gzip
+import importlib
+import io
+import json
+import logging
+import math
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import yaml
+
+from .standins import ACCOUNT_ID, REGION, AwsStandIns, StateMachineRunner
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE_PATH = os.path.join(ROOT, 'template.yaml')
+EVENT_TEMPLATE_PATH = os.path.join(ROOT, 'events', 'event.json')
+USER_POOL_ID = f"{REGION}_StandIn"
+ADMIN_EMAIL = 'admin@loadtest.local'
+
+
+# Template
+
+class _TemplateLoader(yaml.SafeLoader):
+    """YAML loader that keeps CloudFormation short-form intrinsics (!Ref, !GetAtt, ...)"""
+
+
+def _construct_intrinsic(loader, suffix, node):
+    if isinstance(node, yaml.ScalarNode):
+        value = loader.construct_scalar(node)
+    elif isinstance(node, yaml.SequenceNode):
+        value = loader.construct_sequence(node, deep=True)
+    else:
+        value = loader.construct_mapping(node, deep=True)
+    return {'Ref' if suffix == 'Ref' else f"Fn::{suffix}": value}
+
+
+_TemplateLoader.add_multi_constructor('!', _construct_intrinsic)
+
+
+def load_template(path=TEMPLATE_PATH):
+    with open(path) as f:
+        return yaml.load(f, Loader=_TemplateLoader)
+
+
+class Stack:
+    """Resolves template references to the names and ARNs the stand-ins use"""
+
+    def __init__(self, template, parameters=None):
+        self.template = template
+        self.parameters = template.get('Parameters', {})
+        self.parameter_values = {name: str(value) for name, value in (parameters or {}).items()}
+        unknown = set(self.parameter_values) - set(self.parameters)
+        if unknown:
+            raise ValueError(f"Unknown template parameters: {', '.join(sorted(unknown))}")
+        self.conditions = template.get('Conditions', {})
+        # Resources whose condition is false are not created, as in CloudFormation
+        self.resources = {name: resource for name, resource in template.get('Resources', {}).items()
+                          if 'Condition' not in resource or self.condition(resource['Condition'])}
+
+    def condition(self, name):
+        return self._evaluate(self.conditions[name])
+
+    def _evaluate(self, value):
+        if 'Condition' in value:
+            return self.condition(value['Condition'])
+        if 'Fn::Equals' in value:
+            left, right = value['Fn::Equals']
+            return str(self.resolve(left)) == str(self.resolve(right))
+        if 'Fn::Not' in value:
+            return not self._evaluate(value['Fn::Not'][0])
+        if 'Fn::And' in value:
+            return all(self._evaluate(element) for element in value['Fn::And'])
+        if 'Fn::Or' in value:
+            return any(self._evaluate(element) for element in value['Fn::Or'])
+        raise ValueError(f"Unsupported condition {value}")
+
+    def of_type(self, resource_type):
+        return {name: resource for name, resource in self.resources.items() if resource['Type'] == resource_type}
+
+    def ref(self, logical_id):
+        if logical_id == 'AWS::AccountId':
+            return ACCOUNT_ID
+        if logical_id == 'AWS::Region':
+            return REGION
+        if logical_id in self.parameters:
+            return self.parameter_values.get(logical_id, str(self.parameters[logical_id].get('Default', '')))
+        resource = self.resources[logical_id]
+        properties = resource.get('Properties', {})
+        resource_type = resource['Type']
+        if resource_type == 'AWS::DynamoDB::Table':
+            return properties.get('TableName', logical_id)
+        if resource_type == 'AWS::SNS::Topic':
+            return f"arn:aws:sns:{REGION}:{ACCOUNT_ID}:{properties.get('TopicName', logical_id)}"
+        if resource_type == 'AWS::SQS::Queue':
+            return f"https://sqs.{REGION}.amazonaws.com/{ACCOUNT_ID}/{properties.get('QueueName', logical_id)}"
+        if resource_type == 'AWS::Serverless::StateMachine':
+            return f"arn:aws:states:{REGION}:{ACCOUNT_ID}:stateMachine:{logical_id}"
+        if resource_type == 'AWS::Cognito::UserPool':
+            return USER_POOL_ID
+        if resource_type == 'AWS::S3::Bucket':
+            return properties.get('BucketName', logical_id.lower())
+        return logical_id
+
+    def get_att(self, logical_id, attribute):
+        resource = self.resources[logical_id]
+        properties = resource.get('Properties', {})
+        resource_type = resource['Type']
+        if resource_type == 'AWS::DynamoDB::Table':
+            arn = f"arn:aws:dynamodb:{REGION}:{ACCOUNT_ID}:table/{self.ref(logical_id)}"
+            return f"{arn}/stream/local" if attribute == 'StreamArn' else arn
+        if resource_type == 'AWS::SNS::Topic':
+            return properties.get('TopicName', logical_id) if attribute == 'TopicName' else self.ref(logical_id)
+        if resource_type == 'AWS::SQS::Queue':
+            queue_name = properties.get('QueueName', logical_id)
+            return {'QueueName': queue_name, 'QueueUrl': self.ref(logical_id)}.get(
+                attribute, f"arn:aws:sqs:{REGION}:{ACCOUNT_ID}:{queue_name}")
+        if resource_type == 'AWS::Serverless::Function':
+            return f"arn:aws:lambda:{REGION}:{ACCOUNT_ID}:function:{logical_id}"
+        if resource_type == 'AWS::Serverless::StateMachine':
+            return logical_id if attribute == 'Name' else self.ref(logical_id)
+        if resource_type == 'AWS::Cognito::UserPool':
+            return f"arn:aws:cognito-idp:{REGION}:{ACCOUNT_ID}:userpool/{USER_POOL_ID}"
+        if resource_type == 'AWS::S3::Bucket':
+            return f"arn:aws:s3:::{self.ref(logical_id)}"
+        return f"arn:aws:iam::{ACCOUNT_ID}:role/{logical_id}"
+
+    def resolve(self, value):
+        if isinstance(value, list):
+            return [self.resolve(element) for element in value]
+        if not isinstance(value, dict):
+            return value
+        if 'Ref' in value:
+            return self.ref(value['Ref'])
+        if 'Fn::GetAtt' in value:
+            target = value['Fn::GetAtt']
+            logical_id, attribute = target.split('.', 1) if isinstance(target, str) else target
+            return self.get_att(logical_id, attribute)
+        if 'Fn::Sub' in value:
+            text = value['Fn::Sub']
+            for name in self.resources:
+                text = text.replace(f"${{{name}}}", str(self.ref(name)))
+            return text.replace('${AWS::Region}', REGION).replace('${AWS::AccountId}', ACCOUNT_ID) \
+                .replace('${AWS::Partition}', 'aws')
+        return {key: self.resolve(element) for key, element in value.items()}
+
+    def logical_id_for(self, value):
+        """Logical ID of the resource a !Ref/!GetAtt points at"""
+        if 'Ref' in value:
+            return value['Ref']
+        target = value['Fn::GetAtt']
+        return (target.split('.', 1) if isinstance(target, str) else target)[0]
+
+    def environment(self):
+        """Union of the Globals and every function's environment variables"""
+        variables = dict(self.template.get('Globals', {}).get('Function', {}).get('Environment', {}).get('Variables', {}))
+        for resource in self.of_type('AWS::Serverless::Function').values():
+            variables.update(resource['Properties'].get('Environment', {}).get('Variables', {}))
+        return {name: str(self.resolve(value)) for name, value in variables.items()}
+
+    def layer_paths(self, layers):
+        """Import paths of the given layers (a Python layer's code lives under python/)"""
+        return [os.path.join(ROOT, self.resources[self.logical_id_for(layer)]['Properties']['ContentUri'], 'python')
+                for layer in layers]
+
+    def functions(self):
+        """{logical id: {'module', 'handler', 'code_uri', 'layer_paths', 'events'}} for every function"""
+        global_layers = self.template.get('Globals', {}).get('Function', {}).get('Layers', [])
+        functions = {}
+        for logical_id, resource in self.of_type('AWS::Serverless::Function').items():
+            properties = resource['Properties']
+            module, handler = properties['Handler'].rsplit('.', 1)
+            functions[logical_id] = {
+                'module': module,
+                'handler': handler,
+                'code_uri': os.path.join(ROOT, properties['CodeUri']),
+                'layer_paths': self.layer_paths(global_layers + properties.get('Layers', [])),
+                'events': properties.get('Events', {})
+            }
+        return functions
+
+
+# Invocation
+
+class LambdaContext:
+    def __init__(self, function_name):
+        self.function_name = function_name
+        self.aws_request_id = str(uuid.uuid4())
+        self.memory_limit_in_mb = 128
+        self.invoked_function_arn = f"arn:aws:lambda:{REGION}:{ACCOUNT_ID}:function:{function_name}"
+
+    def get_remaining_time_in_millis(self):
+        return 30000
+
+
+class HandlerStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.client_errors = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds, error=False, client_error=False):
+        with self.lock:
+            self.latencies.append(seconds)
+            self.errors += int(error)
+            self.client_errors += int(client_error)
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def decode_body(response):
+    """Response body as text, undoing base64 and content encoding"""
+    body = response.get('body')
+    if not body or not response.get('isBase64Encoded'):
+        return body
+    data = base64.b64decode(body)
+    encoding = (response.get('headers') or {}).get('Content-Encoding')
+    if encoding == 'gzip':
+        data = gzip.decompress(data)
+    elif encoding == 'br':
+        import brotli
+        data = brotli.decompress(data)
+    return data.decode()
+
+
+def _match_resource(resource, segments):
+    """Path parameters when the path `segments` fall under an API resource template, else None"""
+    pattern = resource.strip('/').split('/')
+    parameters = {}
+    for index, expected in enumerate(pattern):
+        if index >= len(segments):
+            return None
+        if expected.startswith('{') and expected.endswith('+}'):
+            parameters[expected[1:-2]] = '/'.join(segments[index:])
+            return parameters if segments[index] else None
+        if expected.startswith('{') and expected.endswith('}'):
+            parameters[expected[1:-1]] = segments[index]
+        elif expected != segments[index]:
+            return None
+    return parameters if len(pattern) == len(segments) else None
+
+
+def _matches_pattern(pattern, value):
+    """Lambda event filtering for the exact-value patterns the template uses ({"field": [allowed values]})"""
+    if isinstance(pattern, dict):
+        return isinstance(value, dict) and all(key in value and _matches_pattern(expected, value[key])
+                                               for key, expected in pattern.items())
+    return value in pattern
+
+
+def claims_for(email, admin=False, team=None):
+    claims = {
+        'email': email,
+        'cognito:username': email.split('@')[0],
+        'cognito:groups': 'admin' if admin else 'regular'
+    }
+    if team:
+        claims['custom:team'] = team
+    return claims
+
+
+class Harness:
+    """
+    One in-process copy of the stack. Use start() once, then drive it with
+    request(), settle() and fire_schedules(), or run() for a load test.
+    """
+
+    def __init__(self, template_path=TEMPLATE_PATH, latency=None, stand_ins=None, parameters=None):
+        self.stack = Stack(load_template(template_path), parameters)
+        self.aws = stand_ins or AwsStandIns(latency)
+        self.functions = self.stack.functions()
+        self.handlers = {}
+        self.modules = {}
+        self.routes = {}
+        self.function_names = {}
+        self.stats = defaultdict(HandlerStats)
+        with open(EVENT_TEMPLATE_PATH) as f:
+            self.event_template = json.load(f)
+        # Request bodies of these types reach the functions base64-encoded, as API Gateway does it
+        self.binary_media_types = [
+            media_type.replace('~1', '/')
+            for api in self.stack.of_type('AWS::Serverless::Api').values()
+            for media_type in api['Properties'].get('BinaryMediaTypes', [])
+        ]
+
+    def start(self):
+        os.environ.update({
+            'AWS_ACCESS_KEY_ID': 'standin',
+            'AWS_SECRET_ACCESS_KEY': 'standin',
+            'AWS_DEFAULT_REGION': REGION,
+            'AWS_REGION': REGION,
+            'AWS_EC2_METADATA_DISABLED': 'true'
+        })
+        os.environ.update(self.stack.environment())
+        self.aws.install(REGION)
+
+        for properties in self.stack.of_type('AWS::DynamoDB::Table').values():
+            self.aws.dynamodb.create_table(**self.stack.resolve(properties['Properties']))
+        for logical_id in self.stack.of_type('AWS::S3::Bucket'):
+            self.aws.s3.create_bucket(Bucket=self.stack.ref(logical_id))
+
+        self._import_handlers()
+        for logical_id, function in self.functions.items():
+            self.routes.update({
+                (event['Properties']['Method'].upper(), event['Properties']['Path']): logical_id
+                for event in function['events'].values() if event['Type'] == 'Api'
+            })
+            # Functions are invoked by name or ARN (EventBridge targets, lambda.invoke)
+            for name in (logical_id, self.stack.get_att(logical_id, 'Arn')):
+                self.function_names[name] = logical_id
+                self.aws.lambda_.register_function(name, self._invoker(logical_id))
+
+        for logical_id, resource in self.stack.of_type('AWS::Lambda::Permission').items():
+            properties = self.stack.resolve(resource['Properties'])
+            self.aws.lambda_.add_permission(StatementId=logical_id, **properties)
+
+        for logical_id, resource in self.stack.of_type('AWS::Serverless::StateMachine').items():
+            self._register_state_machine(logical_id, resource['Properties'])
+        return self
+
+    def _import_handlers(self):
+        # Handler modules create their clients at import time, so they must be
+        # (re)imported after the stand-ins are installed
+        modules = set()
+        paths = {path for function in self.functions.values() for path in [function['code_uri']] + function['layer_paths']}
+        for path in paths:
+            if path not in sys.path:
+                sys.path.insert(0, path)
+            modules.update(name[:-3] for name in os.listdir(path) if name.endswith('.py'))
+        for name in modules:
+            sys.modules.pop(name, None)
+        for logical_id, function in self.functions.items():
+            module = importlib.import_module(function['module'])
+            self.modules[logical_id] = module
+            self.handlers[logical_id] = getattr(module, function['handler'])
+            # A router imports its route modules lazily; make sure that happens against the stand-ins too
+            for name in set(getattr(module, 'ROUTES', {}).values()):
+                sys.modules.pop(name, None)
+        tracing = sys.modules.get('tracing')
+        if tracing is not None:
+            tracing.set_exporter(self.aws.collector.export)
+
+    def _register_state_machine(self, logical_id, properties):
+        with open(os.path.join(ROOT, properties['DefinitionUri'])) as f:
+            text = f.read()
+        for name, value in properties.get('DefinitionSubstitutions', {}).items():
+            text = text.replace(f"${{{name}}}", str(self.stack.resolve(value)))
+        runner = StateMachineRunner(json.loads(text), self.aws, label=logical_id)
+
+        def traced_runner(state_input):
+            # Executions run no Lambda code, so the harness records their span
+            tracing = sys.modules.get('tracing')
+            if tracing is None:
+                return runner(state_input)
+            with tracing.span(logical_id, remote=tracing.extract(state_input), kind='consumer',
+                              **{'faas.module': logical_id}):
+                return runner(state_input)
+
+        def timed_runner(state_input):
+            started = time.perf_counter()
+            try:
+                output = traced_runner(state_input)
+            except Exception:
+                self.stats[logical_id].record(time.perf_counter() - started, error=True)
+                raise
+            self.stats[logical_id].record(time.perf_counter() - started)
+            return output
+
+        self.aws.stepfunctions.register_state_machine(self.stack.ref(logical_id), timed_runner)
+
+    def _invoker(self, logical_id):
+        return lambda payload, context=None: self.invoke(logical_id, payload)
+
+    def function_for(self, module):
+        """Logical ID of the function whose handler lives in `module`"""
+        return next(logical_id for logical_id, function in self.functions.items() if function['module'] == module)
+
+    def label_for(self, logical_id):
+        return self.functions[logical_id]['module']
+
+    def _router_routes(self, logical_id):
+        """The ROUTES table of a function that routes API requests itself (ApiMode=router), else None"""
+        return getattr(self.modules.get(logical_id), 'ROUTES', None)
+
+    def api_labels(self):
+        """Labels API requests are recorded under: the module serving each route"""
+        labels = set()
+        for logical_id in set(self.routes.values()):
+            routes = self._router_routes(logical_id)
+            labels.update(routes.values() if routes else [self.label_for(logical_id)])
+        return labels
+
+    def route(self, method, path):
+        """
+        (logical id, resource, path parameters) of the Api event serving the
+        request, preferring literal paths over {name} and {proxy+} templates and
+        explicit methods over ANY, as API Gateway does
+        """
+        segments = path.strip('/').split('/')
+        candidates = []
+        for (route_method, resource), logical_id in self.routes.items():
+            if route_method not in (method, 'ANY'):
+                continue
+            parameters = _match_resource(resource, segments)
+            if parameters is not None:
+                precedence = (resource.endswith('+}'), len(parameters), route_method == 'ANY')
+                candidates.append((precedence, logical_id, resource, parameters or None))
+        if not candidates:
+            raise KeyError(f"No route for {method} {path}")
+        _, logical_id, resource, parameters = min(candidates, key=lambda candidate: candidate[0])
+        return logical_id, resource, parameters
+
+    def invoke(self, logical_id, event, label=None):
+        """Run one handler invocation, recording its latency and AWS calls under `label` (default: its module name)"""
+        label = label or self.label_for(logical_id)
+        previous_label = self.aws.current_label()
+        self.aws.set_label(label)
+        started = time.perf_counter()
+        result, error = None, None
+        try:
+            result = self.handlers[logical_id](event, LambdaContext(logical_id))
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.aws.set_label(previous_label)
+            status = result.get('statusCode', 200) if isinstance(result, dict) else 200
+            failures = result.get('batchItemFailures') if isinstance(result, dict) else None
+            self.stats[label].record(elapsed, error=bool(error or status >= 500 or failures),
+                                     client_error=400 <= status < 500)
+
+    # API Gateway
+
+    def api_event(self, method, path, claims, body=None, query=None, headers=None, resource=None, path_parameters=None):
+        event = copy.deepcopy(self.event_template)
+        event.update({
+            'httpMethod': method,
+            'path': path,
+            'resource': resource or path,
+            'body': json.dumps(body) if body is not None else None,
+            'queryStringParameters': query or None,
+            'pathParameters': path_parameters
+        })
+        if body is not None:
+            event['headers']['Content-Type'] = 'application/json'
+        event['headers'].update(headers or {})
+        content_type = event['headers'].get('Content-Type', '')
+        if body is not None and any(fnmatch.fnmatch(content_type, pattern) for pattern in self.binary_media_types):
+            event['body'] = base64.b64encode(event['body'].encode()).decode()
+            event['isBase64Encoded'] = True
+        event['requestContext'].update({
+            'requestId': str(uuid.uuid4()),
+            'requestTimeEpoch': int(time.time() * 1000),
+            'httpMethod': method,
+            'path': f"/{event['requestContext']['stage']}{path}",
+            'resourcePath': resource or path,
+            'authorizer': {'claims': claims}
+        })
+        return event
+
+    def request(self, method, path, claims, body=None, query=None, headers=None):
+        """Send one API request; returns (status code, decoded body)"""
+        logical_id, resource, parameters = self.route(method, path)
+        event = self.api_event(method, path, claims, body, query, headers, resource, parameters)
+        label = None
+        if self._router_routes(logical_id) is not None:
+            # Record routed requests under the module that serves them, so both layouts report alike
+            matched = self.modules[logical_id].match(method, path)
+            label = matched[0] if matched else None
+        response = self.invoke(logical_id, event, label)
+        payload = decode_body(response)
+        try:
+            payload = json.loads(payload) if payload else None
+        except ValueError:
+            pass
+        return response['statusCode'], payload
+
+    # Asynchronous flows
+
+    def _event_sources(self, event_type):
+        for logical_id, function in self.functions.items():
+            for event in function['events'].values():
+                if event['Type'] == event_type:
+                    yield logical_id, event['Properties']
+
+    def pump_streams(self):
+        """
+        Deliver pending DynamoDB stream records to every consumer of the stream,
+        applying each event source's FilterCriteria; returns the record count
+        """
+        delivered = 0
+        consumers = defaultdict(list)
+        for logical_id, properties in self._event_sources('DynamoDB'):
+            consumers[self.stack.ref(self.stack.logical_id_for(properties['Stream']))].append((logical_id, properties))
+        for table_name, table_consumers in consumers.items():
+            records = self.aws.dynamodb.drain_stream(table_name)
+            for logical_id, properties in table_consumers:
+                delivered += self._deliver_stream(logical_id, properties, records)
+        return delivered
+
+    def _deliver_stream(self, logical_id, properties, records):
+        filters = [json.loads(entry['Pattern']) for entry in properties.get('FilterCriteria', {}).get('Filters', [])]
+        if filters:
+            records = [record for record in records if any(_matches_pattern(pattern, record) for pattern in filters)]
+        delivered = 0
+        batch_size = properties.get('BatchSize', 100)
+        # -1 retries until the records expire from the stream; a few rounds stand in for that here
+        retries = properties.get('MaximumRetryAttempts', 0)
+        retries = 10 if retries < 0 else retries
+        while records:
+            batch, records = records[:batch_size], records[batch_size:]
+            delivered += len(batch)
+            result = self.invoke(logical_id, {'Records': batch}) or {}
+            failures = result.get('batchItemFailures') or []
+            if failures and retries > 0:
+                # Lambda resumes from the first failed record
+                retries -= 1
+                failed = failures[0]['itemIdentifier']
+                position = next(i for i, record in enumerate(batch) if record['dynamodb']['SequenceNumber'] == failed)
+                records = batch[position:] + records
+        return delivered
+
+    def expire_items(self, now=None):
+        """Let DynamoDB TTL remove the items whose time has come, then deliver the resulting stream records"""
+        removed = self.aws.dynamodb.expire_items(now)
+        self.settle()
+        return removed
+
+    def drain_queues(self):
+        """Deliver queued SQS messages to their consumers; returns the message count"""
+        delivered = 0
+        for logical_id, properties in self._event_sources('SQS'):
+            queue_id = self.stack.logical_id_for(properties['Queue'])
+            messages = self.aws.sqs.drain(self.stack.ref(queue_id))
+            batch_size = properties.get('BatchSize', 10)
+            for start in range(0, len(messages), batch_size):
+                records = [{
+                    'messageId': message['MessageId'],
+                    'receiptHandle': message['MessageId'],
+                    'body': message['Body'],
+                    'attributes': dict(message['Attributes']),
+                    'messageAttributes': message['MessageAttributes'],
+                    'eventSource': 'aws:sqs',
+                    'eventSourceARN': self.stack.get_att(queue_id, 'Arn'),
+                    'awsRegion': REGION
+                } for message in messages[start:start + batch_size]]
+                delivered += len(records)
+                with contextlib.suppress(Exception):
+                    self.invoke(logical_id, {'Records': records})
+        return delivered
+
+    def drain_async_invocations(self):
+        invocations = self.aws.lambda_.drain_async()
+        for function_name, payload in invocations:
+            with contextlib.suppress(Exception):
+                self.invoke(self.function_names[function_name], payload)
+        return len(invocations)
+
+    def settle(self, max_rounds=20):
+        """Run stream, queue and async deliveries until nothing is pending"""
+        for _ in range(max_rounds):
+            if not (self.pump_streams() + self.drain_queues() + self.drain_async_invocations()):
+                return
+
+    def fire_schedules(self, rounds=1):
+        """
+        Fast-forward time: invoke the target of every scheduled EventBridge rule
+        that exists at the start of each round, then settle. As in EventBridge,
+        a function is only invoked when its resource policy allows the rule.
+        """
+        fired = 0
+        for _ in range(rounds):
+            with self.aws.events.lock:
+                targets = [(rule['Arn'], target) for rule in self.aws.events.rules.values()
+                           for target in rule['Targets'].values()]
+            for rule_arn, target in targets:
+                logical_id = self.function_names.get(target['Arn'])
+                if logical_id is None or not any(self.aws.lambda_.allows(name, 'events.amazonaws.com', rule_arn)
+                                                 for name in (logical_id, target['Arn'])):
+                    continue
+                fired += 1
+                with contextlib.suppress(Exception):
+                    self.invoke(logical_id, json.loads(target.get('Input') or '{}'))
+            self.settle()
+        return fired
+
+    # Reporting
+
+    def reset_measurements(self):
+        self.stats.clear()
+        self.aws.reset_calls()
+        self.aws.dynamodb.reset_metrics()
+        self.aws.collector.reset()
+
+    def report(self, elapsed):
+        handlers = {}
+        labels = set(self.stats) | {label for label, _, _ in list(self.aws.calls)}
+        for label in sorted(labels):
+            stats = self.stats[label]
+            latencies = sorted(stats.latencies)
+            invocations = len(latencies)
+            calls = self.aws.calls_for(label)
+            total_calls = sum(calls.values())
+            handlers[label] = {
+                'invocations': invocations,
+                'errors': stats.errors,
+                'client_errors': stats.client_errors,
+                'throughput_rps': round(invocations / elapsed, 2) if elapsed else 0.0,
+                'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+                'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+                'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+                'max_ms': round((latencies[-1] if latencies else 0.0) * 1000, 3),
+                'aws_calls': total_calls,
+                'aws_calls_per_invocation': round(total_calls / invocations, 3) if invocations else float(total_calls),
+                'aws_calls_by_operation': {f"{service}.{operation}": count for (service, operation), count in sorted(calls.items())},
+                'aws_throttles': sum(self.aws.throttled_for(label).values())
+            }
+        from . import traces
+        return {
+            'elapsed_seconds': round(elapsed, 3),
+            'handlers': handlers,
+            'tables': {name: table.stats() for name, table in sorted(self.aws.dynamodb.tables.items())},
+            'traces': traces.analyze(self.aws.collector.spans)
+        }
+
+
+# Load generation
+
+WORDS = ['report', 'invoice', 'review', 'deploy', 'customer', 'budget', 'design', 'migration', 'backup',
+         'audit', 'release', 'onboarding', 'security', 'database', 'meeting', 'roadmap', 'training', 'survey']
+
+# Relative weights of each handler in the default request mix
+DEFAULT_MIX = {
+    'assign_task': 20,
+    'get_user_tasks': 15,
+    'get_all_tasks': 8,
+    'get_task': 6,
+    'get_task_history': 3,
+    'edit_task': 15,
+    'delete_task': 4,
+    'get_task_stats': 8,
+    'get_due_tasks': 6,
+    'search_tasks': 8,
+    'get_task_changes': 8,
+    'get_archived_tasks': 2,
+    'get_all_users': 4,
+    'add_user': 2
+}
+
+
+class Workload:
+    """Builds plausible API requests against the tasks and users created so far"""
+
+    def __init__(self, users):
+        self.users = list(users)
+        self.tasks = {}
+        self.lock = threading.Lock()
+
+    def remember(self, task_id, responsibility):
+        with self.lock:
+            self.tasks[task_id] = responsibility
+
+    def forget(self, task_id):
+        with self.lock:
+            self.tasks.pop(task_id, None)
+
+    def pick_task(self, rng):
+        with self.lock:
+            if not self.tasks:
+                return None, None
+            task_id = rng.choice(sorted(self.tasks))
+            return task_id, self.tasks[task_id]
+
+    def assign_task(self, rng):
+        deadline = datetime.now(timezone.utc) + timedelta(hours=rng.randint(2, 240))
+        body = {
+            'name': ' '.join(rng.sample(WORDS, 2)).title(),
+            'description': ' '.join(rng.choices(WORDS, k=8)),
+            'responsibility': rng.choice(self.users),
+            'deadline': deadline.strftime('%Y-%m-%dT%H:%M:%SZ')
+        }
+        return 'POST', '/tasks', claims_for(ADMIN_EMAIL, admin=True), body, None
+
+    def get_user_tasks(self, rng):
+        return 'GET', '/tasks', claims_for(rng.choice(self.users)), None, None
+
+    def get_all_tasks(self, rng):
+        return 'GET', '/tasks/all', claims_for(ADMIN_EMAIL, admin=True), None, None
+
+    def get_task(self, rng):
+        task_id, responsibility = self.pick_task(rng)
+        if not responsibility:
+            return 'GET', '/tasks/missing', claims_for(ADMIN_EMAIL, admin=True), None, None
+        return 'GET', f"/tasks/{task_id}", claims_for(responsibility), None, None
+
+    def get_task_history(self, rng):
+        task_id, responsibility = self.pick_task(rng)
+        if not responsibility:
+            return 'GET', '/tasks/missing/history', claims_for(ADMIN_EMAIL, admin=True), None, None
+        return 'GET', f"/tasks/{task_id}/history", claims_for(responsibility), None, None
+
+    def edit_task(self, rng):
+        task_id, responsibility = self.pick_task(rng)
+        if rng.random() < 0.5 and responsibility:
+            return 'PUT', '/tasks', claims_for(responsibility), {'TaskId': task_id, 'status': 'completed'}, None
+        body = {'TaskId': task_id or 'missing', 'comment': ' '.join(rng.choices(WORDS, k=4))}
+        return 'PUT', '/tasks', claims_for(ADMIN_EMAIL, admin=True), body, None
+
+    def delete_task(self, rng):
+        task_id, _ = self.pick_task(rng)
+        return 'DELETE', '/tasks', claims_for(ADMIN_EMAIL, admin=True), {'TaskId': task_id or 'missing'}, None
+
+    def get_task_stats(self, rng):
+        return 'GET', '/tasks/stats', claims_for(rng.choice(self.users)), None, None
+
+    def get_due_tasks(self, rng):
+        return 'GET', '/tasks/due', claims_for(rng.choice(self.users)), None, {'hours': '48'}
+
+    def search_tasks(self, rng):
+        return 'GET', '/tasks/search', claims_for(rng.choice(self.users)), None, {'q': rng.choice(WORDS)}
+
+    def get_task_changes(self, rng):
+        return 'GET', '/tasks/changes', claims_for(rng.choice(self.users)), None, None
+
+    def get_archived_tasks(self, rng):
+        return 'GET', '/tasks/archive', claims_for(rng.choice(self.users)), None, None
+
+    def get_all_users(self, rng):
+        return 'GET', '/users', claims_for(ADMIN_EMAIL, admin=True), None, None
+
+    def add_user(self, rng):
+        username = f"user-{rng.getrandbits(48):012x}"
+        body = {'username': username, 'email': f"{username}@loadtest.local"}
+        return 'POST', '/users', claims_for(ADMIN_EMAIL, admin=True), body, None
+
+
+@contextlib.contextmanager
+def quiet(verbose=False):
+    """Swallow handler log output and EMF metric lines while measuring"""
+    if verbose:
+        yield
+        return
+    logging.disable(logging.CRITICAL)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def run(requests=500, concurrency=8, seed=1, mix=None, users=20, initial_tasks=100, schedule_rounds=2,
+        latency=None, verbose=False, harness=None, parameters=None, throttles=None):
+    """
+    Seed the stack, replay `requests` API calls drawn from `mix` at the given
+    concurrency while the stream consumer runs alongside, then fast-forward the
+    deadline schedules. `throttles` maps a service to the (rate, burst) its
+    stand-in admits. Returns the report dict for the measured phase.
+    """
+    harness = harness or Harness(latency=latency, parameters=parameters).start()
+    for service_name, (rate, burst) in (throttles or {}).items():
+        harness.aws.throttle(service_name, rate, burst)
+    served = harness.api_labels()
+    mix = {name: weight for name, weight in (mix or DEFAULT_MIX).items() if name in served}
+    emails = [f"user{number:03d}@loadtest.local" for number in range(users)]
+    workload = Workload(emails)
+    names, weights = list(mix), list(mix.values())
+
+    def send(rng, name):
+        method, path, claims, body, query = getattr(workload, name)(rng)
+        status, payload = harness.request(method, path, claims, body, query)
+        if name == 'assign_task' and status == 200:
+            workload.remember(payload['TaskId'], body['responsibility'])
+        elif name == 'delete_task' and status == 200:
+            workload.forget(body['TaskId'])
+
+    with quiet(verbose):
+        seed_rng = random.Random(f"{seed}:seed")
+        for email in emails + [ADMIN_EMAIL]:
+            harness.aws.cognito.admin_create_user(UserPoolId=USER_POOL_ID, Username=email.split('@')[0],
+                                                  UserAttributes=[{'Name': 'email', 'Value': email}])
+        for _ in range(initial_tasks):
+            send(seed_rng, 'assign_task')
+        harness.settle()
+        harness.reset_measurements()
+
+        stop = threading.Event()
+
+        def background():
+            # The stream consumer runs concurrently with the API, as it does in Lambda
+            while not stop.is_set():
+                harness.settle()
+                stop.wait(0.02)
+
+        def one_request(index):
+            rng = random.Random(f"{seed}:{index}")
+            with contextlib.suppress(Exception):
+                send(rng, rng.choices(names, weights)[0])
+
+        started = time.perf_counter()
+        consumer = threading.Thread(target=background, daemon=True)
+        consumer.start()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one_request, range(requests)))
+        stop.set()
+        consumer.join()
+        harness.settle()
+        harness.fire_schedules(rounds=schedule_rounds)
+        elapsed = time.perf_counter() - started
+
+    report = harness.report(elapsed)
+    report['config'] = {'requests': requests, 'concurrency': concurrency, 'seed': seed, 'users': users,
+                        'initial_tasks': initial_tasks, 'mix': mix, 'latency': dict(harness.aws.latency),
+                        'parameters': dict(harness.stack.parameter_values),
+                        'throttles': {name: [limit.rate, limit.burst] for name, limit in harness.aws.rate_limits.items()}}
+    return report
+
+
+def compare(report, baseline, latency_tolerance=0.5, calls_tolerance=0.0):
+    """
+    List regressions against a baseline report: more AWS calls per invocation
+    (deterministic for a given seed) or a p95 latency increase beyond the tolerance.
+    """
+    regressions = []
+    for label, current in report['handlers'].items():
+        previous = baseline.get('handlers', {}).get(label)
+        if not previous or not current['invocations']:
+            continue
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{label}: errors {previous['errors']} -> {current['errors']}")
+        if current['aws_calls_per_invocation'] > previous['aws_calls_per_invocation'] * (1 + calls_tolerance) + 1e-9:
+            regressions.append(f"{label}: AWS calls per invocation "
+                               f"{previous['aws_calls_per_invocation']} -> {current['aws_calls_per_invocation']}")
+        if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + latency_tolerance):
+            regressions.append(f"{label}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+    return regressions
+
+
+def format_report(report):
+    lines = [f"{'handler':<28}{'calls':>8}{'errors':>8}{'4xx':>6}{'req/s':>10}"
+             f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'aws/inv':>9}"]
+    for label, stats in report['handlers'].items():
+        lines.append(f"{label:<28}{stats['invocations']:>8}{stats['errors']:>8}{stats['client_errors']:>6}"
+                     f"{stats['throughput_rps']:>10.1f}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+                     f"{stats['p99_ms']:>10.2f}{stats['aws_calls_per_invocation']:>9.2f}")
+    lines.append('')
+    lines.append('AWS calls by operation:')
+    for label, stats in report['handlers'].items():
+        operations = ', '.join(f"{operation}={count}" for operation, count in stats['aws_calls_by_operation'].items())
+        throttled = f" (throttled {stats['aws_throttles']})" if stats.get('aws_throttles') else ''
+        lines.append(f"  {label}: {operations or '-'}{throttled}")
+    lines.append('')
+    lines.append(f"{'table':<20}{'items':>8}{'RCU':>12}{'WCU':>12}{'scanned':>10}{'returned':>10}")
+    for name, table in report['tables'].items():
+        lines.append(f"{name:<20}{table['items']:>8}{table['read_units']:>12.1f}{table['write_units']:>12.1f}"
+                     f"{table['items_scanned']:>10}{table['items_returned']:>10}")
+    if report.get('traces', {}).get('hops'):
+        from . import traces
+        lines.append('')
+        lines.append(traces.format_analysis(report['traces']))
+    lines.append(f"\nelapsed: {report['elapsed_seconds']}s")
+    return '\n'.join(lines)
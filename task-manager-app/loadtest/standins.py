@@ -0,0 +1,1257 @@
+"""
+In-process stand-ins for the AWS services the handlers use (DynamoDB, S3,
+SNS, SQS, EventBridge, Lambda, Cognito and Step Functions).
+
+The stand-ins plug into botocore's event system the same way
+botocore.stub.Stubber does: requests still go through boto3 parameter
+building, DynamoDB type serialization and validation, but the response is
+produced here instead of by an HTTP call. Handlers therefore run unmodified,
+and every call is counted per handler label.
+"""
+import contextlib
+import fnmatch
+import io
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import boto3
+from boto3.dynamodb.types import Binary, TypeDeserializer, TypeSerializer
+from botocore import xform_name
+from botocore.awsrequest import AWSResponse
+from botocore.response import StreamingBody
+
+from . import expressions
+
+REGION = 'eu-central-1'
+ACCOUNT_ID = '123456789012'
+
+_deserializer = TypeDeserializer()
+_serializer = TypeSerializer()
+
+
+class ServiceError(Exception):
+    """Raised by a stand-in to return an AWS error response with the given code"""
+
+    def __init__(self, code, message='', status=400, **fields):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.message = message
+        self.status = status
+        # Other members of the error response, e.g. a cancelled transaction's CancellationReasons
+        self.fields = fields
+
+
+def deserialize_item(item):
+    return {name: _deserializer.deserialize(value) for name, value in (item or {}).items()}
+
+
+def serialize_item(item):
+    return {name: _serializer.serialize(value) for name, value in item.items()}
+
+
+def item_size(item):
+    """Approximate DynamoDB item size in bytes (attribute names plus values)"""
+    return sum(len(name.encode('utf-8')) + _value_size(value) for name, value in item.items())
+
+
+def _value_size(value):
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, bool) or value is None:
+        return 1
+    if isinstance(value, Binary):
+        return len(value.value)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (list, set)):
+        return 3 + sum(_value_size(element) + 1 for element in value)
+    if isinstance(value, dict):
+        return 3 + item_size(value)
+    # Numbers: roughly one byte per two significant digits plus one
+    return 1 + (len(str(value).lstrip('-').replace('.', '')) + 1) // 2
+
+
+# DynamoDB
+
+class StandInTable:
+    """One table with its primary index, global secondary indexes and stream"""
+
+    def __init__(self, name, hash_key, range_key=None, indexes=None, stream=False, ttl_attribute=None):
+        self.name = name
+        self.hash_key = hash_key
+        self.range_key = range_key
+        # index name -> (hash attribute, range attribute or None)
+        self.indexes = dict(indexes or {})
+        self.stream_enabled = stream
+        self.ttl_attribute = ttl_attribute
+        self.arn = f"arn:aws:dynamodb:{REGION}:{ACCOUNT_ID}:table/{name}"
+
+        self.items = {}
+        self._scan_order = []
+        self._position = {}
+        self.partitions = defaultdict(dict)
+        self.index_partitions = {index: defaultdict(set) for index in self.indexes}
+        self.stream_records = []
+        self.lock = threading.RLock()
+        # Optional write capacity of one partition key, see limit_partition_writes()
+        self.partition_write_rate = None
+        self._partition_limits = {}
+
+        self.consumed_read_units = 0.0
+        self.consumed_write_units = 0.0
+        self.items_scanned = 0
+        self.items_returned = 0
+        self.throttled_writes = 0
+
+    def key_attributes(self):
+        return [self.hash_key] + ([self.range_key] if self.range_key else [])
+
+    def key_of(self, item):
+        try:
+            return (item[self.hash_key], item[self.range_key] if self.range_key else None)
+        except KeyError as e:
+            raise ServiceError('ValidationException', f"One of the required keys was not given a value: {e}")
+
+    def key_item(self, key):
+        item = {self.hash_key: key[0]}
+        if self.range_key:
+            item[self.range_key] = key[1]
+        return item
+
+    def limit_partition_writes(self, units_per_second, burst=None):
+        """
+        Reject writes to a partition key beyond `units_per_second` write units
+        (after `burst`) with ProvisionedThroughputExceededException, as a hot
+        key is throttled once it outgrows the partition that holds it
+        """
+        with self.lock:
+            self.partition_write_rate = (units_per_second, burst)
+            self._partition_limits = {}
+
+    def admit_write(self, hash_value, units):
+        if self.partition_write_rate is None:
+            return
+        limit = self._partition_limits.get(hash_value)
+        if limit is None:
+            limit = self._partition_limits[hash_value] = RateLimit(*self.partition_write_rate)
+        if not limit.admit(units):
+            self.throttled_writes += 1
+            raise ServiceError('ProvisionedThroughputExceededException',
+                               f"The write rate of partition {hash_value!r} of {self.name} was exceeded")
+
+    def _index_key(self, index, item):
+        hash_attr, range_attr = self.indexes[index]
+        if hash_attr not in item or (range_attr and range_attr not in item):
+            return None
+        return item[hash_attr], item.get(range_attr) if range_attr else None
+
+    def store(self, item):
+        """Insert or replace an item; returns the previous version"""
+        key = self.key_of(item)
+        old = self.items.get(key)
+        if old is not None:
+            self._unindex(key, old)
+        else:
+            self._position[key] = len(self._scan_order)
+            self._scan_order.append(key)
+        self.items[key] = item
+        self.partitions[key[0]][key[1]] = key
+        for index in self.indexes:
+            index_key = self._index_key(index, item)
+            if index_key is not None:
+                self.index_partitions[index][index_key[0]].add(key)
+        return old
+
+    def remove(self, key):
+        old = self.items.pop(key, None)
+        if old is not None:
+            self._unindex(key, old)
+            self.partitions[key[0]].pop(key[1], None)
+            if not self.partitions[key[0]]:
+                del self.partitions[key[0]]
+        return old
+
+    def _unindex(self, key, item):
+        for index in self.indexes:
+            index_key = self._index_key(index, item)
+            if index_key is not None:
+                members = self.index_partitions[index][index_key[0]]
+                members.discard(key)
+                if not members:
+                    del self.index_partitions[index][index_key[0]]
+
+    def scan_keys(self, start_key=None):
+        """Keys in stable scan order, starting after start_key"""
+        start = self._position[start_key] + 1 if start_key is not None else 0
+        for position in range(start, len(self._scan_order)):
+            key = self._scan_order[position]
+            if self._position.get(key) == position and key in self.items:
+                yield key
+        # Keys deleted and re-inserted get a new position; drop the stale slots now and then
+        if len(self._scan_order) > 2 * len(self.items) + 1024:
+            self._compact()
+
+    def _compact(self):
+        self._scan_order = list(self.items)
+        self._position = {key: position for position, key in enumerate(self._scan_order)}
+
+    def record(self, event_name, old, new, user_identity=None):
+        if not self.stream_enabled:
+            return
+        key_source = new if new is not None else old
+        record = {
+            'eventID': uuid.uuid4().hex,
+            'eventName': event_name,
+            'eventSource': 'aws:dynamodb',
+            'awsRegion': REGION,
+            'eventSourceARN': f"{self.arn}/stream/local",
+            'dynamodb': {
+                'ApproximateCreationDateTime': time.time(),
+                'Keys': serialize_item({k: key_source[k] for k in self.key_attributes()}),
+                'SequenceNumber': f"{next(_sequence_numbers):021d}",
+                'SizeBytes': item_size(key_source),
+                'StreamViewType': 'NEW_AND_OLD_IMAGES'
+            }
+        }
+        if user_identity:
+            record['userIdentity'] = user_identity
+        if new is not None:
+            record['dynamodb']['NewImage'] = serialize_item(new)
+        if old is not None:
+            record['dynamodb']['OldImage'] = serialize_item(old)
+        self.stream_records.append(record)
+
+    def stats(self):
+        return {
+            'items': len(self.items),
+            'read_units': self.consumed_read_units,
+            'write_units': self.consumed_write_units,
+            'items_scanned': self.items_scanned,
+            'items_returned': self.items_returned,
+            'throttled_writes': self.throttled_writes
+        }
+
+
+_sequence_numbers = itertools.count(1)
+
+# userIdentity of the stream records of items TTL deleted
+TTL_IDENTITY = {'type': 'Service', 'principalId': 'dynamodb.amazonaws.com'}
+
+
+def _read_units(size_bytes, consistent=False):
+    return max(1, math.ceil(size_bytes / 4096)) * (1.0 if consistent else 0.5)
+
+
+def _write_units(size_bytes):
+    return float(max(1, math.ceil(size_bytes / 1024)))
+
+
+PAGE_SIZE_LIMIT = 1024 * 1024
+
+
+class DynamoDBStandIn:
+    def __init__(self):
+        self.tables = {}
+
+    def add_table(self, name, hash_key, range_key=None, indexes=None, stream=False, ttl_attribute=None):
+        self.tables[name] = StandInTable(name, hash_key, range_key, indexes, stream, ttl_attribute)
+        return self.tables[name]
+
+    def table(self, name):
+        if name not in self.tables:
+            raise ServiceError('ResourceNotFoundException', f"Requested resource not found: Table: {name} not found")
+        return self.tables[name]
+
+    def reset_metrics(self):
+        for table in self.tables.values():
+            table.consumed_read_units = table.consumed_write_units = 0.0
+            table.items_scanned = table.items_returned = table.throttled_writes = 0
+
+    def expire_items(self, now=None):
+        """
+        Delete every item whose TTL attribute has passed, as DynamoDB's TTL
+        sweeper does: no write capacity is used and the stream record names
+        the service as the principal. Returns {table name: items removed}.
+        """
+        now = time.time() if now is None else now
+        removed = {}
+        for table in self.tables.values():
+            if not table.ttl_attribute:
+                continue
+            with table.lock:
+                expired = [key for key, item in table.items.items()
+                           if isinstance(item.get(table.ttl_attribute), Decimal) and item[table.ttl_attribute] <= now]
+                for key in expired:
+                    table.record('REMOVE', table.remove(key), None, TTL_IDENTITY)
+            if expired:
+                removed[table.name] = len(expired)
+        return removed
+
+    def drain_stream(self, table_name):
+        table = self.table(table_name)
+        with table.lock:
+            records, table.stream_records = table.stream_records, []
+        return records
+
+    # API operations
+
+    def create_table(self, TableName, KeySchema, AttributeDefinitions=None, GlobalSecondaryIndexes=None,
+                     StreamSpecification=None, TimeToLiveSpecification=None, **_):
+        def keys(schema):
+            hash_key = next(k['AttributeName'] for k in schema if k['KeyType'] == 'HASH')
+            range_key = next((k['AttributeName'] for k in schema if k['KeyType'] == 'RANGE'), None)
+            return hash_key, range_key
+
+        indexes = {index['IndexName']: keys(index['KeySchema']) for index in GlobalSecondaryIndexes or []}
+        stream = bool(StreamSpecification and StreamSpecification.get('StreamEnabled', True))
+        ttl_attribute = TimeToLiveSpecification['AttributeName'] \
+            if TimeToLiveSpecification and TimeToLiveSpecification.get('Enabled') else None
+        table = self.add_table(TableName, *keys(KeySchema), indexes=indexes, stream=stream, ttl_attribute=ttl_attribute)
+        return {'TableDescription': {'TableName': TableName, 'TableArn': table.arn, 'TableStatus': 'ACTIVE'}}
+
+    def describe_table(self, TableName, **_):
+        table = self.table(TableName)
+        return {'Table': {'TableName': TableName, 'TableArn': table.arn, 'TableStatus': 'ACTIVE', 'ItemCount': len(table.items)}}
+
+    def _capacity(self, table, units, requested):
+        if requested and requested != 'NONE':
+            return {'ConsumedCapacity': {'TableName': table.name, 'CapacityUnits': units}}
+        return {}
+
+    def _check(self, condition, item, names, values):
+        if condition and not expressions.matches(condition, item, names, values):
+            raise ServiceError('ConditionalCheckFailedException', 'The conditional request failed')
+
+    def get_item(self, TableName, Key, ProjectionExpression=None, ExpressionAttributeNames=None,
+                 ConsistentRead=False, ReturnConsumedCapacity=None, **_):
+        table = self.table(TableName)
+        key = table.key_of(deserialize_item(Key))
+        with table.lock:
+            item = table.items.get(key)
+            units = _read_units(item_size(item) if item else 0, ConsistentRead)
+            table.consumed_read_units += units
+        response = self._capacity(table, units, ReturnConsumedCapacity)
+        if item is not None:
+            response['Item'] = serialize_item(expressions.project(ProjectionExpression, item, ExpressionAttributeNames))
+        return response
+
+    def put_item(self, TableName, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, ReturnValues='NONE', ReturnConsumedCapacity=None, **_):
+        table = self.table(TableName)
+        item = deserialize_item(Item)
+        values = deserialize_item(ExpressionAttributeValues)
+        with table.lock:
+            key = table.key_of(item)
+            self._check(ConditionExpression, table.items.get(key), ExpressionAttributeNames, values)
+            units = _write_units(item_size(item))
+            table.admit_write(key[0], units)
+            old = table.store(item)
+            table.consumed_write_units += units
+            table.record('MODIFY' if old is not None else 'INSERT', old, item)
+        response = self._capacity(table, units, ReturnConsumedCapacity)
+        if ReturnValues == 'ALL_OLD' and old is not None:
+            response['Attributes'] = serialize_item(old)
+        return response
+
+    def delete_item(self, TableName, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues='NONE', ReturnConsumedCapacity=None, **_):
+        table = self.table(TableName)
+        key = table.key_of(deserialize_item(Key))
+        values = deserialize_item(ExpressionAttributeValues)
+        with table.lock:
+            self._check(ConditionExpression, table.items.get(key), ExpressionAttributeNames, values)
+            current = table.items.get(key)
+            units = _write_units(item_size(current) if current else 0)
+            table.admit_write(key[0], units)
+            old = table.remove(key)
+            table.consumed_write_units += units
+            if old is not None:
+                table.record('REMOVE', old, None)
+        response = self._capacity(table, units, ReturnConsumedCapacity)
+        if ReturnValues == 'ALL_OLD' and old is not None:
+            response['Attributes'] = serialize_item(old)
+        return response
+
+    def update_item(self, TableName, Key, UpdateExpression=None, ConditionExpression=None,
+                    ExpressionAttributeNames=None, ExpressionAttributeValues=None, ReturnValues='NONE',
+                    ReturnConsumedCapacity=None, **_):
+        table = self.table(TableName)
+        key_item = deserialize_item(Key)
+        key = table.key_of(key_item)
+        values = deserialize_item(ExpressionAttributeValues)
+        with table.lock:
+            old = table.items.get(key)
+            self._check(ConditionExpression, old, ExpressionAttributeNames, values)
+            item = _copy_item(old) if old is not None else dict(key_item)
+            try:
+                expressions.apply_update(UpdateExpression, item, ExpressionAttributeNames, values)
+            except expressions.ExpressionError as e:
+                raise ServiceError('ValidationException', str(e))
+            units = _write_units(max(item_size(item), item_size(old) if old else 0))
+            table.admit_write(key[0], units)
+            table.store(item)
+            table.consumed_write_units += units
+            table.record('MODIFY' if old is not None else 'INSERT', old, item)
+        response = self._capacity(table, units, ReturnConsumedCapacity)
+        if ReturnValues in ('ALL_NEW', 'UPDATED_NEW'):
+            response['Attributes'] = serialize_item(item)
+        elif ReturnValues in ('ALL_OLD', 'UPDATED_OLD') and old is not None:
+            response['Attributes'] = serialize_item(old)
+        return response
+
+    def _page(self, table, keys, index, Limit, FilterExpression, ProjectionExpression, names, values,
+              consistent, select, requested_capacity):
+        """Evaluate keys in order up to Limit items or 1 MB, then filter and project them"""
+        items = []
+        scanned = 0
+        size = 0
+        last_key = None
+        exhausted = True
+        for key in keys:
+            if (Limit and scanned >= Limit) or size >= PAGE_SIZE_LIMIT:
+                exhausted = False
+                break
+            item = table.items[key]
+            scanned += 1
+            size += item_size(item)
+            last_key = key
+            if expressions.matches(FilterExpression, item, names, values):
+                items.append(item)
+
+        units = _read_units(size, consistent)
+        table.consumed_read_units += units
+        table.items_scanned += scanned
+        table.items_returned += len(items)
+
+        response = {'Count': len(items), 'ScannedCount': scanned}
+        response.update(self._capacity(table, units, requested_capacity))
+        if select != 'COUNT':
+            response['Items'] = [
+                serialize_item(expressions.project(ProjectionExpression, item, names)) for item in items
+            ]
+        if not exhausted and last_key is not None:
+            last_item = table.items[last_key]
+            last_evaluated = table.key_item(last_key)
+            if index:
+                for attribute in table.indexes[index]:
+                    if attribute:
+                        last_evaluated[attribute] = last_item[attribute]
+            response['LastEvaluatedKey'] = serialize_item(last_evaluated)
+        return response
+
+    def query(self, TableName, KeyConditionExpression, IndexName=None, FilterExpression=None,
+              ProjectionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+              Limit=None, ExclusiveStartKey=None, ScanIndexForward=True, Select=None, ConsistentRead=False,
+              ReturnConsumedCapacity=None, **_):
+        table = self.table(TableName)
+        values = deserialize_item(ExpressionAttributeValues)
+        hash_attr, range_attr = table.indexes[IndexName] if IndexName else (table.hash_key, table.range_key)
+        partition_value = _partition_value(KeyConditionExpression, hash_attr, ExpressionAttributeNames, values)
+
+        with table.lock:
+            if IndexName:
+                members = table.index_partitions[IndexName].get(partition_value, ())
+            else:
+                members = table.partitions.get(partition_value, {}).values()
+
+            def order(key):
+                item = table.items[key]
+                return (item.get(range_attr) if range_attr else None, key)
+
+            candidates = sorted(
+                (key for key in members if expressions.matches(KeyConditionExpression, table.items[key], ExpressionAttributeNames, values)),
+                key=order,
+                reverse=not ScanIndexForward
+            )
+            if ExclusiveStartKey:
+                start = deserialize_item(ExclusiveStartKey)
+                start_key = table.key_of(start)
+                start_order = (start.get(range_attr) if range_attr else None, start_key)
+                candidates = [
+                    key for key in candidates
+                    if (order(key) > start_order if ScanIndexForward else order(key) < start_order)
+                ]
+            return self._page(table, candidates, IndexName, Limit, FilterExpression, ProjectionExpression,
+                              ExpressionAttributeNames, values, ConsistentRead, Select, ReturnConsumedCapacity)
+
+    def scan(self, TableName, IndexName=None, FilterExpression=None, ProjectionExpression=None,
+             ExpressionAttributeNames=None, ExpressionAttributeValues=None, Limit=None, ExclusiveStartKey=None,
+             Segment=None, TotalSegments=None, Select=None, ConsistentRead=False, ReturnConsumedCapacity=None, **_):
+        table = self.table(TableName)
+        values = deserialize_item(ExpressionAttributeValues)
+        with table.lock:
+            start_key = table.key_of(deserialize_item(ExclusiveStartKey)) if ExclusiveStartKey else None
+            keys = table.scan_keys(start_key)
+            if IndexName:
+                keys = (key for key in keys if table._index_key(IndexName, table.items[key]) is not None)
+            if TotalSegments:
+                keys = (key for key in keys if hash(key) % TotalSegments == Segment)
+            return self._page(table, keys, IndexName, Limit, FilterExpression, ProjectionExpression,
+                              ExpressionAttributeNames, values, ConsistentRead, Select, ReturnConsumedCapacity)
+
+    def batch_get_item(self, RequestItems, ReturnConsumedCapacity=None, **_):
+        if sum(len(request['Keys']) for request in RequestItems.values()) > 100:
+            raise ServiceError('ValidationException', 'Too many items requested for the BatchGetItem call')
+        responses = {}
+        capacity = []
+        for table_name, request in RequestItems.items():
+            table = self.table(table_name)
+            found = []
+            size = 0
+            with table.lock:
+                for key in request['Keys']:
+                    item = table.items.get(table.key_of(deserialize_item(key)))
+                    if item is not None:
+                        size += item_size(item)
+                        found.append(serialize_item(expressions.project(
+                            request.get('ProjectionExpression'), item, request.get('ExpressionAttributeNames'))))
+                units = _read_units(size, request.get('ConsistentRead', False))
+                table.consumed_read_units += units
+            capacity.append({'TableName': table_name, 'CapacityUnits': units})
+            responses[table_name] = found
+        response = {'Responses': responses, 'UnprocessedKeys': {}}
+        if ReturnConsumedCapacity and ReturnConsumedCapacity != 'NONE':
+            response['ConsumedCapacity'] = capacity
+        return response
+
+    def batch_write_item(self, RequestItems, ReturnConsumedCapacity=None, **_):
+        if sum(len(requests) for requests in RequestItems.values()) > 25:
+            raise ServiceError('ValidationException', 'Too many items requested for the BatchWriteItem call')
+        unprocessed = defaultdict(list)
+        for table_name, requests in RequestItems.items():
+            for request in requests:
+                try:
+                    if 'PutRequest' in request:
+                        self.put_item(table_name, request['PutRequest']['Item'])
+                    else:
+                        self.delete_item(table_name, request['DeleteRequest']['Key'])
+                except ServiceError as e:
+                    # Writes to a throttled partition come back for the caller to resend
+                    if e.code != 'ProvisionedThroughputExceededException':
+                        raise
+                    unprocessed[table_name].append(request)
+        if sum(len(requests) for requests in unprocessed.values()) == sum(len(requests) for requests in RequestItems.values()):
+            raise ServiceError('ProvisionedThroughputExceededException', 'Every write of the batch was throttled')
+        return {'UnprocessedItems': dict(unprocessed)}
+
+    def transact_write_items(self, TransactItems, ReturnConsumedCapacity=None, **_):
+        """
+        All of the writes or none: every condition is checked with the tables
+        locked, and one that fails cancels the transaction with a reason per item
+        """
+        if len(TransactItems) > 100:
+            raise ServiceError('ValidationException', 'Member must have length less than or equal to 100')
+        actions = [next(iter(entry.items())) for entry in TransactItems]
+        tables = {request['TableName']: self.table(request['TableName']) for _, request in actions}
+        with contextlib.ExitStack() as stack:
+            for name in sorted(tables):
+                stack.enter_context(tables[name].lock)
+            reasons = []
+            for action, request in actions:
+                table = tables[request['TableName']]
+                key = table.key_of(deserialize_item(request['Item'] if action == 'Put' else request['Key']))
+                try:
+                    self._check(request.get('ConditionExpression'), table.items.get(key),
+                                request.get('ExpressionAttributeNames'),
+                                deserialize_item(request.get('ExpressionAttributeValues')))
+                    reasons.append({'Code': 'None'})
+                except ServiceError:
+                    reasons.append({'Code': 'ConditionalCheckFailed', 'Message': 'The conditional request failed'})
+            if any(reason['Code'] != 'None' for reason in reasons):
+                raise ServiceError('TransactionCanceledException',
+                                   'Transaction cancelled, please refer cancellation reasons for specific reasons '
+                                   f"[{', '.join(reason['Code'] for reason in reasons)}]",
+                                   CancellationReasons=reasons)
+            # A throttled partition fails the whole transaction before anything is written
+            for action, request in actions:
+                table = tables[request['TableName']]
+                table.admit_write(table.key_of(deserialize_item(request['Item'] if action == 'Put' else request['Key']))[0], 1)
+            limits = {name: table.partition_write_rate for name, table in tables.items()}
+            try:
+                for table in tables.values():
+                    table.partition_write_rate = None
+                for action, request in actions:
+                    write = {key: value for key, value in request.items() if key != 'ConditionExpression'}
+                    if action == 'Put':
+                        self.put_item(**write)
+                    elif action == 'Update':
+                        self.update_item(**write)
+                    elif action == 'Delete':
+                        self.delete_item(**write)
+            finally:
+                for name, table in tables.items():
+                    table.partition_write_rate = limits[name]
+        return {}
+
+
+def _copy_item(item):
+    return deserialize_item(serialize_item(item))
+
+
+def _partition_value(key_condition, hash_attr, names, values):
+    """Find the equality condition on the partition key of a KeyConditionExpression"""
+    tree = expressions.parse_condition(key_condition)
+    context = expressions.Context(names, values)
+    pending = [tree]
+    while pending:
+        node = pending.pop()
+        if node[0] == 'and':
+            pending.extend((node[1], node[2]))
+        elif node[0] == 'compare' and node[1] == '=':
+            left, right = node[2], node[3]
+            if left[0] == 'path' and context.path_elements(left) == [hash_attr] and right[0] == 'value':
+                return context.value(right[1])
+    raise ServiceError('ValidationException', f"Query condition missed key schema element: {hash_attr}")
+
+
+# Object storage
+
+class S3StandIn:
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def create_bucket(self, Bucket, **_):
+        with self.lock:
+            self.buckets.setdefault(Bucket, {})
+        return {'Location': f"/{Bucket}"}
+
+    def _bucket(self, name):
+        if name not in self.buckets:
+            raise ServiceError('NoSuchBucket', 'The specified bucket does not exist', 404)
+        return self.buckets[name]
+
+    def put_object(self, Bucket, Key, Body=b'', ContentType=None, ContentEncoding=None, **_):
+        data = Body.read() if hasattr(Body, 'read') else Body
+        data = data.encode('utf-8') if isinstance(data, str) else bytes(data)
+        with self.lock:
+            self._bucket(Bucket)[Key] = {'Body': data, 'ContentType': ContentType, 'ContentEncoding': ContentEncoding,
+                                         'LastModified': datetime.now(timezone.utc)}
+        return {'ETag': f'"{uuid.uuid4().hex}"'}
+
+    def get_object(self, Bucket, Key, **_):
+        with self.lock:
+            entry = self._bucket(Bucket).get(Key)
+        if entry is None:
+            raise ServiceError('NoSuchKey', 'The specified key does not exist.', 404)
+        response = {'Body': StreamingBody(io.BytesIO(entry['Body']), len(entry['Body'])),
+                    'ContentLength': len(entry['Body']), 'LastModified': entry['LastModified']}
+        response.update({name: entry[name] for name in ('ContentType', 'ContentEncoding') if entry[name]})
+        return response
+
+    def list_objects_v2(self, Bucket, Prefix='', StartAfter=None, ContinuationToken=None, MaxKeys=1000,
+                        Delimiter=None, **_):
+        with self.lock:
+            bucket = self._bucket(Bucket)
+            names = sorted(name for name in bucket if name.startswith(Prefix or ''))
+            if Delimiter:
+                # Keys with the delimiter past the prefix roll up into one common prefix each
+                rolled = {}
+                for name in names:
+                    cut = name.find(Delimiter, len(Prefix or ''))
+                    rolled.setdefault(name[:cut + len(Delimiter)] if cut >= 0 else name, cut >= 0)
+                names = sorted(rolled)
+            after = ContinuationToken or StartAfter
+            if after:
+                names = [name for name in names if name > after]
+            page = names[:MaxKeys]
+            common = [name for name in page if Delimiter and rolled[name]]
+            response = {'KeyCount': len(page), 'IsTruncated': len(names) > MaxKeys, 'Contents': [
+                {'Key': name, 'Size': len(bucket[name]['Body']), 'LastModified': bucket[name]['LastModified']}
+                for name in page if name not in common
+            ]}
+            if common:
+                response['CommonPrefixes'] = [{'Prefix': name} for name in common]
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = page[-1]
+        return response
+
+
+# Messaging and scheduling
+
+class SNSStandIn:
+    def __init__(self):
+        self.published = []
+        self.subscriptions = []
+        self.lock = threading.Lock()
+
+    def publish(self, TopicArn=None, Message=None, Subject=None, MessageAttributes=None, **_):
+        message_id = str(uuid.uuid4())
+        with self.lock:
+            self.published.append({
+                'MessageId': message_id,
+                'TopicArn': TopicArn,
+                'Subject': Subject,
+                'Message': Message,
+                'MessageAttributes': MessageAttributes or {}
+            })
+        return {'MessageId': message_id}
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries, **_):
+        successful = []
+        for entry in PublishBatchRequestEntries:
+            result = self.publish(TopicArn=TopicArn, Message=entry['Message'], Subject=entry.get('Subject'),
+                                  MessageAttributes=entry.get('MessageAttributes'))
+            successful.append({'Id': entry['Id'], 'MessageId': result['MessageId']})
+        return {'Successful': successful, 'Failed': []}
+
+    def subscribe(self, TopicArn, Protocol, Endpoint=None, Attributes=None, **_):
+        arn = f"{TopicArn}:{uuid.uuid4()}"
+        with self.lock:
+            self.subscriptions.append({'TopicArn': TopicArn, 'Protocol': Protocol, 'Endpoint': Endpoint,
+                                       'Attributes': Attributes or {}, 'SubscriptionArn': arn})
+        return {'SubscriptionArn': arn}
+
+
+class SQSStandIn:
+    def __init__(self):
+        self.queues = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def send_message(self, QueueUrl, MessageBody, MessageAttributes=None, **_):
+        message_id = str(uuid.uuid4())
+        with self.lock:
+            self.queues[QueueUrl].append({'MessageId': message_id, 'Body': MessageBody,
+                                          'MessageAttributes': MessageAttributes or {},
+                                          'Attributes': {'SentTimestamp': str(int(time.time() * 1000))}})
+        return {'MessageId': message_id}
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages=1, **_):
+        with self.lock:
+            messages = self.queues[QueueUrl][:MaxNumberOfMessages]
+            del self.queues[QueueUrl][:MaxNumberOfMessages]
+        return {'Messages': [dict(m, ReceiptHandle=m['MessageId']) for m in messages]}
+
+    def delete_message(self, QueueUrl, ReceiptHandle, **_):
+        return {}
+
+    def drain(self, queue_url):
+        with self.lock:
+            messages, self.queues[queue_url] = self.queues[queue_url], []
+        return messages
+
+
+class EventBridgeStandIn:
+    def __init__(self):
+        self.rules = {}
+        self.lock = threading.RLock()
+
+    def put_rule(self, Name, ScheduleExpression=None, EventPattern=None, State='ENABLED', **_):
+        arn = f"arn:aws:events:{REGION}:{ACCOUNT_ID}:rule/{Name}"
+        with self.lock:
+            rule = self.rules.setdefault(Name, {'Name': Name, 'Arn': arn, 'Targets': {}})
+            rule.update({'ScheduleExpression': ScheduleExpression, 'EventPattern': EventPattern, 'State': State})
+        return {'RuleArn': arn}
+
+    def put_targets(self, Rule, Targets, **_):
+        with self.lock:
+            if Rule not in self.rules:
+                raise ServiceError('ResourceNotFoundException', f"Rule {Rule} does not exist.")
+            for target in Targets:
+                self.rules[Rule]['Targets'][target['Id']] = target
+        return {'FailedEntryCount': 0, 'FailedEntries': []}
+
+    def remove_targets(self, Rule, Ids, **_):
+        with self.lock:
+            if Rule not in self.rules:
+                raise ServiceError('ResourceNotFoundException', f"Rule {Rule} does not exist.")
+            for target_id in Ids:
+                self.rules[Rule]['Targets'].pop(target_id, None)
+        return {'FailedEntryCount': 0, 'FailedEntries': []}
+
+    def delete_rule(self, Name, **_):
+        with self.lock:
+            rule = self.rules.get(Name)
+            if rule and rule['Targets']:
+                raise ServiceError('ValidationException', "Rule can't be deleted since it has targets.")
+            self.rules.pop(Name, None)
+        return {}
+
+    def list_rules(self, NamePrefix='', NextToken=None, Limit=100, **_):
+        with self.lock:
+            names = sorted(name for name in self.rules if name.startswith(NamePrefix or ''))
+        start = int(NextToken or 0)
+        page = names[start:start + Limit]
+        response = {'Rules': [
+            {key: value for key, value in self.rules[name].items() if key != 'Targets' and value is not None}
+            for name in page if name in self.rules
+        ]}
+        if start + Limit < len(names):
+            response['NextToken'] = str(start + Limit)
+        return response
+
+    def list_targets_by_rule(self, Rule, **_):
+        with self.lock:
+            if Rule not in self.rules:
+                raise ServiceError('ResourceNotFoundException', f"Rule {Rule} does not exist.")
+            return {'Targets': list(self.rules[Rule]['Targets'].values())}
+
+
+class LambdaStandIn:
+    # A function's resource-based policy may not grow beyond 20 KB
+    MAX_POLICY_BYTES = 20 * 1024
+
+    def __init__(self):
+        self.policies = defaultdict(dict)
+        self.functions = {}
+        self.async_invocations = []
+        self.lock = threading.Lock()
+
+    def register_function(self, name, handler):
+        """Make a Python handler invokable under a function name or ARN"""
+        self.functions[name] = handler
+
+    def add_permission(self, FunctionName, StatementId, Action, Principal, SourceArn=None, SourceAccount=None, **_):
+        statement = {'Sid': StatementId, 'Effect': 'Allow', 'Principal': {'Service': Principal},
+                     'Action': Action, 'Resource': FunctionName}
+        if SourceArn or SourceAccount:
+            statement['Condition'] = {}
+        if SourceAccount:
+            statement['Condition']['StringEquals'] = {'AWS:SourceAccount': SourceAccount}
+        if SourceArn:
+            statement['Condition']['ArnLike'] = {'AWS:SourceArn': SourceArn}
+        with self.lock:
+            if StatementId in self.policies[FunctionName]:
+                raise ServiceError('ResourceConflictException', f"The statement id ({StatementId}) provided already exists.", 409)
+            statements = list(self.policies[FunctionName].values()) + [statement]
+            if self._policy_size(statements) > self.MAX_POLICY_BYTES:
+                raise ServiceError('PolicyLengthExceededException',
+                                   'The final policy size is bigger than the limit.', 400)
+            self.policies[FunctionName][StatementId] = statement
+        return {'Statement': json.dumps(statement)}
+
+    def remove_permission(self, FunctionName, StatementId, **_):
+        with self.lock:
+            if StatementId not in self.policies[FunctionName]:
+                raise ServiceError('ResourceNotFoundException', f"Statement {StatementId} is not found.", 404)
+            del self.policies[FunctionName][StatementId]
+        return {}
+
+    def get_policy(self, FunctionName, **_):
+        with self.lock:
+            statements = list(self.policies[FunctionName].values())
+        if not statements:
+            raise ServiceError('ResourceNotFoundException', 'The resource you requested does not exist.', 404)
+        policy = {'Version': '2012-10-17', 'Id': 'default', 'Statement': statements}
+        return {'Policy': json.dumps(policy), 'RevisionId': str(uuid.uuid4())}
+
+    @staticmethod
+    def _policy_size(statements):
+        return len(json.dumps({'Version': '2012-10-17', 'Id': 'default', 'Statement': statements}))
+
+    def allows(self, function_name, principal, source_arn):
+        """Whether the function's resource policy lets `principal` invoke it for `source_arn`"""
+        with self.lock:
+            statements = list(self.policies[function_name].values())
+        for statement in statements:
+            if statement['Principal'].get('Service') != principal:
+                continue
+            pattern = statement.get('Condition', {}).get('ArnLike', {}).get('AWS:SourceArn')
+            if pattern is None or fnmatch.fnmatchcase(source_arn, pattern):
+                return True
+        return False
+
+    def invoke(self, FunctionName, InvocationType='RequestResponse', Payload=b'{}', **_):
+        payload = json.loads(Payload.read() if hasattr(Payload, 'read') else Payload or b'{}')
+        if InvocationType == 'Event':
+            with self.lock:
+                self.async_invocations.append((FunctionName, payload))
+            return {'StatusCode': 202, 'Payload': StreamingBody(io.BytesIO(b''), 0)}
+        if FunctionName not in self.functions:
+            raise ServiceError('ResourceNotFoundException', f"Function not found: {FunctionName}", 404)
+        result = json.dumps(self.functions[FunctionName](payload, None)).encode('utf-8')
+        return {'StatusCode': 200, 'Payload': StreamingBody(io.BytesIO(result), len(result))}
+
+    def drain_async(self):
+        with self.lock:
+            invocations, self.async_invocations = self.async_invocations, []
+        return invocations
+
+
+class CognitoStandIn:
+    def __init__(self):
+        self.users = {}
+        self.groups = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def admin_create_user(self, UserPoolId, Username, UserAttributes=None, TemporaryPassword=None, **_):
+        with self.lock:
+            if Username in self.users:
+                raise ServiceError('UsernameExistsException', 'User account already exists')
+            user = {
+                'Username': Username,
+                'Attributes': list(UserAttributes or []),
+                'UserCreateDate': datetime.now(timezone.utc),
+                'UserLastModifiedDate': datetime.now(timezone.utc),
+                'Enabled': True,
+                'UserStatus': 'FORCE_CHANGE_PASSWORD'
+            }
+            self.users[Username] = user
+        return {'User': user}
+
+    def admin_add_user_to_group(self, UserPoolId, Username, GroupName, **_):
+        with self.lock:
+            if Username not in self.users:
+                raise ServiceError('UserNotFoundException', 'User does not exist.')
+            self.groups[GroupName].add(Username)
+        return {}
+
+    def list_users(self, UserPoolId, PaginationToken=None, Limit=60, Filter=None, **_):
+        with self.lock:
+            names = sorted(self.users)
+            if Filter:
+                # Only the exact match form, attribute = "value", with \" and \\ escaped as Cognito parses it
+                matched = re.fullmatch(r'\s*([\w:]+)\s*=\s*"((?:[^"\\]|\\.)*)"\s*', Filter)
+                if not matched:
+                    raise ServiceError('InvalidParameterException', f"Invalid filter: {Filter}")
+                attribute, value = matched.group(1), re.sub(r'\\(.)', r'\1', matched.group(2))
+                names = [name for name in names
+                         if any(attr['Name'] == attribute and attr['Value'] == value
+                                for attr in self.users[name]['Attributes'])]
+            start = int(PaginationToken or 0)
+            response = {'Users': [self.users[name] for name in names[start:start + Limit]]}
+        if start + Limit < len(names):
+            response['PaginationToken'] = str(start + Limit)
+        return response
+
+
+class StepFunctionsStandIn:
+    def __init__(self):
+        self.executions = []
+        self.runners = {}
+        self.lock = threading.Lock()
+
+    def register_state_machine(self, arn, runner):
+        """Run executions of `arn` synchronously with runner(input_dict)"""
+        self.runners[arn] = runner
+
+    def start_execution(self, stateMachineArn, input='{}', name=None, **_):
+        execution_arn = f"{stateMachineArn.replace(':stateMachine:', ':execution:')}:{name or uuid.uuid4()}"
+        execution = {'executionArn': execution_arn, 'stateMachineArn': stateMachineArn,
+                     'input': json.loads(input), 'startDate': datetime.now(timezone.utc)}
+        with self.lock:
+            self.executions.append(execution)
+        runner = self.runners.get(stateMachineArn)
+        if runner:
+            # Real executions are asynchronous, so a failing run never fails the caller
+            try:
+                execution['output'] = runner(execution['input'])
+                execution['status'] = 'SUCCEEDED'
+            except Exception as e:
+                execution['status'] = 'FAILED'
+                execution['error'] = str(e)
+        return {'executionArn': execution_arn, 'startDate': execution['startDate']}
+
+
+class TraceCollectorStandIn:
+    """Receives the spans the tracing module exports, in place of an OTLP collector"""
+
+    def __init__(self):
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def export(self, spans):
+        with self.lock:
+            self.spans.extend(spans)
+
+    def reset(self):
+        with self.lock:
+            self.spans.clear()
+
+
+class StateMachineRunner:
+    """
+    Minimal Amazon States Language interpreter for the service-integration
+    state machines in statemachine/: Task states calling DynamoDB, SNS and SQS,
+    plus Pass, Succeed and Fail, with Parameters, ResultPath and States.Format.
+    """
+
+    RESOURCES = {
+        'arn:aws:states:::dynamodb:getItem': ('dynamodb', 'GetItem'),
+        'arn:aws:states:::dynamodb:putItem': ('dynamodb', 'PutItem'),
+        'arn:aws:states:::dynamodb:updateItem': ('dynamodb', 'UpdateItem'),
+        'arn:aws:states:::dynamodb:deleteItem': ('dynamodb', 'DeleteItem'),
+        'arn:aws:states:::sns:publish': ('sns', 'Publish'),
+        'arn:aws:states:::sqs:sendMessage': ('sqs', 'SendMessage')
+    }
+
+    def __init__(self, definition, stand_ins, label='state_machine'):
+        self.definition = definition
+        self.stand_ins = stand_ins
+        self.label = label
+
+    def __call__(self, state_input):
+        previous_label = self.stand_ins.current_label()
+        self.stand_ins.set_label(self.label)
+        try:
+            return self._run(state_input)
+        finally:
+            self.stand_ins.set_label(previous_label)
+
+    def _run(self, data):
+        state_name = self.definition['StartAt']
+        while True:
+            state = self.definition['States'][state_name]
+            kind = state['Type']
+            if kind == 'Fail':
+                raise RuntimeError(f"{state.get('Error', 'States.Fail')}: {state.get('Cause', '')}")
+            if kind == 'Succeed':
+                return data
+            if kind == 'Task':
+                service, operation = self.RESOURCES[state['Resource']]
+                result = self.stand_ins.call(service, operation, self._resolve(state.get('Parameters', {}), data))
+                result.pop('ResponseMetadata', None)
+            elif kind == 'Pass':
+                result = self._resolve(state['Parameters'], data) if 'Parameters' in state else state.get('Result', data)
+            else:
+                raise NotImplementedError(f"State type {kind} is not supported by the stand-in")
+            data = self._apply_result_path(data, result, state.get('ResultPath', '$'))
+            if state.get('End'):
+                return data
+            state_name = state['Next']
+
+    @staticmethod
+    def _apply_result_path(data, result, result_path):
+        if result_path is None:
+            return data
+        if result_path == '$':
+            return result
+        target = data = json.loads(json.dumps(data))
+        parts = result_path[2:].split('.')
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = result
+        return data
+
+    def _resolve(self, template, data):
+        if isinstance(template, dict):
+            resolved = {}
+            for key, value in template.items():
+                if key.endswith('.$'):
+                    resolved[key[:-2]] = self._evaluate(value, data)
+                else:
+                    resolved[key] = self._resolve(value, data)
+            return resolved
+        if isinstance(template, list):
+            return [self._resolve(value, data) for value in template]
+        return template
+
+    def _evaluate(self, expression, data):
+        if expression.startswith('States.Format('):
+            arguments = _split_arguments(expression[len('States.Format('):-1])
+            template = arguments[0][1:-1]
+            values = [self._evaluate(argument, data) for argument in arguments[1:]]
+            pieces = template.split('{}')
+            return ''.join(piece + (str(values[i]) if i < len(values) else '') for i, piece in enumerate(pieces))
+        if expression.startswith("'"):
+            return expression[1:-1]
+        return _json_path(data, expression)
+
+
+def _split_arguments(text):
+    arguments, current, quoted = [], '', False
+    for character in text:
+        if character == "'":
+            quoted = not quoted
+        if character == ',' and not quoted:
+            arguments.append(current.strip())
+            current = ''
+        else:
+            current += character
+    arguments.append(current.strip())
+    return arguments
+
+
+def _json_path(data, path):
+    if path == '$':
+        return data
+    current = data
+    for part in path[2:].split('.'):
+        if not isinstance(current, dict) or part not in current:
+            raise KeyError(f"The JSONPath {path} could not be found in the input")
+        current = current[part]
+    return current
+
+
+# Wiring into boto3
+
+class RateLimit:
+    """Account-level request rate of a service: a token bucket that rejects instead of waiting"""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def admit(self, cost=1):
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < cost:
+                return False
+            self._tokens -= cost
+            return True
+
+
+# The error each service answers with when a caller exceeds its rate
+THROTTLE_ERRORS = {'lambda': ('TooManyRequestsException', 429)}
+DEFAULT_THROTTLE_ERROR = ('ThrottlingException', 400)
+# botocore retries a throttled partition itself (legacy mode: 10 attempts, jittered 50 ms doubling); the
+# stand-ins answer before botocore's retry handler runs, so _respond does the same
+PARTITION_THROTTLE_CODE = 'ProvisionedThroughputExceededException'
+PARTITION_RETRY_ATTEMPTS = 10
+PARTITION_RETRY_BASE_SECONDS = 0.05
+
+
+class AwsStandIns:
+    """All stand-ins plus the botocore hooks that route client calls to them"""
+
+    def __init__(self, latency=None):
+        self.dynamodb = DynamoDBStandIn()
+        self.s3 = S3StandIn()
+        self.sns = SNSStandIn()
+        self.sqs = SQSStandIn()
+        self.events = EventBridgeStandIn()
+        self.lambda_ = LambdaStandIn()
+        self.cognito = CognitoStandIn()
+        self.stepfunctions = StepFunctionsStandIn()
+        self.collector = TraceCollectorStandIn()
+        self.services = {
+            'dynamodb': self.dynamodb,
+            's3': self.s3,
+            'sns': self.sns,
+            'sqs': self.sqs,
+            'events': self.events,
+            'lambda': self.lambda_,
+            'cognito-idp': self.cognito,
+            'stepfunctions': self.stepfunctions
+        }
+        # Optional simulated round-trip time per service, in seconds
+        self.latency = dict(latency or {})
+        # Optional request rate limit per service, see throttle()
+        self.rate_limits = {}
+        self.calls = Counter()
+        self.throttled = Counter()
+        self._calls_lock = threading.Lock()
+        self._local = threading.local()
+        self.session = None
+
+    # Call attribution
+
+    def current_label(self):
+        return getattr(self._local, 'label', 'unlabelled')
+
+    def set_label(self, label):
+        self._local.label = label
+
+    def calls_for(self, label):
+        """{(service, operation): count} recorded while `label` was active"""
+        with self._calls_lock:
+            return {(service, operation): count for (owner, service, operation), count in self.calls.items() if owner == label}
+
+    def throttled_for(self, label):
+        """{(service, operation): count} of calls rejected as throttled while `label` was active"""
+        with self._calls_lock:
+            return {(service, operation): count for (owner, service, operation), count in self.throttled.items()
+                    if owner == label}
+
+    def reset_calls(self):
+        with self._calls_lock:
+            self.calls.clear()
+            self.throttled.clear()
+
+    def throttle(self, service_name, rate, burst=None):
+        """Reject calls to `service_name` beyond `rate` per second (after `burst`) as AWS does, with a throttling error"""
+        self.rate_limits[service_name] = RateLimit(rate, burst)
+
+    def call(self, service_name, operation, params):
+        """Invoke a stand-in directly (used by service integrations such as Step Functions)"""
+        with self._calls_lock:
+            self.calls[(self.current_label(), service_name, operation)] += 1
+        return getattr(self.services[service_name], xform_name(operation))(**params)
+
+    # botocore hooks
+
+    def _capture_params(self, params, context, **kwargs):
+        context['standin_params'] = params
+
+    def _respond(self, model, context, **kwargs):
+        service_name = model.service_model.service_name
+        operation = model.name
+        with self._calls_lock:
+            self.calls[(self.current_label(), service_name, operation)] += 1
+
+        service = self.services.get(service_name)
+        method = getattr(service, xform_name(operation), None) if service else None
+        if method is None:
+            return AWSResponse(None, 501, {}, None), {
+                'Error': {'Code': 'NotImplemented', 'Message': f"{service_name}.{operation} has no stand-in"}
+            }
+        if self.latency.get(service_name):
+            time.sleep(self.latency[service_name])
+        rate_limit = self.rate_limits.get(service_name)
+        if rate_limit is not None and not rate_limit.admit():
+            with self._calls_lock:
+                self.throttled[(self.current_label(), service_name, operation)] += 1
+            code, status = THROTTLE_ERRORS.get(service_name, DEFAULT_THROTTLE_ERROR)
+            return AWSResponse(None, status, {}, None), {
+                'Error': {'Code': code, 'Message': 'Rate exceeded'},
+                'ResponseMetadata': {'HTTPStatusCode': status}
+            }
+        try:
+            result = self._call_with_retries(service_name, operation, method, context.get('standin_params', {}))
+        except ServiceError as e:
+            return AWSResponse(None, e.status, {}, None), dict(e.fields, **{
+                'Error': {'Code': e.code, 'Message': e.message},
+                'ResponseMetadata': {'HTTPStatusCode': e.status}
+            })
+        except expressions.ExpressionError as e:
+            return AWSResponse(None, 400, {}, None), {
+                'Error': {'Code': 'ValidationException', 'Message': str(e)},
+                'ResponseMetadata': {'HTTPStatusCode': 400}
+            }
+        result.setdefault('ResponseMetadata', {'HTTPStatusCode': 200, 'RequestId': uuid.uuid4().hex})
+        return AWSResponse(None, 200, {}, None), result
+
+    def _call_with_retries(self, service_name, operation, method, params):
+        for attempt in range(1, PARTITION_RETRY_ATTEMPTS + 1):
+            try:
+                return method(**params)
+            except ServiceError as e:
+                if e.code != PARTITION_THROTTLE_CODE:
+                    raise
+                with self._calls_lock:
+                    self.throttled[(self.current_label(), service_name, operation)] += 1
+                if attempt == PARTITION_RETRY_ATTEMPTS:
+                    raise
+                time.sleep(random.random() * PARTITION_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+
+    def install(self, region=REGION):
+        """
+        Route every boto3 client created from now on to the stand-ins. Modules
+        that created clients at import time must be (re)imported afterwards.
+        """
+        boto3.setup_default_session(
+            region_name=region,
+            aws_access_key_id='standin',
+            aws_secret_access_key='standin'
+        )
+        self.session = boto3.DEFAULT_SESSION
+        events = self.session._session.get_component('event_emitter')
+        # Registered last so the DynamoDB resource has already serialized the parameters
+        events.register_last('before-parameter-build.*.*', self._capture_params, unique_id='standin-params')
+        events.register('before-call.*.*', self._respond, unique_id='standin-respond')
+        return self
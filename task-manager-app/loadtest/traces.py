@@ -0,0 +1,151 @@
+"""
+Hop-by-hop analysis of task lifecycle traces.
+
+Spans are grouped into traces and each trace is split into its hops (one
+per function invocation or state machine execution). For every hop the
+report shows how long it ran and how long it waited to start: queue and
+invocation wait for pushed hops, scheduler lag for EventBridge schedules.
+It also reports the deadline-to-notification delay and the slowest hop.
+
+Spans come from the load-test collector, or from CloudWatch Logs exports
+of the `{"trace_spans": [...]}` lines the functions print:
+
+    python -m loadtest.traces spans.log
+"""
+import argparse
+import json
+import sys
+from collections import defaultdict
+
+from .harness import percentile
+
+# The hop that fires at the deadline and the one that sends the expiry notification
+DEADLINE_HOP = 'deadline_check'
+NOTIFICATION_HOP = 'ExpiredTasksStateMachine'
+
+
+def hop_name(span):
+    return span['attributes'].get('faas.module') or span['name']
+
+
+def group(spans):
+    """{trace_id: [span, ...]} ordered by start time"""
+    traces = defaultdict(list)
+    for span in sorted(spans, key=lambda span: span['start']):
+        traces[span['trace_id']].append(span)
+    return dict(traces)
+
+
+def hops(trace):
+    """The invocation and execution spans of a trace, in start order"""
+    result = []
+    for span in trace:
+        if span['kind'] not in ('server', 'consumer'):
+            continue
+        attributes = span['attributes']
+        lag = attributes.get('schedule.lag_ms')
+        if lag is not None:
+            # Firing early (the load test fast-forwards schedules) is not a delay
+            lag = max(0.0, lag)
+        result.append({
+            'hop': hop_name(span),
+            'start': span['start'],
+            'end': span['end'],
+            'duration_ms': span['duration_ms'],
+            'wait_ms': attributes.get('hop.wait_ms'),
+            'lag_ms': lag,
+            # A scheduled hop is meant to wait until its schedule; only lag past it is delay
+            'delay_ms': span['duration_ms'] + (lag if lag is not None else attributes.get('hop.wait_ms') or 0.0),
+            'error': span['error']
+        })
+    return result
+
+
+def deadline_to_notification_ms(trace_hops):
+    """Scheduler lag at the deadline plus the time until the expiry notification was sent"""
+    deadline = next((hop for hop in trace_hops if hop['hop'] == DEADLINE_HOP), None)
+    notification = next((hop for hop in reversed(trace_hops) if hop['hop'] == NOTIFICATION_HOP), None)
+    if deadline is None or notification is None:
+        return None
+    return (deadline['lag_ms'] or 0.0) + (notification['end'] - deadline['start']) * 1000
+
+
+def _distribution(values):
+    values = sorted(values)
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 50), 3),
+        'p95_ms': round(percentile(values, 95), 3),
+        'max_ms': round(values[-1], 3) if values else 0.0
+    }
+
+
+def analyze(spans):
+    traces = group(spans)
+    per_hop = defaultdict(lambda: defaultdict(list))
+    end_to_end = []
+    for trace in traces.values():
+        trace_hops = hops(trace)
+        for hop in trace_hops:
+            for metric in ('duration_ms', 'wait_ms', 'lag_ms', 'delay_ms'):
+                if hop[metric] is not None:
+                    per_hop[hop['hop']][metric].append(hop[metric])
+        delay = deadline_to_notification_ms(trace_hops)
+        if delay is not None:
+            end_to_end.append(delay)
+
+    hop_stats = {
+        name: {metric: _distribution(values) for metric, values in metrics.items()}
+        for name, metrics in per_hop.items()
+    }
+    slowest = max(hop_stats, key=lambda name: hop_stats[name]['delay_ms']['p95_ms'], default=None)
+    return {
+        'traces': len(traces),
+        'hops': hop_stats,
+        'deadline_to_notification': _distribution(end_to_end),
+        'slowest_hop': slowest
+    }
+
+
+def format_analysis(analysis):
+    lines = [f"{'hop':<28}{'count':>7}{'run p50':>10}{'run p95':>10}{'wait p95':>10}{'lag p95':>10}{'delay p95':>11}"]
+    for name, stats in analysis['hops'].items():
+        wait = stats.get('wait_ms', {}).get('p95_ms')
+        lag = stats.get('lag_ms', {}).get('p95_ms')
+        lines.append(f"{name:<28}{stats['duration_ms']['count']:>7}{stats['duration_ms']['p50_ms']:>10.2f}"
+                     f"{stats['duration_ms']['p95_ms']:>10.2f}{'-' if wait is None else f'{wait:.2f}':>10}"
+                     f"{'-' if lag is None else f'{lag:.2f}':>10}{stats['delay_ms']['p95_ms']:>11.2f}")
+    end_to_end = analysis['deadline_to_notification']
+    lines.append(f"deadline to notification: {end_to_end['count']} traces, p50 {end_to_end['p50_ms']}ms, "
+                 f"p95 {end_to_end['p95_ms']}ms, max {end_to_end['max_ms']}ms")
+    lines.append(f"slowest hop: {analysis['slowest_hop'] or '-'}")
+    return '\n'.join(lines)
+
+
+def read_spans(lines):
+    """Spans from log lines holding the tracing module's stdout export"""
+    spans = []
+    for line in lines:
+        start = line.find('{"trace_spans"')
+        if start >= 0:
+            spans.extend(json.loads(line[start:])['trace_spans'])
+    return spans
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Break task lifecycle traces down by hop')
+    parser.add_argument('paths', nargs='+', help='log exports containing trace_spans lines')
+    parser.add_argument('--json', action='store_true', help='print the analysis as JSON')
+    args = parser.parse_args(argv)
+
+    spans = []
+    for path in args.paths:
+        with open(path) as f:
+            spans.extend(read_spans(f))
+    analysis = analyze(spans)
+    print(json.dumps(analysis, indent=2) if args.json else format_analysis(analysis))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
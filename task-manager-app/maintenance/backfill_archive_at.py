@@ -0,0 +1,102 @@
+"""
+Stamp ArchiveAt on the completed and expired tasks that were closed before
+TasksTable had a TTL, so they move to the archive like newly closed tasks.
+
+A task closed more than --days ago gets a time in the past, which DynamoDB's
+TTL picks up within a few days; the others get their closing time plus
+--days (expired tasks, which record no closing time, count from now). Tasks
+reopened or already stamped meanwhile are left alone.
+
+    python -m maintenance.backfill_archive_at --table TasksTable --days 30 --dry-run
+
+Needs dynamodb:Scan and dynamodb:UpdateItem on the table.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TASKS_PATH = os.path.join(ROOT, 'functions', 'tasks')
+if TASKS_PATH not in sys.path:
+    sys.path.append(TASKS_PATH)
+
+import task_codec  # noqa: E402
+
+TTL_ATTRIBUTE = 'ArchiveAt'
+CLOSED_STATUSES = ('completed', 'expired')
+DEFAULT_DAYS = 30
+
+
+def closed_at(task):
+    """Epoch seconds the task was completed at, or None when it does not say"""
+    try:
+        moment = datetime.fromisoformat(str(task['completed_at']).replace('Z', '+00:00'))
+    except (KeyError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def candidates(table):
+    """Closed tasks without ArchiveAt, a Scan page at a time"""
+    projection, names = task_codec.projection(('TaskId', 'status', 'completed_at'))
+    kwargs = {
+        'FilterExpression': task_codec.condition('status', 'is_in', list(CLOSED_STATUSES)) & Attr(TTL_ATTRIBUTE).not_exists(),
+        'ProjectionExpression': projection,
+        'ExpressionAttributeNames': names
+    }
+    while True:
+        response = table.scan(**kwargs)
+        yield from (task_codec.decode(item) for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def backfill(table, days=DEFAULT_DAYS, dry_run=False, now=None):
+    """Stamp every candidate; returns what was found and done"""
+    now = time.time() if now is None else now
+    report = {'dry_run': dry_run, 'candidates': 0, 'due_now': 0, 'stamped': 0, 'skipped': 0}
+    for task in candidates(table):
+        report['candidates'] += 1
+        archive_at = int((closed_at(task) or now) + days * 86400)
+        report['due_now'] += int(archive_at <= now)
+        if dry_run:
+            continue
+        try:
+            table.update_item(
+                Key={'TaskId': task['TaskId']},
+                UpdateExpression='SET #ttl = :archive_at',
+                # Reopened or stamped by edit_task since the scan read it
+                ConditionExpression=task_codec.condition('status', 'eq', task['status']) & Attr(TTL_ATTRIBUTE).not_exists(),
+                ExpressionAttributeNames={'#ttl': TTL_ATTRIBUTE},
+                ExpressionAttributeValues={':archive_at': archive_at}
+            )
+            report['stamped'] += 1
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            report['skipped'] += 1
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Set ArchiveAt on closed tasks that predate the archive')
+    parser.add_argument('--table', default='TasksTable')
+    parser.add_argument('--days', type=float, default=DEFAULT_DAYS,
+                        help='days a closed task stays in the table (the TaskArchiveAfterDays parameter)')
+    parser.add_argument('--dry-run', action='store_true', help='report what would be stamped')
+    args = parser.parse_args(argv)
+
+    report = backfill(boto3.resource('dynamodb').Table(args.table), args.days, args.dry_run)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Stamp each task created before teams existed with its assignee's team, read
+from the custom:team attribute of the Cognito users, so it joins the team's
+TeamIndex partition and its admins' listings.
+
+Tasks whose assignee has no team (or is not a user of the pool) are left
+out of every team, as are tasks reassigned or given a team since the scan
+read them.
+
+    python -m maintenance.backfill_task_team --table TasksTable --user-pool-id <pool id> --dry-run
+
+Needs cognito-idp:ListUsers on the pool and dynamodb:Scan and
+dynamodb:UpdateItem on the table.
+"""
+import argparse
+import json
+import os
+import sys
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TASKS_PATH = os.path.join(ROOT, 'functions', 'tasks')
+if TASKS_PATH not in sys.path:
+    sys.path.append(TASKS_PATH)
+
+import task_codec  # noqa: E402
+
+TEAM_ATTRIBUTE = 'custom:team'
+
+
+def teams_by_email(cognito, user_pool_id):
+    """{email: team} for every user of the pool that has a team"""
+    teams = {}
+    kwargs = {'UserPoolId': user_pool_id}
+    while True:
+        response = cognito.list_users(**kwargs)
+        for user in response['Users']:
+            attributes = {attr['Name']: attr['Value'] for attr in user.get('Attributes', [])}
+            if attributes.get('email') and attributes.get(TEAM_ATTRIBUTE):
+                teams[attributes['email']] = attributes[TEAM_ATTRIBUTE]
+        if 'PaginationToken' not in response:
+            return teams
+        kwargs['PaginationToken'] = response['PaginationToken']
+
+
+def candidates(table):
+    """Tasks without a team, a Scan page at a time"""
+    projection, names = task_codec.projection(('TaskId', 'responsibility'))
+    kwargs = {
+        'FilterExpression': Attr(task_codec.stored_name('team')).not_exists(),
+        'ProjectionExpression': projection,
+        'ExpressionAttributeNames': names
+    }
+    while True:
+        response = table.scan(**kwargs)
+        yield from (task_codec.decode(item) for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def backfill(table, teams, dry_run=False):
+    """Stamp every candidate whose assignee has a team; returns what was found and done"""
+    report = {'dry_run': dry_run, 'candidates': 0, 'no_team': 0, 'stamped': 0, 'skipped': 0}
+    for task in candidates(table):
+        report['candidates'] += 1
+        team = teams.get(task.get('responsibility'))
+        if not team:
+            report['no_team'] += 1
+            continue
+        if dry_run:
+            continue
+        try:
+            table.update_item(
+                Key={'TaskId': task['TaskId']},
+                UpdateExpression='SET #team = :team',
+                # Reassigned or given a team since the scan read it
+                ConditionExpression=(task_codec.condition('responsibility', 'eq', task['responsibility'])
+                                     & Attr(task_codec.stored_name('team')).not_exists()),
+                ExpressionAttributeNames={'#team': task_codec.stored_name('team')},
+                ExpressionAttributeValues={':team': team}
+            )
+            report['stamped'] += 1
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            report['skipped'] += 1
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Give tasks without a team their assignee's team")
+    parser.add_argument('--table', default='TasksTable')
+    parser.add_argument('--user-pool-id', required=True)
+    parser.add_argument('--dry-run', action='store_true', help='report what would be stamped')
+    args = parser.parse_args(argv)
+
+    teams = teams_by_email(boto3.client('cognito-idp'), args.user_pool_id)
+    report = backfill(boto3.resource('dynamodb').Table(args.table), teams, args.dry_run)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Rewrite TasksTable items stored before the compact encoding (long attribute
+names, uncompressed descriptions, client attributes at the top level) the
+way task_codec stores them now.
+
+The handlers read both encodings, so the migration can run while the API
+serves traffic. Each item is rewritten only if it is still what the scan
+read; an item changed in the meantime was written compact by its writer, or
+is picked up by the next run.
+
+    python -m maintenance.migrate_task_encoding --table TasksTable --segments 4 --dry-run
+
+Needs dynamodb:Scan and dynamodb:PutItem on the table.
+"""
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TASKS_PATH = os.path.join(ROOT, 'functions', 'tasks')
+if TASKS_PATH not in sys.path:
+    sys.path.append(TASKS_PATH)
+
+import task_codec  # noqa: E402
+
+DEFAULT_SEGMENTS = 4
+
+
+def unchanged(item):
+    """Condition that the stored item is still exactly `item`"""
+    expression = None
+    for name, value in item.items():
+        condition = Attr(name).eq(value)
+        expression = condition if expression is None else expression & condition
+    for name in (*task_codec.LONG_NAMES, task_codec.EXTRA_NAME):
+        if name not in item:
+            expression &= Attr(name).not_exists()
+    return expression
+
+
+def migrate_segment(table, segment, segments, dry_run=False):
+    """Scan one segment and rewrite its legacy items; returns the segment's counts"""
+    report = Counter()
+    kwargs = {'Segment': segment, 'TotalSegments': segments}
+    while True:
+        response = table.scan(**kwargs)
+        for item in response.get('Items', []):
+            report['scanned'] += 1
+            encoded = task_codec.encode(task_codec.decode(item))
+            if encoded == item:
+                report['compact'] += 1
+                continue
+            report['legacy'] += 1
+            report['bytes_before'] += task_codec.item_size(item)
+            report['bytes_after'] += task_codec.item_size(encoded)
+            if dry_run:
+                continue
+            try:
+                table.put_item(Item=encoded, ConditionExpression=unchanged(item))
+                report['migrated'] += 1
+            except table.meta.client.exceptions.ConditionalCheckFailedException:
+                report['skipped'] += 1
+        if 'LastEvaluatedKey' not in response:
+            return report
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def migrate(table, dry_run=False, segments=DEFAULT_SEGMENTS):
+    """Migrate the whole table with one parallel scan segment per worker; returns what was found and done"""
+    totals = Counter()
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        for report in pool.map(lambda segment: migrate_segment(table, segment, segments, dry_run), range(segments)):
+            totals.update(report)
+    report = {'dry_run': dry_run, **{name: totals[name] for name in
+              ('scanned', 'compact', 'legacy', 'migrated', 'skipped', 'bytes_before', 'bytes_after')}}
+    report['bytes_saved'] = report['bytes_before'] - report['bytes_after']
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rewrite TasksTable items in the compact task encoding')
+    parser.add_argument('--table', default='TasksTable')
+    parser.add_argument('--segments', type=int, default=DEFAULT_SEGMENTS, help='parallel scan segments')
+    parser.add_argument('--dry-run', action='store_true', help='report what would be rewritten')
+    args = parser.parse_args(argv)
+
+    report = migrate(boto3.resource('dynamodb').Table(args.table), args.dry_run, args.segments)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
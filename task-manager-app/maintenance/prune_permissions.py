@@ -0,0 +1,129 @@
+"""
+Remove the per-task statements that deadline scheduling used to add to the
+deadline functions' resource policies (Sid EventBridge-<task id>).
+
+The template now grants EventBridge one wildcard permission per function, so
+these statements only take up room in a policy capped at 20 KB. A statement
+is removed only when another statement in the same policy already allows its
+rule; statements for other rules are reported and kept.
+
+    python -m maintenance.prune_permissions --function task-manager-app-TaskDeadlineNotificationFunction-Ab12 \
+        --function task-manager-app-DeadlineCheckFunction-Cd34 --dry-run
+
+Needs lambda:GetPolicy and lambda:RemovePermission on the functions.
+"""
+import argparse
+import fnmatch
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAYER_PATH = os.path.join(ROOT, 'layers', 'shared', 'python')
+if LAYER_PATH not in sys.path:
+    sys.path.append(LAYER_PATH)
+
+import throttling  # noqa: E402
+
+# Statement ids schedule_deadline_notification and deadline_warning used to add, one per task
+PER_TASK_SID = re.compile(r'^EventBridge-.+$')
+EVENTS_PRINCIPAL = 'events.amazonaws.com'
+# Lambda's control plane allows about 15 requests per second per account, so stay well below it
+DEFAULT_CONCURRENCY = 4
+
+
+def _principal(statement):
+    principal = statement.get('Principal')
+    return principal.get('Service') if isinstance(principal, dict) else principal
+
+
+def _source_arn(statement):
+    return statement.get('Condition', {}).get('ArnLike', {}).get('AWS:SourceArn')
+
+
+def read_policy(lambda_client, function_name):
+    """(statements, policy size in bytes) of the function's resource policy; ([], 0) when it has none"""
+    try:
+        policy = lambda_client.get_policy(FunctionName=function_name)['Policy']
+    except lambda_client.exceptions.ResourceNotFoundException:
+        return [], 0
+    return json.loads(policy)['Statement'], len(policy)
+
+
+def plan(statements):
+    """Split the per-task statements into those a remaining statement covers (removable) and the rest (kept)"""
+    shared = [statement for statement in statements
+              if not PER_TASK_SID.match(statement['Sid']) and _principal(statement) == EVENTS_PRINCIPAL]
+    removable, kept = [], []
+    for statement in statements:
+        if not PER_TASK_SID.match(statement['Sid']):
+            continue
+        source_arn = _source_arn(statement)
+        covered = source_arn is not None and any(
+            _source_arn(other) is None or fnmatch.fnmatchcase(source_arn, _source_arn(other)) for other in shared)
+        (removable if covered else kept).append(statement['Sid'])
+    return removable, kept
+
+
+def prune(lambda_client, function_name, dry_run=False, concurrency=DEFAULT_CONCURRENCY):
+    """Remove the covered per-task statements of one function; returns what was found and done"""
+    statements, size = read_policy(lambda_client, function_name)
+    removable, kept = plan(statements)
+    report = {'function': function_name, 'statements': len(statements), 'policy_bytes': size,
+              'removable': len(removable), 'kept': kept, 'removed': 0, 'failed': {}}
+    if dry_run or not removable:
+        return report
+
+    def remove(sid):
+        try:
+            lambda_client.remove_permission(FunctionName=function_name, StatementId=sid)
+        except lambda_client.exceptions.ResourceNotFoundException:
+            # Removed by a concurrent run; the outcome is the same
+            pass
+        except Exception as e:
+            return sid, str(e)
+        return sid, None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for sid, error in pool.map(remove, removable):
+            if error is None:
+                report['removed'] += 1
+            else:
+                report['failed'][sid] = error
+    report['policy_bytes_after'] = read_policy(lambda_client, function_name)[1]
+    return report
+
+
+def format_report(reports, dry_run):
+    lines = [f"{'function':<60}{'statements':>11}{'bytes':>8}{'removable':>11}{'kept':>6}{'removed':>9}{'failed':>8}"]
+    for report in reports:
+        lines.append(f"{report['function']:<60}{report['statements']:>11}{report['policy_bytes']:>8}"
+                     f"{report['removable']:>11}{len(report['kept']):>6}{report['removed']:>9}{len(report['failed']):>8}")
+    if dry_run:
+        lines.append('dry run: nothing was removed')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Prune per-task EventBridge statements from Lambda resource policies')
+    parser.add_argument('--function', action='append', required=True, metavar='NAME',
+                        help='function name or ARN (repeatable)')
+    parser.add_argument('--dry-run', action='store_true', help='report what would be removed')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--json', metavar='PATH', help='also write the report as JSON')
+    args = parser.parse_args(argv)
+
+    # Throttled removals back off and retry instead of failing the run
+    lambda_client = throttling.client('lambda')
+    reports = [prune(lambda_client, name, args.dry_run, args.concurrency) for name in args.function]
+    print(format_report(reports, args.dry_run))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
+    return 1 if any(report['failed'] for report in reports) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
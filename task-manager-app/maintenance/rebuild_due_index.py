@@ -0,0 +1,85 @@
+"""
+Bring DueTasksTable in line with TasksTable under the current
+DUE_INDEX_SHARDS: entries every open task with a deadline should have are
+written, and entries no task accounts for (the all-tasks buckets written
+before sharding, or under another shard count) are deleted. Run it once
+after deploying a new shard count; the stream keeps the index current
+afterwards. Entries the stream changes while this runs may be left stale,
+so a second run cleans them up.
+
+    DUE_INDEX_SHARDS=8 python -m maintenance.rebuild_due_index --dry-run
+
+Needs dynamodb:Scan on both tables and dynamodb:BatchWriteItem on
+DueTasksTable.
+"""
+import argparse
+import json
+import os
+import sys
+from decimal import Decimal
+
+import boto3
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TASKS_PATH = os.path.join(ROOT, 'functions', 'tasks')
+if TASKS_PATH not in sys.path:
+    sys.path.append(TASKS_PATH)
+
+import due_index  # noqa: E402
+import task_codec  # noqa: E402
+
+
+def _scan(table, **kwargs):
+    while True:
+        response = table.scan(**kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def expected_entries(tasks_table):
+    """{(Bucket, DueKey): entry} of every task, from a scan of the tasks table"""
+    entries = {}
+    for item in _scan(tasks_table):
+        for entry in due_index.entries_for(task_codec.decode(item)):
+            # Entries come back from DynamoDB with Decimal numbers
+            entry['DueAt'] = Decimal(entry['DueAt'])
+            entries[(entry['Bucket'], entry['DueKey'])] = entry
+    return entries
+
+
+def rebuild(tasks_table, due_table, dry_run=False):
+    """Write missing or outdated entries and delete orphaned ones; returns what was found and done"""
+    expected = expected_entries(tasks_table)
+    stored = {(entry['Bucket'], entry['DueKey']): entry for entry in _scan(due_table)}
+    orphaned = [key for key in stored if key not in expected]
+    missing = [entry for key, entry in expected.items() if stored.get(key) != entry]
+    report = {'dry_run': dry_run, 'shards': due_index.DUE_INDEX_SHARDS, 'expected': len(expected),
+              'stored': len(stored), 'written': len(missing), 'deleted': len(orphaned)}
+    if dry_run:
+        return report
+
+    with due_table.batch_writer() as batch:
+        for bucket, due_key in orphaned:
+            batch.delete_item(Key={'Bucket': bucket, 'DueKey': due_key})
+        for entry in missing:
+            batch.put_item(Item=entry)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rebuild the due index of TasksTable under the current shard count')
+    parser.add_argument('--table', default='TasksTable')
+    parser.add_argument('--due-table', default=due_index.DUE_TASKS_TABLE_NAME)
+    parser.add_argument('--dry-run', action='store_true', help='report what would be written and deleted')
+    args = parser.parse_args(argv)
+
+    dynamodb = boto3.resource('dynamodb')
+    report = rebuild(dynamodb.Table(args.table), dynamodb.Table(args.due_table), args.dry_run)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
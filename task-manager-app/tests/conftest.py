@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Handlers are deployed as flat Lambda packages, so import them the same way
+for path in ('functions/tasks', 'functions/users', 'layers/shared/python'):
+    full_path = os.path.join(ROOT, path)
+    if full_path not in sys.path:
+        sys.path.insert(0, full_path)
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-central-1')
+os.environ.setdefault('AWS_REGION', os.environ['AWS_DEFAULT_REGION'])
+
+
+@pytest.fixture()
+def stack(request):
+    """
+    The whole template running in-process against the AWS stand-ins; parametrize
+    indirectly with a dict to override template parameters
+    """
+    import boto3
+    from loadtest.harness import Harness
+
+    environment = dict(os.environ)
+    modules = dict(sys.modules)
+    try:
+        yield Harness(parameters=getattr(request, 'param', None)).start()
+    finally:
+        # Give the other tests back the modules and environment they imported with
+        boto3.DEFAULT_SESSION = None
+        os.environ.clear()
+        os.environ.update(environment)
+        for name in set(sys.modules) - set(modules):
+            del sys.modules[name]
+        sys.modules.update(modules)
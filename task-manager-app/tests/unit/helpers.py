@@ -0,0 +1,22 @@
+"""Claims and task helpers shared by the unit tests; the stack fixture is in tests/conftest.py"""
+from datetime import datetime, timedelta, timezone
+
+from loadtest.harness import claims_for
+
+ADMIN = claims_for('admin@x.io', admin=True)
+ALICE = claims_for('alice@x.io')
+BOB = claims_for('bob@x.io')
+RED_ADMIN = claims_for('lead@red.io', admin=True, team='red')
+BLUE_ADMIN = claims_for('lead@blue.io', admin=True, team='blue')
+
+
+def deadline(hours):
+    """A deadline `hours` from now, as the API takes it"""
+    return (datetime.now(timezone.utc) + timedelta(hours=hours)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def assign(stack, claims=ADMIN, **fields):
+    """Create a task through POST /tasks, assigned to Alice unless `fields` say otherwise; returns its TaskId"""
+    status, payload = stack.request('POST', '/tasks', claims, dict({'name': 'Report', 'responsibility': 'alice@x.io'}, **fields))
+    assert status == 200
+    return payload['TaskId']
@@ -0,0 +1,50 @@
+import pytest
+
+import api
+from loadtest.harness import claims_for
+
+
+def test_schema_reports_missing_and_mistyped_fields():
+    schema = api.Schema(required=('name', 'responsibility'), types={'name': str, 'estimate_hours': int})
+
+    with pytest.raises(api.ApiError) as missing:
+        schema.validate({'name': 'Report', 'responsibility': ''})
+    with pytest.raises(api.ApiError) as mistyped:
+        schema.validate({'name': 'Report', 'responsibility': 'alice@x.io', 'estimate_hours': True})
+
+    assert (missing.value.status_code, missing.value.message) == (400, 'Missing required fields: responsibility')
+    assert mistyped.value.message == 'estimate_hours must be a number'
+
+
+def test_endpoint_maps_errors_to_responses_with_cors_headers():
+    @api.endpoint(errors={LookupError: (410, 'Gone')})
+    def handler(request):
+        raise {'gone': LookupError(), 'broken': RuntimeError()}[request.query['case']]
+
+    def call(case, claims=claims_for('alice@x.io')):
+        return handler({'requestContext': {'authorizer': {'claims': claims}},
+                        'queryStringParameters': {'case': case}}, None)
+
+    gone, broken, anonymous = call('gone'), call('broken'), call('gone', claims={})
+
+    assert (gone['statusCode'], gone['body']) == (410, '{"error":"Gone"}')
+    assert (broken['statusCode'], broken['body']) == (500, '{"error":"Internal Server Error"}')
+    assert (anonymous['statusCode'], anonymous['body']) == (401, '{"message":"Missing user email"}')
+    for response in (gone, broken, anonymous):
+        assert response['headers']['Access-Control-Allow-Origin'] == '*'
+        assert response['headers']['Server-Timing'].startswith('app;dur=')
+
+
+def test_handlers_validate_bodies_before_doing_any_work(stack):
+    admin = claims_for('admin@x.io', admin=True)
+    past = {'name': 'Report', 'responsibility': 'alice@x.io', 'deadline': '2020-01-01T00:00:00Z'}
+
+    response = stack.invoke(stack.function_for('assign_task'), stack.api_event('POST', '/tasks', admin, past))
+    assert response['statusCode'] == 400
+    assert response['headers']['Access-Control-Allow-Origin'] == '*'
+
+    event = stack.api_event('POST', '/tasks', admin)
+    event.update({'body': '{"name": ', 'isBase64Encoded': False})
+    assert stack.invoke(stack.function_for('assign_task'), event)['statusCode'] == 400
+    assert stack.request('DELETE', '/tasks', claims_for('alice@x.io'), {'TaskId': 'task-1'})[0] == 403
+    assert stack.aws.calls_for('assign_task') == {} and stack.aws.calls_for('delete_task') == {}
@@ -0,0 +1,111 @@
+import task_codec
+from loadtest.harness import claims_for
+from tests.unit.helpers import ADMIN, BLUE_ADMIN, RED_ADMIN, assign, deadline
+
+
+def _store(stack, count, responsibility, status='open', team=None, prefix='t'):
+    table = stack.aws.dynamodb.table('TasksTable')
+    for index in range(count):
+        task = {'TaskId': f"{prefix}{index:03d}", 'name': f"Task {index}", 'status': status, 'responsibility': responsibility}
+        if team:
+            task['team'] = team
+        table.store(task_codec.encode(task))
+
+
+def _task(stack, task_id):
+    return task_codec.decode(stack.aws.dynamodb.table('TasksTable').items[(task_id, None)])
+
+
+def _bulk(stack, claims, job_filter, changes):
+    status, job = stack.request('POST', '/tasks/bulk', claims, {'filter': job_filter, 'set': changes})
+    assert status == 202 and job['status'] == 'running'
+    stack.settle()
+    return stack.request('GET', f"/tasks/bulk/{job['JobId']}", claims)[1]
+
+
+def test_offboarding_reassigns_open_tasks_in_one_job(stack):
+    due_soon = assign(stack, name='Due soon', responsibility='leaver@x.io', deadline=deadline(hours=3))
+    _store(stack, 60, 'leaver@x.io')
+    _store(stack, 5, 'leaver@x.io', status='completed', prefix='c')
+    _store(stack, 5, 'stays@x.io', prefix='s')
+    stack.settle()
+    stack.aws.sns.published.clear()
+    stack.aws.reset_calls()
+
+    job = _bulk(stack, ADMIN, {'responsibility': 'leaver@x.io', 'status': 'open'}, {'responsibility': 'heir@x.io'})
+    assert (job['status'], job['matched'], job['updated'], job['unchanged'], job['conflicts']) == ('succeeded', 61, 61, 0, 0)
+    assert 'cursor' not in job and job['started_by'] == 'admin@x.io'
+
+    assert {_task(stack, f"t{index:03d}")['responsibility'] for index in range(60)} == {'heir@x.io'}
+    assert _task(stack, 'c000')['responsibility'] == 'leaver@x.io' and _task(stack, 's000')['responsibility'] == 'stays@x.io'
+    assert [task['TaskId'] for task in stack.request('GET', '/tasks', claims_for('leaver@x.io'))[1]] == ['c000', 'c001', 'c002', 'c003', 'c004']
+
+    # One message for the new assignee, written in transactions of 25 with no rule rewritten
+    (message,) = stack.aws.sns.published
+    assert message['MessageAttributes']['email']['StringValue'] == 'heir@x.io'
+    assert '61 task(s) were reassigned' in message['Message'] and '...and 11 more' in message['Message']
+    calls = stack.aws.calls_for('run_bulk_update')
+    assert calls[('dynamodb', 'TransactWriteItems')] == 3
+    assert not any(service == 'events' for service, _ in calls)
+
+    # The deadline warning scheduled for the leaver reaches the new assignee
+    stack.fire_schedules()
+    warning = stack.aws.sns.published[-1]
+    assert warning['Subject'] == '⚠️ Task Due in 1 Hour!' and due_soon in warning['Message']
+    assert warning['MessageAttributes']['email']['StringValue'] == 'heir@x.io'
+
+
+def test_team_admin_completes_their_team_and_rules_go(stack):
+    red = assign(stack, RED_ADMIN, name='Red', responsibility='alice@red.io', deadline=deadline(hours=3))
+    _store(stack, 10, 'alice@red.io', team='red')
+    _store(stack, 10, 'alice@red.io', team='blue', prefix='b')
+    stack.settle()
+    stack.aws.sns.published.clear()
+
+    # The filter's team is the admin's own, whatever it asks for
+    job = _bulk(stack, RED_ADMIN, {'responsibility': 'alice@red.io', 'team': 'blue'}, {'status': 'completed'})
+    assert (job['status'], job['team'], job['updated']) == ('succeeded', 'red', 11)
+    assert _task(stack, red)['status'] == 'completed' and 'ArchiveAt' in _task(stack, red)
+    assert {_task(stack, f"b{index:03d}")['status'] for index in range(10)} == {'open'}
+    assert stack.aws.events.rules == {}
+    assert [message['Subject'] for message in stack.aws.sns.published] == ['Task Completed']
+    stack.settle()
+    assert stack.request('GET', '/tasks/stats', RED_ADMIN)[1]['counts']['completed'] == 11
+
+    # Reopening reaches the same tasks back, and the job is the red team's alone
+    reopened = _bulk(stack, ADMIN, {'team': 'red', 'status': 'completed'}, {'status': 'open'})
+    assert (reopened['updated'], _task(stack, red)['status']) == (11, 'open') and 'ArchiveAt' not in _task(stack, red)
+    assert stack.request('GET', f"/tasks/bulk/{job['JobId']}", BLUE_ADMIN)[0] == 404
+    assert stack.request('GET', f"/tasks/bulk/{job['JobId']}", claims_for('alice@red.io', team='red'))[0] == 403
+
+    for body in ({'filter': {}, 'set': {'status': 'completed'}},
+                 {'filter': {'status': 'open'}, 'set': {'status': 'expired'}},
+                 {'filter': {'name': 'x'}, 'set': {'status': 'completed'}},
+                 {'filter': {'status': 'open'}, 'set': {'responsibility': ''}}):
+        assert stack.request('POST', '/tasks/bulk', ADMIN, body)[0] == 400
+    assert stack.request('POST', '/tasks/bulk', claims_for('alice@red.io'), {'filter': {'status': 'open'},
+                                                                             'set': {'status': 'completed'}})[0] == 403
+
+
+def test_long_jobs_continue_and_skip_tasks_changed_meanwhile(stack, monkeypatch):
+    _store(stack, 30, 'leaver@x.io')
+    worker = stack.modules['RunBulkUpdateFunction']
+    # Every page hands off to a new invocation
+    monkeypatch.setattr(worker, 'BULK_PAGE_SIZE', 8)
+    monkeypatch.setattr(worker, 'BULK_STOP_MARGIN_MS', 10 ** 9)
+
+    write = worker.write
+
+    def write_after_a_concurrent_edit(changed):
+        # Someone completes a task between the job's read and its write
+        if changed and changed[0][0]['TaskId'] == 't008':
+            stack.aws.dynamodb.table('TasksTable').store(task_codec.encode(dict(changed[1][0], status='completed')))
+        return write(changed)
+
+    monkeypatch.setattr(worker, 'write', write_after_a_concurrent_edit)
+    job = _bulk(stack, ADMIN, {'responsibility': 'leaver@x.io'}, {'responsibility': 'heir@x.io'})
+
+    assert (job['status'], job['invocations']) == ('succeeded', 4)
+    assert (job['matched'], job['updated'], job['conflicts']) == (30, 29, 1)
+    assert _task(stack, 't009') == {'TaskId': 't009', 'name': 'Task 9', 'status': 'completed', 'responsibility': 'leaver@x.io'}
+    assert len(stack.aws.sns.published) == 4
@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+import change_log
+
+
+def test_reassignment_is_a_delete_for_the_previous_owner():
+    old = {'TaskId': 't1', 'responsibility': 'a@x.io', 'status': 'open'}
+    new = dict(old, responsibility='b@x.io')
+
+    entries = [(feed, op) for feed, op, _ in change_log._entries(old, new)]
+
+    assert entries == [('ALL', 'upsert'), ('USER#b@x.io', 'upsert'), ('USER#a@x.io', 'delete')]
+
+
+def test_deletion_reaches_all_and_owner_feeds():
+    old = {'TaskId': 't1', 'responsibility': 'a@x.io'}
+
+    entries = [(feed, op) for feed, op, _ in change_log._entries(old, None)]
+
+    assert entries == [('ALL', 'delete'), ('USER#a@x.io', 'delete')]
+
+
+def test_moving_team_is_a_delete_for_the_previous_team():
+    old = {'TaskId': 't1', 'responsibility': 'a@x.io', 'team': 'red'}
+    new = dict(old, team='blue')
+
+    entries = [(feed, op) for feed, op, _ in change_log._entries(old, new)]
+
+    assert entries == [('ALL', 'upsert'), ('USER#a@x.io', 'upsert'), ('TEAM#blue', 'upsert'), ('TEAM#red', 'delete')]
+
+
+def test_cursors_sort_by_time_then_sequence():
+    assert change_log.make_cursor(1000, '99') < change_log.make_cursor(1000, '100') < change_log.make_cursor(1001, '1')
+    assert change_log.cursor_time_ms(change_log.make_cursor(1234, '5')) == 1234
+
+
+def test_cursor_older_than_retention_requires_resync():
+    expired_ms = int((time.time() - (change_log.CHANGE_LOG_RETENTION_DAYS + 1) * 86400) * 1000)
+
+    with pytest.raises(change_log.CursorExpiredError):
+        change_log.read_changes('ALL', change_log.make_cursor(expired_ms), 10)
+
+
+def test_read_changes_pages_and_advances_cursor(monkeypatch):
+    base = int(time.time() * 1000) - 60_000
+    items = [{'Feed': 'ALL', 'Cursor': change_log.make_cursor(base + i, str(i)), 'TaskId': f"t{i}", 'Op': 'upsert', 'ExpiresAt': 1}
+             for i in range(5)]
+
+    class FakeTable:
+        def query(self, KeyConditionExpression, Limit):
+            lower, upper = KeyConditionExpression._values[1]._values[1:]
+            matching = [item for item in items if lower <= item['Cursor'] <= upper]
+            response = {'Items': matching[:Limit]}
+            if len(matching) > Limit:
+                response['LastEvaluatedKey'] = {'Cursor': matching[Limit - 1]['Cursor']}
+            return response
+
+    monkeypatch.setattr(change_log, 'changes_table', FakeTable())
+
+    changes, cursor, has_more = change_log.read_changes('ALL', change_log.make_cursor(base - 1), 3)
+    assert [c['TaskId'] for c in changes] == ['t0', 't1', 't2'] and has_more
+    assert 'Feed' not in changes[0] and 'ExpiresAt' not in changes[0]
+
+    changes, cursor, has_more = change_log.read_changes('ALL', cursor, 3)
+    assert [c['TaskId'] for c in changes] == ['t3', 't4'] and not has_more
+    assert cursor > items[-1]['Cursor']
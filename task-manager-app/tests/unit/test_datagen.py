@@ -0,0 +1,34 @@
+from collections import Counter
+from datetime import datetime, timezone
+
+from loadtest import bench_scaling, datagen
+
+NOW = datetime(2025, 3, 12, 9, 30, tzinfo=timezone.utc)
+
+
+def test_same_seed_generates_the_same_tasks():
+    assert datagen.generate_tasks(50, seed=7, now=NOW) == datagen.generate_tasks(50, seed=7, now=NOW)
+    assert datagen.generate_tasks(50, seed=7, now=NOW) != datagen.generate_tasks(50, seed=8, now=NOW)
+
+
+def test_assignees_are_skewed_and_deadlines_match_status():
+    tasks = datagen.generate_tasks(5000, seed=1, user_count=100, now=NOW)
+    per_user = Counter(task['responsibility'] for task in tasks).most_common()
+
+    assert per_user[0][1] > 10 * per_user[len(per_user) // 2][1]
+    now = NOW.strftime('%Y-%m-%dT%H:%M:%SZ')
+    assert all(task['deadline'] < now for task in tasks if task['status'] == 'expired')
+    open_with_deadline = [task for task in tasks if task['status'] == 'open' and 'deadline' in task]
+    overdue = sum(task['deadline'] < now for task in open_with_deadline)
+    assert overdue < 0.1 * len(open_with_deadline)
+
+
+def test_scaling_run_reports_scanned_versus_returned(stack):
+    result = bench_scaling.run_size(300, repeat=2, harness=stack)
+
+    endpoints = result['endpoints']
+    busiest = endpoints['get_user_tasks (busiest user)']
+    assert busiest['items_scanned'] == 300
+    assert busiest['result_items'] == busiest['expected_items']
+    assert endpoints['get_task_stats']['statuses'] == {'200': 2}
+    assert endpoints['deadline_check']['statuses'] == {'ok': 2}
@@ -0,0 +1,75 @@
+import due_index
+import write_shards
+
+
+class FakeBatch:
+    def __init__(self, table):
+        self.table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def put_item(self, Item):
+        self.table.puts.append(Item)
+
+    def delete_item(self, Key):
+        self.table.deletes.append(Key)
+
+
+class FakeDueTable:
+    def __init__(self):
+        self.puts = []
+        self.deletes = []
+
+    def batch_writer(self):
+        return FakeBatch(self)
+
+
+# The all-tasks bucket of a day is sharded; t1 always lands in the same shard
+SHARD = write_shards.shard_of('t1', due_index.DUE_INDEX_SHARDS)
+TASK = {'TaskId': 't1', 'status': 'open', 'responsibility': 'a@x.io', 'name': 'n', 'deadline': '2030-01-02T03:04:05Z'}
+
+
+def test_open_task_is_indexed_for_all_and_its_owner():
+    entries = due_index.entries_for(TASK)
+
+    assert {e['Bucket'] for e in entries} == {f'ALL#2030-01-02#{SHARD}', 'USER#a@x.io#2030-01-02'}
+    assert all(e['DueKey'] == f"{e['DueAt']:010d}#t1" for e in entries)
+
+
+def test_closed_or_undated_tasks_are_not_indexed():
+    assert due_index.entries_for(dict(TASK, status='completed')) == []
+    assert due_index.entries_for({k: v for k, v in TASK.items() if k != 'deadline'}) == []
+    assert due_index.entries_for(dict(TASK, deadline='not a date')) == []
+
+
+def test_completion_removes_entries(monkeypatch):
+    table = FakeDueTable()
+    monkeypatch.setattr(due_index, 'due_table', table)
+
+    due_index.apply_change(TASK, dict(TASK, status='completed'))
+
+    assert table.puts == []
+    assert len(table.deletes) == 2
+
+
+def test_deadline_move_replaces_entries(monkeypatch):
+    table = FakeDueTable()
+    monkeypatch.setattr(due_index, 'due_table', table)
+
+    due_index.apply_change(TASK, dict(TASK, deadline='2030-01-05T00:00:00Z'))
+
+    assert {p['Bucket'] for p in table.puts} == {f'ALL#2030-01-05#{SHARD}', 'USER#a@x.io#2030-01-05'}
+    assert {d['Bucket'] for d in table.deletes} == {f'ALL#2030-01-02#{SHARD}', 'USER#a@x.io#2030-01-02'}
+
+
+def test_comment_edit_does_not_rewrite_the_index(monkeypatch):
+    table = FakeDueTable()
+    monkeypatch.setattr(due_index, 'due_table', table)
+
+    due_index.apply_change(TASK, dict(TASK, comment='hello'))
+
+    assert table.puts == [] and table.deletes == []
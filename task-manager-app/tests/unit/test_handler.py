@@ -1,72 +1,108 @@
-import json
-
-import pytest
-
-from hello_world import app
-
-
-@pytest.fixture()
-def apigw_event():
-    """ Generates API GW Event"""
-
-    return {
-        "body": '{ "test": "body"}',
-        "resource": "/{proxy+}",
-        "requestContext": {
-            "resourceId": "123456",
-            "apiId": "1234567890",
-            "resourcePath": "/{proxy+}",
-            "httpMethod": "POST",
-            "requestId": "c6af9ac6-7b61-11e6-9a41-93e8deadbeef",
-            "accountId": "123456789012",
-            "identity": {
-                "apiKey": "",
-                "userArn": "",
-                "cognitoAuthenticationType": "",
-                "caller": "",
-                "userAgent": "Custom User Agent String",
-                "user": "",
-                "cognitoIdentityPoolId": "",
-                "cognitoIdentityId": "",
-                "cognitoAuthenticationProvider": "",
-                "sourceIp": "127.0.0.1",
-                "accountId": "",
-            },
-            "stage": "prod",
-        },
-        "queryStringParameters": {"foo": "bar"},
-        "headers": {
-            "Via": "1.1 08f323deadbeefa7af34d5feb414ce27.cloudfront.net (CloudFront)",
-            "Accept-Language": "en-US,en;q=0.8",
-            "CloudFront-Is-Desktop-Viewer": "true",
-            "CloudFront-Is-SmartTV-Viewer": "false",
-            "CloudFront-Is-Mobile-Viewer": "false",
-            "X-Forwarded-For": "127.0.0.1, 127.0.0.2",
-            "CloudFront-Viewer-Country": "US",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-            "Upgrade-Insecure-Requests": "1",
-            "X-Forwarded-Port": "443",
-            "Host": "1234567890.execute-api.us-east-1.amazonaws.com",
-            "X-Forwarded-Proto": "https",
-            "X-Amz-Cf-Id": "aaaaaaaaaae3VYQb9jd-nvCd-de396Uhbp027Y2JvkCPNLmGJHqlaA==",
-            "CloudFront-Is-Tablet-Viewer": "false",
-            "Cache-Control": "max-age=0",
-            "User-Agent": "Custom User Agent String",
-            "CloudFront-Forwarded-Proto": "https",
-            "Accept-Encoding": "gzip, deflate, sdch",
-        },
-        "pathParameters": {"proxy": "/examplepath"},
-        "httpMethod": "POST",
-        "stageVariables": {"baz": "qux"},
-        "path": "/examplepath",
+from tests.unit.helpers import ADMIN, ALICE, BOB, assign, deadline
+
+
+def test_assigned_task_reaches_assignee_and_counters(stack):
+    task_id = assign(stack)
+    stack.settle()
+
+    status, tasks = stack.request('GET', '/tasks', ALICE)
+    assert status == 200
+    assert [task['TaskId'] for task in tasks] == [task_id]
+    assert stack.request('GET', '/tasks', BOB) == (200, [])
+
+    status, stats = stack.request('GET', '/tasks/stats', ALICE)
+    assert stats['counts']['open'] == 1
+
+    published = stack.aws.sns.published
+    assert [message['Subject'] for message in published] == ['New Task Assignment']
+    assert published[0]['MessageAttributes']['email']['StringValue'] == 'alice@x.io'
+
+
+def test_only_the_assignee_can_complete_a_task(stack):
+    task_id = assign(stack)
+
+    assert stack.request('PUT', '/tasks', BOB, {'TaskId': task_id, 'status': 'completed'})[0] == 403
+    assert stack.request('PUT', '/tasks', ALICE, {'TaskId': task_id, 'status': 'completed'})[0] == 200
+    stack.settle()
+
+    status, stats = stack.request('GET', '/tasks/stats', ALICE)
+    assert (stats['counts']['open'], stats['counts']['completed']) == (0, 1)
+
+
+def test_missed_deadline_expires_the_task_and_cleans_up_rules(stack):
+    task_id = assign(stack, deadline=deadline(hours=3))
+    assert set(stack.aws.events.rules) == {f"task-deadline-{task_id}"}
+
+    # Warning rule, then the final deadline rule it schedules
+    stack.fire_schedules(rounds=2)
+
+    table = stack.aws.dynamodb.table('TasksTable')
+    assert table.items[(task_id, None)]['s'] == 'expired'
+    assert stack.aws.events.rules == {}
+    assert stack.aws.stepfunctions.executions[0]['status'] == 'SUCCEEDED'
+    subjects = [message['Subject'] for message in stack.aws.sns.published]
+    assert subjects[-1] == 'Task Expired Notification'
+    # Both rules were allowed by the template's wildcard permissions, not per-task statements
+    assert {sid for statements in stack.aws.lambda_.policies.values() for sid in statements} == {
+        'TaskDeadlineNotificationPermission', 'DeadlineCheckPermission'
     }
 
 
-def test_lambda_handler(apigw_event):
+def test_completing_after_the_warning_removes_the_final_rule(stack):
+    task_id = assign(stack, deadline=deadline(hours=3))
+    stack.fire_schedules()
+    assert set(stack.aws.events.rules) == {f"task-final-deadline-{task_id}"}
+
+    assert stack.request('PUT', '/tasks', ALICE, {'TaskId': task_id, 'status': 'completed'})[0] == 200
+    assert stack.aws.events.rules == {}
+
+
+def test_deadline_handlers_skip_the_task_cache(stack):
+    task_id = assign(stack, deadline=deadline(hours=3))
+    stack.request('GET', f'/tasks/{task_id}', ALICE)
+    # Completed by a writer whose invalidation never reached this container's cache
+    table = stack.aws.dynamodb.table('TasksTable')
+    table.store(dict(table.items[(task_id, None)], s='completed'))
+    stack.aws.sns.published.clear()
+
+    stack.fire_schedules(rounds=2)
+
+    assert stack.aws.sns.published == []
+    assert table.items[(task_id, None)]['s'] == 'completed'
+
+
+def test_edits_read_the_task_consistently_and_notify_after_the_write(stack, monkeypatch):
+    task_id = assign(stack, deadline=deadline(hours=3))
+    stack.request('GET', f'/tasks/{task_id}', ALICE)
+    # Another container moves the deadline; its invalidation never reaches this one's cache
+    table = stack.aws.dynamodb.table('TasksTable')
+    moved = deadline(hours=5)
+    table.store(dict(table.items[(task_id, None)], dl=moved))
+
+    assert stack.request('PUT', '/tasks', ADMIN, {'TaskId': task_id, 'responsibility': 'bob@x.io'})[0] == 200
+    assert (table.items[(task_id, None)]['dl'], table.items[(task_id, None)]['r']) == (moved, 'bob@x.io')
+
+    # Completed between the read and the write: the update is rejected with nothing sent or rescheduled
+    editor = stack.modules[stack.function_for('edit_task')]
+    get_item = editor.table.get_item
+
+    def read_then_complete(**kwargs):
+        response = get_item(**kwargs)
+        table.store(dict(table.items[(task_id, None)], s='completed'))
+        return response
+
+    monkeypatch.setattr(editor.table, 'get_item', read_then_complete)
+    stack.aws.sns.published.clear()
+    rules = dict(stack.aws.events.rules)
+    assert stack.request('PUT', '/tasks', ADMIN, {'TaskId': task_id, 'responsibility': 'alice@x.io'})[0] == 409
+    assert stack.aws.sns.published == [] and stack.aws.events.rules == rules
+    assert table.items[(task_id, None)]['r'] == 'bob@x.io'
+
 
-    ret = app.lambda_handler(apigw_event, "")
-    data = json.loads(ret["body"])
+def test_delete_requires_admin(stack):
+    task_id = assign(stack, deadline=deadline(hours=3))
 
-    assert ret["statusCode"] == 200
-    assert "message" in ret["body"]
-    assert data["message"] == "hello world"
+    assert stack.request('DELETE', '/tasks', ALICE, {'TaskId': task_id})[0] == 403
+    assert stack.request('DELETE', '/tasks', ADMIN, {'TaskId': task_id})[0] == 200
+    assert stack.aws.events.rules == {}
+    assert stack.request('PUT', '/tasks', ALICE, {'TaskId': task_id, 'status': 'completed'})[0] == 404
@@ -0,0 +1,63 @@
+from loadtest.harness import claims_for
+from tests.unit.helpers import ADMIN, ALICE
+
+TASK = {'name': 'Quarterly report', 'responsibility': 'alice@x.io', 'deadline': '2099-01-01T12:00:00Z'}
+
+
+def test_retried_creation_replays_the_first_response(stack):
+    key = {'Idempotency-Key': 'create-report-1'}
+
+    first = stack.request('POST', '/tasks', ADMIN, dict(TASK), headers=key)
+    retry = stack.request('POST', '/tasks', ADMIN, dict(TASK), headers=key)
+
+    assert first[0] == 200 and retry == first
+    assert len(stack.aws.dynamodb.tables['TasksTable'].items) == 1
+    assert len(stack.aws.sns.published) == 1
+    assert stack.aws.calls_for('assign_task')[('events', 'PutRule')] == 1
+    # Keys belong to the caller, and a key reused for another request is rejected
+    assert stack.request('POST', '/tasks', claims_for('bob@x.io', admin=True), dict(TASK), headers=key)[0] == 200
+    assert stack.request('POST', '/tasks', ADMIN, dict(TASK, name='Other'), headers=key)[0] == 422
+
+
+def test_a_retry_after_a_late_failure_finishes_the_same_task(stack, monkeypatch):
+    key = {'Idempotency-Key': 'create-report-2'}
+    assigner = stack.modules[stack.function_for('assign_task')]
+    publish = assigner.sns_client.publish
+
+    def unavailable(**kwargs):
+        raise RuntimeError('SNS is unavailable')
+
+    # The task is written, then the notification fails and the key is released
+    monkeypatch.setattr(assigner.sns_client, 'publish', unavailable)
+    assert stack.request('POST', '/tasks', ADMIN, dict(TASK), headers=key)[0] == 500
+    monkeypatch.setattr(assigner.sns_client, 'publish', publish)
+
+    status, created = stack.request('POST', '/tasks', ADMIN, dict(TASK), headers=key)
+    assert status == 200
+    assert [task_id for task_id, _ in stack.aws.dynamodb.tables['TasksTable'].items] == [created['TaskId']]
+    assert len(stack.aws.sns.published) == 1
+    assert stack.request('POST', '/tasks', ADMIN, dict(TASK), headers=key) == (200, created)
+
+
+def test_retryable_outcomes_are_not_replayed(stack, monkeypatch):
+    key = {'Idempotency-Key': 'complete-1'}
+    status, created = stack.request('POST', '/tasks', ADMIN, dict(TASK))
+    update = {'TaskId': created['TaskId'], 'status': 'completed'}
+
+    # The task disappears between the read and the write: the first attempt conflicts, its retry runs again
+    editor = stack.modules[stack.function_for('edit_task')]
+    get_item = editor.table.get_item
+
+    def read_then_delete(**kwargs):
+        response = get_item(**kwargs)
+        stack.aws.dynamodb.tables['TasksTable'].items.clear()
+        return response
+
+    monkeypatch.setattr(editor.table, 'get_item', read_then_delete)
+    assert stack.request('PUT', '/tasks', ALICE, dict(update), headers=key)[0] == 409
+    monkeypatch.undo()
+    assert stack.request('PUT', '/tasks', ALICE, dict(update), headers=key)[0] == 404
+
+    event = stack.api_event('PUT', '/tasks', ALICE, dict(update), headers=key)
+    replayed = stack.invoke(stack.function_for('edit_task'), event)
+    assert (replayed['statusCode'], replayed['headers']['Idempotent-Replayed']) == (404, 'true')
@@ -0,0 +1,59 @@
+import json
+
+import instrumentation
+from loadtest.harness import claims_for
+
+
+def _emf_lines(output):
+    return [json.loads(line) for line in output.splitlines() if line.startswith('{"_aws"')]
+
+
+def test_summary_orders_operations_by_time():
+    calls = [
+        {'service': 'sns', 'operation': 'Publish', 'latency_ms': 40.0, 'retries': 1, 'error': None,
+         'request_bytes': 300, 'response_bytes': 90},
+        {'service': 'dynamodb', 'operation': 'PutItem', 'latency_ms': 8.0, 'retries': 0, 'error': None,
+         'request_bytes': 200, 'response_bytes': 2},
+        {'service': 'dynamodb', 'operation': 'PutItem', 'latency_ms': 7.0, 'retries': 0, 'error': 'Throttled',
+         'request_bytes': 200, 'response_bytes': 0},
+    ]
+
+    summary = instrumentation.summarize(calls, duration_ms=100.0)
+
+    assert list(summary['Operations']) == ['sns.Publish', 'dynamodb.PutItem']
+    assert summary['DominantOperation'] == 'sns.Publish'
+    assert summary['Operations']['dynamodb.PutItem'] == {
+        'calls': 2, 'latency_ms': 15.0, 'max_ms': 8.0, 'retries': 0, 'errors': 1,
+        'request_bytes': 400, 'response_bytes': 2
+    }
+    assert summary['AwsTimeShare'] == 0.55
+
+
+def test_handler_emits_per_operation_metrics_and_summary(stack, capsys):
+    body = {'name': 'Report', 'responsibility': 'alice@x.io', 'deadline': '2099-01-01T10:00:00Z'}
+    status, _ = stack.request('POST', '/tasks', claims_for('admin@x.io', admin=True), body)
+    assert status == 200
+
+    lines = [line for line in _emf_lines(capsys.readouterr().out) if 'AwsCalls' in line or 'AwsCallCount' in line]
+    summary = lines[-1]
+    assert summary['AwsCalls'] == 4
+    assert set(summary['Operations']) == {'dynamodb.PutItem', 'sns.Publish', 'events.PutRule', 'events.PutTargets'}
+    assert summary['RequestId']
+    operations = {(line['Service'], line['Operation']) for line in lines[:-1]}
+    assert ('dynamodb', 'PutItem') in operations
+    assert all(line['AwsRequestBytes'] > 0 for line in lines[:-1])
+
+
+def test_metrics_lines_carry_the_function_and_extra_dimensions(capsys, monkeypatch):
+    monkeypatch.setenv('AWS_LAMBDA_FUNCTION_NAME', 'ReconcileRulesFunction')
+
+    instrumentation.emit_metrics({'Calls': (3, 'Count'), 'Wait': (1.5, 'Milliseconds')}, {'Service': 'events'},
+                                 DryRun=True)
+
+    (line,) = _emf_lines(capsys.readouterr().out)
+    (directive,) = line['_aws']['CloudWatchMetrics']
+    assert directive['Dimensions'] == [['FunctionName', 'Service']]
+    assert directive['Metrics'] == [{'Name': 'Calls', 'Unit': 'Count'}, {'Name': 'Wait', 'Unit': 'Milliseconds'}]
+    assert {name: line[name] for name in ('FunctionName', 'Service', 'Calls', 'Wait', 'DryRun')} == {
+        'FunctionName': 'ReconcileRulesFunction', 'Service': 'events', 'Calls': 3, 'Wait': 1.5, 'DryRun': True
+    }
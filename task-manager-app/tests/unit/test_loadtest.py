@@ -0,0 +1,35 @@
+from decimal import Decimal
+
+from loadtest import expressions, harness
+
+
+def test_expressions_follow_dynamodb_semantics():
+    item = {'status': 'open', 'tags': {'a'}, 'count': Decimal(1)}
+    names = {'#s': 'status'}
+    values = {':open': 'open', ':one': Decimal(1), ':t': {'b'}}
+
+    assert expressions.matches('#s = :open AND attribute_not_exists(deadline)', item, names, values)
+    assert not expressions.matches('NOT (#s IN (:open))', item, names, values)
+
+    updated = expressions.apply_update('SET #c = #c + :one ADD tags :t REMOVE #s', item,
+                                       {'#c': 'count', '#s': 'status'}, values)
+    assert updated == {'count': Decimal(2), 'tags': {'a', 'b'}}
+
+
+def test_load_run_reports_every_exercised_handler(stack):
+    report = harness.run(requests=60, concurrency=4, seed=3, users=5, initial_tasks=10, harness=stack)
+
+    handlers = report['handlers']
+    assert all(stats['errors'] == 0 for stats in handlers.values())
+    assert handlers['assign_task']['aws_calls_by_operation']['dynamodb.PutItem'] == handlers['assign_task']['invocations']
+    assert handlers['task_stream']['invocations'] > 0
+    assert handlers['get_user_tasks']['p95_ms'] >= handlers['get_user_tasks']['p50_ms']
+
+
+def test_compare_flags_extra_aws_calls():
+    stats = {'invocations': 10, 'errors': 0, 'aws_calls_per_invocation': 2.0, 'p95_ms': 5.0}
+    baseline = {'handlers': {'edit_task': stats}}
+
+    assert harness.compare({'handlers': {'edit_task': stats}}, baseline) == []
+    regressions = harness.compare({'handlers': {'edit_task': dict(stats, aws_calls_per_invocation=3.0)}}, baseline)
+    assert regressions == ['edit_task: AWS calls per invocation 2.0 -> 3.0']
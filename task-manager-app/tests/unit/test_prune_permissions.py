@@ -0,0 +1,40 @@
+import boto3
+import pytest
+
+from loadtest.standins import ACCOUNT_ID, REGION, ServiceError
+from maintenance import prune_permissions
+
+FUNCTION = 'TaskDeadlineNotificationFunction'
+
+
+def _grant_per_task(stack, count, rule_prefix='task-deadline'):
+    for index in range(count):
+        stack.aws.lambda_.add_permission(
+            FunctionName=FUNCTION, StatementId=f"EventBridge-task-{index}", Action='lambda:InvokeFunction',
+            Principal='events.amazonaws.com',
+            SourceArn=f"arn:aws:events:{REGION}:{ACCOUNT_ID}:rule/{rule_prefix}-task-{index}")
+
+
+def test_per_task_statements_fill_the_policy(stack):
+    with pytest.raises(ServiceError) as full:
+        _grant_per_task(stack, 200)
+
+    assert full.value.code == 'PolicyLengthExceededException'
+
+
+def test_prune_removes_covered_statements_and_keeps_the_rest(stack):
+    _grant_per_task(stack, 30)
+    # Not covered by the template's task-deadline-* statement, so it stays
+    stack.aws.lambda_.add_permission(
+        FunctionName=FUNCTION, StatementId='EventBridge-legacy', Action='lambda:InvokeFunction',
+        Principal='events.amazonaws.com', SourceArn=f"arn:aws:events:{REGION}:{ACCOUNT_ID}:rule/legacy-reminder")
+    client = boto3.client('lambda')
+
+    dry_run = prune_permissions.prune(client, FUNCTION, dry_run=True)
+    assert (dry_run['statements'], dry_run['removable'], dry_run['removed']) == (32, 30, 0)
+    assert dry_run['kept'] == ['EventBridge-legacy']
+
+    report = prune_permissions.prune(client, FUNCTION)
+    assert (report['removed'], report['failed']) == (30, {})
+    assert report['policy_bytes_after'] < report['policy_bytes'] / 10
+    assert set(stack.aws.lambda_.policies[FUNCTION]) == {'TaskDeadlineNotificationPermission', 'EventBridge-legacy'}
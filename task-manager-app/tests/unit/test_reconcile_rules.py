@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta, timezone
+
+from tests.unit.helpers import assign, deadline
+
+
+def _cron(when):
+    return f"cron({when.minute} {when.hour} {when.day} {when.month} ? {when.year})"
+
+
+def _rule(stack, name, when):
+    stack.aws.events.put_rule(Name=name, ScheduleExpression=_cron(when))
+    stack.aws.events.put_targets(Rule=name, Targets=[{'Id': 'target', 'Arn': 'arn:aws:lambda:::function:gone'}])
+
+
+def test_orphaned_and_passed_rules_are_reported_then_deleted(stack):
+    now = datetime.now(timezone.utc)
+    live = assign(stack, deadline=deadline(hours=72))
+    closed = assign(stack, deadline=deadline(hours=72))
+    stack.aws.dynamodb.table('TasksTable').items[(closed, None)]['s'] = 'completed'
+    overdue = assign(stack, deadline=deadline(hours=72))
+    stack.aws.events.rules[f"task-deadline-{overdue}"]['ScheduleExpression'] = _cron(now - timedelta(days=1))
+    # More rules of deleted tasks than fit in one ListRules page or BatchGetItem call
+    for index in range(150):
+        _rule(stack, f"task-final-deadline-gone-{index:03d}", now + timedelta(days=1))
+    reconciler = stack.function_for('reconcile_rules')
+
+    report = stack.invoke(reconciler, {'dry_run': True})
+    assert (report['rules'], report['orphans'], report['deleted']) == (153, 152, 0)
+    assert report['reasons'] == {'task_missing': 150, 'task_closed': 1, 'schedule_passed': 1}
+    assert len(stack.aws.events.rules) == 153
+
+    report = stack.invoke(reconciler, {})
+    assert (report['deleted'], report['failed']) == (152, {})
+    assert set(stack.aws.events.rules) == {f"task-deadline-{live}"}
+    # Per run: one page of warning rules and two of final rules, two batches of tasks
+    calls = stack.aws.calls_for('reconcile_rules')
+    assert (calls[('events', 'ListRules')], calls[('dynamodb', 'BatchGetItem')]) == (6, 4)
@@ -0,0 +1,86 @@
+import base64
+import gzip
+import json
+from decimal import Decimal
+
+import responses
+from loadtest.harness import claims_for
+
+
+def test_dynamodb_types_are_encoded():
+    body = responses.dumps({'count': Decimal('3'), 'score': Decimal('0.5'), 'tags': {'b', 'a'}})
+
+    assert json.loads(body) == {'count': 3, 'score': 0.5, 'tags': ['a', 'b']}
+
+
+def test_projection_keeps_requested_fields_only():
+    items = [{'TaskId': '1', 'name': 'Report', 'Bucket': 7}, {'TaskId': '2'}]
+
+    assert responses.project(items, ['TaskId', 'name']) == [{'TaskId': '1', 'name': 'Report'}, {'TaskId': '2'}]
+    assert responses.project(items, exclude=('Bucket',)) == [{'TaskId': '1', 'name': 'Report'}, {'TaskId': '2'}]
+
+
+def test_large_bodies_are_gzipped_for_clients_that_accept_it(monkeypatch):
+    monkeypatch.setattr(responses, 'RESPONSE_COMPRESSION_MIN_BYTES', 100)
+    items = [{'TaskId': str(number), 'name': 'Quarterly report'} for number in range(20)]
+
+    plain = responses.json_response(200, items, {'headers': {}})
+    compressed = responses.json_response(200, items, {'headers': {'accept-encoding': 'br;q=1.0, gzip;q=0.8'}})
+
+    assert 'isBase64Encoded' not in plain
+    assert compressed['headers']['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(base64.b64decode(compressed['body']))) == items
+    assert len(compressed['body']) < len(plain['body'])
+
+
+def test_listings_return_numeric_attributes(stack):
+    task = {'name': 'Report', 'responsibility': 'alice@x.io', 'estimate_hours': 3}
+    assert stack.request('POST', '/tasks', claims_for('admin@x.io', admin=True), task)[0] == 200
+
+    status, tasks = stack.request('GET', '/tasks', claims_for('alice@x.io'), query={'fields': 'name,estimate_hours'})
+
+    assert status == 200
+    assert tasks[0]['estimate_hours'] == 3
+
+
+def test_if_none_match_uses_weak_comparison():
+    etag = responses.etag_for('tasks', 'alice@x.io', 'cursor-1')
+
+    assert responses.matches({'headers': {'If-None-Match': f'"other", {etag[2:]}'}}, etag)
+    assert not responses.matches({'headers': {'If-None-Match': '"other"'}}, etag)
+    assert responses.not_modified({'headers': {'if-none-match': '*'}}, etag)['statusCode'] == 304
+
+
+def _get(stack, module, path, claims, headers=None):
+    return stack.invoke(stack.function_for(module), stack.api_event('GET', path, claims, headers=headers))
+
+
+def test_polling_an_unchanged_task_list_gets_a_304(stack):
+    alice = claims_for('alice@x.io')
+    task = {'name': 'Report', 'responsibility': 'alice@x.io'}
+    status, created = stack.request('POST', '/tasks', claims_for('admin@x.io', admin=True), task)
+    stack.settle()
+
+    first = _get(stack, 'get_user_tasks', '/tasks', alice)
+    etag = first['headers']['ETag']
+    again = _get(stack, 'get_user_tasks', '/tasks', alice, {'If-None-Match': etag})
+
+    assert again['statusCode'] == 304
+    assert again['body'] == ''
+
+    # Before the stream has carried the write to the change feed
+    stack.request('PUT', '/tasks', alice, {'TaskId': created['TaskId'], 'status': 'completed'})
+    changed = _get(stack, 'get_user_tasks', '/tasks', alice, {'If-None-Match': etag})
+    assert changed['statusCode'] == 200
+    assert changed['headers']['ETag'] != etag
+
+
+def test_user_listing_is_conditional(stack):
+    admin = claims_for('admin@x.io', admin=True)
+    stack.request('POST', '/users', admin, {'username': 'carol', 'email': 'carol@x.io'})
+
+    first = _get(stack, 'get_all_users', '/users', admin)
+    again = _get(stack, 'get_all_users', '/users', admin, {'If-None-Match': first['headers']['ETag']})
+
+    assert first['statusCode'] == 200
+    assert again['statusCode'] == 304
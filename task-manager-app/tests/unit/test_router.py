@@ -0,0 +1,34 @@
+import pytest
+
+from loadtest import bench_api_mode
+from loadtest.harness import claims_for
+
+ROUTER = {'ApiMode': 'router'}
+
+
+@pytest.mark.parametrize('stack', [ROUTER], indirect=True)
+def test_router_mode_serves_every_route_from_one_function(stack):
+    admin = claims_for('admin@x.io', admin=True)
+    task = {'name': 'Quarterly report', 'responsibility': 'alice@x.io'}
+
+    assert 'AssignTaskFunction' not in stack.functions
+    assert set(stack.routes.values()) == {'ApiRouterFunction'}
+    assert stack.request('POST', '/tasks', admin, task)[0] == 200
+    status, tasks = stack.request('GET', '/tasks', claims_for('alice@x.io'))
+    assert (status, [item['name'] for item in tasks]) == (200, ['Quarterly report'])
+    assert stack.request('GET', '/tasks/unknown/route', admin) == (404, {'error': 'Not Found'})
+    # Requests are still measured per route module, as in the split layout
+    assert stack.stats['assign_task'].latencies and stack.stats['get_user_tasks'].latencies
+
+
+def test_shared_containers_cold_start_less_under_sparse_traffic():
+    arrivals = [(minute * 60.0, route) for minute, route in enumerate(['add_user', 'get_all_users', 'add_user'] * 4)]
+    init = {'add_user': 80.0, 'get_all_users': 60.0}
+    warm = {'add_user': 2.0, 'get_all_users': 1.0}
+
+    split = bench_api_mode.simulate('split', arrivals, init, warm, keep_alive=150)
+    router = bench_api_mode.simulate('router', arrivals, dict(init, router=5.0), warm, keep_alive=150)
+
+    assert (split['cold_starts'], router['cold_starts']) == (5, 1)
+    assert router['lazy_imports'] == 1
+    assert router['init_seconds'] < split['init_seconds']
@@ -0,0 +1,84 @@
+import pytest
+
+import search_index
+import task_views
+from tests.unit.helpers import ALICE, assign, deadline
+
+TASKS = [
+    {'TaskId': 't1', 'name': 'Deploy billing service', 'description': 'Roll out the new billing API', 'responsibility': 'a@x.io'},
+    {'TaskId': 't2', 'name': 'Review budget', 'description': 'Check billing totals for Q3', 'responsibility': 'b@x.io'},
+    {'TaskId': 't3', 'name': 'Deploy docs', 'description': 'Publish the handbook', 'responsibility': 'a@x.io'},
+]
+
+
+@pytest.fixture()
+def indexed(monkeypatch):
+    postings = {}
+    for task in TASKS:
+        postings.update(search_index.entries_for(task))
+
+    def fake_postings(scope, term):
+        matches = {}
+        for (shard, term_key), score in postings.items():
+            indexed_term, task_id = term_key.rsplit('#', 1)
+            if shard == search_index._shard(scope, term) and indexed_term.startswith(term):
+                boost = search_index.EXACT_MATCH_BOOST if indexed_term == term else 1
+                matches[task_id] = max(score * boost, matches.get(task_id, 0))
+        return matches
+
+    monkeypatch.setattr(search_index, '_postings', fake_postings)
+
+
+def test_tokenize_is_case_insensitive_and_drops_stopwords():
+    assert search_index.tokenize('Fix the Login-Page, a.s.a.p!') == ['fix', 'login', 'page']
+
+
+def test_name_matches_rank_above_description_matches(indexed):
+    hits = search_index.search('billing')
+
+    assert [task_id for task_id, _ in hits] == ['t1', 't2']
+
+
+def test_multi_term_queries_require_every_term(indexed):
+    assert [task_id for task_id, _ in search_index.search('deploy billing')] == ['t1']
+
+
+def test_prefix_and_scope(indexed):
+    assert {task_id for task_id, _ in search_index.search('dep')} == {'t1', 't3'}
+    assert search_index.search('budget', email='a@x.io') == []
+
+
+def test_renaming_a_task_only_rewrites_changed_postings(monkeypatch):
+    writes = {'put': [], 'delete': []}
+
+    class Batch:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def put_item(self, Item):
+            writes['put'].append(Item['TermKey'])
+
+        def delete_item(self, Key):
+            writes['delete'].append(Key['TermKey'])
+
+    monkeypatch.setattr(search_index.search_table, 'batch_writer', lambda: Batch())
+    old = {'TaskId': 't9', 'name': 'Draft report'}
+
+    search_index.apply_change(old, dict(old, name='Final report'))
+
+    assert writes == {'put': ['final#t9'], 'delete': ['draft#t9']}
+
+
+def test_search_results_come_in_the_list_shape(stack):
+    task_id = assign(stack, name='Deploy billing', description='Roll out the new billing API', deadline=deadline(hours=3))
+    stack.settle()
+
+    (item,) = stack.request('GET', '/tasks/search', ALICE, query={'q': 'billing'})[1]['items']
+    assert set(item) == {*task_views.LIST_FIELDS, 'score'} and item['TaskId'] == task_id
+    (item,) = stack.request('GET', '/tasks/search', ALICE, query={'q': 'billing', 'fields': 'description'})[1]['items']
+    assert set(item) == {'TaskId', 'description', 'score'}
+    (item,) = stack.request('GET', '/tasks/search', ALICE, query={'q': 'billing', 'fields': 'all'})[1]['items']
+    assert item['description'] == 'Roll out the new billing API'
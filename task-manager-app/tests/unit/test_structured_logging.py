@@ -0,0 +1,113 @@
+import io
+import json
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+import structured_logging
+
+
+@pytest.fixture()
+def log():
+    stream = io.StringIO()
+    logger = logging.getLogger('test_structured_logging')
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    handler = structured_logging.SampledHandler(logging.INFO, buffer_size=10, stream=stream)
+    logger.addHandler(handler)
+    context = SimpleNamespace(aws_request_id='lambda-request-1', function_name='TestFunction')
+    try:
+        yield logger, stream, context
+    finally:
+        logger.removeHandler(handler)
+        structured_logging.end()
+
+
+def _lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_records_are_json_with_the_api_gateway_request_id(log):
+    logger, stream, context = log
+    structured_logging.begin({'requestContext': {'requestId': 'api-request-1'}}, context, sample_rate=0)
+
+    logger.info("Task %s assigned to %s", 'task-1', 'alice@x.io', extra={'task_id': 'task-1'})
+
+    [line] = _lines(stream)
+    assert line['message'] == 'Task task-1 assigned to alice@x.io'
+    assert line['level'] == 'INFO'
+    assert line['correlation_id'] == 'api-request-1'
+    assert line['request_id'] == 'lambda-request-1'
+    assert line['task_id'] == 'task-1'
+
+
+def test_debug_records_are_held_until_an_error(log):
+    logger, stream, context = log
+    structured_logging.begin({'correlation_id': 'flow-1'}, context, sample_rate=0)
+
+    logger.debug("Task: %s", {'TaskId': 'task-1'})
+    assert stream.getvalue() == ''
+
+    logger.error("Error sending notification")
+
+    assert [line['level'] for line in _lines(stream)] == ['DEBUG', 'ERROR']
+    assert all(line['correlation_id'] == 'flow-1' for line in _lines(stream))
+
+
+def test_held_debug_records_are_dropped_when_the_invocation_succeeds(log, monkeypatch):
+    logger, stream, context = log
+    # logged() samples at LOG_DEBUG_SAMPLE_RATE; neither invocation may be sampled
+    monkeypatch.setattr(structured_logging.random, 'random', lambda: 1.0)
+
+    @structured_logging.logged
+    def handler(event, context):
+        logger.debug("Loaded %s", 'task-1')
+        return {'statusCode': 200}
+
+    @structured_logging.logged
+    def failing(event, context):
+        logger.debug("Loaded %s", 'task-2')
+        return {'statusCode': 500}
+
+    handler({}, context)
+    assert stream.getvalue() == ''
+
+    failing({}, context)
+    [line] = _lines(stream)
+    assert line['message'] == 'Loaded task-2'
+    assert line['correlation_id'] == 'lambda-request-1'
+
+
+def test_sampled_invocations_write_debug_records_directly(log):
+    logger, stream, context = log
+    structured_logging.begin({'headers': {'X-Correlation-Id': 'client-1'}}, context, sample_rate=1)
+
+    logger.debug("Scanning %d items", 3)
+
+    [line] = _lines(stream)
+    assert line['message'] == 'Scanning 3 items'
+    assert line['correlation_id'] == 'client-1'
+
+
+def test_the_root_logger_is_lowered_only_for_sampled_invocations(log):
+    _, _, context = log
+    root = logging.getLogger()
+    try:
+        structured_logging.setup(logging.INFO, buffer_size=0)
+        assert root.level == logging.INFO
+
+        structured_logging.begin({}, context, sample_rate=0)
+        assert root.level == logging.INFO
+        structured_logging.end()
+
+        structured_logging.begin({}, context, sample_rate=1)
+        assert root.level == logging.DEBUG
+        structured_logging.end()
+        assert root.level == logging.INFO
+
+        # Held records need a LogRecord in every invocation
+        structured_logging.setup(logging.INFO, buffer_size=10)
+        assert root.level == logging.DEBUG
+    finally:
+        structured_logging.setup()
@@ -0,0 +1,118 @@
+import time
+
+import boto3
+
+import task_archive
+from maintenance import backfill_archive_at
+from tests.unit.helpers import ADMIN, ALICE, BOB, assign, deadline
+
+LATER = time.time() + 400 * 86400
+
+
+def test_completed_tasks_move_to_the_archive_after_their_ttl(stack):
+    done = assign(stack, name='Done')
+    assign(stack, name='Still open')
+    bobs = assign(stack, name='Bob done', responsibility='bob@x.io')
+    for task_id, claims in ((done, ALICE), (bobs, BOB)):
+        assert stack.request('PUT', '/tasks', claims, {'TaskId': task_id, 'status': 'completed'})[0] == 200
+    stack.settle()
+
+    assert stack.expire_items() == {}
+    assert stack.expire_items(LATER)['TasksTable'] == 2
+    assert [task['name'] for task in stack.request('GET', '/tasks', ALICE)[1]] == ['Still open']
+
+    status, archived = stack.request('GET', '/tasks/archive', ALICE)
+    assert status == 200
+    assert [(task['TaskId'], task['status']) for task in archived['items']] == [(done, 'completed')]
+    assert archived['next_token'] is None
+    assert {task['name'] for task in stack.request('GET', '/tasks/archive', ADMIN)[1]['items']} == {'Done', 'Bob done'}
+    assert stack.request('GET', '/tasks/archive', ADMIN, query={'user': 'bob@x.io'})[1]['count'] == 1
+    # Archived tasks still count as completed
+    assert stack.request('GET', '/tasks/stats', ALICE)[1]['counts']['completed'] == 1
+
+
+def test_expired_and_reopened_tasks(stack):
+    expired = assign(stack, name='Missed', deadline=deadline(hours=3))
+    reopened = assign(stack, name='Reopened')
+    stack.fire_schedules(rounds=2)
+    assert stack.request('PUT', '/tasks', ALICE, {'TaskId': reopened, 'status': 'completed'})[0] == 200
+    assert stack.request('PUT', '/tasks', ADMIN, {'TaskId': reopened, 'status': 'open'})[0] == 200
+
+    table = stack.aws.dynamodb.table('TasksTable')
+    assert 'ArchiveAt' in table.items[(expired, None)]
+    assert 'ArchiveAt' not in table.items[(reopened, None)]
+    assert stack.expire_items(LATER)['TasksTable'] == 1
+    assert [task['TaskId'] for task in stack.request('GET', '/tasks/archive', ALICE)[1]['items']] == [expired]
+
+
+def test_any_status_change_sets_the_ttl_from_the_final_status(stack):
+    reopened = assign(stack, name='Reopened by its assignee')
+    expired = assign(stack, name='Expired by hand')
+    assert stack.request('PUT', '/tasks', ALICE, {'TaskId': reopened, 'status': 'completed'})[0] == 200
+    assert stack.request('PUT', '/tasks', ALICE, {'TaskId': reopened, 'status': 'open'})[0] == 200
+    assert stack.request('PUT', '/tasks', ADMIN, {'TaskId': expired, 'status': 'expired'})[0] == 200
+
+    table = stack.aws.dynamodb.table('TasksTable')
+    assert table.items[(reopened, None)]['s'] == 'open' and 'ArchiveAt' not in table.items[(reopened, None)]
+    assert table.items[(expired, None)]['s'] == 'expired' and 'ArchiveAt' in table.items[(expired, None)]
+    stack.settle()
+    assert stack.expire_items(LATER)['TasksTable'] == 1
+    assert [task['TaskId'] for task in stack.request('GET', '/tasks/archive', ALICE)[1]['items']] == [expired]
+
+
+def test_clients_cannot_set_the_archive_time(stack):
+    task_id = assign(stack, name='Open', ArchiveAt=1, completed_at='2020-01-01', status='completed', TaskId='mine')
+    assert task_id != 'mine'
+    assert stack.request('PUT', '/tasks', ADMIN, {'TaskId': task_id, 'ArchiveAt': 1, 'completed_at': '2020-01-01'})[0] == 200
+
+    item = stack.aws.dynamodb.table('TasksTable').items[(task_id, None)]
+    assert item['s'] == 'open' and 'ArchiveAt' not in item and 'ca' not in item and 'x' not in item
+    assert stack.expire_items(LATER) == {}
+
+
+def test_archive_pages_by_object(tmp_path):
+    store = task_archive.LocalStore(str(tmp_path))
+    tasks = [{'TaskId': f"t{index}", 'responsibility': 'a@x.io', 'ArchiveAt': 1_800_000_000} for index in range(3)]
+    original, task_archive._store = task_archive._store, store
+    objects = task_archive.ARCHIVE_PAGE_OBJECTS
+    try:
+        keys = task_archive.archive([('12', tasks[2]), ('10', tasks[0]), ('11', tasks[1])])
+        assert keys == [f"-/a@x.io/2027-01/{'10':0>40}.json.gz"]
+        task_archive.archive([('20', dict(tasks[0], TaskId='t3')), ('21', dict(tasks[0], TaskId='t4', responsibility='b@x.io')),
+                              ('22', dict(tasks[0], TaskId='t5', team='red'))])
+
+        page, token = task_archive.read('a@x.io', limit=2)
+        assert [task['TaskId'] for task in page] == ['t0', 't1', 't2'] and token == keys[0]
+        page, token = task_archive.read('a@x.io', token, limit=2)
+        assert ([task['TaskId'] for task in page], token) == (['t3', 't5'], None)
+        assert len(task_archive.read(limit=10)[0]) == 6
+
+        # A team's listing reads only the team's objects
+        reads = []
+        get = store.get
+        store.get = lambda key: reads.append(key) or get(key)
+        assert [task['TaskId'] for task in task_archive.read(team='red')[0]] == ['t5'] and len(reads) == 1
+
+        # A page stops after ARCHIVE_PAGE_OBJECTS objects, however few tasks they hold
+        task_archive.ARCHIVE_PAGE_OBJECTS = 2
+        page, token = task_archive.read(limit=50)
+        assert len(page) == 4 and token is not None
+    finally:
+        task_archive.ARCHIVE_PAGE_OBJECTS = objects
+        task_archive._store = original
+
+
+def test_backfill_stamps_closed_tasks_once(stack):
+    table = stack.aws.dynamodb.table('TasksTable')
+    now = time.time()
+    table.store({'TaskId': 'old', 'status': 'completed', 'completed_at': '2020-01-01 00:00:00+00:00'})
+    table.store({'TaskId': 'expired', 'status': 'expired'})
+    table.store({'TaskId': 'open', 'status': 'open'})
+    tasks = boto3.resource('dynamodb').Table('TasksTable')
+
+    assert backfill_archive_at.backfill(tasks, days=30, dry_run=True, now=now)['candidates'] == 2
+    report = backfill_archive_at.backfill(tasks, days=30, now=now)
+    assert (report['stamped'], report['due_now']) == (2, 1)
+    assert int(table.items[('expired', None)]['ArchiveAt']) == int(now + 30 * 86400)
+    assert 'ArchiveAt' not in table.items[('open', None)]
+    assert backfill_archive_at.backfill(tasks, now=now)['candidates'] == 0
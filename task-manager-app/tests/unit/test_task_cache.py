@@ -0,0 +1,75 @@
+from decimal import Decimal
+
+import pytest
+
+import task_cache
+
+
+class FakeTable:
+    def __init__(self, items):
+        self.items = items
+        self.get_calls = 0
+
+    def get_item(self, Key):
+        self.get_calls += 1
+        item = self.items.get(Key['TaskId'])
+        return {'Item': dict(item)} if item else {}
+
+
+@pytest.fixture()
+def cache(monkeypatch):
+    monkeypatch.setattr(task_cache, 'local_cache', task_cache.LRUCache(max_entries=2, ttl_seconds=30))
+    monkeypatch.setattr(task_cache, 'shared_tier', task_cache.LocalSharedTier())
+    task_cache.emit_metrics()
+    return task_cache
+
+
+def test_repeat_reads_skip_dynamodb(cache):
+    table = FakeTable({'t1': {'TaskId': 't1', 'status': 'open'}})
+
+    first = cache.get_task(table, 't1')
+    first['status'] = 'mutated'
+    second = cache.get_task(table, 't1')
+
+    assert table.get_calls == 1
+    assert second['status'] == 'open'
+    stats = cache.cache_stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1
+
+
+def test_invalidate_forces_a_fresh_read(cache):
+    table = FakeTable({'t1': {'TaskId': 't1', 'status': 'open'}})
+    cache.get_task(table, 't1')
+
+    table.items['t1']['status'] = 'completed'
+    cache.invalidate('t1')
+
+    assert cache.get_task(table, 't1')['status'] == 'completed'
+    assert table.get_calls == 2
+
+
+def test_shared_tier_serves_other_containers(cache):
+    table = FakeTable({'t1': {'TaskId': 't1', 'points': Decimal('3')}})
+    cache.get_task(table, 't1')
+
+    cache.local_cache.clear()
+    task = cache.get_task(table, 't1')
+
+    assert table.get_calls == 1
+    assert task['points'] == Decimal('3')
+    assert cache.cache_stats()['shared_hits'] == 1
+
+
+def test_lru_evicts_oldest_and_expires_entries():
+    now = [0.0]
+    lru = task_cache.LRUCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    lru.set('a', 1)
+    lru.set('b', 2)
+    lru.get('a')
+    lru.set('c', 3)
+
+    assert lru.get('b') is None
+    assert lru.get('a') == 1
+
+    now[0] = 11.0
+    assert lru.get('a') is None
@@ -0,0 +1,94 @@
+import boto3
+from boto3.dynamodb.types import Binary
+
+import task_codec
+from loadtest import bench_encoding
+from maintenance import migrate_task_encoding
+from tests.unit.helpers import ADMIN, ALICE, assign, deadline
+
+LONG_TEXT = 'Collect the figures from every region and reconcile them with finance. ' * 8
+
+
+def test_items_use_short_names_and_compress_long_text():
+    task = {'TaskId': 't1', 'name': 'Report', 'description': LONG_TEXT, 'comment': 'short', 'status': 'open',
+            'responsibility': 'alice@x.io', 'estimate_hours': 3}
+    item = task_codec.encode(task)
+
+    assert set(item) == {'TaskId', 'n', 'd', 'c', 's', 'r', 'x'}
+    assert isinstance(item['d'], Binary) and len(item['d'].value) < len(LONG_TEXT) // 4
+    assert item['c'] == 'short' and item['x'] == {'estimate_hours': 3}
+    assert task_codec.decode(item) == task
+    assert task_codec.item_size(item) < task_codec.item_size(task) // 3
+
+    # Items written before the compact encoding still read; a short name written later wins
+    legacy = {'TaskId': 't2', 'name': 'Old', 'status': 'open', 's': 'expired', 'points': 2}
+    assert task_codec.decode(legacy) == {'TaskId': 't2', 'name': 'Old', 'status': 'expired', 'points': 2}
+    assert not task_codec.is_compact(legacy) and task_codec.is_compact(item)
+
+
+def test_api_stores_compact_items_and_serves_legacy_ones(stack):
+    status, payload = stack.request('POST', '/tasks', ADMIN, {'name': 'Spec', 'responsibility': 'alice@x.io',
+                                                             'description': LONG_TEXT})
+    assert status == 200
+    table = stack.aws.dynamodb.table('TasksTable')
+    assert isinstance(table.items[(payload['TaskId'], None)]['d'], Binary)
+    table.store({'TaskId': 'legacy', 'name': 'Old', 'responsibility': 'alice@x.io', 'status': 'open'})
+
+    assert {task['name'] for task in stack.request('GET', '/tasks', ALICE)[1]} == {'Spec', 'Old'}
+    matched = stack.request('GET', '/tasks/all', ADMIN, query={'description': LONG_TEXT, 'limit': '10'})[1]
+    assert [task['TaskId'] for task in matched['items']] == [payload['TaskId']]
+
+    # The edit's stale-read guard accepts the legacy item and rewrites it compact
+    assert stack.request('PUT', '/tasks', ALICE, {'TaskId': 'legacy', 'status': 'completed'})[0] == 200
+    assert task_codec.is_compact(table.items[('legacy', None)])
+    assert table.items[('legacy', None)]['s'] == 'completed'
+
+
+def test_migration_rewrites_legacy_items_once(stack):
+    table = stack.aws.dynamodb.table('TasksTable')
+    table.store({'TaskId': 'a', 'name': 'A', 'description': LONG_TEXT, 'responsibility': 'alice@x.io',
+                 'status': 'open', 'points': 2})
+    table.store(task_codec.encode({'TaskId': 'b', 'name': 'B', 'status': 'open'}))
+    tasks = boto3.resource('dynamodb').Table('TasksTable')
+
+    report = migrate_task_encoding.migrate(tasks, dry_run=True, segments=2)
+    assert (report['scanned'], report['legacy'], report['migrated']) == (2, 1, 0)
+    assert report['bytes_saved'] > len(LONG_TEXT) // 2
+
+    assert migrate_task_encoding.migrate(tasks, segments=2)['migrated'] == 1
+    assert table.items[('a', None)] == task_codec.encode({'TaskId': 'a', 'name': 'A', 'description': LONG_TEXT,
+                                                          'responsibility': 'alice@x.io', 'status': 'open',
+                                                          'points': 2})
+    assert migrate_task_encoding.migrate(tasks)['legacy'] == 0
+
+
+def test_encoding_benchmark_shows_smaller_items_and_cheaper_scans(stack):
+    report = bench_encoding.run(400, long_descriptions=0.2, harness=stack)
+
+    assert report['migration']['migrated'] == 400
+    assert report['compact']['mean_item_bytes'] < 0.7 * report['legacy']['mean_item_bytes']
+    assert report['compact']['scan_read_units'] < report['legacy']['scan_read_units']
+
+
+def test_expiry_notifies_legacy_items(stack):
+    due = deadline(hours=3)
+    task_id = assign(stack, name='Old', deadline=due)
+    table = stack.aws.dynamodb.table('TasksTable')
+    # Written before the compact encoding
+    table.store(task_codec.decode(table.items[(task_id, None)]))
+
+    # Warning rule, then the final deadline rule it schedules
+    stack.fire_schedules(rounds=2)
+
+    assert stack.aws.stepfunctions.executions[0]['status'] == 'SUCCEEDED'
+    assert task_codec.decode(table.items[(task_id, None)])['status'] == 'expired'
+    notification = stack.aws.sns.published[-1]
+    assert notification['Subject'] == 'Task Expired Notification'
+    assert notification['Message'] == f"Task {task_id}: Old has expired.\nAssigned to: alice@x.io\nDeadline: {due}"
+    assert notification['MessageAttributes']['email']['StringValue'] == 'alice@x.io'
+
+    # The item keeps its legacy status=open next to s=expired; filters go by the short name
+    tasks = boto3.resource('dynamodb').Table('TasksTable')
+    assert table.items[(task_id, None)]['status'] == 'open'
+    assert tasks.scan(FilterExpression=task_codec.condition('status', 'eq', 'open'))['Items'] == []
+    assert len(tasks.scan(FilterExpression=task_codec.condition('status', 'eq', 'expired'))['Items']) == 1
@@ -0,0 +1,59 @@
+from boto3.dynamodb.types import TypeSerializer
+
+import task_codec
+import task_counters
+import write_shards
+from loadtest.harness import claims_for
+
+# t1's share of the all-tasks counters
+ALL = write_shards.sharded('ALL', 't1', task_counters.TASK_COUNTER_SHARDS)
+
+
+def test_creation_counts_for_user_and_all():
+    deltas = task_counters.counter_deltas(None, {'TaskId': 't1', 'status': 'open', 'responsibility': 'a@x.io'})
+
+    assert deltas == {
+        ALL: {'open': 1, 'total': 1},
+        'USER#a@x.io': {'open': 1, 'total': 1},
+    }
+
+
+def test_status_transition_moves_one_count():
+    old = {'TaskId': 't1', 'status': 'open', 'responsibility': 'a@x.io'}
+    new = dict(old, status='expired')
+
+    deltas = task_counters.counter_deltas(old, new)
+
+    assert deltas[ALL] == {'open': -1, 'expired': 1}
+    assert deltas['USER#a@x.io'] == {'open': -1, 'expired': 1}
+
+
+def test_reassignment_only_touches_user_counters():
+    old = {'TaskId': 't1', 'status': 'open', 'responsibility': 'a@x.io'}
+    new = dict(old, responsibility='b@x.io')
+
+    deltas = task_counters.counter_deltas(old, new)
+
+    assert ALL not in deltas
+    assert deltas['USER#a@x.io'] == {'open': -1, 'total': -1}
+    assert deltas['USER#b@x.io'] == {'open': 1, 'total': 1}
+
+
+def test_unrelated_edit_is_a_no_op():
+    old = {'TaskId': 't1', 'status': 'open', 'responsibility': 'a@x.io', 'comment': 'a'}
+
+    assert task_counters.counter_deltas(old, dict(old, comment='b')) == {}
+
+
+def test_replayed_stream_record_counts_once(stack):
+    task = {'TaskId': 't1', 'status': 'open', 'responsibility': 'a@x.io'}
+    record = {'eventID': '1', 'eventName': 'INSERT', 'dynamodb': {
+        'NewImage': {key: TypeSerializer().serialize(value) for key, value in task_codec.encode(task).items()},
+        'SequenceNumber': '100'
+    }}
+
+    for _ in range(2):
+        assert stack.invoke('TaskStreamFunction', {'Records': [record]}) == {'batchItemFailures': []}
+
+    assert stack.request('GET', '/tasks/stats', claims_for('a@x.io'))[1]['counts'] == {'open': 1, 'completed': 0, 'expired': 0, 'total': 1}
+    assert stack.aws.calls_for('task_stream')[('dynamodb', 'TransactWriteItems')] == 2
@@ -0,0 +1,61 @@
+import task_history
+from tests.unit.helpers import ADMIN, ALICE, BOB, assign
+
+
+def _history(stack, task_id, claims=ALICE, **query):
+    status, page = stack.request('GET', f"/tasks/{task_id}/history", claims, query=query or None)
+    assert status == 200
+    return page
+
+
+def test_comments_are_appended_without_rewriting_the_task(stack):
+    task_id = assign(stack)
+    stack.settle()
+    stack.reset_measurements()
+
+    for text in ('Started', 'Waiting on finance'):
+        assert stack.request('PUT', '/tasks', ALICE, {'TaskId': task_id, 'comment': text})[0] == 200
+
+    assert stack.aws.calls_for('edit_task').get(('dynamodb', 'PutItem')) == 2
+    assert stack.aws.dynamodb.table('TasksTable').stats()['write_units'] == 0
+    comments = [(event['by'], event['text']) for event in _history(stack, task_id)['items'] if event['type'] == 'comment']
+    assert comments == [('alice@x.io', 'Started'), ('alice@x.io', 'Waiting on finance')]
+
+
+def test_transitions_are_recorded_and_paged(stack):
+    task_id = assign(stack)
+    assert stack.request('PUT', '/tasks', ALICE, {'TaskId': task_id, 'status': 'completed', 'comment': 'Done'})[0] == 200
+    assert stack.request('PUT', '/tasks', ADMIN, {'TaskId': task_id, 'status': 'open'})[0] == 200
+    assert stack.request('PUT', '/tasks', ADMIN, {'TaskId': task_id, 'responsibility': 'bob@x.io'})[0] == 200
+    stack.settle()
+
+    events = _history(stack, task_id, ADMIN)['items']
+    assert sorted((event['type'], event.get('from'), event.get('to')) for event in events) == [
+        ('assigned', 'alice@x.io', 'bob@x.io'), ('comment', None, None), ('created', None, 'open'),
+        ('status', 'completed', 'open'), ('status', 'open', 'completed')]
+    assert [event['EventAt'] for event in events] == sorted(event['EventAt'] for event in events)
+
+    first = _history(stack, task_id, BOB, limit='3', order='desc')
+    rest = _history(stack, task_id, BOB, limit='3', order='desc', next_token=first['next_token'])
+    assert [event['EventAt'] for event in first['items'] + rest['items']] == [event['EventAt'] for event in events][::-1]
+    # Alice no longer holds the task
+    assert stack.request('GET', f"/tasks/{task_id}/history", ALICE)[0] == 404
+
+
+def test_history_outlives_the_task(stack):
+    task_id = assign(stack)
+    assert stack.request('DELETE', '/tasks', ADMIN, {'TaskId': task_id})[0] == 200
+    stack.settle()
+
+    assert [event['type'] for event in _history(stack, task_id, ADMIN)['items']] == ['created', 'deleted']
+    assert stack.request('GET', f"/tasks/{task_id}/history", ALICE)[0] == 404
+
+
+def test_replayed_stream_records_rewrite_the_same_events():
+    old, new = {'TaskId': 't1', 'status': 'open'}, {'TaskId': 't1', 'status': 'completed', 'deadline': 'x'}
+    events = task_history.events_for(old, new, '42', 1_700_000_000_000)
+
+    assert events == task_history.events_for(old, new, '42', 1_700_000_000_000)
+    assert [(event['type'], event['at']) for event in events] == [
+        ('status', '2023-11-14T22:13:20.000+00:00'), ('deadline', '2023-11-14T22:13:20.000+00:00')]
+    assert len({event['EventAt'] for event in events}) == 2
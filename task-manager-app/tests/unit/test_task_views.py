@@ -0,0 +1,50 @@
+from tests.unit.helpers import ADMIN, ALICE, BOB, assign
+
+DETAILS = 'Collect the figures from every region. ' * 20
+# Fields a listing leaves out unless asked for
+DETAILED = {'description': DETAILS, 'estimate_hours': 3}
+
+
+def test_listings_return_the_list_shape_unless_asked_for_more(stack):
+    task_id = assign(stack, **DETAILED, deadline='2099-01-01T00:00:00Z', comment='Draft is in the shared folder')
+
+    row = {'TaskId': task_id, 'name': 'Report', 'status': 'open', 'deadline': '2099-01-01T00:00:00Z',
+           'responsibility': 'alice@x.io'}
+    assert stack.request('GET', '/tasks', ALICE) == (200, [row])
+    assert stack.request('GET', '/tasks/all', ADMIN)[1]['items'] == [row]
+
+    status, tasks = stack.request('GET', '/tasks', ALICE, query={'fields': 'comment,estimate_hours'})
+    assert tasks == [{'TaskId': task_id, 'comment': 'Draft is in the shared folder', 'estimate_hours': 3}]
+    full = stack.request('GET', '/tasks/all', ADMIN, query={'fields': 'all'})[1]['items'][0]
+    assert full['description'] == DETAILS and full['estimate_hours'] == 3
+    # Sorting by a field that is not returned still works
+    page = stack.request('GET', '/tasks/all', ADMIN, query={'fields': 'name', 'sort': 'completed_at:desc'})[1]
+    assert page['items'] == [{'TaskId': task_id, 'name': 'Report'}]
+
+    assert stack.request('GET', '/tasks', ALICE, query={'fields': 'name;drop'})[0] == 400
+    assert stack.request('GET', '/tasks/all', ADMIN, query={'fields': ''})[0] == 400
+
+
+def test_list_etag_depends_on_the_fields(stack):
+    assign(stack, **DETAILED)
+    stack.settle()
+    first = stack.invoke(stack.function_for('get_user_tasks'), stack.api_event('GET', '/tasks', ALICE))
+    etag = first['headers']['ETag']
+
+    repeat = stack.api_event('GET', '/tasks', ALICE, headers={'If-None-Match': etag})
+    assert stack.invoke(stack.function_for('get_user_tasks'), repeat)['statusCode'] == 304
+    wider = stack.api_event('GET', '/tasks', ALICE, query={'fields': 'all'}, headers={'If-None-Match': etag})
+    assert stack.invoke(stack.function_for('get_user_tasks'), wider)['statusCode'] == 200
+
+
+def test_task_details_are_fetched_on_demand(stack):
+    task_id = assign(stack, **DETAILED)
+
+    status, task = stack.request('GET', f"/tasks/{task_id}", ALICE)
+    assert status == 200
+    assert (task['description'], task['estimate_hours'], task['status']) == (DETAILS, 3, 'open')
+    assert stack.request('GET', f"/tasks/{task_id}", ADMIN)[0] == 200
+    assert stack.request('GET', f"/tasks/{task_id}", BOB) == (404, {'error': 'Task not found'})
+    assert stack.request('GET', '/tasks/missing', ADMIN)[0] == 404
+    # Literal routes under /tasks still win over the task id
+    assert stack.request('GET', '/tasks/stats', ALICE)[0] == 200
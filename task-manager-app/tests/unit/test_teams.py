@@ -0,0 +1,138 @@
+import importlib
+import time
+
+import boto3
+
+import change_log
+import task_codec
+from loadtest.harness import claims_for
+from maintenance import backfill_task_team
+from tests.unit.helpers import ADMIN, BLUE_ADMIN, RED_ADMIN, assign, deadline
+
+RED_ALICE = claims_for('alice@red.io', team='red')
+
+
+def _names(stack, claims, **query):
+    status, page = stack.request('GET', '/tasks/all', claims, query=dict({'limit': '100'}, **query))
+    assert status == 200
+    return sorted(task['name'] for task in page['items'])
+
+
+def test_team_admins_only_reach_their_team(stack):
+    red = assign(stack, RED_ADMIN, name='Red 1', responsibility='alice@red.io', team='blue')
+    assign(stack, RED_ADMIN, name='Red 2', responsibility='alice@red.io')
+    blue = assign(stack, BLUE_ADMIN, name='Blue 1', responsibility='bob@blue.io')
+    assign(stack, ADMIN, name='Blue 2', responsibility='carol@blue.io', team='blue')
+    assign(stack, ADMIN, name='Unteamed', responsibility='dave@x.io')
+
+    # A team admin cannot assign into another team
+    assert task_codec.decode(stack.aws.dynamodb.table('TasksTable').items[(red, None)])['team'] == 'red'
+    assert _names(stack, RED_ADMIN) == ['Red 1', 'Red 2']
+    assert _names(stack, RED_ADMIN, team='blue') == ['Red 1', 'Red 2']
+    assert _names(stack, BLUE_ADMIN) == ['Blue 1', 'Blue 2']
+    assert _names(stack, ADMIN, team='blue') == ['Blue 1', 'Blue 2']
+    assert len(_names(stack, ADMIN)) == 5
+    assert [task['name'] for task in stack.request('GET', '/tasks/all', RED_ALICE)[1]['items']] == ['Red 1', 'Red 2']
+
+    assert stack.request('GET', f'/tasks/{blue}', RED_ADMIN)[0] == 404
+    assert stack.request('GET', f'/tasks/{blue}', BLUE_ADMIN)[0] == 200
+    assert stack.request('PUT', '/tasks', RED_ADMIN, {'TaskId': blue, 'status': 'completed'})[0] == 403
+    assert stack.request('PUT', '/tasks', RED_ADMIN, {'TaskId': red, 'team': 'blue', 'name': 'Red one'})[0] == 200
+    assert _names(stack, RED_ADMIN) == ['Red 2', 'Red one']
+    assert stack.request('DELETE', '/tasks', BLUE_ADMIN, {'TaskId': red})[0] == 404
+    assert stack.request('GET', f'/tasks/{red}/history', BLUE_ADMIN)[0] == 404
+
+
+def test_team_listing_reads_only_the_team(stack):
+    table = stack.aws.dynamodb.table('TasksTable')
+    for index in range(200):
+        team = 'small' if index < 5 else 'big'
+        table.store(task_codec.encode({'TaskId': f"t{index:03d}", 'name': f"Task {index}", 'status': 'open',
+                                       'responsibility': f"user{index % 7}@x.io", 'team': team}))
+
+    stack.reset_measurements()
+    assert len(_names(stack, claims_for('lead@small.io', admin=True, team='small'))) == 5
+    assert table.stats()['items_scanned'] == 5
+
+    stack.reset_measurements()
+    assert len(_names(stack, ADMIN)) == 100
+    assert table.stats()['items_scanned'] == 100
+
+
+def test_users_carry_their_team(stack):
+    assert stack.request('POST', '/users', RED_ADMIN, {'username': 'alice', 'email': 'alice@red.io', 'team': 'blue'})[1]['team'] == 'red'
+    assert stack.request('POST', '/users', ADMIN, {'username': 'bob', 'email': 'bob@blue.io', 'team': 'blue'})[0] == 200
+    assert stack.request('POST', '/users', ADMIN, {'username': 'dave', 'email': 'dave@x.io'})[0] == 200
+    assert stack.request('POST', '/users', RED_ALICE, {'username': 'eve', 'email': 'eve@x.io', 'team': 'red'})[0] == 403
+    assert stack.request('POST', '/users', RED_ALICE, {'username': 'eve', 'email': 'eve@x.io'})[1]['team'] is None
+
+    assert [user['username'] for user in stack.request('GET', '/users', RED_ADMIN)[1]] == ['alice']
+    assert len(stack.request('GET', '/users', ADMIN)[1]) == 4
+
+    table = stack.aws.dynamodb.table('TasksTable')
+    table.store({'TaskId': 'a', 'responsibility': 'alice@red.io', 'status': 'open'})
+    table.store(task_codec.encode({'TaskId': 'b', 'responsibility': 'bob@blue.io', 'status': 'open'}))
+    table.store({'TaskId': 'd', 'responsibility': 'dave@x.io', 'status': 'open'})
+    table.store(task_codec.encode({'TaskId': 'e', 'responsibility': 'bob@blue.io', 'team': 'green'}))
+    teams = backfill_task_team.teams_by_email(boto3.client('cognito-idp'), 'pool')
+    assert teams == {'alice@red.io': 'red', 'bob@blue.io': 'blue'}
+
+    tasks = boto3.resource('dynamodb').Table('TasksTable')
+    assert backfill_task_team.backfill(tasks, teams, dry_run=True)['candidates'] == 3
+    report = backfill_task_team.backfill(tasks, teams)
+    assert (report['stamped'], report['no_team']) == (2, 1)
+    assert [task_codec.decode(table.items[(key, None)]).get('team') for key in 'abde'] == ['red', 'blue', None, 'green']
+    blue = stack.request('GET', '/tasks/all', ADMIN, query={'team': 'blue'})[1]['items']
+    assert [task['TaskId'] for task in blue] == ['b']
+    assert backfill_task_team.backfill(tasks, teams)['stamped'] == 0
+
+
+def test_team_admins_read_their_team_through_every_view(stack, monkeypatch):
+    # The stack imports its own copy of the handlers' modules
+    monkeypatch.setattr(importlib.import_module('change_log'), 'CHANGE_FEED_SETTLE_SECONDS', 0)
+    since = change_log.make_cursor(int(time.time() * 1000) - 1000)
+    stack.request('POST', '/users', ADMIN, {'username': 'alice', 'email': 'alice@red.io', 'team': 'red'})
+    stack.request('POST', '/users', ADMIN, {'username': 'bob', 'email': 'bob@blue.io', 'team': 'blue'})
+    due = deadline(hours=3)
+    red = assign(stack, RED_ADMIN, name='Report red', responsibility='alice@red.io', deadline=due)
+    blue = assign(stack, BLUE_ADMIN, name='Report blue', responsibility='bob@blue.io', deadline=due)
+    for task_id, claims in ((red, RED_ADMIN), (blue, BLUE_ADMIN)):
+        assert stack.request('PUT', '/tasks', claims, {'TaskId': task_id, 'status': 'completed'})[0] == 200
+    stack.settle()
+
+    def ids(path, claims, key='TaskId', **query):
+        status, page = stack.request('GET', path, claims, query=query)
+        assert status == 200
+        return sorted({item[key] for item in page['items' if 'items' in page else 'changes']})
+
+    assert ids('/tasks/search', RED_ADMIN, q='report') == [red]
+    assert ids('/tasks/search', ADMIN, q='report') == sorted([red, blue])
+    assert ids('/tasks/changes', RED_ADMIN, scope='all', since=since) == [red]
+    assert ids('/tasks/changes', ADMIN, scope='all', since=since) == sorted([red, blue])
+    assert stack.request('GET', '/tasks/stats', RED_ADMIN)[1] == {'scope': 'team:red', 'counts': {'open': 0, 'completed': 1, 'expired': 0, 'total': 1}}
+    assert stack.request('GET', '/tasks/stats', ADMIN, query={'team': 'blue'})[1]['counts']['completed'] == 1
+    assert stack.request('GET', '/tasks/stats', ADMIN)[1]['counts']['completed'] == 2
+
+    # Reopened, both are due again
+    for task_id, claims in ((red, RED_ADMIN), (blue, BLUE_ADMIN)):
+        assert stack.request('PUT', '/tasks', claims, {'TaskId': task_id, 'status': 'open'})[0] == 200
+    stack.settle()
+    assert ids('/tasks/due', RED_ADMIN) == [red]
+    assert ids('/tasks/due', ADMIN) == sorted([red, blue])
+
+    # Closed again and past their TTL, they move to the archive
+    for task_id, claims in ((red, RED_ADMIN), (blue, BLUE_ADMIN)):
+        assert stack.request('PUT', '/tasks', claims, {'TaskId': task_id, 'status': 'completed'})[0] == 200
+    stack.settle()
+    stack.expire_items(time.time() + 400 * 86400)
+    assert ids('/tasks/archive', RED_ADMIN) == [red]
+    assert ids('/tasks/archive', ADMIN) == sorted([red, blue])
+
+    # user= must name a member of the admin's team
+    for path, query in (('/tasks/search', {'q': 'report'}), ('/tasks/due', {}), ('/tasks/stats', {}), ('/tasks/archive', {})):
+        assert stack.request('GET', path, RED_ADMIN, query=dict(query, user='bob@blue.io'))[0] == 404
+        assert stack.request('GET', path, RED_ADMIN, query=dict(query, user='alice@red.io'))[0] == 200
+        assert stack.request('GET', path, ADMIN, query=dict(query, user='bob@blue.io'))[0] == 200
+    # Quotes in user= stay inside the Cognito filter's value
+    for injected in ('alice@red.io" ', 'x\\" or email = "alice@red.io'):
+        assert stack.request('GET', '/tasks/stats', RED_ADMIN, query={'user': injected})[0] == 404
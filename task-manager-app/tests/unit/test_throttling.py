@@ -0,0 +1,127 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+import throttling
+from loadtest.harness import claims_for
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def throttle_error():
+    return ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, 'PutRule')
+
+
+def raising(error):
+    def operation():
+        raise error
+    return operation
+
+
+def test_limiter_halves_its_rate_on_throttles_and_regains_it_additively():
+    clock = FakeClock()
+    limiter = throttling.AdaptiveLimiter('events', max_rate=8, burst=2, max_attempts=3, increase=1,
+                                         clock=clock, sleep=clock.sleep)
+    for _ in range(5):
+        limiter.call(lambda: 'ok')
+    # Nothing is paced until the service pushes back
+    assert limiter.stats()['wait_seconds'] == 0 and not limiter.engaged
+    outcomes = iter([throttle_error(), throttle_error(), 'ok'])
+
+    def put_rule():
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert limiter.call(put_rule) == 'ok'
+    # Two throttles halve 8 -> 4 -> 2, the success adds one back
+    assert limiter.rate == 3
+    assert limiter.stats()['throttles'] == 2 and limiter.stats()['retries'] == 2
+
+    with pytest.raises(ClientError):
+        limiter.call(raising(throttle_error()))
+    # Gave up after three attempts: 3 -> 1.5 -> 0.75 -> 0.375
+    assert limiter.stats()['failures'] == 1
+    assert limiter.rate == 0.375
+
+    # Other errors are not retried and leave the rate alone
+    rate = limiter.rate
+    with pytest.raises(ValueError):
+        limiter.call(raising(ValueError()))
+    assert limiter.rate == rate
+
+    # Successes climb back to max_rate, and pacing stops with it
+    assert limiter.engaged
+    for _ in range(8):
+        limiter.call(lambda: 'ok')
+    assert limiter.rate == 8 and not limiter.engaged
+    waited = limiter.stats()['wait_seconds']
+    for _ in range(5):
+        limiter.call(lambda: 'ok')
+    assert limiter.stats()['wait_seconds'] == waited
+
+
+def test_limiter_retries_server_errors_without_slowing_down():
+    clock = FakeClock()
+    limiter = throttling.AdaptiveLimiter('events', max_rate=8, max_attempts=3, clock=clock, sleep=clock.sleep)
+    outcomes = iter([ClientError({'Error': {'Code': 'InternalFailure'}, 'ResponseMetadata': {'HTTPStatusCode': 500}}, 'PutRule'),
+                     EndpointConnectionError(endpoint_url='https://events'), 'ok'])
+
+    def put_rule():
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert limiter.call(put_rule) == 'ok'
+    assert limiter.stats()['retries'] == 2 and limiter.stats()['throttles'] == 0
+    assert limiter.rate == 8 and not limiter.engaged
+
+    # A client error is the caller's to handle
+    not_found = ClientError({'Error': {'Code': 'ResourceNotFoundException'}, 'ResponseMetadata': {'HTTPStatusCode': 400}}, 'DeleteRule')
+    with pytest.raises(ClientError):
+        limiter.call(raising(not_found))
+    assert limiter.stats()['retries'] == 2
+
+
+def test_bucket_spaces_calls_out_once_the_burst_is_spent():
+    clock = FakeClock()
+    bucket = throttling.TokenBucket(rate=4, burst=2, clock=clock, sleep=clock.sleep)
+
+    waits = [bucket.acquire() for _ in range(4)]
+
+    assert waits == [0.0, 0.0, 0.25, 0.25]
+
+
+@pytest.mark.parametrize('stack', [{'ControlPlaneRate': '100'}], indirect=True)
+def test_task_burst_against_throttled_eventbridge_succeeds(stack):
+    stack.aws.throttle('events', rate=40, burst=4)
+    admin = claims_for('admin@x.io', admin=True)
+    deadline = (datetime.now(timezone.utc) + timedelta(days=2)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def create(index):
+        return stack.request('POST', '/tasks', admin, {'name': f"Task {index}", 'responsibility': 'alice@x.io',
+                                                       'deadline': deadline})[0]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        statuses = list(pool.map(create, range(24)))
+
+    assert statuses == [200] * 24
+    assert len(stack.aws.events.rules) == 24
+    # The stand-in did push back, and the container slowed down instead of failing; its rate
+    # may have climbed back to the maximum by now, so only the pushback is checked
+    assert stack.aws.throttled_for('assign_task')
@@ -0,0 +1,42 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import tracing
+from loadtest import traces
+from loadtest.harness import claims_for
+
+TRACEPARENT = '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'
+
+
+def test_payload_carries_the_current_span_to_the_next_hop():
+    with tracing.span('sender', remote=tracing.extract({'headers': {'traceparent': TRACEPARENT}})) as sender:
+        payload = tracing.inject({'taskId': 'task-1'})
+    tracing.flush()
+
+    carrier = tracing.extract({'Records': [{'body': json.dumps(payload), 'attributes': {}}]})
+
+    assert sender.trace_id == '0af7651916cd43dd8448eb211c80319c'
+    assert sender.parent_id == 'b7ad6b7169203331'
+    assert carrier.context == (sender.trace_id, sender.span_id, True)
+    assert carrier.sent_at == payload['trace_sent_at']
+
+
+def test_deadline_flow_is_one_trace_from_assignment_to_expiry_notification(stack):
+    deadline = (datetime.now(timezone.utc) + timedelta(hours=3)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    task = {'name': 'Quarterly report', 'responsibility': 'alice@x.io', 'deadline': deadline}
+    assert stack.request('POST', '/tasks', claims_for('admin@x.io', admin=True), task)[0] == 200
+
+    stack.fire_schedules(rounds=2)
+
+    [trace] = traces.group(stack.aws.collector.spans).values()
+    assert [hop['hop'] for hop in traces.hops(trace)] == [
+        'assign_task', 'deadline_warning', 'deadline_check', 'process_expired_task', 'ExpiredTasksStateMachine'
+    ]
+    notification = stack.aws.sns.published[-1]
+    assert notification['Subject'] == 'Task Expired Notification'
+    assert tracing.parse_traceparent(notification['MessageAttributes']['traceparent']['StringValue']).trace_id == \
+        trace[0]['trace_id']
+
+    analysis = traces.analyze(stack.aws.collector.spans)
+    assert analysis['deadline_to_notification']['count'] == 1
+    assert analysis['hops']['process_expired_task']['wait_ms']['count'] == 1
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+
+import write_shards
+from loadtest import bench_hot_keys, standins
+from maintenance import rebuild_due_index
+from tests.unit.helpers import ADMIN, assign, deadline
+
+
+def test_keys_and_merge():
+    assert write_shards.sharded('ALL#2030-01-02', 't1', 1) == 'ALL#2030-01-02'
+    key = write_shards.sharded('ALL#2030-01-02', 't1', 8)
+    assert key in write_shards.shard_keys('ALL#2030-01-02', 8) and key == write_shards.sharded('ALL#2030-01-02', 't1', 8)
+    assert write_shards.shard_keys('ALL', 1) == ['ALL'] and len(write_shards.shard_keys('ALL', 4)) == 4
+    assert len({write_shards.shard_of(f"t{index}", 8) for index in range(100)}) == 8
+
+    pages = write_shards.scatter(lambda key: [f"{value}{key}" for value in range(key, 9, 3)], [0, 1, 2])
+    assert write_shards.gather(pages, lambda value: value) == ['00', '11', '22', '30', '41', '52', '60', '71', '82']
+    assert write_shards.gather(pages, lambda value: value, limit=4) == ['00', '11', '22', '30']
+
+
+def test_due_listing_and_stats_read_every_shard(stack):
+    soon = datetime.now(timezone.utc) + timedelta(hours=2)
+    for index in range(24):
+        assign(stack, name=f"Task {index:02d}", deadline=(soon + timedelta(minutes=index)).strftime('%Y-%m-%dT%H:%M:%SZ'))
+    stack.settle()
+
+    due_table = stack.aws.dynamodb.table('DueTasksTable')
+    assert len({bucket for bucket, _ in due_table.items if bucket.startswith('ALL#')}) > 1
+    due = stack.request('GET', '/tasks/due', ADMIN, query={'hours': '6', 'limit': '10'})[1]['items']
+    assert [task['name'] for task in due] == [f"Task {index:02d}" for index in range(10)]
+    assert len(stack.request('GET', '/tasks/due', ADMIN, query={'hours': '6'})[1]['items']) == 24
+
+    # Counts kept in the unsharded item before sharding still add up
+    stack.aws.dynamodb.table('TaskStatsTable').store({'CounterKey': 'ALL', 'completed': 3, 'total': 3})
+    counts = stack.request('GET', '/tasks/stats', ADMIN)[1]['counts']
+    assert (counts['open'], counts['completed'], counts['total']) == (24, 3, 27)
+
+
+def test_rebuild_moves_unsharded_entries(stack):
+    task_id = assign(stack, name='Old', deadline=deadline(hours=2))
+    stack.settle()
+    due_table = stack.aws.dynamodb.table('DueTasksTable')
+    # As written before sharding, plus an entry of a task that no longer exists
+    (bucket, due_key), = [key for key in due_table.items if key[0].startswith('ALL#')]
+    legacy = dict(due_table.remove((bucket, due_key)), Bucket=bucket.rsplit('#', 1)[0])
+    due_table.store(legacy)
+    due_table.store(dict(legacy, DueKey='0000000001#gone', TaskId='gone'))
+
+    dynamodb = boto3.resource('dynamodb')
+    tables = dynamodb.Table('TasksTable'), dynamodb.Table('DueTasksTable')
+    report = rebuild_due_index.rebuild(*tables)
+    assert (report['written'], report['deleted']) == (1, 2)
+    assert (bucket, due_key) in due_table.items and len(due_table.items) == 2
+    assert [task['TaskId'] for task in stack.request('GET', '/tasks/due', ADMIN)[1]['items']] == [task_id]
+    assert rebuild_due_index.rebuild(*tables)['written'] == 0
+
+
+def test_hot_partition_writes_are_throttled_and_retried(stack, monkeypatch):
+    monkeypatch.setattr(standins, 'PARTITION_RETRY_BASE_SECONDS', 0.001)
+    table = stack.aws.dynamodb.table('DueTasksTable')
+    table.limit_partition_writes(units_per_second=1000, burst=2)
+    due = boto3.resource('dynamodb').Table('DueTasksTable')
+
+    with due.batch_writer() as batch:
+        for index in range(5):
+            batch.put_item(Item={'Bucket': 'hot', 'DueKey': f"{index}"})
+    assert len(table.items) == 5 and table.stats()['throttled_writes'] > 0
+
+    table.limit_partition_writes(units_per_second=0.001, burst=1)
+    due.put_item(Item={'Bucket': 'hot', 'DueKey': 'a'})
+    with pytest.raises(ClientError, match='ProvisionedThroughputExceeded'):
+        due.put_item(Item={'Bucket': 'hot', 'DueKey': 'b'})
+    due.put_item(Item={'Bucket': 'cold', 'DueKey': 'b'})
+
+
+def test_sharding_lifts_the_hot_key_write_limit():
+    unsharded, sharded = bench_hot_keys.run(300, shard_counts=(1, 4), partition_wcu=100, latency_ms=0)['runs']
+
+    assert unsharded['throttled_due_writes'] > 0 and unsharded['throttled_counter_writes'] > 0
+    assert sharded['throttled_due_writes'] == sharded['throttled_counter_writes'] == 0
+    for run in (unsharded, sharded):
+        assert (run['failed_writes'], run['due_entries_read'], run['open_count']) == (0, 300, 300)
+        assert run['due_read_in_order']